@@ -0,0 +1,43 @@
+"""
+Check members' activity bitmaps against their logged sessions, or rebuild them.
+
+    python -m app.activity check|rebuild
+
+A day's bit is set as a session is logged on it and cleared when its last
+session is deleted. `check` recomputes every member's bitmap from history,
+archived sessions included, and lists the members whose stored bitmap
+differs, exiting 1 if any do; `rebuild` stores the recomputed ones and
+drops words left empty by deletes. Run `rebuild` once to fill the bitmaps
+in for sessions logged before they existed.
+"""
+import argparse
+import sys
+
+from .utils import activity
+
+
+def main(argv=None, session_factory=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", choices=("check", "rebuild"))
+    args = parser.parse_args(argv)
+
+    if session_factory is None:
+        from .database import SessionLocal as session_factory
+
+    with session_factory() as db:
+        if args.command == "check":
+            changes = activity.check(db)
+        else:
+            changes = activity.rebuild(db)
+            db.commit()
+
+    members = len({user_id for user_id, _ in changes})
+    if args.command == "check":
+        print(f"{members} members' activity out of date ({len(changes)} words)")
+        return 1 if changes else 0
+    print(f"Rebuilt activity for {members} members ({len(changes)} words)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import declarative_base, sessionmaker
 import os
 import logging
@@ -19,6 +20,14 @@ def get_db():
     finally:
         db.close()
 
+def get_session_factory():
+    """For endpoints that open their own sessions, e.g. one per thread; overridden like get_db."""
+    return SessionLocal
+
+def upsert(conn, table):
+    """An INSERT for the connection's database with on_conflict_do_nothing() and on_conflict_do_update()."""
+    return (postgresql if conn.dialect.name == "postgresql" else sqlite).insert(table)
+
 def init_db():
     Base.metadata.create_all(bind=engine)
 
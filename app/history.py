@@ -0,0 +1,107 @@
+"""
+Maintain workout history storage.
+
+    python -m app.history status
+    python -m app.history partition [--months-ahead 3]    # Postgres: rebuild workout_sessions partitioned by month
+    python -m app.history maintain [--months-ahead 3]     # create upcoming partitions and missing indexes
+    python -m app.history archive [--older-than-days 730] [--batch-size 500] [--dry-run]
+
+Run `maintain` from cron at least monthly once sessions are partitioned,
+and `archive` whenever cold sessions should leave the hot tables.
+"""
+import argparse
+import sys
+
+from sqlalchemy import func, select
+
+from . import models
+from .utils import archive, partitions
+
+INDEXED_TABLES = (models.WorkoutSession, models.WorkoutEntry, models.ArchivedWorkoutSession, models.ArchivedWorkoutEntry)
+
+
+def _is_postgres(engine) -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def status(engine) -> None:
+    with engine.connect() as conn:
+        for model in (models.WorkoutSession, models.ArchivedWorkoutSession):
+            count = conn.execute(select(func.count()).select_from(model.__table__)).scalar()
+            print(f"{model.__tablename__}: {count} sessions")
+        if _is_postgres(engine) and partitions.is_partitioned(conn):
+            for partition in partitions.partitions(conn):
+                print(f"  {partition['name']}: ~{partition['rows']} rows  {partition['bounds']}")
+
+
+def create_indexes(engine) -> None:
+    with engine.begin() as conn:
+        for model in INDEXED_TABLES:
+            model.__table__.create(conn, checkfirst=True)
+            for index in model.__table__.indexes:
+                index.create(conn, checkfirst=True)
+
+
+def main(argv=None, engine=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status")
+    for name in ("partition", "maintain"):
+        command = commands.add_parser(name)
+        command.add_argument("--months-ahead", type=int, default=partitions.PARTITION_MONTHS_AHEAD)
+    command = commands.add_parser("archive")
+    command.add_argument("--older-than-days", type=int, default=archive.ARCHIVE_AFTER_DAYS)
+    command.add_argument("--batch-size", type=int, default=archive.ARCHIVE_BATCH_SIZE)
+    command.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    if engine is None:
+        from .database import engine
+
+    if args.command == "status":
+        status(engine)
+        return 0
+
+    if args.command == "partition":
+        if not _is_postgres(engine):
+            print("Partitioning needs Postgres", file=sys.stderr)
+            return 1
+        try:
+            with engine.begin() as conn:
+                created = partitions.convert_to_partitioned(conn, args.months_ahead)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(f"Partitioned {partitions.TABLE} into {len(created)} partitions")
+        return 0
+
+    if args.command == "maintain":
+        create_indexes(engine)
+        if _is_postgres(engine):
+            with engine.begin() as conn:
+                if partitions.is_partitioned(conn):
+                    for name in partitions.ensure_partitions(conn, args.months_ahead):
+                        print(f"Created {name}")
+        return 0
+
+    try:
+        cutoff = archive.archive_cutoff(args.older_than_days)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.dry_run:
+        print(f"{archive.archivable_sessions(engine, cutoff)} sessions dated before {cutoff:%Y-%m-%d} would be archived")
+        return 0
+    create_indexes(engine)
+    if _is_postgres(engine):
+        # Completed sets may still point at sessions that move
+        with engine.begin() as conn:
+            partitions.drop_foreign_keys_to(conn, partitions.TABLE,
+                                            referencing=models.CompletedExerciseSet.__tablename__)
+    moved = archive.archive_sessions(engine, cutoff, args.batch_size)
+    print(f"Archived {moved} sessions dated before {cutoff:%Y-%m-%d}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
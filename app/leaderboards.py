@@ -0,0 +1,45 @@
+"""
+Check leaderboard scores against members' logged history, or rebuild them.
+
+    python -m app.leaderboards check|rebuild
+
+Scores are folded in as workouts are logged and recomputed by a queued
+job after edits and deletes. `check` recomputes every public program's
+boards from history and lists the stored scores that differ, exiting 1 if
+any do; `rebuild` stores the recomputed ones. Run either one periodically
+to catch anything the incremental updates missed, such as rows changed by
+hand. Earlier months' volume boards are final and left alone.
+"""
+import argparse
+import sys
+from collections import Counter
+
+from .utils import leaderboards
+
+
+def main(argv=None, session_factory=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", choices=("check", "rebuild"))
+    args = parser.parse_args(argv)
+
+    if session_factory is None:
+        from .database import SessionLocal as session_factory
+
+    with session_factory() as db:
+        if args.command == "check":
+            changes = leaderboards.check(db)
+        else:
+            changes = leaderboards.refresh(db)
+            db.commit()
+
+    for board, count in sorted(Counter(key[1] for key in changes).items()):
+        print(f"{board}: {count} scores {'out of date' if args.command == 'check' else 'rebuilt'}")
+    if args.command == "check":
+        print(f"{len(changes)} scores out of date")
+        return 1 if changes else 0
+    print(f"Rebuilt {len(changes)} scores")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,31 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
-from app.routers import health, users, workouts, workout_entries, auth, workout_plans, workout_templates, workout_programs
+from app.routers import health, users, workouts, workout_entries, auth, workout_plans, workout_templates, workout_programs, dashboard, analytics, jobs, metrics, profiles, slow_queries
+from app.utils.content_negotiation import ContentNegotiationMiddleware
+from app.utils.fast_json import NegotiatedJSONResponse
+from app.utils.jobs import job_runner
+from app.utils.metrics import MetricsMiddleware, request_metrics
+from app.utils.profiling import ProfilerMiddleware, profiling_enabled
+from app.utils.response_cache import GZipETagMiddleware
+from app.utils.query_stats import QUERY_STATS_ENABLED, QueryStatsMiddleware
+from app.utils.slow_queries import SlowQueryMiddleware, slow_query_log, slow_query_log_enabled
+from app.utils.structured_logging import RequestIdMiddleware, configure_logging
 from .database import engine, init_db
 from . import models
 import os
 
+# Responses at least this large are gzipped for clients that accept it; level 0 turns compression off
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
+
+# JSON logs through a queue to a background writer, before anything logs
+configure_logging()
+
 models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+app = FastAPI(default_response_class=NegotiatedJSONResponse)
 
 # Initialize database tables
 init_db()
@@ -28,14 +45,60 @@ app.add_middleware(
 )
 print(f"CORS middleware added with origins: {'all origins' if '*' in allowed_origins else allowed_origins}")
 
+# On-demand profiles (X-Profile header or PROFILE_SAMPLE_RATE); not installed otherwise
+if profiling_enabled():
+    app.add_middleware(ProfilerMiddleware)
+
+# Statements over SLOW_QUERY_MS are kept with their plans and calling route
+if slow_query_log_enabled():
+    app.add_middleware(SlowQueryMiddleware)
+
+# Per-request query counts in Server-Timing, with N+1 warnings in the log
+if QUERY_STATS_ENABLED:
+    app.add_middleware(QueryStatsMiddleware)
+
+# MessagePack bodies and responses for clients that send or accept application/msgpack
+app.add_middleware(ContentNegotiationMiddleware)
+
+if COMPRESSION_LEVEL > 0:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_BYTES, compresslevel=COMPRESSION_LEVEL)
+    # Outside GZip, so it sees which responses were compressed
+    app.add_middleware(GZipETagMiddleware)
+
+# Request ids for log records, profiles and the X-Request-ID response header
+app.add_middleware(RequestIdMiddleware)
+
+# Added last so it is outermost and times the whole request
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(health.router, prefix="/health", tags=["health"])
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(users.router, prefix="/users", tags=["users"])
 app.include_router(workouts.router, prefix="/workouts", tags=["workouts"])
 app.include_router(workout_entries.router, prefix="/workouts", tags=["workout-entries"])
+app.include_router(analytics.router, prefix="/workouts/analytics", tags=["analytics"])
 app.include_router(workout_plans.router, prefix="/workout-plans", tags=["workout-plans"])
 app.include_router(workout_templates.router, prefix="/workout-templates", tags=["workout-templates"])
 app.include_router(workout_programs.router, prefix="/workout-programs", tags=["workout-programs"])
+app.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
+app.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+app.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
+app.include_router(profiles.router, prefix="/profiles", tags=["profiles"])
+app.include_router(slow_queries.router, prefix="/slow-queries", tags=["slow-queries"])
+
+# Background jobs run in this process unless JOB_WORKERS=0
+@app.on_event("startup")
+def start_job_runner():
+    job_runner.start()
+
+@app.on_event("shutdown")
+def stop_job_runner():
+    job_runner.stop()
+
+@app.on_event("shutdown")
+def flush_metrics():
+    request_metrics.flush()
+    slow_query_log.flush()
 
 # Add endpoint for exercise names
 @app.get("/exercises", response_model=list[str])
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Float, Text, Table
+from sqlalchemy import BigInteger, Boolean, Column, ForeignKey, Index, Integer, LargeBinary, String, DateTime, Float, Text, Table
 from sqlalchemy.orm import relationship
 from .database import Base
 from datetime import datetime
@@ -24,8 +24,8 @@ class User(Base):
 class WorkoutSession(Base):
     __tablename__ = "workout_sessions"
     id = Column(Integer, primary_key=True, index=True)
-    date = Column(DateTime, default=datetime.utcnow)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    date = Column(DateTime, default=datetime.utcnow, index=True)  # Monthly partition key on Postgres
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     notes = Column(Text)
     user = relationship("User", back_populates="workouts")
     entries = relationship("WorkoutEntry", back_populates="session")
@@ -33,7 +33,7 @@ class WorkoutSession(Base):
 class WorkoutEntry(Base):
     __tablename__ = "workout_entries"
     id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(Integer, ForeignKey("workout_sessions.id"))
+    session_id = Column(Integer, ForeignKey("workout_sessions.id"), index=True)
     exercise_name = Column(String, nullable=False)
     sets = Column(Integer, nullable=False)
     reps = Column(Integer, nullable=False)
@@ -43,6 +43,28 @@ class WorkoutEntry(Base):
     difficulty = Column(Integer, nullable=True)
     session = relationship("WorkoutSession", back_populates="entries")
 
+# Sessions older than ARCHIVE_AFTER_DAYS, moved out of the hot tables by
+# `python -m app.history archive`; read-only, and unioned into history reads
+class ArchivedWorkoutSession(Base):
+    __tablename__ = "workout_sessions_archive"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    date = Column(DateTime)
+    user_id = Column(Integer)
+    notes = Column(Text)
+    __table_args__ = (Index("ix_workout_sessions_archive_user_date", "user_id", "date"),)
+
+class ArchivedWorkoutEntry(Base):
+    __tablename__ = "workout_entries_archive"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    session_id = Column(Integer, index=True)
+    exercise_name = Column(String, nullable=False)
+    sets = Column(Integer, nullable=False)
+    reps = Column(Integer, nullable=False)
+    weight = Column(Float)
+    notes = Column(Text)
+    category = Column(String, nullable=True)
+    difficulty = Column(Integer, nullable=True)
+
 class WorkoutPlan(Base):
     __tablename__ = "workout_plans"
     id = Column(Integer, primary_key=True, index=True)
@@ -59,6 +81,7 @@ class WorkoutTemplate(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     description = Column(Text, nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Bumped on edit to invalidate cached copies
     # Relationships
     plans = relationship("WorkoutPlan", secondary=workout_plan_template, back_populates="templates")
     exercises = relationship("TemplateExercise", back_populates="template")
@@ -88,6 +111,7 @@ class WorkoutProgram(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     is_public = Column(Boolean, default=False)
     creator_id = Column(Integer, ForeignKey("users.id"))
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Bumped on edit to invalidate cached copies
     
     # Relationships
     creator = relationship("User", back_populates="created_programs")
@@ -125,6 +149,7 @@ class ProgramExercise(Base):
     notes = Column(Text, nullable=True)
     category = Column(String, nullable=True)
     is_barbell_exercise = Column(Boolean, default=False)
+    equipment = Column(String, nullable=True)  # barbell, dumbbell, cable, machine, bodyweight, kettlebell
     
     # Relationships
     program_workout = relationship("ProgramWorkout", back_populates="exercises")
@@ -163,6 +188,7 @@ class CompletedExerciseSet(Base):
     __tablename__ = "completed_exercise_sets"
     id = Column(Integer, primary_key=True, index=True)
     exercise_progress_id = Column(Integer, ForeignKey("exercise_progress.id"))
+    # Not enforced in the database once sessions are archived or partitioned
     workout_session_id = Column(Integer, ForeignKey("workout_sessions.id"), nullable=True)
     set_number = Column(Integer, nullable=False)
     reps_completed = Column(Integer, nullable=False)
@@ -173,3 +199,70 @@ class CompletedExerciseSet(Base):
     # Relationships
     exercise_progress = relationship("ExerciseProgress", back_populates="completed_sets")
     workout_session = relationship("WorkoutSession")
+
+class Job(Base):
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    kind = Column(String, nullable=False)
+    status = Column(String, default="queued", index=True)  # queued, running, succeeded, failed, cancelled
+    priority = Column(Integer, default=0)  # Higher runs first
+    payload = Column(Text, nullable=True)  # JSON arguments for the handler
+    result = Column(Text, nullable=True)  # JSON result once succeeded
+    error = Column(Text, nullable=True)
+    progress = Column(Float, default=0.0)  # 0.0 - 1.0
+    progress_message = Column(String, nullable=True)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_after = Column(DateTime, default=datetime.utcnow)  # Not picked up before this time (retry backoff)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    locked_by = Column(String, nullable=True)
+
+# Each member's score on each public program's leaderboards, kept current by
+# app/utils/leaderboards.py; `python -m app.leaderboards check` verifies them
+class LeaderboardScore(Base):
+    __tablename__ = "leaderboard_scores"
+    id = Column(Integer, primary_key=True, index=True)
+    program_id = Column(Integer, ForeignKey("workout_programs.id"), nullable=False)
+    board = Column(String, nullable=False)
+    period = Column(String, nullable=False, default="")  # YYYY-MM on monthly boards, empty otherwise
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    score = Column(Float, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        Index("ix_leaderboard_scores_board", "program_id", "board", "period", "user_id", unique=True),
+        Index("ix_leaderboard_scores_user", "user_id"),
+    )
+
+# Each member's best estimated 1RM per exercise (lowercased), as counted in
+# the exercise's quantile sketch; app/utils/percentiles.py keeps both current
+class ExerciseBest(Base):
+    __tablename__ = "exercise_bests"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    exercise = Column(String, nullable=False)
+    e1rm = Column(Float, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (Index("ix_exercise_bests_user_exercise", "user_id", "exercise", unique=True),)
+
+class ExerciseSketch(Base):
+    __tablename__ = "exercise_sketches"
+    id = Column(Integer, primary_key=True, index=True)
+    exercise = Column(String, nullable=False, unique=True)
+    lifters = Column(Integer, nullable=False, default=0)
+    data = Column(LargeBinary, nullable=False)  # QuantileSketch.to_bytes()
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+# Each member's training days as a bitmap, WORD_DAYS (63) days to a row: bit
+# n of word w is day 63w + n counted from 1970-01-01, so every word fits a
+# signed BIGINT. app/utils/activity.py keeps it current
+class ActivityDays(Base):
+    __tablename__ = "activity_days"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    word = Column(Integer, nullable=False)
+    bits = Column(BigInteger, nullable=False, default=0)
+    __table_args__ = (Index("ix_activity_days_user_word", "user_id", "word", unique=True),)
@@ -0,0 +1,44 @@
+"""
+Find and remove rows whose parent has been deleted.
+
+    python -m app.orphans [--batch-size 1000] [--dry-run]
+
+Deletes through the API cascade to children now; this clears what earlier
+deletes left behind. Each batch commits on its own, so it can run against
+a live database and be stopped and restarted at any point.
+"""
+import argparse
+import sys
+
+from .utils import cascades
+
+
+def main(argv=None, engine=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=cascades.ORPHAN_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.batch_size < 1:
+        print("--batch-size must be at least 1", file=sys.stderr)
+        return 1
+
+    if engine is None:
+        from .database import engine
+
+    if args.dry_run:
+        # Counts only the rows orphaned now, not those a run would orphan on the way
+        with engine.connect() as conn:
+            for orphans in cascades.ORPHANS:
+                print(f"{orphans.name}: {cascades.count_orphans(conn, orphans)} orphaned rows")
+        return 0
+
+    removed = cascades.delete_orphans(engine, args.batch_size)
+    for name, count in removed:
+        print(f"{name}: removed {count} orphaned rows")
+    print(f"Removed {sum(count for _, count in removed)} orphaned rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+"""
+Rebuild every member's best e1RMs and the percentile sketches built from them.
+
+    python -m app.percentiles [--relative-accuracy 0.01]
+
+Bests and sketches are kept current as entries are written, so this is for
+filling them in the first time, changing their accuracy, and periodically
+correcting anything changed behind the application's back. Everything is
+recomputed from history, archived sessions included, in one transaction.
+"""
+import argparse
+import sys
+
+from .utils import percentiles
+
+
+def main(argv=None, session_factory=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--relative-accuracy", type=float, default=percentiles.PERCENTILE_RELATIVE_ACCURACY)
+    args = parser.parse_args(argv)
+
+    if not 0 < args.relative_accuracy < 1:
+        print("--relative-accuracy must be between 0 and 1", file=sys.stderr)
+        return 1
+
+    if session_factory is None:
+        from .database import SessionLocal as session_factory
+
+    with session_factory() as db:
+        lifters = percentiles.rebuild(db, args.relative_accuracy)
+        db.commit()
+    print(f"Rebuilt {len(lifters)} exercise sketches from {sum(lifters.values())} bests")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
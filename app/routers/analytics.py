@@ -0,0 +1,138 @@
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from .. import models
+from ..utils import activity, muscles, percentiles, strength, training_load
+from ..utils.auth import get_current_active_user
+from ..utils.data_versions import conditional_get, daily_conditional_get
+from ..utils.fast_json import FastJSONResponse
+
+router = APIRouter()
+
+
+def require_numpy():
+    if strength.np is None:
+        raise HTTPException(status_code=503, detail="Analytics need numpy, which is not installed")
+
+
+def _parse_goals(goals: List[str]) -> Dict[str, float]:
+    parsed = {}
+    for goal in goals:
+        name, _, weight = goal.rpartition(":")
+        try:
+            parsed[name] = float(weight)
+        except ValueError:
+            name = ""
+        if not name:
+            raise HTTPException(status_code=422, detail=f"Goals look like 'Squat:405', not {goal!r}")
+    return parsed
+
+
+@router.get("/strength", dependencies=[Depends(require_numpy), Depends(daily_conditional_get)])
+def get_strength_analytics(
+    response: Response,
+    formula: str = Query("epley", pattern=f"^({'|'.join(strength.FORMULAS)})$"),
+    weeks: int = Query(52, gt=0, le=520),
+    goal: List[str] = Query([], description="Goal e1RMs as 'Exercise:weight', repeatable"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Estimated 1RM trends for every exercise the member has logged: weekly
+    best e1RM and its rolling best, weekly volume and intensity for the
+    last `weeks` weeks, and a trend line fitted to recent weekly bests with
+    the date it projects each goal to be reached.
+    """
+    goals = _parse_goals(goal)
+    arrays = strength.history_arrays(db, current_user.id)
+    # Returned directly, so the ETag set by daily_conditional_get is copied over
+    return FastJSONResponse(strength.strength_report(arrays, formula=formula, weeks=weeks, goals=goals),
+                            headers=response.headers)
+
+
+@router.get("/training-load", dependencies=[Depends(daily_conditional_get)])
+def get_training_load(
+    response: Response,
+    days: Optional[int] = Query(None, gt=0, le=3650, description="Only the last this many days; all history if unset"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    The member's daily training load with its acute (7-day) and chronic
+    (28-day) loads, acute:chronic workload ratio, monotony and strain.
+    """
+    # Returned directly, so the ETag set by daily_conditional_get is copied over
+    return FastJSONResponse({"days": training_load.history(db, current_user.id, days=days)}, headers=response.headers)
+
+
+@router.get("/muscle-volume", dependencies=[Depends(require_numpy), Depends(daily_conditional_get)])
+def get_muscle_volume(
+    response: Response,
+    weeks: int = Query(52, gt=0, le=52),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Hard sets per muscle group for each of the last `weeks` weeks, for a
+    heatmap. Catalog exercises count toward their primary muscles in full
+    and secondary ones by half; others fall back to their category, and
+    any left over are listed as unmapped. Only the hot tables are read, so
+    a year is the most it covers.
+    """
+    # Returned directly, so the ETag set by daily_conditional_get is copied over
+    return FastJSONResponse(muscles.weekly_sets(db, current_user.id, weeks=weeks), headers=response.headers)
+
+
+@router.get("/percentile")
+def get_percentile(
+    exercise: str = Query(..., min_length=1),
+    e1rm: Optional[float] = Query(None, gt=0, description="Compare this e1RM instead of the member's best"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    The percentile of the member's best e1RM for an exercise among every
+    member's best, with the quartiles and other quantiles of those bests.
+    Answered from the exercise's quantile sketch, so it costs the same with
+    ten lifters or a million: percentiles are within `error` points and
+    quantile values within `relative_accuracy` of exact.
+    """
+    return FastJSONResponse(percentiles.standing(db, current_user.id, exercise, e1rm))
+
+
+# Not conditional: the current streak ends when a day passes without a
+# session, which changes no row
+@router.get("/streaks")
+def get_streaks(
+    weeks: int = Query(12, gt=0, le=520),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    The member's current and longest streaks of consecutive training days,
+    days trained in all, and days trained in each of the last `weeks`
+    weeks. Days are counted, not sessions: two sessions on one day are one
+    day trained. Answered from the member's activity bitmap.
+    """
+    return FastJSONResponse(activity.streaks(db, current_user.id, weeks=weeks))
+
+
+@router.get("/calendar", dependencies=[Depends(conditional_get)])
+def get_calendar(
+    response: Response,
+    year: int = Query(..., ge=1970, le=9999),
+    month: Optional[int] = Query(None, ge=1, le=12, description="Only this month; the whole year if unset"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    A training calendar for a month or a year: Monday-to-Sunday weeks with
+    1 for each day trained, 0 for rest days and null for days outside the
+    month or year, for a calendar view or a year heatmap.
+    """
+    # Returned directly, so the ETag set by conditional_get is copied over
+    return FastJSONResponse(activity.calendar(db, current_user.id, year, month), headers=response.headers)
+
@@ -0,0 +1,113 @@
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..database import get_session_factory
+from .. import models, schemas
+from ..utils.archive import session_history
+from ..utils.auth import get_current_active_user
+from ..utils.data_versions import conditional_get
+from ..utils.fast_json import FastJSONResponse
+from .workouts import SESSION_COLUMNS, _sessions_response, get_personal_records
+from .workout_programs import get_active_programs, get_todays_workout
+
+router = APIRouter()
+
+# Threads running dashboard sections, shared by every request. Each section
+# opens its own session and closes it when done, so sections of a burst of
+# dashboards hold at most this many database connections between them
+DASHBOARD_WORKERS = int(os.getenv("DASHBOARD_WORKERS", "8"))
+# Sessions shown under recent workouts
+DASHBOARD_RECENT_WORKOUTS = int(os.getenv("DASHBOARD_RECENT_WORKOUTS", "5"))
+
+_executor = ThreadPoolExecutor(max_workers=DASHBOARD_WORKERS, thread_name_prefix="dashboard")
+
+
+def _recent_workouts(db: Session, user: models.User) -> list:
+    query = select(*SESSION_COLUMNS).where(session_history.c.user_id == user.id).order_by(
+        session_history.c.date.desc(), session_history.c.id.desc()
+    ).limit(DASHBOARD_RECENT_WORKOUTS)
+    return _sessions_response(db, query)
+
+
+def _personal_records(db: Session, user: models.User) -> list:
+    return get_personal_records(user.id, db=db)["records"]
+
+
+def _active_programs(db: Session, user: models.User) -> list:
+    return [
+        schemas.UserProgramProgress.model_validate(progress).model_dump(mode="json")
+        for progress in get_active_programs(db=db, current_user=user)
+    ]
+
+
+def _todays_workouts(db: Session, user: models.User) -> list:
+    workouts = []
+    for progress in get_active_programs(db=db, current_user=user):
+        try:
+            execution = get_todays_workout(progress.id, warmups=False, db=db, current_user=user)
+        except HTTPException:
+            # Finished programs have no workout left for today
+            continue
+        workouts.append({
+            "program_progress_id": progress.id,
+            "program_id": progress.program_id,
+            **execution.model_dump(mode="json")
+        })
+    return workouts
+
+
+SECTIONS = {
+    "recent_workouts": _recent_workouts,
+    "personal_records": _personal_records,
+    "active_programs": _active_programs,
+    "todays_workouts": _todays_workouts,
+}
+
+
+def _timed(section, user: models.User, session_factory: Callable[[], Session]):
+    start = time.perf_counter()
+    # Sessions can't be shared across threads, and one opened here goes back
+    # to the pool as soon as its section is done, not when the request is
+    db = session_factory()
+    try:
+        result = section(db, user)
+    finally:
+        db.close()
+    return result, round((time.perf_counter() - start) * 1000, 2)
+
+
+@router.get("", dependencies=[Depends(conditional_get)])
+async def get_dashboard(
+    response: Response,
+    session_factory: Callable[[], Session] = Depends(get_session_factory),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    Everything the dashboard shows on first paint in one response: recent
+    workouts, personal records, active programs and today's workout in
+    each. Sections run concurrently, and each one's time in milliseconds
+    is reported under "timings".
+    """
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    # Each section gets its own copy of the request's context, so its
+    # queries are still counted and logged against this request
+    results = await asyncio.gather(*(
+        loop.run_in_executor(_executor, contextvars.copy_context().run, _timed, section, current_user,
+                             session_factory)
+        for section in SECTIONS.values()
+    ))
+
+    payload = {name: result for name, (result, _) in zip(SECTIONS, results)}
+    payload["timings"] = {name: elapsed for name, (_, elapsed) in zip(SECTIONS, results)}
+    payload["timings"]["total"] = round((time.perf_counter() - start) * 1000, 2)
+    # Returned directly, so the ETag set by conditional_get is copied over
+    return FastJSONResponse(payload, headers=response.headers)
@@ -0,0 +1,105 @@
+import os
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from typing import List
+from datetime import datetime
+from ..database import get_db
+from .. import models, schemas
+from ..utils.auth import get_current_active_user
+from ..utils.jobs import enqueue, is_submittable
+from ..utils.exports import export_file_path
+from ..utils import recompute  # noqa: F401  registers the recompute_stats job
+
+router = APIRouter()
+
+def _get_user_job(db: Session, job_id: int, user_id: int) -> models.Job:
+    job = db.query(models.Job).filter(
+        models.Job.id == job_id,
+        models.Job.user_id == user_id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/", response_model=schemas.Job, status_code=202)
+def create_job(
+    job: schemas.JobCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Queue a background job: an `export_workouts` history export or a `recompute_stats` rebuild."""
+    if not is_submittable(job.kind):
+        raise HTTPException(status_code=400, detail=f"Unknown job kind: {job.kind}")
+    return enqueue(db, job.kind, job.payload, user_id=current_user.id, priority=job.priority)
+
+@router.get("/", response_model=List[schemas.Job])
+def read_jobs(
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Get the current user's jobs, newest first."""
+    return db.query(models.Job).filter(
+        models.Job.user_id == current_user.id
+    ).order_by(models.Job.id.desc()).offset(skip).limit(limit).all()
+
+@router.get("/{job_id}", response_model=schemas.Job)
+def read_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Get a job's status and progress."""
+    return _get_user_job(db, job_id, current_user.id)
+
+@router.post("/{job_id}/cancel", response_model=schemas.Job)
+def cancel_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Cancel a queued or running job."""
+    job = _get_user_job(db, job_id, current_user.id)
+    if job.status not in ("queued", "running"):
+        raise HTTPException(status_code=400, detail=f"Cannot cancel a {job.status} job")
+    job.status = "cancelled"
+    job.finished_at = datetime.utcnow()
+    db.commit()
+    db.refresh(job)
+    return job
+
+@router.post("/{job_id}/retry", response_model=schemas.Job)
+def retry_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Queue a failed or cancelled job again."""
+    job = _get_user_job(db, job_id, current_user.id)
+    if job.status not in ("failed", "cancelled"):
+        raise HTTPException(status_code=400, detail=f"Cannot retry a {job.status} job")
+    job.status = "queued"
+    job.attempts = 0
+    job.error = None
+    job.progress = 0.0
+    job.progress_message = None
+    job.finished_at = None
+    job.run_after = datetime.utcnow()
+    db.commit()
+    db.refresh(job)
+    return job
+
+@router.get("/{job_id}/download")
+def download_job_result(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Download the file produced by a finished export job."""
+    job = _get_user_job(db, job_id, current_user.id)
+    path = export_file_path(job.id)
+    if job.kind != "export_workouts" or job.status != "succeeded" or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="No file available for this job")
+    return FileResponse(path, media_type="text/csv", filename=f"workouts-{job.id}.csv")
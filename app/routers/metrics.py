@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..utils.metrics import collect, render_prometheus
+
+router = APIRouter()
+
+@router.get("", response_class=PlainTextResponse, include_in_schema=False)
+async def read_metrics():
+    """Request latency histograms and gauges in the Prometheus text format."""
+    # Runs on the event loop, the only thread that updates the counters
+    return PlainTextResponse(
+        render_prometheus(collect()),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
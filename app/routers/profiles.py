@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from typing import List, Optional
+
+from .. import schemas
+from ..utils import profiling
+from ..utils.auth import require_admin
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/", response_model=List[schemas.ProfileInfo])
+def read_profiles(route: Optional[str] = None, limit: int = 50):
+    """List recent request profiles, newest first, optionally for one route template."""
+    return profiling.list_profiles(profiling.PROFILE_DIR, route=route, limit=limit)
+
+@router.get("/{profile_id}/{kind}")
+def download_profile(profile_id: str, kind: str):
+    """Download a profile as `pstats` (for pstats/snakeviz) or `collapsed` (for flamegraphs)."""
+    path = profiling.profile_path(profile_id, kind, profiling.PROFILE_DIR)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "application/octet-stream" if kind == "pstats" else "text/plain"
+    return FileResponse(path, media_type=media_type, filename=f"{profile_id}.{kind}")
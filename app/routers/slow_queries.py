@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends
+
+from ..utils import slow_queries
+from ..utils.auth import require_admin
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/")
+def read_slow_queries(limit: int = 20, recent: int = 20):
+    """
+    Statements over SLOW_QUERY_MS ranked by total time across workers, with
+    their routes and captured plans, plus this worker's most recent ones.
+    """
+    log = slow_queries.slow_query_log
+    snapshots = slow_queries.collect(log)
+    return {
+        "threshold_ms": log.threshold * 1000,
+        "top": slow_queries.top_offenders(snapshots, limit),
+        "recent": list(reversed(snapshots[0]["recent"]))[:recent]
+    }
+
+@router.delete("/")
+def clear_slow_queries():
+    """Forget this worker's slow statements, e.g. after deploying a fix."""
+    slow_queries.slow_query_log.clear()
+    return {"message": "Slow query log cleared"}
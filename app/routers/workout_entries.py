@@ -1,14 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List
 from ..database import get_db
 from .. import models, schemas
+from ..utils.archive import entry_history
+from ..utils.fast_json import row_dicts, schema_columns
+from ..utils.structured_logging import log_payload
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Entries of hot and archived sessions alike
+ENTRY_COLUMNS = schema_columns(entry_history, schemas.WorkoutEntry)
+
 @router.post("/{session_id}/entries", response_model=schemas.WorkoutEntry)
 def create_workout_entry(
     session_id: int,
@@ -38,13 +45,14 @@ def create_workout_entry(
         raise
     except Exception as e:
         # Log other exceptions and return 500
-        logger.error(f"Error creating entry: {str(e)}")
+        logger.error("Error creating entry: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{session_id}/entries", response_model=List[schemas.WorkoutEntry])
 def read_workout_entries(session_id: int, db: Session = Depends(get_db)):
-    entries = db.query(models.WorkoutEntry).filter(models.WorkoutEntry.session_id == session_id).all()
-    return entries
+    return row_dicts(db.execute(
+        select(*ENTRY_COLUMNS).where(entry_history.c.session_id == session_id).order_by(entry_history.c.id)
+    ))
 
 @router.put("/{session_id}/entries/{entry_id}", response_model=schemas.WorkoutEntry)
 def update_workout_entry(
@@ -60,12 +68,14 @@ def update_workout_entry(
         ).first()
         
         if db_entry is None:
-            error_msg = f"Entry not found: session_id={session_id}, entry_id={entry_id}"
-            logger.error(error_msg)
-            raise HTTPException(status_code=404, detail=error_msg)
+            logger.error("Entry not found: session_id=%s, entry_id=%s", session_id, entry_id)
+            raise HTTPException(
+                status_code=404,
+                detail=f"Entry not found: session_id={session_id}, entry_id={entry_id}"
+            )
         
         update_data = entry.model_dump(exclude_unset=True)
-        logger.info(f"Updating entry {entry_id} with data: {update_data}")
+        log_payload(logger, "Updating entry %s", update_data, entry_id)
         
         for key, value in update_data.items():
             setattr(db_entry, key, value)
@@ -77,7 +87,7 @@ def update_workout_entry(
         # Re-raise HTTP exceptions to maintain their status codes
         raise
     except Exception as e:
-        logger.error(f"Error updating entry: {str(e)}")
+        logger.error("Error updating entry: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/{session_id}/entries/{entry_id}")
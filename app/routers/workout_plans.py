@@ -5,6 +5,8 @@ from typing import List, Optional
 from ..database import get_db
 from .. import models, schemas
 from ..utils.auth import get_current_active_user
+from ..utils import cascades
+from ..utils.data_versions import conditional_get
 
 logger = logging.getLogger(__name__)
 
@@ -43,7 +45,7 @@ def create_workout_plan(
         logger.error(f"Error creating workout plan: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error creating workout plan: {str(e)}")
 
-@router.get("/", response_model=List[schemas.WorkoutPlan])
+@router.get("/", response_model=List[schemas.WorkoutPlan], dependencies=[Depends(conditional_get)])
 def read_workout_plans(
     skip: int = 0, 
     limit: int = 100, 
@@ -56,7 +58,7 @@ def read_workout_plans(
     ).offset(skip).limit(limit).all()
     return plans
 
-@router.get("/{plan_id}", response_model=schemas.WorkoutPlan)
+@router.get("/{plan_id}", response_model=schemas.WorkoutPlan, dependencies=[Depends(conditional_get)])
 def read_workout_plan(
     plan_id: int, 
     db: Session = Depends(get_db),
@@ -127,7 +129,7 @@ def delete_workout_plan(
     if not db_plan:
         raise HTTPException(status_code=404, detail="Workout plan not found")
     
-    db.delete(db_plan)
+    cascades.delete_plans(db, [plan_id])
     db.commit()
     
     return {"detail": "Workout plan deleted successfully"}
\ No newline at end of file
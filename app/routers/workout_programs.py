@@ -1,20 +1,64 @@
 import logging
-import json
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Query
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import datetime
 from ..database import get_db
 from .. import models, schemas
 from ..utils.auth import get_current_active_user
-from ..utils.plate_calculator import PlateCalculator
-import csv
-import io
+from ..utils.data_versions import conditional_get
+from ..utils import cascades
+from ..utils.plate_calculator import default_solver
+from ..utils.set_planner import WARMUP_REPS, loading_calculation, plan_session
+from ..utils import fast_json
+from ..utils.fast_json import FastJSONResponse, group_children, row_dicts, schema_columns
+from ..utils.leaderboards import BOARDS, leaderboards
+from ..utils.response_cache import public_cache, bump_version, json_response, json_array
+from ..utils.program_builder import build_program
+from ..utils.program_import import (
+    import_program,
+    iter_csv_program,
+    iter_json_program,
+    ImportLimitExceeded,
+    IMPORT_MAX_BYTES,
+    JSON_IMPORT_DEFAULTS,
+)
+from ..utils.jobs import enqueue, save_upload, PermanentJobError
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Program trees are assembled from these columns and encoded directly
+PROGRAM_COLUMNS = schema_columns(models.WorkoutProgram.__table__, schemas.WorkoutProgram)
+WORKOUT_COLUMNS = schema_columns(models.ProgramWorkout.__table__, schemas.ProgramWorkout)
+EXERCISE_COLUMNS = schema_columns(models.ProgramExercise.__table__, schemas.ProgramExercise)
+
+def _load_programs(db: Session, program_ids: List[int]) -> dict:
+    """Load full program trees for the given ids as plain dicts, in three queries."""
+    if not program_ids:
+        return {}
+    programs = row_dicts(db.execute(
+        select(*PROGRAM_COLUMNS, models.WorkoutProgram.version).where(models.WorkoutProgram.id.in_(program_ids))
+    ))
+    workouts = group_children(db, WORKOUT_COLUMNS, models.ProgramWorkout.program_id, programs, "workouts",
+                              order_by=models.ProgramWorkout.id)
+    group_children(db, EXERCISE_COLUMNS, models.ProgramExercise.program_workout_id,
+                   [workout for children in workouts.values() for workout in children], "exercises",
+                   order_by=models.ProgramExercise.id)
+    return {program["id"]: program for program in programs}
+
+def _program_body(program: dict) -> bytes:
+    """Serialize a program tree, storing it in the shared cache when it is public."""
+    version = program.pop("version")
+    body = fast_json.dumps(program)
+    if program["is_public"]:
+        public_cache.put("program", program["id"], version, body)
+    return body
+
 @router.post("/", response_model=schemas.WorkoutProgram)
 def create_workout_program(
     program: schemas.WorkoutProgramCreate,
@@ -23,67 +67,14 @@ def create_workout_program(
 ):
     """Create a new workout program with workouts and exercises."""
     try:
-        # Create new program
-        db_program = models.WorkoutProgram(
-            name=program.name,
-            description=program.description,
-            duration_weeks=program.duration_weeks,
-            is_public=program.is_public,
-            creator_id=current_user.id
-        )
-        db.add(db_program)
-        db.commit()
-        db.refresh(db_program)
-        
-        # Add workouts if provided
-        if program.workouts:
-            for workout in program.workouts:
-                db_workout = models.ProgramWorkout(
-                    program_id=db_program.id,
-                    name=workout.name,
-                    week_number=workout.week_number,
-                    day_number=workout.day_number,
-                    order=workout.order,
-                    template_id=workout.template_id
-                )
-                db.add(db_workout)
-                db.commit()
-                db.refresh(db_workout)
-                
-                # Add exercises if provided
-                if workout.exercises:
-                    for exercise in workout.exercises:
-                        # Automatically detect barbell exercises
-                        is_barbell = any(barbell_term in exercise.exercise_name.lower() 
-                                        for barbell_term in ["barbell", "bench press", "squat", "deadlift"])
-                        
-                        db_exercise = models.ProgramExercise(
-                            program_workout_id=db_workout.id,
-                            exercise_name=exercise.exercise_name,
-                            sets=exercise.sets,
-                            initial_reps=exercise.initial_reps,
-                            target_reps=exercise.target_reps,
-                            initial_weight=exercise.initial_weight,
-                            progression_strategy=exercise.progression_strategy,
-                            progression_value=exercise.progression_value,
-                            progression_frequency=exercise.progression_frequency,
-                            order=exercise.order,
-                            notes=exercise.notes,
-                            category=exercise.category,
-                            is_barbell_exercise=is_barbell or exercise.is_barbell_exercise
-                        )
-                        db.add(db_exercise)
-                
-                db.commit()
-        
-        db.refresh(db_program)
-        return db_program
+        return build_program(db, program, current_user.id)
     except Exception as e:
         logger.error(f"Error creating workout program: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error creating workout program: {str(e)}")
 
 @router.get("/", response_model=List[schemas.WorkoutProgram])
 def read_workout_programs(
+    request: Request,
     skip: int = 0, 
     limit: int = 100, 
     public_only: bool = False,
@@ -91,7 +82,11 @@ def read_workout_programs(
     current_user: Optional[models.User] = Depends(get_current_active_user)
 ):
     """Get a list of workout programs."""
-    query = db.query(models.WorkoutProgram)
+    query = db.query(
+        models.WorkoutProgram.id,
+        models.WorkoutProgram.version,
+        models.WorkoutProgram.is_public
+    )
     
     if public_only:
         query = query.filter(models.WorkoutProgram.is_public == True)
@@ -102,17 +97,35 @@ def read_workout_programs(
             (models.WorkoutProgram.creator_id == current_user.id)
         )
     
-    programs = query.offset(skip).limit(limit).all()
-    return programs
+    rows = query.order_by(models.WorkoutProgram.id).offset(skip).limit(limit).all()
+    
+    # Public programs come pre-serialized from the shared cache; only misses hit the DB
+    parts = {}
+    for program_id, version, is_public in rows:
+        if is_public:
+            cached = public_cache.get("program", program_id, version)
+            if cached:
+                parts[program_id] = cached[0]
+    
+    missing = _load_programs(db, [row[0] for row in rows if row[0] not in parts])
+    for program_id, program in missing.items():
+        parts[program_id] = _program_body(program)
+    
+    return json_response(request, json_array(parts[row[0]] for row in rows if row[0] in parts))
 
 @router.get("/{program_id}", response_model=schemas.WorkoutProgram)
 def read_workout_program(
+    request: Request,
     program_id: int,
     db: Session = Depends(get_db),
     current_user: Optional[models.User] = Depends(get_current_active_user)
 ):
     """Get a specific workout program by ID."""
-    program = db.query(models.WorkoutProgram).filter(models.WorkoutProgram.id == program_id).first()
+    program = db.query(
+        models.WorkoutProgram.version,
+        models.WorkoutProgram.is_public,
+        models.WorkoutProgram.creator_id
+    ).filter(models.WorkoutProgram.id == program_id).first()
     
     if not program:
         raise HTTPException(status_code=404, detail="Workout program not found")
@@ -121,7 +134,36 @@ def read_workout_program(
     if not program.is_public and program.creator_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to access this program")
     
-    return program
+    if program.is_public:
+        cached = public_cache.get("program", program_id, program.version)
+        if cached:
+            return json_response(request, *cached)
+    
+    return json_response(request, _program_body(_load_programs(db, [program_id])[program_id]))
+
+@router.get("/{program_id}/leaderboards/{board}")
+def read_program_leaderboard(
+    program_id: int,
+    board: str,
+    limit: int = Query(10, gt=0, le=100),
+    month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", description="YYYY-MM on monthly boards; this month if unset"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """
+    The leaders of one of a public program's boards and the current user's
+    rank on it. Scores are kept up to date as workouts are logged, so this
+    reads a ranking held in memory rather than anyone's history.
+    """
+    if board not in BOARDS:
+        raise HTTPException(status_code=404, detail=f"Unknown leaderboard; boards are {', '.join(BOARDS)}")
+    program = db.query(models.WorkoutProgram.is_public).filter(models.WorkoutProgram.id == program_id).first()
+    if not program or not program.is_public:
+        raise HTTPException(status_code=404, detail="Public workout program not found")
+    board_period = month if month and BOARDS[board].monthly else None
+    return FastJSONResponse(
+        leaderboards.standings(db, program_id, BOARDS[board], current_user.id, limit=limit, board_period=board_period)
+    )
 
 @router.put("/{program_id}", response_model=schemas.WorkoutProgram)
 def update_workout_program(
@@ -143,6 +185,7 @@ def update_workout_program(
     update_data = program.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_program, key, value)
+    bump_version(db_program)
     
     db.commit()
     db.refresh(db_program)
@@ -164,204 +207,73 @@ def delete_workout_program(
     if db_program.creator_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this program")
     
-    # Delete the program and all associated data (cascade should handle this)
-    db.delete(db_program)
+    cascades.delete_programs(db, [program_id])
     db.commit()
+    public_cache.invalidate("program", program_id)
     
     return {"detail": "Workout program deleted"}
 
-@router.post("/import/csv", response_model=schemas.WorkoutProgram)
-async def import_program_from_csv(
+def _check_upload_size(file: UploadFile) -> None:
+    """Reject uploads over the byte limit before parsing anything."""
+    if file.size is not None and file.size > IMPORT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds the {IMPORT_MAX_BYTES} byte limit")
+
+def _queue_import(db: Session, file: UploadFile, kind: str, suffix: str, user_id: int) -> JSONResponse:
+    """Spool an upload and queue it for the background job workers."""
+    path = save_upload(file.file, suffix, IMPORT_MAX_BYTES)
+    job = enqueue(db, kind, {"path": path, "filename": file.filename}, user_id=user_id, priority=1)
+    return JSONResponse(status_code=202, content=jsonable_encoder(schemas.Job.model_validate(job)))
+
+@router.post("/import/csv", response_model=schemas.WorkoutProgram, responses={202: {"model": schemas.Job}})
+def import_program_from_csv(
     file: UploadFile = File(...),
+    background: bool = False,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    """Import a workout program from a CSV file."""
-    try:
-        contents = await file.read()
-        buffer = io.StringIO(contents.decode('utf-8'))
-        reader = csv.DictReader(buffer)
-        
-        # Extract program metadata from the first row
-        program_data = {}
-        workouts_data = []
-        
-        # Process CSV data
-        current_workout = None
-        for row in reader:
-            if row.get('type') == 'program':
-                program_data = {
-                    'name': row.get('name', 'Imported Program'),
-                    'description': row.get('description', ''),
-                    'duration_weeks': int(row.get('duration_weeks', 8)),
-                    'is_public': row.get('is_public', '').lower() == 'true'
-                }
-            elif row.get('type') == 'workout':
-                if current_workout:
-                    workouts_data.append(current_workout)
-                    
-                current_workout = {
-                    'name': row.get('name', f"Week {row.get('week', 1)} Day {row.get('day', 1)}"),
-                    'week_number': int(row.get('week', 1)),
-                    'day_number': int(row.get('day', 1)),
-                    'order': int(row.get('order', 0)),
-                    'exercises': []
-                }
-            elif row.get('type') == 'exercise' and current_workout:
-                exercise = {
-                    'exercise_name': row.get('name', 'Exercise'),
-                    'sets': int(row.get('sets', 3)),
-                    'initial_reps': int(row.get('initial_reps', 8)),
-                    'target_reps': int(row.get('target_reps', 12)),
-                    'initial_weight': float(row.get('initial_weight', 0)) if row.get('initial_weight') else None,
-                    'progression_strategy': row.get('progression', 'linear'),
-                    'progression_value': float(row.get('progression_value', 5)),
-                    'progression_frequency': int(row.get('progression_frequency', 1)),
-                    'order': int(row.get('order', 0)),
-                    'notes': row.get('notes', ''),
-                    'category': row.get('category', ''),
-                    'is_barbell_exercise': row.get('is_barbell', '').lower() == 'true'
-                }
-                current_workout['exercises'].append(exercise)
-        
-        # Add the last workout if exists
-        if current_workout:
-            workouts_data.append(current_workout)
-        
-        # Create the program
-        program_create = schemas.ProgramImport(
-            **program_data,
-            workouts=workouts_data
-        )
-        
-        # Convert to proper format for database
-        db_program = models.WorkoutProgram(
-            name=program_create.name,
-            description=program_create.description,
-            duration_weeks=program_create.duration_weeks,
-            is_public=program_create.is_public,
-            creator_id=current_user.id
-        )
-        db.add(db_program)
-        db.commit()
-        db.refresh(db_program)
-        
-        # Add workouts and exercises
-        for workout_data in program_create.workouts:
-            db_workout = models.ProgramWorkout(
-                program_id=db_program.id,
-                name=workout_data.get('name'),
-                week_number=workout_data.get('week_number'),
-                day_number=workout_data.get('day_number'),
-                order=workout_data.get('order', 0)
-            )
-            db.add(db_workout)
-            db.commit()
-            db.refresh(db_workout)
-            
-            for exercise_data in workout_data.get('exercises', []):
-                # Auto-detect barbell exercises if not specified
-                is_barbell = exercise_data.get('is_barbell_exercise', False)
-                if not is_barbell:
-                    is_barbell = any(barbell_term in exercise_data.get('exercise_name', '').lower() 
-                                    for barbell_term in ["barbell", "bench press", "squat", "deadlift"])
-                
-                db_exercise = models.ProgramExercise(
-                    program_workout_id=db_workout.id,
-                    exercise_name=exercise_data.get('exercise_name'),
-                    sets=exercise_data.get('sets'),
-                    initial_reps=exercise_data.get('initial_reps'),
-                    target_reps=exercise_data.get('target_reps'),
-                    initial_weight=exercise_data.get('initial_weight'),
-                    progression_strategy=exercise_data.get('progression_strategy'),
-                    progression_value=exercise_data.get('progression_value'),
-                    progression_frequency=exercise_data.get('progression_frequency'),
-                    order=exercise_data.get('order', 0),
-                    notes=exercise_data.get('notes'),
-                    category=exercise_data.get('category'),
-                    is_barbell_exercise=is_barbell
-                )
-                db.add(db_exercise)
-            
-            db.commit()
-        
-        db.refresh(db_program)
-        return db_program
+    """
+    Import a workout program from a CSV file.
     
+    With `background=true` the upload is queued as a job and a 202 with the
+    job is returned immediately; poll `GET /jobs/{id}` for the program id.
+    """
+    try:
+        _check_upload_size(file)
+        if background:
+            return _queue_import(db, file, "import_program_csv", ".csv", current_user.id)
+        # Workouts are parsed from the upload stream and written in batches
+        return import_program(db, iter_csv_program(file.file), current_user.id)
+    except HTTPException:
+        raise
+    except (ImportLimitExceeded, PermanentJobError) as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         logger.error(f"Error importing program from CSV: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Error importing program: {str(e)}")
 
-@router.post("/import/json", response_model=schemas.WorkoutProgram)
-async def import_program_from_json(
+@router.post("/import/json", response_model=schemas.WorkoutProgram, responses={202: {"model": schemas.Job}})
+def import_program_from_json(
     file: UploadFile = File(...),
+    background: bool = False,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
-    """Import a workout program from a JSON file."""
-    try:
-        contents = await file.read()
-        program_data = json.loads(contents.decode('utf-8'))
-        
-        # Validate the JSON structure
-        if 'name' not in program_data or 'workouts' not in program_data:
-            raise ValueError("Invalid JSON format: missing required fields")
-        
-        # Create the program
-        db_program = models.WorkoutProgram(
-            name=program_data.get('name'),
-            description=program_data.get('description', ''),
-            duration_weeks=program_data.get('duration_weeks', 8),
-            is_public=program_data.get('is_public', False),
-            creator_id=current_user.id
-        )
-        db.add(db_program)
-        db.commit()
-        db.refresh(db_program)
-        
-        # Add workouts and exercises
-        for workout_data in program_data.get('workouts', []):
-            db_workout = models.ProgramWorkout(
-                program_id=db_program.id,
-                name=workout_data.get('name'),
-                week_number=workout_data.get('week_number'),
-                day_number=workout_data.get('day_number'),
-                order=workout_data.get('order', 0),
-                template_id=workout_data.get('template_id')
-            )
-            db.add(db_workout)
-            db.commit()
-            db.refresh(db_workout)
-            
-            for exercise_data in workout_data.get('exercises', []):
-                # Auto-detect barbell exercises if not specified
-                is_barbell = exercise_data.get('is_barbell_exercise', False)
-                if not is_barbell:
-                    is_barbell = any(barbell_term in exercise_data.get('exercise_name', '').lower() 
-                                    for barbell_term in ["barbell", "bench press", "squat", "deadlift"])
-                
-                db_exercise = models.ProgramExercise(
-                    program_workout_id=db_workout.id,
-                    exercise_name=exercise_data.get('exercise_name'),
-                    sets=exercise_data.get('sets'),
-                    initial_reps=exercise_data.get('initial_reps'),
-                    target_reps=exercise_data.get('target_reps'),
-                    initial_weight=exercise_data.get('initial_weight'),
-                    progression_strategy=exercise_data.get('progression_strategy', 'linear'),
-                    progression_value=exercise_data.get('progression_value', 5.0),
-                    progression_frequency=exercise_data.get('progression_frequency', 1),
-                    order=exercise_data.get('order', 0),
-                    notes=exercise_data.get('notes'),
-                    category=exercise_data.get('category'),
-                    is_barbell_exercise=is_barbell
-                )
-                db.add(db_exercise)
-            
-            db.commit()
-        
-        db.refresh(db_program)
-        return db_program
+    """
+    Import a workout program from a JSON file.
     
+    With `background=true` the upload is queued as a job and a 202 with the
+    job is returned immediately; poll `GET /jobs/{id}` for the program id.
+    """
+    try:
+        _check_upload_size(file)
+        if background:
+            return _queue_import(db, file, "import_program_json", ".json", current_user.id)
+        # Workouts are parsed from the upload stream and written in batches
+        return import_program(db, iter_json_program(file.file), current_user.id, **JSON_IMPORT_DEFAULTS)
+    except HTTPException:
+        raise
+    except (ImportLimitExceeded, PermanentJobError) as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         logger.error(f"Error importing program from JSON: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Error importing program: {str(e)}")
@@ -421,7 +333,8 @@ def start_program(
     
     return user_progress
 
-@router.get("/user/active", response_model=List[schemas.UserProgramProgress])
+@router.get("/user/active", response_model=List[schemas.UserProgramProgress],
+            dependencies=[Depends(conditional_get)])
 def get_active_programs(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
@@ -434,9 +347,11 @@ def get_active_programs(
     
     return active_programs
 
-@router.get("/user/workout/today", response_model=schemas.WorkoutExecution)
+@router.get("/user/workout/today", response_model=schemas.WorkoutExecution,
+            dependencies=[Depends(conditional_get)])
 def get_todays_workout(
     program_progress_id: int,
+    warmups: bool = False,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
@@ -461,7 +376,7 @@ def get_todays_workout(
         raise HTTPException(status_code=404, detail="No workout found for today")
     
     # Get exercise progress
-    exercise_sets = []
+    exercises = []
     for exercise in workout.exercises:
         # Find the user's progress for this exercise
         exercise_progress = db.query(models.ExerciseProgress).filter(
@@ -480,6 +395,51 @@ def get_todays_workout(
             db.add(exercise_progress)
             db.commit()
             db.refresh(exercise_progress)
+        exercises.append((exercise, exercise_progress))
+    
+    # Barbell sets share one bar, so their loadings are planned together to
+    # keep plate changes between sets and exercises to a minimum
+    loaded = [
+        (exercise, exercise_progress) for exercise, exercise_progress in exercises
+        if exercise.is_barbell_exercise and exercise_progress.current_weight and exercise.sets > 0
+    ]
+    plan = plan_session(
+        [
+            {"exercise_name": exercise.exercise_name, "weights": [exercise_progress.current_weight] * exercise.sets}
+            for exercise, exercise_progress in loaded
+        ],
+        default_solver,
+        warmups=warmups
+    )["steps"]
+    # Steps come back in exercise order: its warm-ups, then one per work set
+    planned = {}
+    position = 0
+    for exercise, exercise_progress in loaded:
+        first = position
+        while plan[position]["is_warmup"]:
+            position += 1
+        position += exercise.sets
+        planned[exercise.id] = [
+            schemas.ExerciseSetWithPlates(
+                exercise_id=exercise.id,
+                exercise_name=exercise.exercise_name,
+                set_number=step["set_number"],
+                target_reps=WARMUP_REPS if step["is_warmup"] else exercise_progress.current_reps_target,
+                target_weight=step["actual_weight"] if step["is_warmup"] else exercise_progress.current_weight,
+                is_barbell_exercise=True,
+                plate_calculation=loading_calculation(step, default_solver),
+                is_warmup=step["is_warmup"],
+                plates_removed=step["plates_removed"],
+                plates_added=step["plates_added"]
+            )
+            for step in plan[first:position]
+        ]
+    
+    exercise_sets = []
+    for exercise, exercise_progress in exercises:
+        if exercise.id in planned:
+            exercise_sets.extend(planned[exercise.id])
+            continue
         
         # Create an exercise set for each set
         for set_num in range(1, exercise.sets + 1):
@@ -489,14 +449,8 @@ def get_todays_workout(
                 set_number=set_num,
                 target_reps=exercise_progress.current_reps_target,
                 target_weight=exercise_progress.current_weight or 0,
-                is_barbell_exercise=exercise.is_barbell_exercise,
-                plate_calculation=None
+                is_barbell_exercise=exercise.is_barbell_exercise
             )
-            
-            # Add plate calculation if it's a barbell exercise
-            if exercise.is_barbell_exercise and exercise_progress.current_weight:
-                exercise_set.plate_calculation = PlateCalculator.calculate_plates(exercise_progress.current_weight)
-            
             exercise_sets.append(exercise_set)
     
     return schemas.WorkoutExecution(
@@ -1,15 +1,37 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
 from ..database import get_db
 from .. import models, schemas
 from ..utils.auth import get_current_active_user
+from ..utils import cascades
+from ..utils.response_cache import public_cache, bump_version, json_response, json_array
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+def _template_body(db_template: models.WorkoutTemplate) -> bytes:
+    """Serialize a template and store it in the shared cache."""
+    body = schemas.WorkoutTemplate.model_validate(db_template).model_dump_json().encode()
+    public_cache.put("template", db_template.id, db_template.version, body)
+    return body
+
+def _load_templates(db: Session, template_ids: List[int]) -> dict:
+    if not template_ids:
+        return {}
+    templates = db.query(models.WorkoutTemplate).options(
+        selectinload(models.WorkoutTemplate.exercises)
+    ).filter(models.WorkoutTemplate.id.in_(template_ids)).all()
+    return {template.id: template for template in templates}
+
+def _touch_template(db: Session, template_id: int) -> None:
+    """Bump a template's version after one of its exercises changed."""
+    db.query(models.WorkoutTemplate).filter(
+        models.WorkoutTemplate.id == template_id
+    ).update({models.WorkoutTemplate.version: models.WorkoutTemplate.version + 1}, synchronize_session=False)
+
 @router.post("/", response_model=schemas.WorkoutTemplate)
 def create_workout_template(
     template: schemas.WorkoutTemplateCreate,
@@ -39,6 +61,8 @@ def create_workout_template(
             db.commit()
             db.refresh(db_template)
         
+        # Drop any copy cached under a reused id
+        public_cache.invalidate("template", db_template.id)
         return db_template
     except Exception as e:
         logger.error(f"Error creating workout template: {str(e)}")
@@ -46,30 +70,52 @@ def create_workout_template(
 
 @router.get("/", response_model=List[schemas.WorkoutTemplate])
 def read_workout_templates(
+    request: Request,
     skip: int = 0, 
     limit: int = 100, 
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
     """Get all workout templates."""
-    templates = db.query(models.WorkoutTemplate).offset(skip).limit(limit).all()
-    return templates
+    rows = db.query(
+        models.WorkoutTemplate.id,
+        models.WorkoutTemplate.version
+    ).order_by(models.WorkoutTemplate.id).offset(skip).limit(limit).all()
+    
+    # Templates are global, so every one can come from the shared cache
+    parts = {}
+    for template_id, version in rows:
+        cached = public_cache.get("template", template_id, version)
+        if cached:
+            parts[template_id] = cached[0]
+    
+    missing = _load_templates(db, [row[0] for row in rows if row[0] not in parts])
+    for template_id, db_template in missing.items():
+        parts[template_id] = _template_body(db_template)
+    
+    return json_response(request, json_array(parts[row[0]] for row in rows if row[0] in parts))
 
 @router.get("/{template_id}", response_model=schemas.WorkoutTemplate)
 def read_workout_template(
+    request: Request,
     template_id: int, 
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_active_user)
 ):
     """Get a specific workout template by ID."""
-    template = db.query(models.WorkoutTemplate).filter(
+    version = db.query(models.WorkoutTemplate.version).filter(
         models.WorkoutTemplate.id == template_id
-    ).first()
+    ).scalar()
     
-    if not template:
+    if version is None:
         raise HTTPException(status_code=404, detail="Workout template not found")
     
-    return template
+    cached = public_cache.get("template", template_id, version)
+    if cached:
+        return json_response(request, *cached)
+    
+    db_template = _load_templates(db, [template_id])[template_id]
+    return json_response(request, _template_body(db_template))
 
 @router.put("/{template_id}", response_model=schemas.WorkoutTemplate)
 def update_workout_template(
@@ -90,6 +136,7 @@ def update_workout_template(
     update_data = template_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_template, key, value)
+    bump_version(db_template)
     
     db.commit()
     db.refresh(db_template)
@@ -109,14 +156,9 @@ def delete_workout_template(
     if not db_template:
         raise HTTPException(status_code=404, detail="Workout template not found")
     
-    # Delete related template exercises
-    db.query(models.TemplateExercise).filter(
-        models.TemplateExercise.template_id == template_id
-    ).delete()
-    
-    # Delete template
-    db.delete(db_template)
+    cascades.delete_templates(db, [template_id])
     db.commit()
+    public_cache.invalidate("template", template_id)
     
     return {"detail": "Workout template deleted successfully"}
 
@@ -141,6 +183,7 @@ def add_template_exercise(
         **exercise.model_dump()
     )
     db.add(db_exercise)
+    bump_version(db_template)
     db.commit()
     db.refresh(db_exercise)
     
@@ -167,6 +210,7 @@ def update_template_exercise(
     update_data = exercise_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_exercise, key, value)
+    _touch_template(db, template_id)
     
     db.commit()
     db.refresh(db_exercise)
@@ -189,6 +233,7 @@ def delete_template_exercise(
         raise HTTPException(status_code=404, detail="Template exercise not found")
     
     db.delete(db_exercise)
+    _touch_template(db, template_id)
     db.commit()
     
     return {"detail": "Template exercise deleted successfully"}
\ No newline at end of file
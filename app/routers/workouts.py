@@ -1,18 +1,36 @@
 import logging
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, select
 from typing import List, Optional
 from datetime import datetime, timedelta
 from ..database import get_db
 from .. import models, schemas
-from ..utils.plate_calculator import PlateCalculator
+from ..utils.plate_calculator import PlateCalculator, get_solver
+from ..utils.set_planner import plan_session
 from ..utils.auth import get_current_active_user
+from ..utils.archive import entry_history, session_history
+from ..utils import cascades
+from ..utils.fast_json import FastJSONResponse, group_children, row_dicts, schema_columns
+from ..utils.structured_logging import log_payload
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Read endpoints select just these columns and encode the rows directly,
+# rather than loading ORM objects for pydantic to walk. History reads cover
+# hot and archived sessions; the stats endpoints only ever need hot ones.
+SESSION_COLUMNS = schema_columns(session_history, schemas.WorkoutSession)
+ENTRY_COLUMNS = schema_columns(entry_history, schemas.WorkoutEntry)
+
+def _sessions_response(db: Session, query) -> List[dict]:
+    """Run a session query and attach every session's entries with one more query."""
+    sessions = row_dicts(db.execute(query))
+    group_children(db, ENTRY_COLUMNS, entry_history.c.session_id, sessions, "entries",
+                   order_by=entry_history.c.id)
+    return sessions
+
 @router.post("/", response_model=schemas.WorkoutSession)
 def create_workout(
     workout: schemas.WorkoutSessionCreate, 
@@ -20,8 +38,8 @@ def create_workout(
     current_user: models.User = Depends(get_current_active_user)
 ):
     try:
-        # Log incoming request
-        logger.info(f"Attempting to create workout with data: {workout.model_dump()}")
+        # Log a sample of incoming payloads; serialized off the request thread
+        log_payload(logger, "Creating workout", workout)
         
         # Use the authenticated user
         workout_data = workout.model_dump()
@@ -31,30 +49,31 @@ def create_workout(
         db.add(db_workout)
         db.commit()
         db.refresh(db_workout)
-        logger.info(f"Successfully created workout {db_workout.id}")
+        logger.info("Created workout %s", db_workout.id)
         return db_workout
     except HTTPException:
         # Re-raise HTTP exceptions to preserve their status codes
         raise
     except Exception as e:
-        logger.error(f"Error creating workout: {str(e)}")
-        logger.exception("Full traceback:")
+        logger.exception("Error creating workout: %s", e)
         raise HTTPException(
             status_code=500, 
             detail=f"Error creating workout: {str(e)}"
         )
 
-@router.get("/", response_model=List[schemas.WorkoutSession])
+@router.get("/", response_model=List[schemas.WorkoutSession], response_class=FastJSONResponse)
 def read_workouts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    workouts = db.query(models.WorkoutSession).offset(skip).limit(limit).all()
-    return workouts
+    # Load every session's entries in one query instead of one per session
+    query = select(*SESSION_COLUMNS).order_by(session_history.c.id).offset(skip).limit(limit)
+    return FastJSONResponse(_sessions_response(db, query))
 
-@router.get("/{workout_id}", response_model=schemas.WorkoutSession)
+@router.get("/{workout_id}", response_model=schemas.WorkoutSession, response_class=FastJSONResponse)
 def read_workout(workout_id: int, db: Session = Depends(get_db)):
-    workout = db.query(models.WorkoutSession).filter(models.WorkoutSession.id == workout_id).first()
-    if workout is None:
+    query = select(*SESSION_COLUMNS).where(session_history.c.id == workout_id)
+    workouts = _sessions_response(db, query)
+    if not workouts:
         raise HTTPException(status_code=404, detail="Workout not found")
-    return workout
+    return FastJSONResponse(workouts[0])
 
 @router.put("/{workout_id}", response_model=schemas.WorkoutSession)
 def update_workout(
@@ -75,33 +94,33 @@ def update_workout(
 
 @router.delete("/{workout_id}")
 def delete_workout(workout_id: int, db: Session = Depends(get_db)):
-    db_workout = db.query(models.WorkoutSession).filter(models.WorkoutSession.id == workout_id).first()
-    if db_workout is None:
+    if not cascades.delete_sessions(db, [workout_id]):
         raise HTTPException(status_code=404, detail="Workout not found")
-    
-    db.delete(db_workout)
     db.commit()
     return {"detail": "Workout deleted"}
 
-@router.get("/search/", response_model=List[schemas.WorkoutSession])
+@router.get("/search/", response_model=List[schemas.WorkoutSession], response_class=FastJSONResponse)
 def search_workouts(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     exercise_name: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    query = db.query(models.WorkoutSession)
+    query = select(*SESSION_COLUMNS)
     
     if start_date:
-        query = query.filter(models.WorkoutSession.date >= start_date)
+        query = query.where(session_history.c.date >= start_date)
     if end_date:
-        query = query.filter(models.WorkoutSession.date <= end_date)
+        query = query.where(session_history.c.date <= end_date)
     if exercise_name:
-        query = query.join(models.WorkoutEntry).filter(
-            models.WorkoutEntry.exercise_name.ilike(f"%{exercise_name}%")
-        )
+        # A semi-join, so sessions with several matching entries appear once
+        query = query.where(session_history.c.id.in_(
+            select(entry_history.c.session_id).where(
+                entry_history.c.exercise_name.ilike(f"%{exercise_name}%")
+            )
+        ))
     
-    return query.all()
+    return FastJSONResponse(_sessions_response(db, query))
 
 @router.get("/stats/exercise/{exercise_name}")
 def get_exercise_stats(
@@ -175,18 +194,19 @@ def get_personal_records(
     user_id: int,
     db: Session = Depends(get_db)
 ):
+    # Records are all-time, so archived sessions count too
     records = db.query(
-        models.WorkoutEntry.exercise_name,
-        models.WorkoutEntry.category,
-        func.max(models.WorkoutEntry.weight).label('max_weight'),
-        func.max(models.WorkoutEntry.reps).label('max_reps')
+        entry_history.c.exercise_name,
+        entry_history.c.category,
+        func.max(entry_history.c.weight).label('max_weight'),
+        func.max(entry_history.c.reps).label('max_reps')
     ).join(
-        models.WorkoutSession
+        session_history, session_history.c.id == entry_history.c.session_id
     ).filter(
-        models.WorkoutSession.user_id == user_id
+        session_history.c.user_id == user_id
     ).group_by(
-        models.WorkoutEntry.exercise_name,
-        models.WorkoutEntry.category
+        entry_history.c.exercise_name,
+        entry_history.c.category
     ).all()
     
     return {
@@ -205,3 +225,29 @@ def get_personal_records(
 @router.get("/calculate-plates/{weight}")
 def calculate_plates(weight: float):
     return PlateCalculator.calculate_plates(weight)
+
+@router.post("/calculate-plates/batch", response_model=List[schemas.PlateCalculation])
+def calculate_plates_batch(
+    request: schemas.PlateCalculationRequest,
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Calculate plates for every weight of a workout, optionally for a specific bar and inventory."""
+    return _request_solver(request).solve_many(request.weights)
+
+@router.post("/calculate-plates/plan", response_model=schemas.PlatePlan)
+def plan_plate_loading(
+    request: schemas.PlatePlanRequest,
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Order the loadings of a barbell session, with warm-ups, to minimize plate changes."""
+    return plan_session(
+        [exercise.model_dump() for exercise in request.exercises],
+        _request_solver(request),
+        warmups=request.warmups
+    )
+
+def _request_solver(request):
+    inventory = None
+    if request.inventory is not None:
+        inventory = {item.weight: item.count for item in request.inventory}
+    return get_solver(request.bar_weight, inventory, request.unit)
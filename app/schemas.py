@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field, validator
 from typing import List, Optional
 from datetime import datetime, date
+import json
 import re
 
 # User schemas
@@ -208,8 +209,49 @@ class PlateCalculation(BaseModel):
     weight_per_side: float
     plates_per_side: List[float]
     actual_weight: float
+    unit: str = "lb"
+    exact: bool = True
     error: Optional[str] = None
 
+# Custom inventories are solved on request, so their size is bounded
+class PlateInventoryItem(BaseModel):
+    weight: float = Field(..., gt=0, le=100)
+    count: Optional[int] = Field(None, ge=0, le=100)  # Total plates; omit for unlimited
+
+class PlateCalculationRequest(BaseModel):
+    weights: List[float] = Field(..., max_length=500)
+    unit: str = Field("lb", pattern=r'^(lb|kg)$')
+    bar_weight: Optional[float] = Field(None, ge=0, le=100)
+    inventory: Optional[List[PlateInventoryItem]] = Field(None, max_length=20)
+
+class PlanExercise(BaseModel):
+    exercise_name: str
+    weights: List[float] = Field(..., min_length=1, max_length=20)  # Work and back-off sets, in order
+    warmup: bool = True
+    bar: Optional[str] = None  # Exercises naming the same bar share its plates
+
+class PlatePlanRequest(BaseModel):
+    exercises: List[PlanExercise] = Field(..., min_length=1, max_length=10)
+    warmups: bool = True
+    unit: str = Field("lb", pattern=r'^(lb|kg)$')
+    bar_weight: Optional[float] = Field(None, ge=0, le=100)
+    inventory: Optional[List[PlateInventoryItem]] = Field(None, max_length=20)
+
+class PlateLoadingStep(BaseModel):
+    exercise_name: str
+    set_number: int
+    is_warmup: bool
+    target_weight: float
+    actual_weight: float
+    plates_per_side: List[float]
+    plates_removed: List[float]  # Outermost first
+    plates_added: List[float]  # Innermost first
+
+class PlatePlan(BaseModel):
+    steps: List[PlateLoadingStep]
+    plate_moves: int  # Per side, including stripping the bar at the end
+    baseline_moves: int  # Same count with minimum-plate loadings for every set
+
 # New schemas for workout programs
 
 class ProgramExerciseBase(BaseModel):
@@ -225,6 +267,7 @@ class ProgramExerciseBase(BaseModel):
     notes: Optional[str] = None
     category: Optional[str] = None
     is_barbell_exercise: bool = False
+    equipment: Optional[str] = Field(None, pattern=r'^(barbell|dumbbell|cable|machine|bodyweight|kettlebell)$')
 
 class ProgramExerciseCreate(ProgramExerciseBase):
     pass
@@ -329,7 +372,7 @@ class CompletedExerciseSetBase(BaseModel):
     notes: Optional[str] = None
 
 class CompletedExerciseSetCreate(CompletedExerciseSetBase):
-    pass
+    exercise_progress_id: int
 
 class CompletedExerciseSet(CompletedExerciseSetBase):
     id: int
@@ -355,6 +398,9 @@ class ExerciseSetWithPlates(BaseModel):
     target_weight: float
     is_barbell_exercise: bool
     plate_calculation: Optional[PlateCalculation] = None
+    is_warmup: bool = False
+    plates_removed: Optional[List[float]] = None
+    plates_added: Optional[List[float]] = None
 
 class WorkoutExecution(BaseModel):
     workout_id: int
@@ -368,6 +414,49 @@ class ProgramImport(BaseModel):
     is_public: bool = False
     workouts: List[dict]
     
+# Background job schemas
+class JobCreate(BaseModel):
+    kind: str
+    priority: int = 0
+    payload: dict = {}
+
+class Job(BaseModel):
+    id: int
+    kind: str
+    status: str
+    priority: int
+    progress: float
+    progress_message: Optional[str] = None
+    attempts: int
+    max_attempts: int
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    @validator('result', pre=True)
+    def parse_result(cls, v):
+        if isinstance(v, str):
+            return json.loads(v)
+        return v
+    
+    class Config:
+        from_attributes = True
+
+# Profiling schemas
+class ProfileInfo(BaseModel):
+    id: str
+    request_id: str
+    method: str
+    path: str
+    route: str
+    status: int
+    created_at: datetime
+    duration_ms: float
+    interval_ms: float
+    samples: int
+
 # Update forward references
 WorkoutSession.model_rebuild()
 WorkoutPlan.model_rebuild()
\ No newline at end of file
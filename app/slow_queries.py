@@ -0,0 +1,63 @@
+"""
+List the slowest statements by total time.
+
+Run with `python -m app.slow_queries [--url http://localhost:8000] [--limit 20] [--plans]`
+and ADMIN_TOKEN set, or with `--dir` pointing at the workers' METRICS_DIR to
+read their snapshots without going through the API.
+"""
+import argparse
+import json
+import os
+import sys
+import urllib.request
+
+from .utils.slow_queries import top_offenders
+
+
+def _from_api(url: str, limit: int) -> list:
+    request = urllib.request.Request(
+        f"{url.rstrip('/')}/slow-queries/?limit={limit}&recent=0",
+        headers={"X-Admin-Token": os.getenv("ADMIN_TOKEN", "")}
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.load(response)["top"]
+
+
+def _from_dir(directory: str, limit: int) -> list:
+    snapshots = []
+    for name in sorted(os.listdir(directory)):
+        if name.startswith("slow-queries-") and name.endswith(".json"):
+            with open(os.path.join(directory, name)) as f:
+                snapshots.append(json.load(f))
+    return top_offenders(snapshots, limit)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--dir", default=None, help="Read worker snapshots from this METRICS_DIR instead")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--plans", action="store_true", help="Print captured plans")
+    args = parser.parse_args(argv)
+
+    offenders = _from_dir(args.dir, args.limit) if args.dir else _from_api(args.url, args.limit)
+    if not offenders:
+        print("No slow queries recorded")
+        return 0
+    print(f"{'total ms':>11} {'count':>7} {'mean ms':>9} {'max ms':>9}  statement")
+    for stats in offenders:
+        print(f"{stats['total_ms']:>11.1f} {stats['count']:>7} {stats['mean_ms']:>9.1f} "
+              f"{stats['max_ms']:>9.1f}  {stats['statement'][:160]}")
+        routes = ", ".join(f"{route} ({count})" for route, count in
+                           sorted(stats["routes"].items(), key=lambda item: -item[1]))
+        print(f"{'':>40}  routes: {routes}")
+        if args.plans and stats.get("plan"):
+            label = "EXPLAIN ANALYZE" if stats.get("analyzed") else "EXPLAIN"
+            print(f"{'':>40}  {label}:")
+            for line in stats["plan"].splitlines():
+                print(f"{'':>42}{line}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
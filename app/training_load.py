@@ -0,0 +1,43 @@
+"""
+Print today's training load for every active member.
+
+    python -m app.training_load [--date 2025-03-01] [--format csv|json]
+
+One row per member who trained in the 28 days up to the date: acute and
+chronic load, acute:chronic workload ratio, monotony and strain. JSON is
+written one object per line.
+"""
+import argparse
+import csv
+import json
+import sys
+from datetime import date
+
+from .utils import training_load
+
+FIELDS = ["user_id", "date", "load", "acute", "chronic", "acwr", "monotony", "strain"]
+
+
+def main(argv=None, session_factory=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--date", type=date.fromisoformat, default=None)
+    parser.add_argument("--format", choices=("csv", "json"), default="csv")
+    args = parser.parse_args(argv)
+
+    if session_factory is None:
+        from .database import SessionLocal as session_factory
+
+    with session_factory() as db:
+        rows = training_load.todays_loads(db, args.date)
+        if args.format == "json":
+            for row in rows:
+                print(json.dumps(row))
+        else:
+            writer = csv.DictWriter(sys.stdout, fieldnames=FIELDS, lineterminator="\n")
+            writer.writeheader()
+            writer.writerows(rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
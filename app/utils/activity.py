@@ -0,0 +1,328 @@
+from datetime import date, datetime, timedelta
+from functools import reduce
+from operator import add
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, event, exists, func, insert, inspect, literal, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import upsert
+from .archive import session_history
+
+_DAYS = models.ActivityDays.__table__
+
+EPOCH = date(1970, 1, 1)
+# Days per stored word; 63 leaves the sign bit of a BIGINT alone
+WORD_DAYS = 63
+_FULL = (1 << WORD_DAYS) - 1
+
+# (user_id, day number since EPOCH)
+Day = Tuple[int, int]
+# (user_id, word)
+Key = Tuple[int, int]
+
+
+def day_number(value) -> int:
+    if isinstance(value, datetime):
+        value = value.date()
+    return (value - EPOCH).days
+
+
+def day_date(number: int) -> date:
+    return EPOCH + timedelta(days=number)
+
+
+def _day_start(number: int) -> datetime:
+    return datetime.combine(day_date(number), datetime.min.time())
+
+
+def _as_date(value) -> date:
+    # SQLite's date() returns text, Postgres a date
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def session_days(rows: Iterable[Tuple[Optional[int], Optional[datetime]]]) -> List[Day]:
+    """The (user_id, day number) of each (user_id, date) pair that has both."""
+    return sorted({(user_id, day_number(when)) for user_id, when in rows if user_id is not None and when is not None})
+
+
+class ActivityBitmap:
+    """
+    A member's training days as one integer, bit i set if they trained on
+    day `origin + i`: ten years of history is 3,650 bits, under 500 bytes.
+    Streaks, weekly counts and calendar grids are shifts, masks and
+    popcounts over it instead of loops over sessions.
+    """
+
+    def __init__(self, origin: int = 0, bits: int = 0):
+        self.origin = origin
+        self.bits = bits
+
+    @classmethod
+    def from_words(cls, words: Iterable[Tuple[int, int]]) -> "ActivityBitmap":
+        words = [(word, bits) for word, bits in words if bits]
+        if not words:
+            return cls()
+        first = min(word for word, _ in words)
+        bits = 0
+        for word, value in words:
+            bits |= value << (word - first) * WORD_DAYS
+        return cls(first * WORD_DAYS, bits)
+
+    @classmethod
+    def from_days(cls, days: Iterable[date]) -> "ActivityBitmap":
+        numbers = {day_number(day) for day in days}
+        if not numbers:
+            return cls()
+        origin = min(numbers)
+        return cls(origin, sum(1 << number - origin for number in numbers))
+
+    def __contains__(self, day: date) -> bool:
+        number = day_number(day)
+        return bool(self._range(number, number + 1))
+
+    @property
+    def days_trained(self) -> int:
+        return self.bits.bit_count()
+
+    @property
+    def first_day(self) -> Optional[date]:
+        # x & -x keeps only the lowest set bit
+        return day_date(self.origin + (self.bits & -self.bits).bit_length() - 1) if self.bits else None
+
+    @property
+    def last_day(self) -> Optional[date]:
+        return day_date(self.origin + self.bits.bit_length() - 1) if self.bits else None
+
+    def _range(self, start: int, end: int) -> int:
+        """The bits for day numbers start to end - 1, start's in bit 0."""
+        if end <= start:
+            return 0
+        shift = start - self.origin
+        bits = self.bits >> shift if shift >= 0 else self.bits << -shift
+        return bits & ((1 << end - start) - 1)
+
+    def count(self, start: date, end: date) -> int:
+        """Days trained from start to end, both included."""
+        return self._range(day_number(start), day_number(end) + 1).bit_count()
+
+    def current_streak(self, today: date) -> int:
+        """
+        Consecutive days trained up to today, or up to yesterday when today
+        has no session yet: the streak isn't broken until the day is over.
+        """
+        end = day_number(today)
+        if not self._range(end, end + 1):
+            end -= 1
+        span = end + 1 - self.origin
+        if span <= 0:
+            return 0
+        # The latest rest day is the highest bit left when the bits are inverted
+        rest = ~self.bits & ((1 << span) - 1)
+        return span - rest.bit_length()
+
+    def longest_streak(self) -> int:
+        # Each AND with itself shifted by one shortens every run of ones by one
+        bits, longest = self.bits, 0
+        while bits:
+            bits &= bits >> 1
+            longest += 1
+        return longest
+
+    def weekly(self, weeks: int, today: date) -> List[Tuple[date, int]]:
+        """(Monday, days trained) for the last `weeks` weeks, the current one last."""
+        monday = day_number(today) - today.weekday()
+        first = monday - 7 * (weeks - 1)
+        bits = self._range(first, monday + 7)
+        return [(day_date(first + 7 * week), ((bits >> 7 * week) & 0x7F).bit_count()) for week in range(weeks)]
+
+    def grid(self, start: date, end: date) -> List[dict]:
+        """
+        Monday-to-Sunday weeks covering start to end: 1 for a day trained,
+        0 for a rest day and None for days outside the range.
+        """
+        first, last = day_number(start), day_number(end)
+        monday = first - start.weekday()
+        bits = self._range(monday, last + 1)
+        return [
+            {"week": day_date(week).isoformat(),
+             "days": [(bits >> day - monday) & 1 if first <= day <= last else None for day in range(week, week + 7)]}
+            for week in range(monday, last + 1, 7)
+        ]
+
+
+def load(conn: Connection, user_id: int) -> ActivityBitmap:
+    return ActivityBitmap.from_words(conn.execute(
+        select(_DAYS.c.word, _DAYS.c.bits).where(_DAYS.c.user_id == user_id)
+    ).all())
+
+
+def _words(days: Iterable[Day]) -> Dict[Key, List[int]]:
+    words: Dict[Key, List[int]] = {}
+    for user_id, number in days:
+        words.setdefault((user_id, number // WORD_DAYS), []).append(number)
+    return words
+
+
+def _mask(number: int):
+    return literal(1 << number % WORD_DAYS, _DAYS.c.bits.type)
+
+
+def _match(key: Key) -> tuple:
+    return _DAYS.c.user_id == key[0], _DAYS.c.word == key[1]
+
+
+def mark_days(conn: Connection, days: Iterable[Day]) -> None:
+    """
+    Set the bits of days trained with one INSERT ... ON CONFLICT DO UPDATE
+    ORing them into each word, so concurrent writers can't lose each
+    other's days or collide inserting a new word.
+    """
+    rows = [{"user_id": key[0], "word": key[1], "bits": sum({1 << number % WORD_DAYS for number in numbers})}
+            for key, numbers in sorted(_words(days).items())]
+    if not rows:
+        return
+    statement = upsert(conn, _DAYS).values(rows)
+    conn.execute(statement.on_conflict_do_update(
+        index_elements=["user_id", "word"], set_={"bits": _DAYS.c.bits.op("|")(statement.excluded.bits)}
+    ))
+
+
+def unmark_days(conn: Connection, days: Iterable[Day]) -> None:
+    """
+    Clear the bits of days that may no longer have a session, after the
+    sessions are gone: one UPDATE per word, clearing each day's bit only if
+    no session, hot or archived, is left on it.
+    """
+    for key, numbers in sorted(_words(days).items()):
+        cleared = reduce(add, (
+            case((~exists().where(session_history.c.user_id == key[0],
+                                  session_history.c.date >= _day_start(number),
+                                  session_history.c.date < _day_start(number + 1)), _mask(number)),
+                 else_=literal(0, _DAYS.c.bits.type))
+            for number in sorted(set(numbers))
+        ))
+        conn.execute(update(_DAYS).where(*_match(key)).values(
+            bits=_DAYS.c.bits.op("&")(literal(_FULL, _DAYS.c.bits.type) - cleared)
+        ))
+
+
+def compute_words(conn: Connection, user_ids=None) -> Dict[Key, int]:
+    """Every member's (or some members') bitmap words from their whole history."""
+    day = func.date(session_history.c.date)
+    query = select(session_history.c.user_id, day).where(
+        session_history.c.user_id.isnot(None), session_history.c.date.isnot(None)
+    ).distinct()
+    if user_ids is not None:
+        query = query.where(session_history.c.user_id.in_(user_ids))
+    words: Dict[Key, int] = {}
+    for user_id, value in conn.execute(query):
+        number = day_number(_as_date(value))
+        key = (user_id, number // WORD_DAYS)
+        words[key] = words.get(key, 0) | 1 << number % WORD_DAYS
+    return words
+
+
+def _stored(conn: Connection, user_ids=None) -> Dict[Key, int]:
+    query = select(_DAYS.c.user_id, _DAYS.c.word, _DAYS.c.bits)
+    if user_ids is not None:
+        query = query.where(_DAYS.c.user_id.in_(user_ids))
+    return {(user_id, word): bits for user_id, word, bits in conn.execute(query)}
+
+
+def _diff(stored: Dict[Key, int], computed: Dict[Key, int]) -> Dict[Key, Optional[int]]:
+    # Words emptied by deletes are left in place and match no word at all
+    changes: Dict[Key, Optional[int]] = {key: None for key in stored.keys() - computed.keys() if stored[key]}
+    for key, bits in computed.items():
+        if stored.get(key) != bits:
+            changes[key] = bits
+    return changes
+
+
+def check(db: Session) -> Dict[Key, Optional[int]]:
+    """Words whose stored bits differ from history, with the right bits (None: shouldn't exist)."""
+    conn = db.connection()
+    return _diff(_stored(conn), compute_words(conn))
+
+
+def rebuild(db: Session, user_ids=None) -> Dict[Key, Optional[int]]:
+    """Recompute bitmaps, all of them or some members', store any words that changed and drop empty ones."""
+    conn = db.connection()
+    stored = _stored(conn, user_ids)
+    changes = _diff(stored, compute_words(conn, user_ids))
+    inserts = []
+    for key, bits in changes.items():
+        if bits is None:
+            conn.execute(delete(_DAYS).where(*_match(key)))
+        elif key in stored:
+            conn.execute(update(_DAYS).where(*_match(key)).values(bits=bits))
+        else:
+            inserts.append({"user_id": key[0], "word": key[1], "bits": bits})
+    if inserts:
+        conn.execute(insert(_DAYS), inserts)
+    empty = delete(_DAYS).where(_DAYS.c.bits == 0)
+    conn.execute(empty if user_ids is None else empty.where(_DAYS.c.user_id.in_(user_ids)))
+    return changes
+
+
+def streaks(db: Session, user_id: int, weeks: int = 12, today: Optional[date] = None) -> dict:
+    today = today or datetime.utcnow().date()
+    bitmap = load(db.connection(), user_id)
+    return {
+        "current_streak": bitmap.current_streak(today),
+        "longest_streak": bitmap.longest_streak(),
+        "days_trained": bitmap.days_trained,
+        "first_day": bitmap.first_day.isoformat() if bitmap.bits else None,
+        "last_day": bitmap.last_day.isoformat() if bitmap.bits else None,
+        "weekly": [{"week": monday.isoformat(), "days": days} for monday, days in bitmap.weekly(weeks, today)],
+    }
+
+
+def calendar(db: Session, user_id: int, year: int, month: Optional[int] = None) -> dict:
+    if month is None:
+        start, end = date(year, 1, 1), date(year, 12, 31)
+    else:
+        start = date(year, month, 1)
+        end = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    bitmap = load(db.connection(), user_id)
+    return {
+        "year": year,
+        "month": month,
+        "days_trained": bitmap.count(start, end),
+        "weeks": bitmap.grid(start, end),
+    }
+
+
+def _before(obj, name: str):
+    history = inspect(obj).attrs[name].history
+    return history.deleted[0] if history.deleted else getattr(obj, name)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flush(session, flush_context):
+    """
+    Mark the days of new sessions and clear those of deleted ones, in the
+    same transaction; a session moved to another day or member does both.
+    """
+    marked, cleared = [], []
+    for obj in session.new:
+        if isinstance(obj, models.WorkoutSession):
+            marked.append((obj.user_id, obj.date))
+    for obj in session.dirty:
+        if isinstance(obj, models.WorkoutSession) and any(
+                inspect(obj).attrs[name].history.has_changes() for name in ("date", "user_id")):
+            cleared.append((_before(obj, "user_id"), _before(obj, "date")))
+            marked.append((obj.user_id, obj.date))
+    for obj in session.deleted:
+        if isinstance(obj, models.WorkoutSession):
+            cleared.append((obj.user_id, obj.date))
+    if not (marked or cleared):
+        return
+
+    connection = session.connection()
+    if cleared:
+        unmark_days(connection, session_days(cleared))
+    if marked:
+        mark_days(connection, session_days(marked))
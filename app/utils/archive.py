@@ -0,0 +1,74 @@
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select, union_all
+from sqlalchemy.engine import Engine
+
+from .. import models
+
+# Sessions older than this are moved to the archive tables
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "730"))
+# Sessions moved per transaction, with their entries
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+# Stats endpoints look back at most this far and read only the hot tables,
+# so nothing younger may be archived
+HOT_WINDOW_DAYS = 365
+
+_SESSIONS = models.WorkoutSession.__table__
+_ENTRIES = models.WorkoutEntry.__table__
+_ARCHIVED_SESSIONS = models.ArchivedWorkoutSession.__table__
+_ARCHIVED_ENTRIES = models.ArchivedWorkoutEntry.__table__
+
+
+def _history(hot, archive, name: str):
+    names = [column.name for column in archive.columns]
+    return union_all(
+        select(*(hot.c[column] for column in names)),
+        select(*(archive.c[column] for column in names))
+    ).subquery(name)
+
+
+# Hot and archived rows together, for reads that cover a member's whole
+# history; the database pushes filters down into both halves
+session_history = _history(_SESSIONS, _ARCHIVED_SESSIONS, "session_history")
+entry_history = _history(_ENTRIES, _ARCHIVED_ENTRIES, "entry_history")
+
+
+def archive_cutoff(days: int = ARCHIVE_AFTER_DAYS, now: Optional[datetime] = None) -> datetime:
+    if days <= HOT_WINDOW_DAYS:
+        raise ValueError(f"Sessions younger than {HOT_WINDOW_DAYS + 1} days are read by the stats endpoints")
+    return (now or datetime.utcnow()) - timedelta(days=days)
+
+
+def archivable_sessions(engine: Engine, cutoff: datetime) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).where(_SESSIONS.c.date < cutoff)).scalar()
+
+
+def archive_sessions(engine: Engine, cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Move sessions dated before the cutoff, with their entries, to the
+    archive tables. Each batch is copied and deleted in one transaction, so
+    readers see every session exactly once and an interrupted run can
+    simply be started again.
+    """
+    moved = 0
+    while True:
+        with engine.begin() as conn:
+            ids = conn.execute(
+                select(_SESSIONS.c.id).where(_SESSIONS.c.date < cutoff).order_by(_SESSIONS.c.id).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                return moved
+            session_columns = [column.name for column in _ARCHIVED_SESSIONS.columns]
+            entry_columns = [column.name for column in _ARCHIVED_ENTRIES.columns]
+            conn.execute(insert(_ARCHIVED_SESSIONS).from_select(
+                session_columns, select(*(_SESSIONS.c[name] for name in session_columns)).where(_SESSIONS.c.id.in_(ids))
+            ))
+            conn.execute(insert(_ARCHIVED_ENTRIES).from_select(
+                entry_columns, select(*(_ENTRIES.c[name] for name in entry_columns)).where(_ENTRIES.c.session_id.in_(ids))
+            ))
+            conn.execute(delete(_ENTRIES).where(_ENTRIES.c.session_id.in_(ids)))
+            conn.execute(delete(_SESSIONS).where(_SESSIONS.c.id.in_(ids)))
+        moved += len(ids)
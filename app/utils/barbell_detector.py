@@ -1,5 +1,7 @@
 from typing import List
 
+from .equipment import equipment_classifier
+
 class BarbellExerciseDetector:
     """Utility class to detect if an exercise is a barbell exercise."""
     
@@ -34,14 +36,7 @@ class BarbellExerciseDetector:
         Returns:
             True if the exercise is likely a barbell exercise, False otherwise
         """
-        exercise_lower = exercise_name.lower()
-        
-        # Check if any of the barbell exercise keywords are in the exercise name
-        for keyword in BarbellExerciseDetector.BARBELL_EXERCISES:
-            if keyword in exercise_lower:
-                return True
-        
-        return False
+        return equipment_classifier.is_barbell(exercise_name)
     
     @staticmethod
     def get_barbell_exercises() -> List[str]:
@@ -0,0 +1,181 @@
+import os
+from typing import Iterable, List, NamedTuple, Tuple
+
+from sqlalchemy import Table, delete, exists, func, or_, select, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from .. import models
+from .archive import session_history
+from .data_versions import mark_changed
+from . import activity, leaderboards, percentiles
+from .jobs import queue_job_rows
+
+# Orphaned rows removed per transaction by `python -m app.orphans`
+ORPHAN_BATCH_SIZE = int(os.getenv("ORPHAN_BATCH_SIZE", "1000"))
+
+_SESSIONS = models.WorkoutSession.__table__
+_ENTRIES = models.WorkoutEntry.__table__
+_ARCHIVED_SESSIONS = models.ArchivedWorkoutSession.__table__
+_ARCHIVED_ENTRIES = models.ArchivedWorkoutEntry.__table__
+_PLANS = models.WorkoutPlan.__table__
+_PLAN_TEMPLATES = models.workout_plan_template
+_TEMPLATES = models.WorkoutTemplate.__table__
+_TEMPLATE_EXERCISES = models.TemplateExercise.__table__
+_PROGRAMS = models.WorkoutProgram.__table__
+_PROGRAM_WORKOUTS = models.ProgramWorkout.__table__
+_PROGRAM_EXERCISES = models.ProgramExercise.__table__
+_PROGRESS = models.UserProgramProgress.__table__
+_EXERCISE_PROGRESS = models.ExerciseProgress.__table__
+_COMPLETED_SETS = models.CompletedExerciseSet.__table__
+_LEADERBOARD_SCORES = models.LeaderboardScore.__table__
+
+# Children are removed with explicit DELETE ... WHERE statements rather than
+# ON DELETE CASCADE: SQLite doesn't enforce foreign keys unless asked, and
+# completed sets lose theirs once sessions are archived or partitioned.
+# Statements go through the session's connection so they share its
+# transaction without the bulk hook marking every member's data changed.
+
+
+def delete_sessions(db: Session, session_ids: Iterable[int]) -> int:
+    """Delete sessions, hot or archived, with their entries and completed sets; returns the sessions deleted."""
+    ids = list(session_ids)
+    conn = db.connection()
+    days = conn.execute(
+        select(session_history.c.user_id, session_history.c.date).where(session_history.c.id.in_(ids))
+    ).all()
+    owners = sorted({user_id for user_id, _ in days if user_id is not None})
+    conn.execute(delete(_COMPLETED_SETS).where(_COMPLETED_SETS.c.workout_session_id.in_(ids)))
+    conn.execute(delete(_ENTRIES).where(_ENTRIES.c.session_id.in_(ids)))
+    conn.execute(delete(_ARCHIVED_ENTRIES).where(_ARCHIVED_ENTRIES.c.session_id.in_(ids)))
+    deleted = conn.execute(delete(_SESSIONS).where(_SESSIONS.c.id.in_(ids))).rowcount
+    deleted += conn.execute(delete(_ARCHIVED_SESSIONS).where(_ARCHIVED_SESSIONS.c.id.in_(ids))).rowcount
+    queue_job_rows(conn, [leaderboards.refresh_job(owners), percentiles.refresh_job(owners)])
+    activity.unmark_days(conn, activity.session_days(days))
+    mark_changed(db, owners)
+    return deleted
+
+
+def delete_plans(db: Session, plan_ids: Iterable[int]) -> int:
+    """Delete plans and their template links; the templates stay."""
+    ids = list(plan_ids)
+    conn = db.connection()
+    owners = conn.execute(select(_PLANS.c.user_id).where(_PLANS.c.id.in_(ids)).distinct()).scalars().all()
+    conn.execute(delete(_PLAN_TEMPLATES).where(_PLAN_TEMPLATES.c.plan_id.in_(ids)))
+    deleted = conn.execute(delete(_PLANS).where(_PLANS.c.id.in_(ids))).rowcount
+    mark_changed(db, owners)
+    return deleted
+
+
+def delete_templates(db: Session, template_ids: Iterable[int]) -> int:
+    """Delete templates with their exercises and plan links; program workouts built from them keep their own exercises."""
+    ids = list(template_ids)
+    conn = db.connection()
+    conn.execute(delete(_TEMPLATE_EXERCISES).where(_TEMPLATE_EXERCISES.c.template_id.in_(ids)))
+    conn.execute(delete(_PLAN_TEMPLATES).where(_PLAN_TEMPLATES.c.template_id.in_(ids)))
+    conn.execute(
+        update(_PROGRAM_WORKOUTS).where(_PROGRAM_WORKOUTS.c.template_id.in_(ids)).values(template_id=None)
+    )
+    deleted = conn.execute(delete(_TEMPLATES).where(_TEMPLATES.c.id.in_(ids))).rowcount
+    mark_changed(db, shared=True)
+    return deleted
+
+
+def delete_programs(db: Session, program_ids: Iterable[int]) -> int:
+    """
+    Delete programs with their workouts and exercises, and every member's
+    progress through them. Sessions logged while following a program are
+    the member's own history and stay.
+    """
+    ids = list(program_ids)
+    conn = db.connection()
+    workouts = select(_PROGRAM_WORKOUTS.c.id).where(_PROGRAM_WORKOUTS.c.program_id.in_(ids))
+    exercises = select(_PROGRAM_EXERCISES.c.id).where(_PROGRAM_EXERCISES.c.program_workout_id.in_(workouts))
+    progress = select(_PROGRESS.c.id).where(_PROGRESS.c.program_id.in_(ids))
+    exercise_progress = select(_EXERCISE_PROGRESS.c.id).where(or_(
+        _EXERCISE_PROGRESS.c.user_progress_id.in_(progress),
+        _EXERCISE_PROGRESS.c.program_exercise_id.in_(exercises)
+    ))
+    conn.execute(delete(_COMPLETED_SETS).where(_COMPLETED_SETS.c.exercise_progress_id.in_(exercise_progress)))
+    conn.execute(delete(_EXERCISE_PROGRESS).where(_EXERCISE_PROGRESS.c.id.in_(exercise_progress)))
+    conn.execute(delete(_PROGRESS).where(_PROGRESS.c.program_id.in_(ids)))
+    conn.execute(delete(_PROGRAM_EXERCISES).where(_PROGRAM_EXERCISES.c.program_workout_id.in_(workouts)))
+    conn.execute(delete(_PROGRAM_WORKOUTS).where(_PROGRAM_WORKOUTS.c.program_id.in_(ids)))
+    leaderboards.delete_program_scores(db, ids)
+    deleted = conn.execute(delete(_PROGRAMS).where(_PROGRAMS.c.id.in_(ids))).rowcount
+    # Progress rows belong to every member who followed the program
+    mark_changed(db, shared=True)
+    return deleted
+
+
+class Orphans(NamedTuple):
+    table: Table
+    column: str
+    parents: Tuple[Table, ...]
+
+    @property
+    def name(self) -> str:
+        return f"{self.table.name}.{self.column}"
+
+    def condition(self):
+        """Rows whose reference is set but found in none of the parent tables."""
+        value = self.table.c[self.column]
+        return value.isnot(None), *(
+            ~exists().where(parent.c.id == value) for parent in self.parents
+        )
+
+
+# Parents come before their children, so rows orphaned by an earlier
+# cleanup in the same run are found by a later one
+ORPHANS = [
+    Orphans(_PROGRAM_WORKOUTS, "program_id", (_PROGRAMS,)),
+    Orphans(_PROGRAM_EXERCISES, "program_workout_id", (_PROGRAM_WORKOUTS,)),
+    Orphans(_PROGRESS, "program_id", (_PROGRAMS,)),
+    Orphans(_LEADERBOARD_SCORES, "program_id", (_PROGRAMS,)),
+    Orphans(_EXERCISE_PROGRESS, "user_progress_id", (_PROGRESS,)),
+    Orphans(_EXERCISE_PROGRESS, "program_exercise_id", (_PROGRAM_EXERCISES,)),
+    Orphans(_COMPLETED_SETS, "exercise_progress_id", (_EXERCISE_PROGRESS,)),
+    # Sets recorded in a session that has since been archived aren't orphans
+    Orphans(_COMPLETED_SETS, "workout_session_id", (_SESSIONS, _ARCHIVED_SESSIONS)),
+    Orphans(_ENTRIES, "session_id", (_SESSIONS,)),
+    Orphans(_ARCHIVED_ENTRIES, "session_id", (_ARCHIVED_SESSIONS,)),
+    Orphans(_TEMPLATE_EXERCISES, "template_id", (_TEMPLATES,)),
+    Orphans(_PLAN_TEMPLATES, "plan_id", (_PLANS,)),
+    Orphans(_PLAN_TEMPLATES, "template_id", (_TEMPLATES,)),
+]
+
+
+def count_orphans(conn: Connection, orphans: Orphans) -> int:
+    return conn.execute(select(func.count()).select_from(orphans.table).where(*orphans.condition())).scalar()
+
+
+def _delete_batch(conn: Connection, orphans: Orphans, batch_size: int) -> int:
+    table = orphans.table
+    # Tables with an id are trimmed by id; the plan/template link table has
+    # none, so it goes by the missing parents instead
+    key = table.c.id if "id" in table.c else table.c[orphans.column]
+    keys = conn.execute(
+        select(key).where(*orphans.condition()).distinct().order_by(key).limit(batch_size)
+    ).scalars().all()
+    if not keys:
+        return 0
+    return conn.execute(delete(table).where(key.in_(keys))).rowcount
+
+
+def delete_orphans(engine: Engine, batch_size: int = ORPHAN_BATCH_SIZE) -> List[Tuple[str, int]]:
+    """
+    Remove rows whose parent is gone, batch_size at a time with a commit
+    after each batch, so no lock is held for long and an interrupted run
+    can simply be started again. Returns the rows removed per reference.
+    """
+    removed = []
+    for orphans in ORPHANS:
+        total = 0
+        while True:
+            with engine.begin() as conn:
+                deleted = _delete_batch(conn, orphans, batch_size)
+            if not deleted:
+                break
+            total += deleted
+        removed.append((orphans.name, total))
+    return removed
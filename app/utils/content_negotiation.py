@@ -0,0 +1,115 @@
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+
+from .fast_json import dumps, msgpack, msgpack_requested
+
+MSGPACK_TYPES = {"application/msgpack", "application/x-msgpack", "application/vnd.msgpack"}
+_JSON_RANGES = {"application/json", "application/*", "*/*"}
+
+
+def prefers_msgpack(accept: str) -> bool:
+    """True when an Accept header ranks MessagePack at least as high as JSON."""
+    msgpack_q = json_q = 0.0
+    for part in accept.split(","):
+        media, _, params = part.partition(";")
+        media = media.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media in MSGPACK_TYPES:
+            msgpack_q = max(msgpack_q, q)
+        elif media in _JSON_RANGES:
+            json_q = max(json_q, q)
+    return msgpack_q > 0 and msgpack_q >= json_q
+
+
+def _is_msgpack(content_type: str) -> bool:
+    return content_type.partition(";")[0].strip().lower() in MSGPACK_TYPES
+
+
+class ContentNegotiationMiddleware:
+    """
+    MessagePack for clients that ask for it, on any endpoint.
+
+    Responses are encoded as MessagePack instead of JSON when the Accept
+    header prefers it; the response classes check the flag this sets, so
+    nothing is encoded twice. Request bodies sent as MessagePack are
+    decoded here and handed on as JSON, so every endpoint validates them
+    with its usual pydantic schema. Without the msgpack package responses
+    stay JSON and MessagePack bodies get a 415.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = content_type = ""
+        for name, value in scope["headers"]:
+            if name == b"accept":
+                accept = value.decode("latin-1")
+            elif name == b"content-type":
+                content_type = value.decode("latin-1")
+
+        if _is_msgpack(content_type):
+            if msgpack is None:
+                response = JSONResponse(status_code=415, content={"detail": "MessagePack is not supported"})
+                await response(scope, receive, send)
+                return
+            body = await _read_body(receive)
+            try:
+                json_body = dumps(msgpack.unpackb(body)) if body else b""
+            except (ValueError, TypeError, msgpack.UnpackException):
+                response = JSONResponse(status_code=400, content={"detail": "Malformed MessagePack body"})
+                await response(scope, receive, send)
+                return
+            # Rewritten in place: the router records the matched route in this
+            # scope, and outer middleware such as metrics read it from there
+            scope["headers"] = [
+                (name, value) for name, value in scope["headers"] if name not in (b"content-type", b"content-length")
+            ] + [(b"content-type", b"application/json"), (b"content-length", str(len(json_body)).encode())]
+            receive = _replay(json_body, receive)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", []))}
+                MutableHeaders(raw=message["headers"]).add_vary_header("Accept")
+            await send(message)
+
+        token = msgpack_requested.set(msgpack is not None and bool(accept) and prefers_msgpack(accept))
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            msgpack_requested.reset(token)
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def _replay(body: bytes, receive):
+    sent = False
+
+    async def replay():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+    return replay
@@ -0,0 +1,221 @@
+import fcntl
+import mmap
+import os
+import secrets
+import struct
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Iterable, Optional
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from .. import models
+from .auth import token_user_id
+from .response_cache import etag_matches
+
+# Counter file shared by every uvicorn worker and `python -m app.worker` on a
+# host; unset keeps counters per process, which is only right with one worker
+DATA_VERSION_FILE = os.getenv("DATA_VERSION_FILE")
+# Users whose ids collide on a slot invalidate each other's ETags, nothing worse
+DATA_VERSION_SLOTS = int(os.getenv("DATA_VERSION_SLOTS", "65536"))
+
+_HEADER = struct.Struct("<8sQ")
+_MAGIC = b"dversion"
+_COUNTER = struct.Struct("<Q")
+
+# Slot for rows every member can read: programs, templates, accounts
+SHARED_SLOT = 0
+
+# Rows whose owner is a column on the row itself
+_OWNED = {
+    models.WorkoutSession: models.WorkoutSession.user_id,
+    models.WorkoutPlan: models.WorkoutPlan.user_id,
+    models.UserProgramProgress: models.UserProgramProgress.user_id,
+}
+# Rows owned through a parent: (foreign key attribute, query for the owners of a set of parent ids)
+_CHILDREN = {
+    models.WorkoutEntry: (
+        "session_id",
+        lambda ids: select(models.WorkoutSession.user_id).where(models.WorkoutSession.id.in_(ids))
+    ),
+    models.ExerciseProgress: (
+        "user_progress_id",
+        lambda ids: select(models.UserProgramProgress.user_id).where(models.UserProgramProgress.id.in_(ids))
+    ),
+    models.CompletedExerciseSet: (
+        "exercise_progress_id",
+        lambda ids: select(models.UserProgramProgress.user_id).join(
+            models.ExerciseProgress, models.ExerciseProgress.user_progress_id == models.UserProgramProgress.id
+        ).where(models.ExerciseProgress.id.in_(ids))
+    ),
+}
+# Job progress is written constantly and no conditional response includes it
+_UNTRACKED = {models.Job}
+
+
+class DataVersions:
+    """
+    A counter per member that goes up whenever a transaction changing their
+    data commits, plus one shared counter for data every member reads.
+
+    Reading a version is a memory read, so a conditional GET can be answered
+    before any database work. The counters live in a memory-mapped file when
+    DATA_VERSION_FILE is set so that every worker sees every other worker's
+    writes. The file carries a random epoch, written when it is created, that
+    goes into every ETag: recreating the file, which is how counters are
+    reset, can never make an old ETag match again.
+    """
+
+    def __init__(self, path: Optional[str] = DATA_VERSION_FILE, slots: int = DATA_VERSION_SLOTS):
+        self.slots = slots
+        self._size = _HEADER.size + _COUNTER.size * slots
+        self._lock = threading.Lock()
+        self._fd = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            with self._file_lock():
+                if os.fstat(self._fd).st_size != self._size or os.pread(self._fd, len(_MAGIC), 0) != _MAGIC:
+                    os.ftruncate(self._fd, 0)
+                    os.ftruncate(self._fd, self._size)
+                    os.pwrite(self._fd, _HEADER.pack(_MAGIC, secrets.randbits(63)), 0)
+            self._map = mmap.mmap(self._fd, self._size)
+        else:
+            self._map = mmap.mmap(-1, self._size)
+            _HEADER.pack_into(self._map, 0, _MAGIC, secrets.randbits(63))
+        self.epoch = _HEADER.unpack_from(self._map, 0)[1]
+
+    @contextmanager
+    def _file_lock(self):
+        if self._fd is None:
+            yield
+            return
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _offset(self, slot: int) -> int:
+        return _HEADER.size + _COUNTER.size * slot
+
+    def slot(self, user_id: int) -> int:
+        return 1 + user_id % (self.slots - 1)
+
+    def get(self, user_id: int) -> int:
+        return _COUNTER.unpack_from(self._map, self._offset(self.slot(user_id)))[0]
+
+    @property
+    def shared(self) -> int:
+        return _COUNTER.unpack_from(self._map, self._offset(SHARED_SLOT))[0]
+
+    def bump(self, user_ids: Iterable[Optional[int]] = (), shared: bool = False) -> None:
+        slots = {self.slot(user_id) for user_id in user_ids if user_id is not None}
+        if shared:
+            slots.add(SHARED_SLOT)
+        if not slots:
+            return
+        # flock excludes other processes; threads here share the descriptor
+        with self._lock, self._file_lock():
+            for slot in slots:
+                offset = self._offset(slot)
+                _COUNTER.pack_into(self._map, offset, _COUNTER.unpack_from(self._map, offset)[0] + 1)
+
+    def etag(self, user_id: int, day: Optional[date] = None) -> str:
+        """Weak ETag for anything built from this member's data and shared data, and the day if given."""
+        tag = f"{user_id:x}.{self.epoch:x}.{self.get(user_id):x}.{self.shared:x}"
+        return f'W/"{tag}.{day:%Y%m%d}"' if day is not None else f'W/"{tag}"'
+
+
+data_versions = DataVersions()
+
+CACHE_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+
+def _conditional(request: Request, response: Response, day: Optional[date] = None) -> None:
+    user_id = token_user_id(request.headers.get("authorization"))
+    if user_id is None:
+        return
+    etag = data_versions.etag(user_id, day)
+    if etag_matches(request, etag):
+        raise HTTPException(status_code=304, headers={"ETag": etag, **CACHE_HEADERS})
+    response.headers["ETag"] = etag
+    response.headers.update(CACHE_HEADERS)
+
+
+async def conditional_get(request: Request, response: Response):
+    """
+    Route dependency answering a matching If-None-Match with a 304 before
+    any other dependency runs, so no session is opened and no query is made.
+
+    List it in the route's `dependencies` and only on routes whose response
+    is built from the caller's own rows and shared rows: anything else
+    changes without the caller's version moving. The ETag is computed
+    before the handler reads, so a write racing the read leaves the client
+    with an older tag, never a newer tag on older data.
+    """
+    _conditional(request, response)
+
+
+async def daily_conditional_get(request: Request, response: Response):
+    """
+    conditional_get for routes whose response also depends on today's
+    (UTC) date, such as series ending today: the date is part of the ETag,
+    so yesterday's tag never matches.
+    """
+    _conditional(request, response, datetime.utcnow().date())
+
+
+def mark_changed(session: Session, user_ids: Iterable[Optional[int]] = (), shared: bool = False) -> None:
+    """Record changes to bump on commit, for writes the flush hooks don't see."""
+    changes = session.info.setdefault("data_versions", {"users": set(), "shared": False})
+    changes["users"].update(user_id for user_id in user_ids if user_id is not None)
+    changes["shared"] = changes["shared"] or shared
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flush(session, flush_context):
+    users, shared = set(), False
+    parents = {}
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        cls = type(obj)
+        if cls in _UNTRACKED:
+            continue
+        if cls in _OWNED:
+            users.add(getattr(obj, _OWNED[cls].key))
+        elif cls in _CHILDREN:
+            parent_id = getattr(obj, _CHILDREN[cls][0])
+            if parent_id is not None:
+                parents.setdefault(cls, set()).add(parent_id)
+        else:
+            shared = True
+    connection = session.connection()
+    for cls, ids in parents.items():
+        users.update(connection.execute(_CHILDREN[cls][1](ids)).scalars())
+    mark_changed(session, users, shared)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_bulk(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in _UNTRACKED:
+        return
+    # Bulk statements don't say whose rows they touch, so they invalidate everyone
+    mark_changed(orm_execute_state.session, shared=True)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session):
+    changes = session.info.pop("data_versions", None)
+    if changes:
+        data_versions.bump(changes["users"], shared=changes["shared"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("data_versions", None)
@@ -0,0 +1,128 @@
+import os
+import re
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Number of classified exercise names kept in memory
+EQUIPMENT_CACHE_SIZE = int(os.getenv("EQUIPMENT_CACHE_SIZE", "4096"))
+
+# (rank, equipment, keywords). When a name matches several keywords the lowest
+# rank wins, so "Dumbbell Row" is a dumbbell exercise even though rows are
+# usually done with a barbell. Keywords are lowercase with single spaces.
+EQUIPMENT_KEYWORDS: List[Tuple[int, str, Sequence[str]]] = [
+    # The implement is named outright
+    (0, "barbell", ["barbell", "bb", "ez bar", "ez curl bar", "trap bar", "hex bar", "landmine", "safety bar"]),
+    (0, "dumbbell", ["dumbbell", "dumbell", "db"]),
+    (0, "kettlebell", ["kettlebell", "kettle bell", "kb"]),
+    (0, "cable", ["cable", "pulley"]),
+    (0, "machine", ["machine", "smith", "hammer strength", "selectorized"]),
+    (0, "bodyweight", ["bodyweight", "body weight", "bw"]),
+    # Movements that imply their equipment
+    (1, "cable", ["pulldown", "pull down", "pushdown", "push down", "face pull", "crossover", "cable fly"]),
+    (1, "machine", ["leg press", "leg extension", "leg curl", "hack squat", "pec deck", "chest press",
+                    "calf raise machine", "seated row machine", "hip abductor", "hip adductor"]),
+    (1, "bodyweight", ["pull up", "pullup", "chin up", "chinup", "push up", "pushup", "dip", "plank",
+                       "burpee", "sit up", "situp", "crunch", "muscle up", "air squat", "pistol squat",
+                       "inverted row", "hanging leg raise", "mountain climber", "jumping jack"]),
+    (1, "kettlebell", ["swing", "turkish get up"]),
+    (1, "dumbbell", ["lateral raise", "hammer curl", "concentration curl", "goblet squat", "fly", "flye"]),
+    # Lifts that are barbell lifts unless something above says otherwise
+    (2, "barbell", ["bench press", "squat", "front squat", "back squat", "deadlift", "sumo deadlift",
+                    "romanian deadlift", "rdl", "overhead press", "ohp", "military press", "push press",
+                    "row", "pendlay row", "power clean", "powerclean", "hang clean", "clean", "clean and jerk",
+                    "jerk", "snatch", "good morning", "hip thrust", "thruster"]),
+    (2, "dumbbell", ["curl"]),
+]
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase a name and collapse separators so keywords match on word boundaries."""
+    return " ".join(re.sub(r"[-_/]", " ", name.lower()).split())
+
+
+class EquipmentClassifier:
+    """
+    Labels exercise names with the equipment they use.
+
+    Every keyword is compiled into one alternation, longest first, so a name
+    is scanned once no matter how many keywords there are. Results are kept in
+    an LRU cache, and classify_many() scans a whole batch of names at once.
+    """
+
+    def __init__(self, keywords: Sequence[Tuple[int, str, Sequence[str]]] = EQUIPMENT_KEYWORDS,
+                 cache_size: int = EQUIPMENT_CACHE_SIZE):
+        self._labels: Dict[str, Tuple[int, str]] = {}
+        for rank, equipment, terms in keywords:
+            for term in terms:
+                term = normalize_name(term)
+                if term not in self._labels or rank < self._labels[term][0]:
+                    self._labels[term] = (rank, equipment)
+        alternatives = "|".join(re.escape(term) for term in sorted(self._labels, key=len, reverse=True))
+        # Allow simple plurals ("rows", "presses", "dips")
+        self._pattern = re.compile(r"\b(" + alternatives + r")(?:e?s)?\b")
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _best(self, terms: Iterable[str]) -> Optional[str]:
+        best = None
+        for term in terms:
+            label = self._labels[term]
+            if best is None or label[0] < best[0]:
+                best = label
+        return best[1] if best else None
+
+    def _scan(self, names: List[str]) -> List[Optional[str]]:
+        """Classify normalized names with a single pass over their concatenation."""
+        text = "\n".join(names)
+        starts = []
+        offset = 0
+        for name in names:
+            starts.append(offset)
+            offset += len(name) + 1
+        matches: List[List[str]] = [[] for _ in names]
+        for match in self._pattern.finditer(text):
+            matches[bisect_right(starts, match.start()) - 1].append(match.group(1))
+        return [self._best(terms) for terms in matches]
+
+    def classify_many(self, names: Sequence[str]) -> List[Optional[str]]:
+        """Return the equipment for each name (None if unknown), in order."""
+        results: Dict[str, Optional[str]] = {}
+        missing = []
+        with self._lock:
+            for name in names:
+                if name in results:
+                    continue
+                if name in self._cache:
+                    self._cache.move_to_end(name)
+                    results[name] = self._cache[name]
+                else:
+                    results[name] = None
+                    missing.append(name)
+
+        if missing:
+            labels = self._scan([normalize_name(name) for name in missing])
+            with self._lock:
+                for name, label in zip(missing, labels):
+                    results[name] = label
+                    self._cache[name] = label
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return [results[name] for name in names]
+
+    def classify(self, name: str) -> Optional[str]:
+        return self.classify_many([name])[0]
+
+    def is_barbell(self, name: str) -> bool:
+        return self.classify(name) == "barbell"
+
+    def clear_cache(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+# Shared classifier, compiled once at import
+equipment_classifier = EquipmentClassifier()
@@ -0,0 +1,54 @@
+import csv
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .archive import entry_history, session_history
+from .jobs import job_handler, JobContext, PermanentJobError, spool_path
+
+EXPORT_COLUMNS = ["date", "session_id", "session_notes", "exercise_name", "category", "sets", "reps", "weight", "difficulty", "notes"]
+
+
+def export_file_path(job_id: int) -> str:
+    return spool_path(f"export-{job_id}.csv")
+
+
+@job_handler("export_workouts", submittable=True)
+def run_workout_export(db: Session, context: JobContext) -> dict:
+    """Write the user's full workout history to a CSV file in the spool directory."""
+    if context.user_id is None:
+        raise PermanentJobError("Workout exports need a user")
+
+    # Archived sessions are part of the history too
+    sessions, entries = session_history, entry_history
+    total = db.execute(select(func.count()).select_from(entries).join(
+        sessions, sessions.c.id == entries.c.session_id
+    ).where(sessions.c.user_id == context.user_id)).scalar()
+
+    rows = db.execute(select(
+        sessions.c.date,
+        sessions.c.id,
+        sessions.c.notes,
+        entries.c.exercise_name,
+        entries.c.category,
+        entries.c.sets,
+        entries.c.reps,
+        entries.c.weight,
+        entries.c.difficulty,
+        entries.c.notes
+    ).join(entries, sessions.c.id == entries.c.session_id).where(
+        sessions.c.user_id == context.user_id
+    ).order_by(sessions.c.date, entries.c.id).execution_options(yield_per=1000))
+
+    written = 0
+    with open(export_file_path(context.job_id), "w", newline="", encoding="utf-8") as out:
+        writer = csv.writer(out)
+        writer.writerow(EXPORT_COLUMNS)
+        for row in rows:
+            writer.writerow([row[0].isoformat() if row[0] else ""] + list(row[1:]))
+            written += 1
+            if written % 1000 == 0:
+                context.check_cancelled()
+                context.report(written / max(total, 1), f"Exported {written} of {total} entries")
+
+    return {"filename": f"workouts-{context.job_id}.csv", "rows": written}
@@ -0,0 +1,113 @@
+import json
+from contextvars import ContextVar
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Sequence
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import FromClause, select
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # MessagePack is then never negotiated
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# Set per request by ContentNegotiationMiddleware when the client prefers MessagePack
+msgpack_requested: ContextVar[bool] = ContextVar("msgpack_requested", default=False)
+
+# Keep IN lists well under SQLite's bound parameter limit
+IN_CHUNK_SIZE = 500
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value) -> bytes:
+    """Encode plain dicts, lists and datetimes the way pydantic would, as compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, default=_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def loads(body: bytes):
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def packb(value) -> bytes:
+    """Encode plain data as MessagePack, with datetimes as the same strings JSON carries."""
+    return msgpack.packb(value, default=_default)
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response for content that is already plain data, or MessagePack
+    when the client negotiated it.
+
+    Routes returning one keep their response_model for the OpenAPI docs, but
+    FastAPI skips validating and re-encoding the body, so the data must
+    already match the schema: build it with schema_columns().
+    """
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if msgpack_requested.get():
+            self.media_type = MSGPACK_MEDIA_TYPE
+            return packb(content)
+        return dumps(content)
+
+
+class NegotiatedJSONResponse(JSONResponse):
+    """The app's default response class: JSON, or MessagePack when the client negotiated it."""
+
+    def render(self, content) -> bytes:
+        if msgpack_requested.get():
+            self.media_type = MSGPACK_MEDIA_TYPE
+            return packb(content)
+        return super().render(content)
+
+
+def schema_columns(table: FromClause, schema, exclude: Sequence[str] = ()) -> list:
+    """Table (or subquery) columns for the schema's fields, in field order, so rows dump like the schema."""
+    return [table.c[name] for name in schema.model_fields if name in table.c and name not in exclude]
+
+
+def row_dicts(result) -> List[dict]:
+    # Labels of subquery columns are str subclasses, which orjson won't take as keys
+    keys = [str(key) for key in result.keys()]
+    return [dict(zip(keys, row)) for row in result]
+
+
+def chunks(values: Sequence, size: int = IN_CHUNK_SIZE) -> Iterable[Sequence]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def group_children(db, columns: list, foreign_key, parents: List[dict], key: str, order_by=None) -> Dict:
+    """
+    Load children of the given parent rows with one query per IN chunk and
+    attach them as lists under `key`; returns the lists by parent id.
+    """
+    children: Dict = {}
+    for parent in parents:
+        parent[key] = children.setdefault(parent["id"], [])
+    ids = list(children)
+    for chunk in chunks(ids):
+        query = select(*columns).where(foreign_key.in_(chunk))
+        if order_by is not None:
+            query = query.order_by(order_by)
+        for child in row_dicts(db.execute(query)):
+            children[child[foreign_key.key]].append(child)
+    return children
@@ -0,0 +1,404 @@
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import BinaryIO, Callable, Dict, Iterable, Optional
+
+from sqlalchemy import insert, literal, select, union_all
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from .. import models
+
+logger = logging.getLogger(__name__)
+
+# Worker pool configuration; set JOB_WORKERS=0 when jobs run in a separate `python -m app.worker` process
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "600"))
+# How often a running job's heartbeat is written, whether or not its handler reports progress
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", str(JOB_STALE_SECONDS / 4)))
+# Uploads and exports live here; it must be shared with any separate worker process
+JOB_SPOOL_DIR = os.getenv("JOB_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "workout-tracker-jobs"))
+
+PROGRESS_INTERVAL = 0.5  # Seconds between progress writes
+
+# Registered handlers: kind -> (function, can be submitted through POST /jobs)
+_handlers: Dict[str, tuple] = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler for failures that retrying won't fix."""
+
+
+class JobCancelled(Exception):
+    """Raised by JobContext.check_cancelled() to stop a job that was cancelled while running."""
+
+
+def job_handler(kind: str, submittable: bool = False):
+    """Register a function as the handler for a job kind."""
+    def decorator(func: Callable):
+        _handlers[kind] = (func, submittable)
+        return func
+    return decorator
+
+
+def is_submittable(kind: str) -> bool:
+    return kind in _handlers and _handlers[kind][1]
+
+
+def spool_path(name: str) -> str:
+    os.makedirs(JOB_SPOOL_DIR, exist_ok=True)
+    return os.path.join(JOB_SPOOL_DIR, name)
+
+
+def save_upload(stream: BinaryIO, suffix: str, max_bytes: int) -> str:
+    """Copy an upload into the spool directory so a worker can read it later."""
+    path = spool_path(f"upload-{uuid.uuid4().hex}{suffix}")
+    written = 0
+    try:
+        with open(path, "wb") as out:
+            while True:
+                chunk = stream.read(64 * 1024)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise PermanentJobError(f"Upload exceeds the {max_bytes} byte limit")
+                out.write(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+class JobContext:
+    """Handed to job handlers for reporting progress and checking cancellation."""
+
+    def __init__(self, job: models.Job, session_factory: Callable[[], Session]):
+        self.job_id = job.id
+        self.worker_id = job.locked_by
+        self.user_id = job.user_id
+        self.attempt = job.attempts
+        self.max_attempts = job.max_attempts
+        self.payload = json.loads(job.payload) if job.payload else {}
+        self._session_factory = session_factory
+        self._last_report = 0.0
+        self._last_check = 0.0
+
+    def report(self, progress: float, message: Optional[str] = None, force: bool = False) -> None:
+        """Record progress (0.0 - 1.0); writes are throttled unless forced."""
+        now = time.monotonic()
+        if not force and now - self._last_report < PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        db = self._session_factory()
+        try:
+            _owned(db, self.job_id, self.worker_id).update({
+                models.Job.progress: max(0.0, min(progress, 1.0)),
+                models.Job.progress_message: message,
+                models.Job.heartbeat_at: datetime.utcnow()
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    @property
+    def is_final_attempt(self) -> bool:
+        return self.attempt >= self.max_attempts
+
+    def is_cancelled(self) -> bool:
+        db = self._session_factory()
+        try:
+            status = db.query(models.Job.status).filter(models.Job.id == self.job_id).scalar()
+            return status == "cancelled"
+        finally:
+            db.close()
+
+    def check_cancelled(self) -> None:
+        """
+        Raise JobCancelled if the job was cancelled; call it inside a
+        handler's loop. Checks are throttled like progress writes.
+        """
+        now = time.monotonic()
+        if now - self._last_check < PROGRESS_INTERVAL:
+            return
+        self._last_check = now
+        if self.is_cancelled():
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: Optional[dict] = None,
+    user_id: Optional[int] = None,
+    priority: int = 0,
+    max_attempts: int = 3
+) -> models.Job:
+    """Queue a job for the worker pool and return it."""
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = models.Job(
+        kind=kind,
+        user_id=user_id,
+        priority=priority,
+        payload=json.dumps(payload or {}),
+        max_attempts=max_attempts,
+        status="queued",
+        run_after=datetime.utcnow()
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+# Columns of job_row(), in order
+_JOB_ROW_COLUMNS = ["kind", "status", "priority", "payload", "progress", "attempts", "max_attempts", "run_after", "created_at"]
+
+
+def job_row(kind: str, payload: Optional[dict] = None, priority: int = 0, max_attempts: int = 3):
+    """
+    A SELECT of one queued job's columns, for queue_job_rows(). Give it a
+    WHERE to queue the job only if the condition holds when it runs.
+    """
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+    now = datetime.utcnow()
+    values = [kind, "queued", priority, json.dumps(payload or {}), 0.0, 0, max_attempts, now, now]
+    table = models.Job.__table__
+    return select(*(literal(value, table.c[name].type).label(name) for name, value in zip(_JOB_ROW_COLUMNS, values)))
+
+
+def queue_job_rows(conn: Connection, rows: Iterable) -> None:
+    """
+    Queue jobs from job_row() SELECTs with one INSERT ... SELECT on the
+    caller's connection, inside its transaction: for hooks and cascades
+    that mustn't commit, or run a query per job.
+    """
+    rows = [row for row in rows if row is not None]
+    if rows:
+        query = rows[0] if len(rows) == 1 else union_all(*rows)
+        conn.execute(insert(models.Job.__table__).from_select(_JOB_ROW_COLUMNS, query))
+
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[models.Job]:
+    """Atomically mark the highest-priority runnable job as running."""
+    now = datetime.utcnow()
+    candidates = db.query(models.Job.id).filter(
+        models.Job.status == "queued",
+        models.Job.run_after <= now
+    ).order_by(models.Job.priority.desc(), models.Job.id).limit(5).all()
+
+    for (job_id,) in candidates:
+        # Optimistic claim: only one worker can flip the row out of 'queued'
+        claimed = db.query(models.Job).filter(
+            models.Job.id == job_id,
+            models.Job.status == "queued"
+        ).update({
+            models.Job.status: "running",
+            models.Job.locked_by: worker_id,
+            models.Job.started_at: now,
+            models.Job.heartbeat_at: now,
+            models.Job.attempts: models.Job.attempts + 1
+        }, synchronize_session=False)
+        db.commit()
+        if claimed:
+            return db.query(models.Job).filter(models.Job.id == job_id).first()
+    return None
+
+
+def _owned(db: Session, job_id: int, worker_id: Optional[str]):
+    """
+    The job's row while this worker's claim on it holds: once a stale job
+    is requeued and claimed again, the superseded run can't write to it.
+    """
+    return db.query(models.Job).filter(
+        models.Job.id == job_id,
+        models.Job.status == "running",
+        models.Job.locked_by == worker_id
+    )
+
+
+def _finish(db: Session, job: models.Job, **fields) -> None:
+    fields["finished_at"] = datetime.utcnow()
+    fields["locked_by"] = None
+    _owned(db, job.id, job.locked_by).update(
+        {getattr(models.Job, key): value for key, value in fields.items()}, synchronize_session=False
+    )
+    db.commit()
+
+
+class _Heartbeat:
+    """Writes a running job's heartbeat from a background thread, so handlers that never report aren't requeued."""
+
+    def __init__(self, job: models.Job, session_factory: Callable[[], Session]):
+        self.job_id = job.id
+        self.worker_id = job.locked_by
+        self.session_factory = session_factory
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"job-heartbeat-{job.id}", daemon=True)
+
+    def __enter__(self) -> "_Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(JOB_HEARTBEAT_SECONDS):
+            db = self.session_factory()
+            try:
+                _owned(db, self.job_id, self.worker_id).update(
+                    {models.Job.heartbeat_at: datetime.utcnow()}, synchronize_session=False
+                )
+                db.commit()
+            except Exception as e:
+                logger.warning(f"Job {self.job_id} heartbeat failed: {str(e)}")
+            finally:
+                db.close()
+
+
+def run_job(job: models.Job, session_factory: Callable[[], Session] = SessionLocal) -> None:
+    """Run a claimed job and record its outcome, scheduling a retry on transient failure."""
+    func, _ = _handlers.get(job.kind, (None, False))
+    db = session_factory()
+    try:
+        if func is None:
+            _finish(db, job, status="failed", error=f"Unknown job kind: {job.kind}")
+            return
+
+        context = JobContext(job, session_factory)
+        try:
+            with _Heartbeat(job, session_factory):
+                result = func(db, context)
+        except JobCancelled:
+            # Its work is rolled back; the row already says cancelled
+            db.rollback()
+            logger.info(f"Job {job.id} ({job.kind}) stopped after being cancelled")
+            return
+        except Exception as e:
+            db.rollback()
+            permanent = isinstance(e, (PermanentJobError, ValueError))
+            if permanent or job.attempts >= job.max_attempts:
+                logger.error(f"Job {job.id} ({job.kind}) failed: {str(e)}")
+                _finish(db, job, status="failed", error=str(e))
+            else:
+                delay = JOB_RETRY_BASE_SECONDS * (2 ** (job.attempts - 1))
+                logger.warning(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed, retrying in {delay}s: {str(e)}")
+                _owned(db, job.id, job.locked_by).update({
+                    models.Job.status: "queued",
+                    models.Job.error: str(e),
+                    models.Job.locked_by: None,
+                    models.Job.run_after: datetime.utcnow() + timedelta(seconds=delay)
+                }, synchronize_session=False)
+                db.commit()
+            return
+
+        _finish(
+            db, job,
+            status="succeeded",
+            progress=1.0,
+            error=None,
+            result=json.dumps(result) if result is not None else None
+        )
+    finally:
+        db.close()
+
+
+def run_next_job(session_factory: Callable[[], Session] = SessionLocal, worker_id: Optional[str] = None) -> Optional[int]:
+    """Claim and run one job; returns its id, or None if nothing was runnable."""
+    db = session_factory()
+    try:
+        job = claim_next_job(db, worker_id or f"{socket.gethostname()}:{os.getpid()}")
+        if job is None:
+            return None
+        db.expunge(job)
+    finally:
+        db.close()
+    run_job(job, session_factory)
+    return job.id
+
+
+def requeue_stale_jobs(db: Session, timeout_seconds: int = JOB_STALE_SECONDS) -> int:
+    """Put running jobs whose worker stopped heart-beating back in the queue."""
+    cutoff = datetime.utcnow() - timedelta(seconds=timeout_seconds)
+    stale = db.query(models.Job).filter(
+        models.Job.status == "running",
+        models.Job.heartbeat_at < cutoff
+    ).all()
+    for job in stale:
+        if job.attempts >= job.max_attempts:
+            job.status = "failed"
+            job.error = "Worker stopped responding"
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = "queued"
+            job.run_after = datetime.utcnow()
+        job.locked_by = None
+    db.commit()
+    return len(stale)
+
+
+class JobRunner:
+    """A pool of worker threads polling the jobs table."""
+
+    def __init__(self, workers: int = JOB_WORKERS, poll_interval: float = JOB_POLL_INTERVAL,
+                 session_factory: Callable[[], Session] = SessionLocal):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.session_factory = session_factory
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _loop(self, index: int) -> None:
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+        last_sweep = 0.0
+        while not self._stop.is_set():
+            try:
+                if index == 0 and time.monotonic() - last_sweep > JOB_STALE_SECONDS / 2:
+                    last_sweep = time.monotonic()
+                    db = self.session_factory()
+                    try:
+                        requeue_stale_jobs(db)
+                    finally:
+                        db.close()
+                if run_next_job(self.session_factory, worker_id) is None:
+                    self._stop.wait(self.poll_interval)
+            except Exception as e:
+                logger.error(f"Job worker {worker_id} error: {str(e)}")
+                self._stop.wait(self.poll_interval)
+
+    def start(self) -> None:
+        if self._threads or self.workers <= 0:
+            return
+        self._stop.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._loop, args=(index,), name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.workers} job worker(s)")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+
+def remove_file(path: Optional[str]) -> None:
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+job_runner = JobRunner()
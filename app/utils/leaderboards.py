@@ -0,0 +1,491 @@
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import date, datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, case, delete, event, exists, func, insert, inspect, or_, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import upsert
+from .archive import entry_history, session_history
+from .jobs import JobContext, job_handler, job_row, queue_job_rows
+
+# Seconds a ranking is served from memory before it is reloaded from
+# leaderboard_scores, which is how one worker sees another worker's writes
+LEADERBOARD_REFRESH_SECONDS = float(os.getenv("LEADERBOARD_REFRESH_SECONDS", "60"))
+
+_SCORES = models.LeaderboardScore.__table__
+_SESSIONS = models.WorkoutSession.__table__
+_ENTRIES = models.WorkoutEntry.__table__
+_PROGRAMS = models.WorkoutProgram.__table__
+_PROGRESS = models.UserProgramProgress.__table__
+
+REFRESH_JOB = "leaderboard_refresh"
+SQUAT = "squat"
+
+# (program_id, board, period, user_id)
+Key = Tuple[int, str, str, int]
+
+
+class Board(NamedTuple):
+    name: str
+    descending: bool  # Higher scores rank first
+    cumulative: bool  # New results add to a score rather than replace a worse one
+    monthly: bool  # A fresh board each calendar month
+
+
+BOARDS = {board.name: board for board in (
+    Board("squat_e1rm", descending=True, cumulative=False, monthly=False),
+    Board("monthly_volume", descending=True, cumulative=True, monthly=True),
+    Board("completion_time", descending=False, cumulative=False, monthly=False),
+)}
+
+
+def period(board: Board, day: Optional[date] = None) -> str:
+    if not board.monthly:
+        return ""
+    return f"{day or datetime.utcnow().date():%Y-%m}"
+
+
+def _e1rm(weight: float, reps: int) -> float:
+    # Epley, as strength.estimated_1rm; a single is its own max
+    return weight if reps == 1 else weight * (1 + reps / 30.0)
+
+
+def _days(started_at: datetime, completed_at: datetime) -> float:
+    return (completed_at - started_at).total_seconds() / 86400
+
+
+class Ranking:
+    """
+    One board's scores, kept in a list sorted best-first: the top N is a
+    slice and a member's rank a binary search. Tied scores share a rank.
+    """
+
+    def __init__(self, descending: bool = True, scores: Iterable[Tuple[int, float]] = ()):
+        self.descending = descending
+        self.scores: Dict[int, float] = dict(scores)
+        self._order = sorted(self._key(score, user_id) for user_id, score in self.scores.items())
+        self.loaded_at = time.monotonic()
+
+    def _key(self, score: float, user_id: int) -> Tuple[float, int]:
+        return (-score if self.descending else score, user_id)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def set(self, user_id: int, score: float) -> None:
+        self.discard(user_id)
+        self.scores[user_id] = score
+        insort(self._order, self._key(score, user_id))
+
+    def discard(self, user_id: int) -> None:
+        score = self.scores.pop(user_id, None)
+        if score is not None:
+            del self._order[bisect_left(self._order, self._key(score, user_id))]
+
+    def rank(self, user_id: int) -> Optional[int]:
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        # A one-item tuple sorts before every member with the same score
+        return bisect_left(self._order, (self._key(score, user_id)[0],)) + 1
+
+    def top(self, n: int) -> List[Tuple[int, int, float]]:
+        """(rank, user_id, score) for the best n."""
+        leaders = []
+        for index, (key, user_id) in enumerate(self._order[:n]):
+            tied = index > 0 and key == self._order[index - 1][0]
+            leaders.append((leaders[-1][0] if tied else index + 1, user_id, self.scores[user_id]))
+        return leaders
+
+
+class Leaderboards:
+    """
+    Rankings for the boards being read, loaded from leaderboard_scores on
+    first read and again once older than max_age seconds. In between, every
+    change this process commits is applied to them as it commits.
+    """
+
+    def __init__(self, max_age: float = LEADERBOARD_REFRESH_SECONDS):
+        self.max_age = max_age
+        self._rankings: Dict[Tuple[int, str, str], Ranking] = {}
+        self._lock = threading.Lock()
+
+    def _ranking(self, db: Session, program_id: int, board: Board, board_period: str) -> Ranking:
+        key = (program_id, board.name, board_period)
+        with self._lock:
+            ranking = self._rankings.get(key)
+        if ranking is not None and time.monotonic() - ranking.loaded_at <= self.max_age:
+            return ranking
+        rows = db.execute(
+            select(_SCORES.c.user_id, _SCORES.c.score).where(*_match((program_id, board.name, board_period)))
+        ).all()
+        ranking = Ranking(board.descending, rows)
+        with self._lock:
+            self._rankings[key] = ranking
+        return ranking
+
+    def standings(self, db: Session, program_id: int, board: Board, user_id: int,
+                  limit: int = 10, board_period: Optional[str] = None) -> dict:
+        """The leaders of a board and where a member stands on it."""
+        board_period = period(board) if board_period is None else board_period
+        ranking = self._ranking(db, program_id, board, board_period)
+        with self._lock:
+            leaders = ranking.top(limit)
+            rank, score = ranking.rank(user_id), ranking.scores.get(user_id)
+            participants = len(ranking)
+        return {
+            "program_id": program_id,
+            "board": board.name,
+            "period": board_period or None,
+            "participants": participants,
+            "leaders": [{"rank": rank, "user_id": leader, "score": round(score, 2)}
+                        for rank, leader, score in leaders],
+            "you": {"rank": rank, "score": round(score, 2)} if rank is not None else None,
+        }
+
+    def apply(self, scores: Dict[Key, Optional[float]], programs: Iterable[int] = ()) -> None:
+        """Apply committed changes to the rankings in memory; None removes a score."""
+        programs = set(programs)
+        with self._lock:
+            for key in [key for key in self._rankings if key[0] in programs]:
+                del self._rankings[key]
+            for (program_id, board, board_period, user_id), score in scores.items():
+                ranking = self._rankings.get((program_id, board, board_period))
+                if ranking is None:
+                    continue
+                if score is None:
+                    ranking.discard(user_id)
+                else:
+                    ranking.set(user_id, score)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rankings.clear()
+
+
+leaderboards = Leaderboards()
+
+
+def _match(key) -> tuple:
+    columns = (_SCORES.c.program_id, _SCORES.c.board, _SCORES.c.period, _SCORES.c.user_id)
+    return tuple(column == value for column, value in zip(columns, key))
+
+
+def _participants(user_ids=None, program_ids=None):
+    """Members on each public program's boards, and when they first started the program."""
+    query = select(
+        _PROGRESS.c.program_id, _PROGRESS.c.user_id, func.min(_PROGRESS.c.started_at).label("since")
+    ).join(
+        _PROGRAMS, _PROGRAMS.c.id == _PROGRESS.c.program_id
+    ).where(_PROGRAMS.c.is_public.is_(True)).group_by(_PROGRESS.c.program_id, _PROGRESS.c.user_id)
+    if user_ids is not None:
+        query = query.where(_PROGRESS.c.user_id.in_(user_ids))
+    if program_ids is not None:
+        query = query.where(_PROGRESS.c.program_id.in_(program_ids))
+    return query.subquery()
+
+
+def _month(day: date) -> Tuple[datetime, datetime]:
+    start = datetime(day.year, day.month, 1)
+    return start, datetime(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def compute_scores(conn: Connection, user_ids=None, program_ids=None, today: Optional[date] = None) -> Dict[Key, float]:
+    """
+    Every score from scratch, optionally for some members or programs only:
+    best squat e1RM and this month's volume from sessions logged since the
+    member first started the program, and the shortest time taken to
+    complete it. This is the full GROUP BY the stored scores save reads from.
+    """
+    today = today or datetime.utcnow().date()
+    participants = _participants(user_ids, program_ids)
+    scores: Dict[Key, float] = {}
+
+    reps, weight = entry_history.c.reps, entry_history.c.weight
+    e1rm = case((reps == 1, weight), else_=weight * (1 + reps / 30.0))
+    rows = conn.execute(
+        select(participants.c.program_id, participants.c.user_id, func.max(e1rm)).select_from(participants)
+        .join(session_history, and_(session_history.c.user_id == participants.c.user_id,
+                                    session_history.c.date >= participants.c.since))
+        .join(entry_history, entry_history.c.session_id == session_history.c.id)
+        .where(func.lower(func.trim(entry_history.c.exercise_name)) == SQUAT,
+               weight > 0, reps > 0, entry_history.c.sets > 0)
+        .group_by(participants.c.program_id, participants.c.user_id)
+    ).all()
+    for program_id, user_id, best in rows:
+        scores[(program_id, "squat_e1rm", "", user_id)] = float(best)
+
+    # A month is never archived, so volume comes from the hot tables
+    start, end = _month(today)
+    volume = func.sum(_ENTRIES.c.sets * _ENTRIES.c.reps * func.coalesce(_ENTRIES.c.weight, 0))
+    rows = conn.execute(
+        select(participants.c.program_id, participants.c.user_id, volume).select_from(participants)
+        .join(_SESSIONS, and_(_SESSIONS.c.user_id == participants.c.user_id,
+                              _SESSIONS.c.date >= participants.c.since))
+        .join(_ENTRIES, _ENTRIES.c.session_id == _SESSIONS.c.id)
+        .where(_SESSIONS.c.date >= start, _SESSIONS.c.date < end)
+        .group_by(participants.c.program_id, participants.c.user_id)
+        .having(volume > 0)
+    ).all()
+    month = period(BOARDS["monthly_volume"], today)
+    for program_id, user_id, total in rows:
+        scores[(program_id, "monthly_volume", month, user_id)] = float(total)
+
+    query = select(_PROGRESS.c.program_id, _PROGRESS.c.user_id, _PROGRESS.c.started_at, _PROGRESS.c.completed_at).join(
+        _PROGRAMS, _PROGRAMS.c.id == _PROGRESS.c.program_id
+    ).where(_PROGRAMS.c.is_public.is_(True), _PROGRESS.c.completed_at.isnot(None), _PROGRESS.c.started_at.isnot(None))
+    if user_ids is not None:
+        query = query.where(_PROGRESS.c.user_id.in_(user_ids))
+    if program_ids is not None:
+        query = query.where(_PROGRESS.c.program_id.in_(program_ids))
+    for program_id, user_id, started_at, completed_at in conn.execute(query):
+        key = (program_id, "completion_time", "", user_id)
+        scores[key] = min(scores.get(key, float("inf")), _days(started_at, completed_at))
+    return scores
+
+
+def _stored(conn: Connection, user_ids=None, program_ids=None, today: Optional[date] = None) -> Dict[Key, float]:
+    # Earlier months' boards are final and never recomputed
+    query = select(_SCORES.c.program_id, _SCORES.c.board, _SCORES.c.period, _SCORES.c.user_id, _SCORES.c.score).where(
+        _SCORES.c.period.in_(("", period(BOARDS["monthly_volume"], today)))
+    )
+    if user_ids is not None:
+        query = query.where(_SCORES.c.user_id.in_(user_ids))
+    if program_ids is not None:
+        query = query.where(_SCORES.c.program_id.in_(program_ids))
+    return {tuple(row[:4]): row[4] for row in conn.execute(query)}
+
+
+def _diff(stored: Dict[Key, float], computed: Dict[Key, float]) -> Dict[Key, Optional[float]]:
+    changes: Dict[Key, Optional[float]] = {key: None for key in stored.keys() - computed.keys()}
+    for key, score in computed.items():
+        if key not in stored or abs(stored[key] - score) > 1e-6:
+            changes[key] = score
+    return changes
+
+
+def _record(db: Session, scores: Dict[Key, Optional[float]] = None, programs: Iterable[int] = ()) -> None:
+    changes = db.info.setdefault("leaderboards", {"scores": {}, "programs": set()})
+    changes["scores"].update(scores or {})
+    changes["programs"].update(programs)
+
+
+def _write(db: Session, changes: Dict[Key, Optional[float]], stored: Dict[Key, float]) -> None:
+    conn = db.connection()
+    now = datetime.utcnow()
+    inserts = []
+    for key, score in changes.items():
+        if score is None:
+            conn.execute(delete(_SCORES).where(*_match(key)))
+        elif key in stored:
+            conn.execute(update(_SCORES).where(*_match(key)).values(score=score, updated_at=now))
+        else:
+            inserts.append({"program_id": key[0], "board": key[1], "period": key[2], "user_id": key[3],
+                            "score": score, "updated_at": now})
+    if inserts:
+        conn.execute(insert(_SCORES), inserts)
+    _record(db, changes)
+
+
+def refresh(db: Session, user_ids=None, program_ids=None, today: Optional[date] = None) -> Dict[Key, Optional[float]]:
+    """Recompute scores, all of them or some members' or programs', and store any that changed."""
+    conn = db.connection()
+    stored = _stored(conn, user_ids, program_ids, today)
+    changes = _diff(stored, compute_scores(conn, user_ids, program_ids, today))
+    _write(db, changes, stored)
+    return changes
+
+
+def check(db: Session, today: Optional[date] = None) -> Dict[Key, Optional[float]]:
+    """Scores whose stored value differs from a recompute, with the recomputed value (None: shouldn't exist)."""
+    conn = db.connection()
+    return _diff(_stored(conn, today=today), compute_scores(conn, today=today))
+
+
+def fold(db: Session, results: Dict[Key, float]) -> None:
+    """
+    Fold new results into stored scores: added to a cumulative board's
+    score, kept on other boards if better. Results are upserted with one
+    INSERT ... ON CONFLICT DO UPDATE per kind of board, doing the comparison
+    in the database, so concurrent writers can't lose each other's results
+    or collide inserting a member's first score.
+    """
+    conn = db.connection()
+    now = datetime.utcnow()
+    column = _SCORES.c.score
+    rows: Dict[Tuple[bool, bool], List[dict]] = {}
+    for key, value in sorted(results.items()):
+        board = BOARDS[key[1]]
+        rows.setdefault((board.cumulative, board.descending), []).append(
+            {"program_id": key[0], "board": key[1], "period": key[2], "user_id": key[3], "score": value, "updated_at": now})
+    for (cumulative, descending), values in rows.items():
+        statement = upsert(conn, _SCORES).values(values)
+        value = statement.excluded.score
+        if cumulative:
+            score = column + value
+        elif descending:
+            score = case((column < value, value), else_=column)
+        else:
+            score = case((column > value, value), else_=column)
+        conn.execute(statement.on_conflict_do_update(
+            index_elements=["program_id", "board", "period", "user_id"],
+            set_={"score": score, "updated_at": statement.excluded.updated_at}
+        ))
+    # Read back what was stored, which may include other transactions' results
+    rows = conn.execute(
+        select(_SCORES.c.program_id, _SCORES.c.board, _SCORES.c.period, _SCORES.c.user_id, _SCORES.c.score)
+        .where(or_(*(and_(*_match(key)) for key in results)))
+    )
+    _record(db, {tuple(row[:4]): row[4] for row in rows})
+
+
+def refresh_job(user_ids: Iterable[Optional[int]] = (), program_ids: Iterable[int] = ()):
+    """
+    A job row recomputing some members' or programs' scores, for edits and
+    deletes: they can lower a best, which only a recompute finds. A job for
+    members is only queued if one of them is on a public program's boards.
+    """
+    users = sorted({user_id for user_id in user_ids if user_id is not None})
+    programs = sorted(set(program_ids))
+    if not users and not programs:
+        return None
+    row = job_row(REFRESH_JOB, {"users": users, "programs": programs})
+    if programs:
+        return row
+    return row.where(exists().where(_PROGRESS.c.program_id == _PROGRAMS.c.id, _PROGRAMS.c.is_public.is_(True),
+                                    _PROGRESS.c.user_id.in_(users)))
+
+
+def delete_program_scores(db: Session, program_ids: Iterable[int]) -> None:
+    ids = list(program_ids)
+    db.connection().execute(delete(_SCORES).where(_SCORES.c.program_id.in_(ids)))
+    _record(db, programs=ids)
+
+
+@job_handler(REFRESH_JOB)
+def run_refresh(db: Session, context: JobContext) -> dict:
+    changed = 0
+    if context.payload.get("users"):
+        changed += len(refresh(db, user_ids=context.payload["users"]))
+    if context.payload.get("programs"):
+        changed += len(refresh(db, program_ids=context.payload["programs"]))
+    db.commit()
+    return {"changed": changed}
+
+
+def _entry_results(conn: Connection, entries: List[models.WorkoutEntry]) -> Dict[Key, float]:
+    """New entries' results on the boards of every public program their member is following."""
+    session_ids = {entry.session_id for entry in entries}
+    participants = _participants(select(_SESSIONS.c.user_id).where(_SESSIONS.c.id.in_(session_ids)))
+    rows = conn.execute(
+        select(_SESSIONS.c.id, _SESSIONS.c.user_id, _SESSIONS.c.date, participants.c.program_id)
+        .join(participants, and_(participants.c.user_id == _SESSIONS.c.user_id,
+                                 participants.c.since <= _SESSIONS.c.date))
+        .where(_SESSIONS.c.id.in_(session_ids))
+    ).all()
+    if not rows:
+        return {}
+    programs: Dict[int, list] = {}
+    for session_id, user_id, day, program_id in rows:
+        programs.setdefault(session_id, []).append((program_id, user_id, day))
+
+    results: Dict[Key, float] = {}
+    volume_board = BOARDS["monthly_volume"]
+    for entry in entries:
+        reps, sets, weight = entry.reps or 0, entry.sets or 0, entry.weight or 0
+        squat = entry.exercise_name.strip().lower() == SQUAT and reps > 0 and sets > 0 and weight > 0
+        for program_id, user_id, day in programs.get(entry.session_id, ()):
+            if squat:
+                key = (program_id, "squat_e1rm", "", user_id)
+                results[key] = max(results.get(key, 0.0), _e1rm(weight, reps))
+            if sets * reps * weight > 0:
+                key = (program_id, volume_board.name, period(volume_board, day), user_id)
+                results[key] = results.get(key, 0.0) + sets * reps * weight
+    return results
+
+
+def _completion_results(conn: Connection, progress: List[models.UserProgramProgress]) -> Dict[Key, float]:
+    public = set(conn.execute(
+        select(_PROGRAMS.c.id).where(_PROGRAMS.c.id.in_({p.program_id for p in progress}),
+                                     _PROGRAMS.c.is_public.is_(True))
+    ).scalars())
+    results: Dict[Key, float] = {}
+    for p in progress:
+        if p.program_id in public and p.started_at is not None:
+            key = (p.program_id, "completion_time", "", p.user_id)
+            results[key] = min(results.get(key, float("inf")), _days(p.started_at, p.completed_at))
+    return results
+
+
+def _changed(obj, *attributes) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+
+_ENTRY_FIELDS = ("session_id", "exercise_name", "sets", "reps", "weight")
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flush(session, flush_context):
+    """
+    Fold new entries and completed programs into the scores, in the same
+    transaction, and queue a recompute for anything edited or deleted.
+    Starting a program needs neither: nothing is logged since it started.
+    """
+    entries, completed, sessions, users, programs = [], [], set(), set(), set()
+    for obj in session.new:
+        if isinstance(obj, models.WorkoutEntry):
+            entries.append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, models.WorkoutEntry) and _changed(obj, *_ENTRY_FIELDS):
+            sessions.update(inspect(obj).attrs.session_id.history.sum())
+        elif isinstance(obj, models.WorkoutSession) and _changed(obj, "date", "user_id"):
+            users.update(inspect(obj).attrs.user_id.history.sum())
+        elif isinstance(obj, models.UserProgramProgress):
+            if _changed(obj, "user_id", "program_id", "started_at") or (
+                    _changed(obj, "completed_at") and obj.completed_at is None):
+                users.update(inspect(obj).attrs.user_id.history.sum())
+            elif _changed(obj, "completed_at"):
+                completed.append(obj)
+        elif isinstance(obj, models.WorkoutProgram) and _changed(obj, "is_public"):
+            programs.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, models.WorkoutEntry):
+            sessions.add(obj.session_id)
+        elif isinstance(obj, (models.WorkoutSession, models.UserProgramProgress)):
+            users.add(obj.user_id)
+        elif isinstance(obj, models.WorkoutProgram):
+            programs.add(obj.id)
+    if not (entries or completed or sessions or users or programs):
+        return
+
+    connection = session.connection()
+    sessions.discard(None)
+    if sessions:
+        users.update(connection.execute(select(_SESSIONS.c.user_id).where(_SESSIONS.c.id.in_(sessions))).scalars())
+    queue_job_rows(connection, [refresh_job(users, programs)])
+    results = {}
+    if entries:
+        results.update(_entry_results(connection, entries))
+    if completed:
+        results.update(_completion_results(connection, completed))
+    if results:
+        fold(session, results)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_on_commit(session):
+    changes = session.info.pop("leaderboards", None)
+    if changes:
+        leaderboards.apply(changes["scores"], changes["programs"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("leaderboards", None)
@@ -0,0 +1,242 @@
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Latency bucket upper bounds in seconds; +Inf is implicit
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# With several uvicorn workers, each one writes its counters here so any of
+# them can answer /metrics for all; leave unset for a single process. Clear the
+# directory on deploy, as counters of exited workers are kept.
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+SeriesKey = Tuple[str, str, str]  # (method, route, status)
+
+
+class RequestMetrics:
+    """
+    Per-process request counters.
+
+    Every update happens on the event loop thread, so the counters are plain
+    lists and ints with no locking. Each series keeps one slot per bucket plus
+    +Inf, then the sum of durations; buckets are made cumulative on export.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.series: Dict[SeriesKey, List[float]] = {}
+        self.in_flight = 0
+        self._last_flush = 0.0
+
+    def observe(self, method: str, route: str, status: int, seconds: float) -> None:
+        key = (method, route, str(status))
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, seconds)] += 1
+        series[-1] += seconds
+
+    def snapshot(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "in_flight": self.in_flight,
+            "pool": pool_stats(),
+            "series": [[*key, values] for key, values in self.series.items()]
+        }
+
+    def maybe_flush(self, now: float) -> None:
+        """Write this worker's counters to METRICS_DIR at most every METRICS_FLUSH_SECONDS."""
+        if METRICS_DIR and now - self._last_flush >= METRICS_FLUSH_SECONDS:
+            self._last_flush = now
+            self.flush()
+
+    def flush(self) -> None:
+        if not METRICS_DIR:
+            return
+        try:
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            path = os.path.join(METRICS_DIR, f"worker-{os.getpid()}.json")
+            tmp = f"{path}.tmp"
+            with open(tmp, "w") as out:
+                json.dump(self.snapshot(), out)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics snapshot: {str(e)}")
+
+
+request_metrics = RequestMetrics()
+
+
+def pool_stats() -> Dict[str, int]:
+    """Connection pool gauges for the app's engine (empty for pools without them)."""
+    from ..database import engine
+
+    pool = engine.pool
+    stats = {}
+    for name in ("size", "checkedout", "checkedin", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            try:
+                stats[name] = int(method())
+            except Exception:
+                continue
+    return stats
+
+
+def route_templates(app) -> Dict[int, str]:
+    """Map each route object to its full path template, router prefixes included."""
+    try:
+        from fastapi.routing import iter_route_contexts
+    except ImportError:
+        # Older FastAPI copies included routes, so their path is already complete
+        return {}
+    return {id(context.original_route): context.path for context in iter_route_contexts(app.routes)}
+
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request and records it under its route template.
+
+    A plain ASGI middleware rather than BaseHTTPMiddleware, so the only cost
+    per request is two clock reads, one dict lookup and a bisect.
+    """
+
+    def __init__(self, app, metrics: RequestMetrics = request_metrics):
+        self.app = app
+        self.metrics = metrics
+        self._templates: Optional[Dict[int, str]] = None
+
+    def route_template(self, scope) -> str:
+        route = scope.get("route")
+        if route is None:
+            return UNMATCHED_ROUTE
+        if self._templates is None:
+            self._templates = route_templates(scope["app"])
+        template = self._templates.get(id(route))
+        if template is None:
+            template = self._templates[id(route)] = getattr(route, "path", UNMATCHED_ROUTE)
+        return template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        status = 500
+        start = time.perf_counter()
+        metrics.in_flight += 1
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end = time.perf_counter()
+            metrics.in_flight -= 1
+            metrics.observe(scope["method"], self.route_template(scope), status, end - start)
+            metrics.maybe_flush(end)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect(metrics: RequestMetrics = request_metrics) -> List[dict]:
+    """Snapshots for every worker: this one live, the others from METRICS_DIR."""
+    snapshots = [metrics.snapshot()]
+    if not METRICS_DIR or not os.path.isdir(METRICS_DIR):
+        return snapshots
+    for name in os.listdir(METRICS_DIR):
+        if not (name.startswith("worker-") and name.endswith(".json")):
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if snapshot.get("pid") == os.getpid():
+            continue
+        # Counters of exited workers still count; their gauges don't
+        if not _pid_alive(snapshot.get("pid", 0)):
+            snapshot["exited"] = True
+            snapshot["in_flight"] = 0
+            snapshot["pool"] = {}
+        snapshots.append(snapshot)
+    return snapshots
+
+
+def _labels(**labels) -> str:
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{key}="{escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(snapshots: List[dict], buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> str:
+    """Merge worker snapshots and format them in the Prometheus text exposition format."""
+    merged: Dict[SeriesKey, List[float]] = {}
+    in_flight = 0
+    pool: Dict[str, int] = {}
+    for snapshot in snapshots:
+        in_flight += snapshot.get("in_flight", 0)
+        for name, value in snapshot.get("pool", {}).items():
+            pool[name] = pool.get(name, 0) + value
+        for method, route, status, values in snapshot.get("series", []):
+            key = (method, route, status)
+            if key not in merged:
+                merged[key] = list(values)
+            else:
+                merged[key] = [a + b for a, b in zip(merged[key], values)]
+
+    lines = [
+        "# HELP http_request_duration_seconds HTTP request latency by route, method and status.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    bounds = [repr(float(bound)) for bound in buckets] + ["+Inf"]
+    for (method, route, status), values in sorted(merged.items()):
+        total = 0
+        for bound, count in zip(bounds, values[:-1]):
+            total += count
+            labels = _labels(method=method, route=route, status=status, le=bound)
+            lines.append(f"http_request_duration_seconds_bucket{labels} {int(total)}")
+        labels = _labels(method=method, route=route, status=status)
+        lines.append(f"http_request_duration_seconds_sum{labels} {_number(values[-1])}")
+        lines.append(f"http_request_duration_seconds_count{labels} {int(total)}")
+
+    lines += [
+        "# HELP http_requests_in_flight HTTP requests currently being served.",
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {in_flight}",
+        "# HELP app_workers Worker processes reporting metrics.",
+        "# TYPE app_workers gauge",
+        f"app_workers {sum(1 for snapshot in snapshots if not snapshot.get('exited'))}",
+    ]
+    for name, value in sorted(pool.items()):
+        lines += [
+            f"# HELP db_pool_{name} Database connection pool {name}, summed over workers.",
+            f"# TYPE db_pool_{name} gauge",
+            f"db_pool_{name} {value}",
+        ]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,184 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .. import models
+from .strength import np, week_number, week_start
+
+MUSCLES = [
+    "Chest", "Front Delts", "Side Delts", "Rear Delts", "Triceps", "Biceps", "Forearms", "Lats", "Upper Back",
+    "Traps", "Lower Back", "Abs", "Obliques", "Quads", "Hamstrings", "Glutes", "Adductors", "Calves",
+]
+
+# A set counts fully toward its primary muscles and half toward secondary ones
+PRIMARY = 1.0
+SECONDARY = 0.5
+
+# The /exercises catalog, mapped to the muscles each one trains
+EXERCISE_MUSCLES: Dict[str, Dict[str, float]] = {
+    "Bench Press": {"Chest": PRIMARY, "Front Delts": SECONDARY, "Triceps": SECONDARY},
+    "Incline Bench Press": {"Chest": PRIMARY, "Front Delts": SECONDARY, "Triceps": SECONDARY},
+    "Decline Bench Press": {"Chest": PRIMARY, "Triceps": SECONDARY},
+    "Push Up": {"Chest": PRIMARY, "Front Delts": SECONDARY, "Triceps": SECONDARY},
+    "Squat": {"Quads": PRIMARY, "Glutes": SECONDARY, "Adductors": SECONDARY},
+    "Front Squat": {"Quads": PRIMARY, "Glutes": SECONDARY},
+    "Leg Press": {"Quads": PRIMARY, "Glutes": SECONDARY},
+    "Lunge": {"Quads": PRIMARY, "Glutes": SECONDARY},
+    "Romanian Deadlift": {"Hamstrings": PRIMARY, "Glutes": SECONDARY, "Lower Back": SECONDARY},
+    "Deadlift": {"Glutes": PRIMARY, "Hamstrings": SECONDARY, "Lower Back": SECONDARY, "Quads": SECONDARY,
+                 "Traps": SECONDARY},
+    "Sumo Deadlift": {"Glutes": PRIMARY, "Adductors": SECONDARY, "Quads": SECONDARY, "Hamstrings": SECONDARY},
+    "Barbell Row": {"Upper Back": PRIMARY, "Lats": PRIMARY, "Biceps": SECONDARY, "Rear Delts": SECONDARY},
+    "Pull Up": {"Lats": PRIMARY, "Biceps": SECONDARY, "Upper Back": SECONDARY},
+    "Lat Pulldown": {"Lats": PRIMARY, "Biceps": SECONDARY},
+    "Shoulder Press": {"Front Delts": PRIMARY, "Side Delts": SECONDARY, "Triceps": SECONDARY},
+    "Military Press": {"Front Delts": PRIMARY, "Side Delts": SECONDARY, "Triceps": SECONDARY},
+    "Lateral Raise": {"Side Delts": PRIMARY},
+    "Face Pull": {"Rear Delts": PRIMARY, "Upper Back": SECONDARY},
+    "Bicep Curl": {"Biceps": PRIMARY},
+    "Hammer Curl": {"Biceps": PRIMARY, "Forearms": SECONDARY},
+    "Barbell Curl": {"Biceps": PRIMARY},
+    "Tricep Extension": {"Triceps": PRIMARY},
+    "Skull Crusher": {"Triceps": PRIMARY},
+    "Crunch": {"Abs": PRIMARY},
+    "Plank": {"Abs": PRIMARY, "Obliques": SECONDARY},
+    "Russian Twist": {"Obliques": PRIMARY, "Abs": SECONDARY},
+    "Leg Raise": {"Abs": PRIMARY},
+    "Calf Raise": {"Calves": PRIMARY},
+    "Chest Fly": {"Chest": PRIMARY},
+    "Cable Crossover": {"Chest": PRIMARY},
+    "Dip": {"Triceps": PRIMARY, "Chest": SECONDARY, "Front Delts": SECONDARY},
+    "Close Grip Bench Press": {"Triceps": PRIMARY, "Chest": SECONDARY},
+    "Hack Squat": {"Quads": PRIMARY, "Glutes": SECONDARY},
+    "Goblet Squat": {"Quads": PRIMARY, "Glutes": SECONDARY},
+    "Bulgarian Split Squat": {"Quads": PRIMARY, "Glutes": SECONDARY},
+    "Step Up": {"Quads": PRIMARY, "Glutes": SECONDARY},
+    "Good Morning": {"Hamstrings": PRIMARY, "Lower Back": SECONDARY, "Glutes": SECONDARY},
+    "Hip Thrust": {"Glutes": PRIMARY, "Hamstrings": SECONDARY},
+    "Glute Bridge": {"Glutes": PRIMARY, "Hamstrings": SECONDARY},
+    "Cable Row": {"Upper Back": PRIMARY, "Lats": PRIMARY, "Biceps": SECONDARY},
+    "T-Bar Row": {"Upper Back": PRIMARY, "Lats": PRIMARY, "Biceps": SECONDARY},
+    "Chin Up": {"Lats": PRIMARY, "Biceps": PRIMARY},
+    "One Arm Dumbbell Row": {"Lats": PRIMARY, "Upper Back": SECONDARY, "Biceps": SECONDARY},
+    "Shrug": {"Traps": PRIMARY},
+    "Upright Row": {"Side Delts": PRIMARY, "Traps": SECONDARY},
+    "Reverse Fly": {"Rear Delts": PRIMARY, "Upper Back": SECONDARY},
+    "Arnold Press": {"Front Delts": PRIMARY, "Side Delts": SECONDARY, "Triceps": SECONDARY},
+    "Push Press": {"Front Delts": PRIMARY, "Triceps": SECONDARY, "Quads": SECONDARY},
+    "Concentration Curl": {"Biceps": PRIMARY},
+    "Preacher Curl": {"Biceps": PRIMARY},
+    "Spider Curl": {"Biceps": PRIMARY},
+    "Cable Curl": {"Biceps": PRIMARY},
+    "Tricep Pushdown": {"Triceps": PRIMARY},
+    "Overhead Tricep Extension": {"Triceps": PRIMARY},
+    "Diamond Push Up": {"Triceps": PRIMARY, "Chest": SECONDARY},
+    "Ab Wheel Rollout": {"Abs": PRIMARY},
+    "Mountain Climber": {"Abs": PRIMARY},
+    "Hanging Leg Raise": {"Abs": PRIMARY},
+    "Standing Calf Raise": {"Calves": PRIMARY},
+    "Seated Calf Raise": {"Calves": PRIMARY},
+}
+
+# Free-text categories, for exercises outside the catalog
+CATEGORY_MUSCLES: Dict[str, Dict[str, float]] = {
+    "chest": {"Chest": PRIMARY},
+    "back": {"Upper Back": PRIMARY, "Lats": SECONDARY},
+    "shoulders": {"Side Delts": PRIMARY, "Front Delts": SECONDARY},
+    "arms": {"Biceps": SECONDARY, "Triceps": SECONDARY},
+    "biceps": {"Biceps": PRIMARY},
+    "triceps": {"Triceps": PRIMARY},
+    "legs": {"Quads": PRIMARY, "Glutes": SECONDARY},
+    "quads": {"Quads": PRIMARY},
+    "hamstrings": {"Hamstrings": PRIMARY},
+    "glutes": {"Glutes": PRIMARY},
+    "calves": {"Calves": PRIMARY},
+    "core": {"Abs": PRIMARY},
+    "abs": {"Abs": PRIMARY},
+}
+
+# Rows of the matrix: catalog exercises, then category fallbacks
+_EXERCISE_ROWS = {name.lower(): row for row, name in enumerate(EXERCISE_MUSCLES)}
+_CATEGORY_ROWS = {category: len(EXERCISE_MUSCLES) + row for row, category in enumerate(CATEGORY_MUSCLES)}
+
+
+def _muscle_matrix():
+    """
+    The exercise x muscle weights. Each row has one to five of eighteen
+    muscles, but at 73 x 18 a dense array multiplies faster than a sparse
+    one would, so the nonzeros are scattered into one.
+    """
+    rows, columns, weights = [], [], []
+    for row, muscles in enumerate([*EXERCISE_MUSCLES.values(), *CATEGORY_MUSCLES.values()]):
+        for muscle, weight in muscles.items():
+            rows.append(row)
+            columns.append(MUSCLES.index(muscle))
+            weights.append(weight)
+    matrix = np.zeros((len(EXERCISE_MUSCLES) + len(CATEGORY_MUSCLES), len(MUSCLES)))
+    matrix[rows, columns] = weights
+    return matrix
+
+
+MUSCLE_MATRIX = _muscle_matrix() if np is not None else None
+
+
+def matrix_row(exercise_name: str, category: Optional[str]) -> Optional[int]:
+    """The matrix row for an entry: its catalog exercise, else its category, else None."""
+    row = _EXERCISE_ROWS.get(exercise_name.strip().lower())
+    if row is None and category:
+        row = _CATEGORY_ROWS.get(category.strip().lower())
+    return row
+
+
+def weekly_sets(db: Session, user_id: int, weeks: int = 52, today: Optional[date] = None) -> dict:
+    """
+    Hard sets per muscle for each of the last `weeks` weeks. Set counts are
+    summed per exercise and week by the database, scattered into a week x
+    exercise matrix and turned into sets per muscle with one multiply.
+    Everything logged counts as a hard set; warm-ups aren't logged.
+    """
+    today = today or datetime.utcnow().date()
+    current_week = int(week_number(np.datetime64(today, "D").astype(np.int64)))
+    first_week = current_week - weeks + 1
+    sessions, entries = models.WorkoutSession.__table__, models.WorkoutEntry.__table__
+    day = func.date(sessions.c.date)
+    rows = db.execute(
+        select(entries.c.exercise_name, entries.c.category, day, func.sum(entries.c.sets))
+        .join(sessions, sessions.c.id == entries.c.session_id)
+        .where(sessions.c.user_id == user_id,
+               sessions.c.date >= datetime.combine(week_start(first_week), datetime.min.time()),
+               sessions.c.date < datetime.combine(today + timedelta(days=1), datetime.min.time()))
+        .group_by(entries.c.exercise_name, entries.c.category, day)
+    ).all()
+
+    counts = np.zeros((weeks, MUSCLE_MATRIX.shape[0]))
+    unmapped: Dict[str, float] = {}
+    if rows:
+        names, categories, days, sets = zip(*rows)
+        # Look each distinct exercise up once, not once per day it was trained
+        pairs = list(zip(names, categories))
+        distinct = list(dict.fromkeys(pairs))
+        lookup = np.array([row if row is not None else -1 for row in (matrix_row(*pair) for pair in distinct)])
+        index = {pair: i for i, pair in enumerate(distinct)}
+        pair_index = np.fromiter((index[pair] for pair in pairs), dtype=np.int64, count=len(pairs))
+        exercise_rows = lookup[pair_index]
+        columns = week_number(np.array(days, dtype="datetime64[D]").astype(np.int64)) - first_week
+        sets = np.array(sets, dtype=np.float64)
+        mapped = exercise_rows >= 0
+        np.add.at(counts, (columns[mapped], exercise_rows[mapped]), sets[mapped])
+        leftover = np.bincount(pair_index[~mapped], weights=sets[~mapped], minlength=len(distinct))
+        for i in np.flatnonzero(leftover):
+            name = distinct[i][0]
+            unmapped[name] = unmapped.get(name, 0.0) + float(leftover[i])
+
+    per_muscle = counts @ MUSCLE_MATRIX
+    return {
+        "weeks": [week_start(week).isoformat() for week in range(first_week, current_week + 1)],
+        "muscles": [
+            {"muscle": muscle, "weekly_sets": np.round(per_muscle[:, column], 1).tolist(),
+             "total_sets": round(float(per_muscle[:, column].sum()), 1)}
+            for column, muscle in enumerate(MUSCLES)
+        ],
+        "unmapped": [{"exercise": name, "sets": count} for name, count in sorted(unmapped.items())],
+    }
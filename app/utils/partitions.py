@@ -0,0 +1,135 @@
+import os
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .. import models
+
+# Partitions kept ready ahead of the current month
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+
+TABLE = models.WorkoutSession.__tablename__
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date, table: str = TABLE) -> str:
+    return f"{table}_{month:%Y_%m}"
+
+
+def partition_ddl(month: date, table: str = TABLE) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month, table)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def months_between(first: date, last: date) -> List[date]:
+    months, month = [], month_start(first)
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def is_partitioned(conn: Connection, table: str = TABLE) -> bool:
+    return conn.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table}
+    ).scalar() is True
+
+
+def partitions(conn: Connection, table: str = TABLE) -> List[dict]:
+    """Partitions with their bounds and estimated row counts."""
+    rows = conn.execute(text(
+        "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid), child.reltuples::bigint "
+        "FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass(:table) ORDER BY child.relname"
+    ), {"table": table})
+    return [{"name": name, "bounds": bounds, "rows": max(rows, 0)} for name, bounds, rows in rows]
+
+
+def drop_foreign_keys_to(conn: Connection, table: str = TABLE, referencing: Optional[str] = None) -> List[str]:
+    """Drop the foreign keys referencing a table, or only those from one table; returns them as "table.constraint"."""
+    constraints = conn.execute(text(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE contype = 'f' AND confrelid = to_regclass(:table) "
+        "AND (CAST(:referencing AS text) IS NULL OR conrelid = to_regclass(:referencing))"
+    ), {"table": table, "referencing": referencing}).all()
+    for owner, name in constraints:
+        conn.execute(text(f'ALTER TABLE {owner} DROP CONSTRAINT "{name}"'))
+    return [f"{owner}.{name}" for owner, name in constraints]
+
+
+def ensure_partitions(conn: Connection, months_ahead: int = PARTITION_MONTHS_AHEAD,
+                      today: Optional[datetime] = None, table: str = TABLE) -> List[str]:
+    """Create any missing partitions from the current month to months_ahead; returns the new ones."""
+    existing = {partition["name"] for partition in partitions(conn, table)}
+    current = month_start(today or datetime.utcnow())
+    created = []
+    for month in months_between(current, add_months(current, months_ahead)):
+        if partition_name(month, table) not in existing:
+            conn.execute(text(partition_ddl(month, table)))
+            created.append(partition_name(month, table))
+    return created
+
+
+def convert_to_partitioned(conn: Connection, months_ahead: int = PARTITION_MONTHS_AHEAD,
+                           today: Optional[datetime] = None) -> List[str]:
+    """
+    Rebuild workout_sessions as a table range-partitioned by month, in the
+    caller's transaction: one partition per month from the oldest session
+    to months_ahead, plus a default partition. The table is locked while
+    its rows are copied. Returns the partitions created.
+
+    The primary key becomes (id, date), and date-window queries scan only
+    the months they cover. Entries stay in one table, reached through their
+    session_id index. Postgres can't point a foreign key at a partitioned
+    table without its partition key, so the constraints from entries and
+    completed sets are dropped.
+    """
+    if is_partitioned(conn):
+        raise ValueError(f"{TABLE} is already partitioned")
+    undated = conn.execute(text(f"SELECT count(*) FROM {TABLE} WHERE date IS NULL")).scalar()
+    if undated:
+        raise ValueError(f"{undated} sessions have no date; set one before partitioning")
+
+    old = f"{TABLE}_unpartitioned"
+    sequence = conn.execute(text(f"SELECT pg_get_serial_sequence('{TABLE}', 'id')")).scalar()
+    oldest = conn.execute(text(f"SELECT min(date) FROM {TABLE}")).scalar()
+    current = month_start(today or datetime.utcnow())
+
+    conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {old}"))
+    conn.execute(text(
+        f"CREATE TABLE {TABLE} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE (date)"
+    ))
+    conn.execute(text(f"ALTER TABLE {TABLE} ALTER COLUMN date SET NOT NULL"))
+    created = []
+    for month in months_between(min(month_start(oldest), current) if oldest else current,
+                                add_months(current, months_ahead)):
+        conn.execute(text(partition_ddl(month)))
+        created.append(partition_name(month))
+    conn.execute(text(f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT"))
+    created.append(f"{TABLE}_default")
+    conn.execute(text(f"INSERT INTO {TABLE} SELECT * FROM {old}"))
+
+    drop_foreign_keys_to(conn, old)
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+    conn.execute(text(f"DROP TABLE {old}"))
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id"))
+
+    # The old table's indexes are gone with it; these cascade to every partition
+    conn.execute(text(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, date)"))
+    for index in models.WorkoutSession.__table__.indexes:
+        index.create(conn, checkfirst=True)
+    return created
@@ -0,0 +1,366 @@
+import math
+import os
+import struct
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, case, delete, event, exists, func, insert, inspect, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import upsert
+from .archive import entry_history, session_history
+from .jobs import JobContext, job_handler, job_row, queue_job_rows
+
+# Relative accuracy of new sketches: values read back from one are within this
+# fraction of the true value. Existing sketches keep theirs until rebuilt.
+PERCENTILE_RELATIVE_ACCURACY = float(os.getenv("PERCENTILE_RELATIVE_ACCURACY", "0.01"))
+
+_BESTS = models.ExerciseBest.__table__
+_SKETCHES = models.ExerciseSketch.__table__
+_SESSIONS = models.WorkoutSession.__table__
+
+REFRESH_JOB = "percentile_refresh"
+QUANTILES = (10, 25, 50, 75, 90, 99)
+
+_HEADER = struct.Struct("<dI")
+
+# (user_id, exercise)
+Key = Tuple[int, str]
+
+
+class QuantileSketch:
+    """
+    A mergeable quantile sketch with relative error guarantees (DDSketch).
+    Value x is counted in bucket ceil(log_γ x), γ = (1 + α) / (1 - α), so
+    any value read back is within α of a true one. Sketches merge by adding
+    counts, and unlike KLL or t-digest a value can be taken back out, which
+    is what happens when a member beats their own best.
+
+    Buckets cover a fixed ratio each, so their number depends on the range
+    of values, not how many there are: e1RMs from 1 to 2000 need at most
+    about 380 at 1%, and every query walks at most that many.
+    """
+
+    def __init__(self, relative_accuracy: float = PERCENTILE_RELATIVE_ACCURACY, counts: Optional[Dict[int, int]] = None):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.counts: Dict[int, int] = dict(counts or {})
+        self.count = sum(self.counts.values())
+
+    def _bucket(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, bucket: int) -> float:
+        # The point of [γ^(i-1), γ^i] within α of both ends
+        return 2 * self.gamma ** bucket / (self.gamma + 1)
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value <= 0:
+            return
+        bucket = self._bucket(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += count
+
+    def remove(self, value: float, count: int = 1) -> None:
+        if value <= 0:
+            return
+        bucket = self._bucket(value)
+        left = self.counts.get(bucket, 0) - count
+        if left < 0:
+            raise ValueError(f"{value} was not in the sketch")
+        if left:
+            self.counts[bucket] = left
+        else:
+            del self.counts[bucket]
+        self.count -= count
+
+    def merge(self, other: "QuantileSketch") -> None:
+        if other.gamma != self.gamma:
+            raise ValueError("Only sketches with the same relative accuracy merge")
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+
+    def percentile(self, value: float) -> Tuple[float, float]:
+        """
+        The percentage of values below `value`, counting values that share
+        its bucket as half below, and the most that can be off by: half
+        that bucket's share.
+        """
+        if not self.count:
+            raise ValueError("The sketch is empty")
+        if value <= 0:
+            return 0.0, 0.0
+        bucket = self._bucket(value)
+        below = sum(count for key, count in self.counts.items() if key < bucket)
+        same = self.counts.get(bucket, 0)
+        return 100 * (below + same / 2) / self.count, 100 * same / 2 / self.count
+
+    def quantile(self, q: float) -> float:
+        """The value at quantile q (0 to 1), within relative_accuracy of a value at that rank."""
+        if not self.count:
+            raise ValueError("The sketch is empty")
+        rank = q * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen > rank:
+                return self._value(bucket)
+        return self._value(max(self.counts))
+
+    def to_bytes(self) -> bytes:
+        buckets = sorted(self.counts)
+        return _HEADER.pack(self.relative_accuracy, len(buckets)) + struct.pack(
+            f"<{len(buckets)}i{len(buckets)}I", *buckets, *(self.counts[bucket] for bucket in buckets)
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "QuantileSketch":
+        relative_accuracy, size = _HEADER.unpack_from(data)
+        values = struct.unpack_from(f"<{size}i{size}I", data, _HEADER.size)
+        return cls(relative_accuracy, dict(zip(values[:size], values[size:])))
+
+
+def exercise_key(name: str) -> str:
+    return name.strip().lower()
+
+
+def _e1rm(weight: float, reps: int) -> float:
+    # Epley, as strength.estimated_1rm; a single is its own max
+    return weight if reps == 1 else weight * (1 + reps / 30.0)
+
+
+def compute_bests(conn: Connection, user_ids=None) -> Dict[Key, float]:
+    """Every member's (or some members') best e1RM per exercise from their whole history."""
+    reps, weight = entry_history.c.reps, entry_history.c.weight
+    name = func.lower(func.trim(entry_history.c.exercise_name))
+    query = select(session_history.c.user_id, name, func.max(case((reps == 1, weight), else_=weight * (1 + reps / 30.0)))).join(
+        session_history, session_history.c.id == entry_history.c.session_id
+    ).where(weight > 0, reps > 0, entry_history.c.sets > 0).group_by(session_history.c.user_id, name)
+    if user_ids is not None:
+        query = query.where(session_history.c.user_id.in_(user_ids))
+    return {(user_id, exercise): float(best) for user_id, exercise, best in conn.execute(query)}
+
+
+def _stored_bests(conn: Connection, user_ids=None) -> Dict[Key, float]:
+    query = select(_BESTS.c.user_id, _BESTS.c.exercise, _BESTS.c.e1rm)
+    if user_ids is not None:
+        query = query.where(_BESTS.c.user_id.in_(user_ids))
+    return {(user_id, exercise): e1rm for user_id, exercise, e1rm in conn.execute(query)}
+
+
+def _diff(stored: Dict[Key, float], computed: Dict[Key, float]) -> Dict[Key, Tuple[Optional[float], Optional[float]]]:
+    changes = {key: (stored[key], None) for key in stored.keys() - computed.keys()}
+    for key, best in computed.items():
+        if key not in stored or abs(stored[key] - best) > 1e-6:
+            changes[key] = (stored.get(key), best)
+    return changes
+
+
+def _write_bests(conn: Connection, changes: Dict[Key, Tuple[Optional[float], Optional[float]]]) -> None:
+    now = datetime.utcnow()
+    inserts = []
+    for (user_id, exercise), (old, new) in changes.items():
+        match = (_BESTS.c.user_id == user_id, _BESTS.c.exercise == exercise)
+        if new is None:
+            conn.execute(delete(_BESTS).where(*match))
+        elif old is not None:
+            conn.execute(update(_BESTS).where(*match).values(e1rm=new, updated_at=now))
+        else:
+            inserts.append({"user_id": user_id, "exercise": exercise, "e1rm": new, "updated_at": now})
+    if inserts:
+        conn.execute(insert(_BESTS), inserts)
+
+
+def _write_sketch(conn: Connection, exercise: str, sketch: QuantileSketch, exists_: bool) -> None:
+    values = {"lifters": sketch.count, "data": sketch.to_bytes(), "updated_at": datetime.utcnow()}
+    if not sketch.count:
+        conn.execute(delete(_SKETCHES).where(_SKETCHES.c.exercise == exercise))
+    elif exists_:
+        conn.execute(update(_SKETCHES).where(_SKETCHES.c.exercise == exercise).values(**values))
+    else:
+        conn.execute(insert(_SKETCHES).values(exercise=exercise, **values))
+
+
+def apply_changes(conn: Connection, bests: Dict[Key, Optional[float]], raise_only: bool = False) -> int:
+    """
+    Store members' new bests (None: no best any more), moving each old best
+    out of its exercise's sketch and the new one in; with raise_only, only
+    bests that go up. The exercises' sketch rows are locked first, inserted
+    empty where missing, and the stored bests read under that lock, so
+    concurrent writers to one exercise take turns and each moves the best
+    the last one left. Returns how many bests changed.
+    """
+    if not bests:
+        return 0
+    exercises = sorted({exercise for _, exercise in bests})
+    empty = {"lifters": 0, "data": QuantileSketch().to_bytes(), "updated_at": datetime.utcnow()}
+    conn.execute(upsert(conn, _SKETCHES).on_conflict_do_nothing(index_elements=["exercise"]),
+                 [{"exercise": exercise, **empty} for exercise in exercises])
+    rows = conn.execute(
+        select(_SKETCHES.c.exercise, _SKETCHES.c.data).where(_SKETCHES.c.exercise.in_(exercises))
+        .order_by(_SKETCHES.c.exercise).with_for_update()
+    ).all()
+    sketches = {exercise: QuantileSketch.from_bytes(data) for exercise, data in rows}
+    stored = {(user_id, exercise): e1rm for user_id, exercise, e1rm in conn.execute(
+        select(_BESTS.c.user_id, _BESTS.c.exercise, _BESTS.c.e1rm)
+        .where(_BESTS.c.user_id.in_({user_id for user_id, _ in bests}), _BESTS.c.exercise.in_(exercises))
+        .with_for_update()
+    )}
+    if raise_only:
+        bests = {key: best for key, best in bests.items() if best > stored.get(key, 0.0)}
+    changes = _diff({key: best for key, best in stored.items() if key in bests},
+                    {key: best for key, best in bests.items() if best is not None})
+    _write_bests(conn, changes)
+    for (_, exercise), (old, new) in changes.items():
+        if old is not None:
+            sketches[exercise].remove(old)
+        if new is not None:
+            sketches[exercise].add(new)
+    # Rewrite the sketches that changed, and drop the empty ones inserted above
+    changed = {exercise for _, exercise in changes}
+    for exercise, sketch in sketches.items():
+        if exercise in changed or not sketch.count:
+            _write_sketch(conn, exercise, sketch, True)
+    return len(changes)
+
+
+def refresh(db: Session, user_ids: Iterable[int]) -> int:
+    """Recompute some members' bests from history and move any that changed; returns how many did."""
+    conn = db.connection()
+    user_ids = list(user_ids)
+    changes = _diff(_stored_bests(conn, user_ids), compute_bests(conn, user_ids))
+    return apply_changes(conn, {key: new for key, (_, new) in changes.items()})
+
+
+def rebuild(db: Session, relative_accuracy: float = PERCENTILE_RELATIVE_ACCURACY) -> Dict[str, int]:
+    """Recompute every member's bests and build every sketch afresh from them; returns lifters per exercise."""
+    conn = db.connection()
+    computed = compute_bests(conn)
+    _write_bests(conn, _diff(_stored_bests(conn), computed))
+    sketches: Dict[str, QuantileSketch] = {}
+    for (_, exercise), best in computed.items():
+        sketches.setdefault(exercise, QuantileSketch(relative_accuracy)).add(best)
+    conn.execute(delete(_SKETCHES))
+    for exercise, sketch in sketches.items():
+        _write_sketch(conn, exercise, sketch, False)
+    return {exercise: sketch.count for exercise, sketch in sketches.items()}
+
+
+def refresh_job(user_ids: Iterable[Optional[int]]):
+    """
+    A job row recomputing some members' bests, for edits and deletes, which
+    can lower them. Members with no bests stored have nothing to lower, so
+    it is only queued if one of them has some.
+    """
+    users = sorted({user_id for user_id in user_ids if user_id is not None})
+    if not users:
+        return None
+    return job_row(REFRESH_JOB, {"users": users}).where(exists().where(_BESTS.c.user_id.in_(users)))
+
+
+@job_handler(REFRESH_JOB)
+def run_refresh(db: Session, context: JobContext) -> dict:
+    changed = refresh(db, context.payload.get("users", []))
+    db.commit()
+    return {"changed": changed}
+
+
+def standing(db: Session, user_id: int, exercise: str, e1rm: Optional[float] = None) -> dict:
+    """
+    Where a member's best e1RM for an exercise, or the e1RM given, falls
+    among every member's best: two single-row reads, however many lifters
+    there are.
+    """
+    key = exercise_key(exercise)
+    data = db.execute(select(_SKETCHES.c.data).where(_SKETCHES.c.exercise == key)).scalar()
+    if e1rm is None:
+        e1rm = db.execute(
+            select(_BESTS.c.e1rm).where(_BESTS.c.user_id == user_id, _BESTS.c.exercise == key)
+        ).scalar()
+    sketch = QuantileSketch.from_bytes(data) if data else QuantileSketch()
+    result = {
+        "exercise": exercise.strip(),
+        "e1rm": round(e1rm, 1) if e1rm else None,
+        "lifters": sketch.count,
+        "percentile": None,
+        "error": None,
+        "relative_accuracy": sketch.relative_accuracy,
+        "quantiles": {},
+    }
+    if sketch.count:
+        result["quantiles"] = {f"p{q}": round(sketch.quantile(q / 100), 1) for q in QUANTILES}
+        if e1rm:
+            percentile, error = sketch.percentile(e1rm)
+            result["percentile"], result["error"] = round(percentile, 1), round(error, 1)
+    return result
+
+
+def _entry_changes(conn: Connection, entries: List[models.WorkoutEntry]) -> Dict[Key, float]:
+    """
+    New entries that beat their member's stored best, as the new best.
+    Read without locks, so apply_changes() checks them again under its own.
+    """
+    candidates: Dict[Tuple[int, str], float] = {}
+    for entry in entries:
+        if (entry.weight or 0) > 0 and (entry.reps or 0) > 0 and (entry.sets or 0) > 0:
+            key = (entry.session_id, exercise_key(entry.exercise_name))
+            candidates[key] = max(candidates.get(key, 0.0), _e1rm(entry.weight, entry.reps))
+    if not candidates:
+        return {}
+    exercises = {exercise for _, exercise in candidates}
+    rows = conn.execute(
+        select(_SESSIONS.c.id, _SESSIONS.c.user_id, _BESTS.c.exercise, _BESTS.c.e1rm)
+        .outerjoin(_BESTS, and_(_BESTS.c.user_id == _SESSIONS.c.user_id, _BESTS.c.exercise.in_(exercises)))
+        .where(_SESSIONS.c.id.in_({session_id for session_id, _ in candidates}))
+    ).all()
+    owners, stored = {}, {}
+    for session_id, user_id, exercise, best in rows:
+        owners[session_id] = user_id
+        if exercise is not None:
+            stored[(user_id, exercise)] = best
+    bests: Dict[Key, float] = {}
+    for (session_id, exercise), e1rm in candidates.items():
+        if session_id in owners:
+            key = (owners[session_id], exercise)
+            bests[key] = max(bests.get(key, 0.0), e1rm)
+    return {key: best for key, best in bests.items() if best > stored.get(key, 0.0)}
+
+
+_ENTRY_FIELDS = ("session_id", "exercise_name", "sets", "reps", "weight")
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flush(session, flush_context):
+    """
+    Move new bests into the sketches in the writing transaction, and queue
+    a recompute for members whose entries were edited or deleted.
+    """
+    entries, sessions, users = [], set(), set()
+    for obj in session.new:
+        if isinstance(obj, models.WorkoutEntry):
+            entries.append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, models.WorkoutEntry) and any(
+                inspect(obj).attrs[name].history.has_changes() for name in _ENTRY_FIELDS):
+            sessions.update(inspect(obj).attrs.session_id.history.sum())
+        elif isinstance(obj, models.WorkoutSession) and inspect(obj).attrs.user_id.history.has_changes():
+            users.update(inspect(obj).attrs.user_id.history.sum())
+    for obj in session.deleted:
+        if isinstance(obj, models.WorkoutEntry):
+            sessions.add(obj.session_id)
+        elif isinstance(obj, models.WorkoutSession):
+            users.add(obj.user_id)
+    if not (entries or sessions or users):
+        return
+
+    connection = session.connection()
+    sessions.discard(None)
+    if sessions:
+        users.update(connection.execute(select(_SESSIONS.c.user_id).where(_SESSIONS.c.id.in_(sessions))).scalars())
+    queue_job_rows(connection, [refresh_job(users)])
+    if entries:
+        apply_changes(connection, _entry_changes(connection, entries), raise_only=True)
@@ -1,32 +1,268 @@
-from typing import Dict, List
+import os
+from collections import deque
+from functools import lru_cache
+from math import gcd
+from typing import Dict, List, Optional, Tuple
 
-class PlateCalculator:
-    BAR_WEIGHT = 45  # Standard Olympic bar weight
-    AVAILABLE_PLATES = [45, 35, 25, 10, 5, 2.5]  # Standard plate weights
+# Standard plate sets; a count of None means "as many as needed"
+STANDARD_LB_PLATES = {45: None, 35: None, 25: None, 10: None, 5: None, 2.5: None}
+STANDARD_KG_PLATES = {25: None, 20: None, 15: None, 10: None, 5: None, 2.5: None, 1.25: None, 0.5: None, 0.25: None}
+DEFAULT_BAR_WEIGHTS = {"lb": 45, "kg": 20}
+MAX_LOADS = {"lb": 1000, "kg": 500}  # Upper bound for sets with unlimited plates
 
-    @staticmethod
-    def calculate_plates(target_weight: float) -> Dict:
-        if target_weight < PlateCalculator.BAR_WEIGHT:
+_SCALE = 100  # Weights are solved in hundredths to keep the DP in integers
+_INF = float("inf")
+
+
+def parse_inventory(spec: str) -> Dict[float, Optional[int]]:
+    """
+    Parse an inventory like "45:8,35:2,25:4,2.5" into {plate: count}.
+
+    Counts are total plates (both sides); a plate without a count is unlimited.
+    """
+    inventory = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        weight, _, count = item.partition(":")
+        inventory[float(weight)] = int(count) if count else None
+    return inventory
+
+
+def _bounded_min_plates(previous: List[float], steps: int, count: int) -> List[float]:
+    """
+    Add one plate type (up to `count` per side) to a fewest-plates table.
+
+    A sliding-window minimum over each residue class keeps this linear in the
+    table size regardless of how many plates of the type are available.
+    """
+    size = len(previous)
+    table = [_INF] * size
+    for residue in range(min(steps, size)):
+        window = deque()  # (j, previous[load] - j), increasing values
+        for j, load in enumerate(range(residue, size, steps)):
+            value = previous[load] - j
+            while window and window[-1][1] >= value:
+                window.pop()
+            window.append((j, value))
+            if window[0][0] < j - count:
+                window.popleft()
+            table[load] = window[0][1] + j
+    return table
+
+
+class PlateSolver:
+    """
+    Minimum-plate loading for a bar and a limited plate inventory.
+
+    Every achievable per-side load is solved once up front with a bounded
+    knapsack DP (fewest plates, heavier plates on ties), and nearest-load
+    tables make each lookup a constant-time list index.
+
+    Args:
+        bar_weight: Weight of the empty bar
+        inventory: {plate weight: total plates}, None counts meaning unlimited
+        unit: "lb" or "kg", reported back with each result
+        max_load: Heaviest total load worth solving for
+    
+    """
+
+    def __init__(self, bar_weight: float = 45, inventory: Optional[Dict[float, Optional[int]]] = None,
+                 unit: str = "lb", max_load: Optional[float] = None):
+        self.bar_weight = bar_weight
+        self.unit = unit
+        inventory = STANDARD_LB_PLATES if inventory is None else inventory
+        max_load = max_load if max_load is not None else MAX_LOADS.get(unit, 1000)
+
+        # Plates are loaded in pairs, so a side gets half of each count
+        max_side = max(int(round((max_load - bar_weight) / 2 * _SCALE)), 0)
+        plates = []
+        for weight, count in sorted(inventory.items(), reverse=True):
+            units = int(round(weight * _SCALE))
+            if units <= 0:
+                continue
+            per_side = count // 2 if count is not None else max_side // units
+            if per_side > 0:
+                plates.append((weight, units, per_side))
+        self.plates = [(weight, per_side) for weight, _, per_side in plates]
+        self._plates = plates
+
+        step = 0
+        for _, units, _ in plates:
+            step = gcd(step, units)
+        self._step = step or _SCALE
+
+        capacity = sum(units // self._step * per_side for _, units, per_side in plates)
+        self._solutions = self._solve(plates, min(capacity, max_side // self._step) + 1)
+        self._build_nearest()
+
+    def _solve(self, plates: List[Tuple[float, int, int]], size: int) -> Dict[int, Tuple[float, ...]]:
+        """Map every achievable per-side load (in steps) to its plates, heaviest first."""
+        # suffix[i][load] = fewest plates reaching load with plate types i.. only
+        suffix = [None] * (len(plates) + 1)
+        suffix[len(plates)] = [0] + [_INF] * (size - 1)
+        for i in range(len(plates) - 1, -1, -1):
+            _, units, per_side = plates[i]
+            suffix[i] = _bounded_min_plates(suffix[i + 1], units // self._step, per_side)
+        self._suffix = suffix
+
+        solutions = {}
+        for load in range(size):
+            needed = suffix[0][load]
+            if needed == _INF:
+                continue
+            # Take as many of each plate as an optimal loading allows, heaviest
+            # first, so ties between equal plate counts go to heavier plates
+            loaded = []
+            remaining = load
+            for i, (weight, units, per_side) in enumerate(plates):
+                steps = units // self._step
+                for k in range(min(per_side, remaining // steps), -1, -1):
+                    if suffix[i + 1][remaining - k * steps] == needed - k:
+                        loaded.extend([weight] * k)
+                        remaining -= k * steps
+                        needed -= k
+                        break
+            solutions[load] = tuple(loaded)
+        return solutions
+
+    def _build_nearest(self) -> None:
+        size = max(self._solutions) + 1
+        self._below = [0] * size
+        self._above = [0] * size
+        last = 0
+        for load in range(size):
+            if load in self._solutions:
+                last = load
+            self._below[load] = last
+        last = size - 1
+        for load in range(size - 1, -1, -1):
+            if load in self._solutions:
+                last = load
+            self._above[load] = last
+
+    @property
+    def max_weight(self) -> float:
+        return self.bar_weight + 2 * (len(self._below) - 1) * self._step / _SCALE
+
+    def achievable_weights(self) -> List[float]:
+        return [self.bar_weight + 2 * load * self._step / _SCALE for load in sorted(self._solutions)]
+
+    def _nearest_load(self, per_side: float) -> int:
+        exact = per_side * _SCALE / self._step
+        index = int(exact + 1e-9)
+        if index >= len(self._below) - 1:
+            return self._below[-1]
+        below = self._below[index]
+        above = self._above[index] if abs(exact - index) < 1e-9 else self._above[index + 1]
+        # Prefer the lighter loading when both are equally close
+        return below if exact - below <= above - exact else above
+
+    def nearest_weight(self, target_weight: float) -> float:
+        """Return the closest weight this bar and inventory can make."""
+        if target_weight <= self.bar_weight:
+            return self.bar_weight
+        load = self._nearest_load((target_weight - self.bar_weight) / 2)
+        return self.bar_weight + 2 * load * self._step / _SCALE
+
+    def loadings(self, target_weight: float, slack: int = 2, limit: int = 64) -> List[Tuple[float, ...]]:
+        """
+        List alternative per-side loadings for the nearest achievable weight.
+
+        Loadings are heaviest first and use at most `slack` plates more than
+        the minimum; the minimum-plate loading always comes first.
+        """
+        if target_weight <= self.bar_weight:
+            return [()]
+        load = self._nearest_load((target_weight - self.bar_weight) / 2)
+        max_plates = self._suffix[0][load] + slack
+        results: List[Tuple[float, ...]] = []
+
+        def search(i: int, remaining: int, stack: Tuple[float, ...]) -> None:
+            if len(results) >= limit:
+                return
+            if remaining == 0:
+                results.append(stack)
+                return
+            if i == len(self._plates) or len(stack) + self._suffix[i][remaining] > max_plates:
+                return
+            weight, units, per_side = self._plates[i]
+            steps = units // self._step
+            for k in range(min(per_side, remaining // steps), -1, -1):
+                search(i + 1, remaining - k * steps, stack + (weight,) * k)
+
+        search(0, load, ())
+        best = self._solutions[load]
+        results.sort(key=lambda stack: (len(stack), stack != best))
+        return results
+
+    def solve(self, target_weight: float) -> Dict:
+        """Return the loading for the target, or the nearest achievable weight."""
+        if target_weight < self.bar_weight:
             return {
                 "error": "Weight is less than bar weight",
-                "bar_weight": PlateCalculator.BAR_WEIGHT
+                "target_weight": target_weight,
+                "bar_weight": self.bar_weight,
+                "weight_per_side": 0,
+                "plates_per_side": [],
+                "actual_weight": self.bar_weight,
+                "unit": self.unit,
+                "exact": False
             }
 
-        weight_per_side = (target_weight - PlateCalculator.BAR_WEIGHT) / 2
-        plates_needed = []
-        remaining_weight = weight_per_side
-
-        for plate in PlateCalculator.AVAILABLE_PLATES:
-            while remaining_weight >= plate:
-                plates_needed.append(plate)
-                remaining_weight -= plate
-
-        actual_weight = (sum(plates_needed) * 2) + PlateCalculator.BAR_WEIGHT
+        weight_per_side = (target_weight - self.bar_weight) / 2
+        load = self._nearest_load(weight_per_side)
+        plates_needed = list(self._solutions[load])
+        actual_weight = self.bar_weight + 2 * load * self._step / _SCALE
 
         return {
             "target_weight": target_weight,
-            "bar_weight": PlateCalculator.BAR_WEIGHT,
+            "bar_weight": self.bar_weight,
             "weight_per_side": weight_per_side,
             "plates_per_side": plates_needed,
-            "actual_weight": actual_weight
+            "actual_weight": actual_weight,
+            "unit": self.unit,
+            "exact": abs(actual_weight - target_weight) < 1e-6
         }
+
+    def solve_many(self, target_weights: List[float]) -> List[Dict]:
+        return [self.solve(weight) for weight in target_weights]
+
+
+def _inventory_key(inventory: Optional[Dict[float, Optional[int]]]):
+    return tuple(sorted(inventory.items())) if inventory is not None else None
+
+
+@lru_cache(maxsize=32)
+def _cached_solver(bar_weight: float, inventory_key, unit: str) -> PlateSolver:
+    inventory = dict(inventory_key) if inventory_key is not None else None
+    if inventory is None and unit == "kg":
+        inventory = STANDARD_KG_PLATES
+    return PlateSolver(bar_weight, inventory, unit)
+
+
+def get_solver(bar_weight: Optional[float] = None, inventory: Optional[Dict[float, Optional[int]]] = None,
+               unit: str = "lb") -> PlateSolver:
+    """Return a (cached) solver for a bar and inventory; defaults to the gym configuration."""
+    if bar_weight is None and inventory is None and unit == GYM_UNIT:
+        return default_solver
+    if bar_weight is None:
+        bar_weight = DEFAULT_BAR_WEIGHTS.get(unit, 45)
+    return _cached_solver(bar_weight, _inventory_key(inventory), unit)
+
+
+# Gym configuration, solved once at startup
+GYM_UNIT = os.getenv("PLATE_UNIT", "lb")
+GYM_BAR_WEIGHT = float(os.getenv("PLATE_BAR_WEIGHT", str(DEFAULT_BAR_WEIGHTS.get(GYM_UNIT, 45))))
+GYM_INVENTORY = parse_inventory(os.getenv("PLATE_INVENTORY")) if os.getenv("PLATE_INVENTORY") else None
+
+default_solver = _cached_solver(GYM_BAR_WEIGHT, _inventory_key(GYM_INVENTORY), GYM_UNIT)
+
+
+class PlateCalculator:
+    """Plate lookups for the configured gym bar and inventory; see GYM_* above."""
+
+    @staticmethod
+    def calculate_plates(target_weight: float) -> Dict:
+        return default_solver.solve(target_weight)
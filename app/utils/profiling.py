@@ -0,0 +1,291 @@
+import json
+import logging
+import marshal
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from .auth import ADMIN_TOKEN, is_admin_token
+from .jobs import JOB_SPOOL_DIR
+from .metrics import UNMATCHED_ROUTE, route_templates
+from .structured_logging import current_request_id
+
+logger = logging.getLogger(__name__)
+
+# Where profiles are written, and how many are kept before the oldest are removed
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(JOB_SPOOL_DIR, "profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+# Profile every Nth request; 0 profiles only requests sent with the admin token
+PROFILE_SAMPLE_RATE = int(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Time between stack samples
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+
+# Requests carrying this header with the admin token are profiled
+PROFILE_HEADER = b"x-profile"
+PROFILE_KINDS = ("pstats", "collapsed")
+PROFILE_ID = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9-]{1,64}$")
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py")
+
+Func = Tuple[str, int, str]  # (filename, first line, function), as pstats keys functions
+
+
+def profiling_enabled() -> bool:
+    """The profiler middleware is only installed when something can trigger it."""
+    return PROFILE_SAMPLE_RATE > 0 or bool(ADMIN_TOKEN)
+
+
+def _func(code) -> Func:
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+
+class StackSampler:
+    """
+    Samples the call stacks serving one request from a background thread.
+
+    A statistical profiler rather than cProfile: cProfile only sees the thread
+    that enabled it, while sync endpoints run on threadpool threads. The event
+    loop thread is sampled while this request's coroutine is on its stack; busy
+    threadpool threads are sampled too, so a sync request profiled alongside
+    another one running concurrently picks up some of its samples.
+    """
+
+    def __init__(self, anchor, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.anchor = anchor  # Frame of the middleware coroutine serving the request
+        self.loop_thread = threading.get_ident()
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != me:
+                    stack = self._stack(thread_id, frame)
+                    if stack:
+                        self.samples[stack] += 1
+
+    def _stack(self, thread_id: int, frame) -> Optional[Tuple[Func, ...]]:
+        if frame.f_code.co_filename.endswith(_IDLE_FILES):
+            return None
+        stack = []
+        relevant = False
+        while frame is not None:
+            if thread_id == self.loop_thread:
+                relevant = relevant or frame is self.anchor
+            elif "anyio" in frame.f_code.co_filename:
+                relevant = True  # A threadpool worker running a sync endpoint or dependency
+            stack.append(_func(frame.f_code))
+            frame = frame.f_back
+        if not relevant:
+            return None
+        stack.reverse()
+        return tuple(stack)
+
+    def collapsed(self) -> str:
+        """Samples in the folded-stack format read by flamegraph.pl and speedscope."""
+        lines = []
+        for stack, count in self.samples.most_common():
+            frames = ";".join(f"{name} ({os.path.basename(filename)}:{line})" for filename, line, name in stack)
+            lines.append(f"{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def pstats(self) -> Dict[Func, tuple]:
+        """
+        Samples as a pstats table, so the file opens in pstats, snakeviz and
+        friends. Times are samples times the interval; call counts are samples.
+        """
+        self_samples: Counter = Counter()
+        total_samples: Counter = Counter()
+        callers: Dict[Func, Counter] = {}
+        for stack, count in self.samples.items():
+            self_samples[stack[-1]] += count
+            for func in set(stack):
+                total_samples[func] += count
+            for caller, callee in zip(stack, stack[1:]):
+                callers.setdefault(callee, Counter())[caller] += count
+
+        interval = self.interval
+        stats = {}
+        for func, total in total_samples.items():
+            own = self_samples.get(func, 0)
+            stats[func] = (
+                total, total, own * interval, total * interval,
+                {
+                    caller: (count, count, 0.0, count * interval)
+                    for caller, count in callers.get(func, {}).items()
+                }
+            )
+        return stats
+
+
+def _safe_name(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", value).strip("_")[:60] or "root"
+
+
+def make_profile_id(created: datetime, method: str, route: str, request_id: str) -> str:
+    return f"{created:%Y%m%dT%H%M%S}-{method}-{_safe_name(route)}-{request_id}"
+
+
+def write_profile(sampler: StackSampler, meta: dict, directory: str = PROFILE_DIR) -> bool:
+    """Write a request's pstats, collapsed stacks and metadata under meta["id"]."""
+    meta = {**meta, "samples": sum(sampler.samples.values())}
+    try:
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, meta["id"])
+        with open(f"{base}.pstats", "wb") as out:
+            marshal.dump(sampler.pstats(), out)
+        with open(f"{base}.collapsed", "w") as out:
+            out.write(sampler.collapsed())
+        # Metadata last: a profile is listed once its files are complete
+        with open(f"{base}.json", "w") as out:
+            json.dump(meta, out)
+        _prune(directory, PROFILE_KEEP)
+    except OSError as e:
+        logger.warning(f"Could not write profile {meta['id']}: {str(e)}")
+        return False
+    return True
+
+
+def _prune(directory: str, keep: int) -> None:
+    metas = sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+    for name in metas[:max(len(metas) - keep, 0)]:
+        stem = name[:-len(".json")]
+        for suffix in (".json",) + tuple(f".{kind}" for kind in PROFILE_KINDS):
+            try:
+                os.remove(os.path.join(directory, stem + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(directory: str = PROFILE_DIR, route: Optional[str] = None, limit: int = 50) -> List[dict]:
+    """Most recent profiles first, optionally only those for one route template."""
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    # Ids start with a timestamp, so names sort by age
+    for name in sorted((name for name in os.listdir(directory) if name.endswith(".json")), reverse=True):
+        try:
+            with open(os.path.join(directory, name)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if route is None or meta.get("route") == route:
+            profiles.append(meta)
+            if len(profiles) >= limit:
+                break
+    return profiles
+
+
+def profile_path(profile_id: str, kind: str, directory: str = PROFILE_DIR) -> Optional[str]:
+    if kind not in PROFILE_KINDS or not PROFILE_ID.match(profile_id):
+        return None
+    path = os.path.join(directory, f"{profile_id}.{kind}")
+    return path if os.path.exists(path) else None
+
+
+class ProfilerMiddleware:
+    """
+    Profiles requests sent with `X-Profile: <admin token>`, and every
+    PROFILE_SAMPLE_RATE-th request when that is set.
+
+    Profiled responses carry an X-Profile-Id header naming the files written
+    to PROFILE_DIR. Other requests pay one header scan and a counter; with
+    neither trigger configured the middleware isn't installed at all.
+    """
+
+    def __init__(self, app, sample_rate: int = PROFILE_SAMPLE_RATE, directory: str = PROFILE_DIR):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self._requests = 0
+        self._templates: Optional[Dict[int, str]] = None
+
+    def _should_profile(self, scope) -> bool:
+        self._requests += 1
+        if self.sample_rate > 0 and self._requests % self.sample_rate == 0:
+            return True
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return is_admin_token(value.decode("latin-1"))
+        return False
+
+    def _route(self, scope) -> str:
+        route = scope.get("route")
+        if route is None:
+            return UNMATCHED_ROUTE
+        if self._templates is None:
+            self._templates = route_templates(scope["app"])
+        return self._templates.get(id(route)) or getattr(route, "path", UNMATCHED_ROUTE)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        # Normally set by RequestIdMiddleware, so the profile matches the logs
+        request_id = current_request_id()
+        if request_id is None:
+            request_id = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+            if not _REQUEST_ID.match(request_id):
+                request_id = uuid.uuid4().hex
+        created = datetime.utcnow()
+        status = 500
+        profile_id = None
+
+        def current_id() -> str:
+            # Routing has happened by the time a response starts, so the id can name the route
+            nonlocal profile_id
+            if profile_id is None:
+                profile_id = make_profile_id(created, scope["method"], self._route(scope), request_id)
+            return profile_id
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", current_id().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        sampler = StackSampler(sys._getframe())
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            duration = time.perf_counter() - start
+            # Building the tables and writing the files would block the event loop
+            written = await run_in_threadpool(write_profile, sampler, {
+                "id": current_id(),
+                "request_id": request_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": self._route(scope),
+                "status": status,
+                "created_at": created.isoformat(),
+                "duration_ms": round(duration * 1000, 3),
+                "interval_ms": sampler.interval * 1000
+            }, self.directory)
+            if written:
+                logger.info(f"Profiled {scope['method']} {scope['path']} as {profile_id}")
@@ -0,0 +1,174 @@
+import os
+from typing import List, Optional, Union
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, selectinload
+
+from .. import models, schemas
+from .equipment import equipment_classifier
+from .response_cache import public_cache
+
+# Number of workouts buffered before they are written to the database
+IMPORT_BATCH_SIZE = int(os.getenv("PROGRAM_IMPORT_BATCH_SIZE", "50"))
+
+
+def validate_program(data: Union[dict, schemas.WorkoutProgramCreate]) -> schemas.WorkoutProgramCreate:
+    """Validate a full program tree before anything is written."""
+    if isinstance(data, schemas.WorkoutProgramCreate):
+        return data
+    return schemas.WorkoutProgramCreate.model_validate(data)
+
+
+class ProgramBuilder:
+    """
+    Writes a program and its workouts in batches inside a single transaction.
+
+    Workouts are validated as they are added and written with one multi-row
+    INSERT per batch, so memory is bounded by the batch size rather than the
+    size of the program. Nothing is visible to other sessions until commit().
+    """
+
+    def __init__(self, db: Session, creator_id: int, batch_size: int = IMPORT_BATCH_SIZE):
+        self.db = db
+        self.creator_id = creator_id
+        self.batch_size = batch_size
+        self.program_data: dict = {}
+        self.workout_count = 0
+        self.exercise_count = 0
+        self._pending: List[schemas.ProgramWorkoutCreate] = []
+        self._db_program: Optional[models.WorkoutProgram] = None
+
+    def set_program(self, **fields) -> None:
+        """Record program metadata; it may arrive before or after the workouts."""
+        self.program_data.update(fields)
+
+    def add_workout(self, workout: Union[dict, schemas.ProgramWorkoutCreate]) -> None:
+        if not isinstance(workout, schemas.ProgramWorkoutCreate):
+            workout = schemas.ProgramWorkoutCreate.model_validate(workout)
+        self._pending.append(workout)
+        self.workout_count += 1
+        self.exercise_count += len(workout.exercises or [])
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def _program_fields(self) -> dict:
+        return schemas.WorkoutProgramBase.model_validate(self.program_data).model_dump()
+
+    def _ensure_program(self) -> models.WorkoutProgram:
+        if self._db_program is None:
+            # Workouts may arrive before the name; it's filled in at commit time
+            fields = {**self.program_data}
+            fields.setdefault("name", "")
+            self._db_program = models.WorkoutProgram(
+                **schemas.WorkoutProgramBase.model_validate(fields).model_dump(),
+                creator_id=self.creator_id
+            )
+            self.db.add(self._db_program)
+            self.db.flush()
+        return self._db_program
+
+    def flush(self) -> None:
+        """Write buffered workouts and their exercises with one INSERT each."""
+        db_program = self._ensure_program()
+        workouts, self._pending = self._pending, []
+        if not workouts:
+            return
+
+        workout_ids = self.db.scalars(
+            insert(models.ProgramWorkout).returning(
+                models.ProgramWorkout.id, sort_by_parameter_order=True
+            ),
+            [
+                {
+                    "program_id": db_program.id,
+                    "name": workout.name,
+                    "week_number": workout.week_number,
+                    "day_number": workout.day_number,
+                    "order": workout.order,
+                    "template_id": workout.template_id
+                }
+                for workout in workouts
+            ]
+        ).all()
+
+        exercises = [
+            (workout_id, exercise)
+            for workout, workout_id in zip(workouts, workout_ids)
+            for exercise in workout.exercises or []
+        ]
+        # Label the whole batch in one pass; explicit values in the payload win
+        labels = equipment_classifier.classify_many([exercise.exercise_name for _, exercise in exercises])
+        exercise_rows = []
+        for (workout_id, exercise), label in zip(exercises, labels):
+            equipment = exercise.equipment or ("barbell" if exercise.is_barbell_exercise else label)
+            exercise_rows.append({
+                "program_workout_id": workout_id,
+                "exercise_name": exercise.exercise_name,
+                "sets": exercise.sets,
+                "initial_reps": exercise.initial_reps,
+                "target_reps": exercise.target_reps,
+                "initial_weight": exercise.initial_weight,
+                "progression_strategy": exercise.progression_strategy,
+                "progression_value": exercise.progression_value,
+                "progression_frequency": exercise.progression_frequency,
+                "order": exercise.order,
+                "notes": exercise.notes,
+                "category": exercise.category,
+                "is_barbell_exercise": exercise.is_barbell_exercise or equipment == "barbell",
+                "equipment": equipment
+            })
+        if exercise_rows:
+            self.db.execute(insert(models.ProgramExercise), exercise_rows)
+
+    def commit(self) -> models.WorkoutProgram:
+        """Write the remaining workouts, finalize the metadata and commit once."""
+        fields = self._program_fields()
+        self.flush()
+        db_program = self._db_program
+        for key, value in fields.items():
+            setattr(db_program, key, value)
+        self.db.commit()
+
+        # Drop any copy cached under a reused id
+        public_cache.invalidate("program", db_program.id)
+
+        return self.db.query(models.WorkoutProgram).options(
+            selectinload(models.WorkoutProgram.workouts).selectinload(models.ProgramWorkout.exercises)
+        ).filter(models.WorkoutProgram.id == db_program.id).populate_existing().one()
+
+    def rollback(self) -> None:
+        self._pending = []
+        self._db_program = None
+        self.db.rollback()
+
+
+def build_program(
+    db: Session,
+    data: Union[dict, schemas.WorkoutProgramCreate],
+    creator_id: int
+) -> models.WorkoutProgram:
+    """
+    Create a program with all of its workouts and exercises in one transaction.
+
+    The tree is validated up front, workouts and exercises are written with one
+    multi-row INSERT each, and the whole program is committed once, so a bad
+    row never leaves a partial program behind.
+
+    Args:
+        db: Database session
+        data: Program tree as a schema or a plain dict
+        creator_id: ID of the user creating the program
+
+    Returns:
+        The created program with workouts and exercises loaded
+    """
+    program = validate_program(data)
+    builder = ProgramBuilder(db, creator_id, batch_size=max(len(program.workouts or []), 1))
+    try:
+        builder.set_program(**program.model_dump(exclude={"workouts"}))
+        for workout in program.workouts or []:
+            builder.add_workout(workout)
+        return builder.commit()
+    except Exception:
+        builder.rollback()
+        raise
@@ -0,0 +1,300 @@
+import codecs
+import csv
+import json
+import os
+from typing import BinaryIO, Iterator, Tuple
+
+from sqlalchemy.orm import Session
+
+from .. import models
+from .program_builder import ProgramBuilder
+from .jobs import job_handler, JobContext, PermanentJobError, remove_file
+
+# Limits for uploaded programs, enforced while the upload is being read
+IMPORT_MAX_BYTES = int(os.getenv("PROGRAM_IMPORT_MAX_BYTES", str(10 * 1024 * 1024)))
+IMPORT_MAX_WORKOUTS = int(os.getenv("PROGRAM_IMPORT_MAX_WORKOUTS", "2000"))
+IMPORT_MAX_EXERCISES = int(os.getenv("PROGRAM_IMPORT_MAX_EXERCISES", "50000"))
+IMPORT_CHUNK_SIZE = 64 * 1024
+
+# A single JSON value (one workout, one metadata field) may not exceed this
+MAX_VALUE_CHARS = 1024 * 1024
+
+# Metadata defaults for JSON uploads that leave fields out
+JSON_IMPORT_DEFAULTS = {'description': '', 'duration_weeks': 8, 'is_public': False}
+
+
+class ImportLimitExceeded(ValueError):
+    """Raised when an upload is larger than the configured import limits."""
+
+
+class _TextChunks:
+    """Decodes a binary upload chunk by chunk, counting bytes against a limit."""
+
+    def __init__(self, stream: BinaryIO, max_bytes: int = IMPORT_MAX_BYTES, chunk_size: int = IMPORT_CHUNK_SIZE):
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.bytes_read = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+
+    def read(self) -> str:
+        """Return the next decoded chunk, or an empty string at the end of the upload."""
+        while True:
+            chunk = self.stream.read(self.chunk_size)
+            self.bytes_read += len(chunk)
+            if self.bytes_read > self.max_bytes:
+                raise ImportLimitExceeded(f"Upload exceeds the {self.max_bytes} byte limit")
+            text = self._decoder.decode(chunk, final=not chunk)
+            if text or not chunk:
+                return text
+
+    def __iter__(self) -> Iterator[str]:
+        """Yield lines with their endings, as csv.reader expects."""
+        rest = ""
+        while True:
+            text = self.read()
+            if not text:
+                break
+            buf = rest + text
+            start = 0
+            end = buf.find("\n")
+            while end >= 0:
+                yield buf[start:end + 1]
+                start = end + 1
+                end = buf.find("\n", start)
+            rest = buf[start:]
+        if rest:
+            yield rest
+
+
+class _JsonReader:
+    """Pulls successive JSON tokens and values out of a chunked text stream."""
+
+    def __init__(self, chunks: _TextChunks):
+        self.chunks = chunks
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        text = self.chunks.read()
+        if not text:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            found = repr(char) if char else "end of file"
+            raise ValueError(f"Invalid JSON format: expected {' or '.join(repr(c) for c in chars)}, found {found}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode one complete JSON value, reading more input until it's available."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buf) or self.eof or not self._fill():
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if len(self.buf) - self.pos > MAX_VALUE_CHARS:
+                    raise ImportLimitExceeded("A single JSON value exceeds the import size limit")
+                if not self._fill():
+                    raise ValueError(f"Invalid JSON format: {e.msg}")
+
+
+def iter_json_program(stream: BinaryIO) -> Iterator[Tuple[str, object]]:
+    """
+    Incrementally parse a program JSON document.
+
+    Yields ("program", {field: value}) for each top-level metadata field and
+    ("workout", dict) for each element of the "workouts" array as soon as it
+    has been read, without materializing the whole document.
+    """
+    reader = _JsonReader(_TextChunks(stream))
+    seen = set()
+
+    reader.expect("{")
+    if reader.peek() == "}":
+        reader.expect("}")
+    else:
+        while True:
+            key = reader.value()
+            if not isinstance(key, str):
+                raise ValueError("Invalid JSON format: object keys must be strings")
+            reader.expect(":")
+            seen.add(key)
+            if key == "workouts":
+                reader.expect("[")
+                if reader.peek() == "]":
+                    reader.expect("]")
+                else:
+                    while True:
+                        workout = reader.value()
+                        if not isinstance(workout, dict):
+                            raise ValueError("Invalid JSON format: workouts must be objects")
+                        yield "workout", workout
+                        if reader.expect(",]") == "]":
+                            break
+            else:
+                yield "program", {key: reader.value()}
+            if reader.expect(",}") == "}":
+                break
+
+    if reader.peek():
+        raise ValueError("Invalid JSON format: unexpected data after the program")
+    if "name" not in seen or "workouts" not in seen:
+        raise ValueError("Invalid JSON format: missing required fields")
+
+
+def iter_csv_program(stream: BinaryIO) -> Iterator[Tuple[str, object]]:
+    """
+    Incrementally parse a program CSV upload.
+
+    Rows carry a 'type' column: a 'program' row holds the metadata, each
+    'workout' row starts a workout and the 'exercise' rows after it belong to
+    that workout. A workout is yielded as soon as the next one starts.
+    """
+    current_workout = None
+    for row in csv.DictReader(_TextChunks(stream)):
+        if row.get('type') == 'program':
+            yield "program", {
+                'name': row.get('name', 'Imported Program'),
+                'description': row.get('description', ''),
+                'duration_weeks': int(row.get('duration_weeks', 8)),
+                'is_public': row.get('is_public', '').lower() == 'true'
+            }
+        elif row.get('type') == 'workout':
+            if current_workout:
+                yield "workout", current_workout
+
+            current_workout = {
+                'name': row.get('name', f"Week {row.get('week', 1)} Day {row.get('day', 1)}"),
+                'week_number': int(row.get('week', 1)),
+                'day_number': int(row.get('day', 1)),
+                'order': int(row.get('order', 0)),
+                'exercises': []
+            }
+        elif row.get('type') == 'exercise' and current_workout:
+            current_workout['exercises'].append({
+                'exercise_name': row.get('name', 'Exercise'),
+                'sets': int(row.get('sets', 3)),
+                'initial_reps': int(row.get('initial_reps', 8)),
+                'target_reps': int(row.get('target_reps', 12)),
+                'initial_weight': float(row.get('initial_weight', 0)) if row.get('initial_weight') else None,
+                'progression_strategy': row.get('progression', 'linear'),
+                'progression_value': float(row.get('progression_value', 5)),
+                'progression_frequency': int(row.get('progression_frequency', 1)),
+                'order': int(row.get('order', 0)),
+                'notes': row.get('notes', ''),
+                'category': row.get('category', ''),
+                'is_barbell_exercise': row.get('is_barbell', '').lower() == 'true',
+                'equipment': row.get('equipment') or None
+            })
+            if len(current_workout['exercises']) > IMPORT_MAX_EXERCISES:
+                raise ImportLimitExceeded(f"Program exceeds the {IMPORT_MAX_EXERCISES} exercise limit")
+
+    # Add the last workout if exists
+    if current_workout:
+        yield "workout", current_workout
+
+
+def import_program(
+    db: Session,
+    events: Iterator[Tuple[str, object]],
+    creator_id: int,
+    **defaults
+) -> models.WorkoutProgram:
+    """
+    Feed parsed program events into a ProgramBuilder in one transaction.
+
+    Args:
+        db: Database session
+        events: Output of iter_json_program or iter_csv_program
+        creator_id: ID of the user importing the program
+        defaults: Metadata used when the upload doesn't provide it
+
+    Returns:
+        The imported program with workouts and exercises loaded
+    """
+    builder = ProgramBuilder(db, creator_id)
+    builder.set_program(**defaults)
+    try:
+        for kind, payload in events:
+            if kind == "program":
+                builder.set_program(**payload)
+                continue
+            builder.add_workout(payload)
+            if builder.workout_count > IMPORT_MAX_WORKOUTS:
+                raise ImportLimitExceeded(f"Program exceeds the {IMPORT_MAX_WORKOUTS} workout limit")
+            if builder.exercise_count > IMPORT_MAX_EXERCISES:
+                raise ImportLimitExceeded(f"Program exceeds the {IMPORT_MAX_EXERCISES} exercise limit")
+        return builder.commit()
+    except Exception:
+        builder.rollback()
+        raise
+
+
+class _ProgressStream:
+    """Reports how far through a spooled upload the parser has read."""
+
+    def __init__(self, stream: BinaryIO, size: int, context: JobContext):
+        self.stream = stream
+        self.size = max(size, 1)
+        self.context = context
+
+    def read(self, size: int = -1) -> bytes:
+        # The parser pulls every chunk through here, so a cancelled job stops
+        # before the next one and import_program rolls back what it built
+        self.context.check_cancelled()
+        data = self.stream.read(size)
+        self.context.report(self.stream.tell() / self.size, "Importing workouts")
+        return data
+
+
+def _run_import(db: Session, context: JobContext, parse, defaults: dict) -> dict:
+    path = context.payload.get("path")
+    if not path or not os.path.exists(path):
+        raise PermanentJobError("Uploaded file is no longer available")
+    try:
+        with open(path, "rb") as upload:
+            stream = _ProgressStream(upload, os.path.getsize(path), context)
+            program = import_program(db, parse(stream), context.user_id, **defaults)
+    except Exception as e:
+        if isinstance(e, (ValueError, PermanentJobError)) or context.is_final_attempt:
+            remove_file(path)
+        raise
+    remove_file(path)
+    return {"program_id": program.id}
+
+
+@job_handler("import_program_csv")
+def run_csv_import(db: Session, context: JobContext) -> dict:
+    """Background version of the CSV program import."""
+    return _run_import(db, context, iter_csv_program, {})
+
+
+@job_handler("import_program_json")
+def run_json_import(db: Session, context: JobContext) -> dict:
+    """Background version of the JSON program import."""
+    return _run_import(db, context, iter_json_program, JSON_IMPORT_DEFAULTS)
@@ -0,0 +1,29 @@
+from sqlalchemy.orm import Session
+
+from . import activity, leaderboards, percentiles
+from .jobs import job_handler, JobContext, PermanentJobError
+
+RECOMPUTE_JOB = "recompute_stats"
+
+
+@job_handler(RECOMPUTE_JOB, submittable=True)
+def run_recompute(db: Session, context: JobContext) -> dict:
+    """
+    Recompute the user's stored stats from their full history: activity
+    bitmap, exercise bests and leaderboard scores, committed together.
+    """
+    if context.user_id is None:
+        raise PermanentJobError("Stats recomputation needs a user")
+    user_ids = [context.user_id]
+    steps = (
+        ("activity_words", lambda: len(activity.rebuild(db, user_ids))),
+        ("exercise_bests", lambda: percentiles.refresh(db, user_ids)),
+        ("leaderboard_scores", lambda: len(leaderboards.refresh(db, user_ids=user_ids))),
+    )
+    changed = {}
+    # No progress writes in between: they would wait on this transaction's locks
+    for name, step in steps:
+        context.check_cancelled()
+        changed[name] = step()
+    db.commit()
+    return {"changed": changed}
@@ -0,0 +1,175 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+from fastapi import Request, Response
+from starlette.datastructures import MutableHeaders
+
+from .fast_json import MSGPACK_MEDIA_TYPE, loads, msgpack_requested, packb
+
+# Size bounds for the shared cache of pre-serialized public resources
+PUBLIC_CACHE_MAX_ENTRIES = int(os.getenv("PUBLIC_CACHE_MAX_ENTRIES", "2048"))
+PUBLIC_CACHE_MAX_BYTES = int(os.getenv("PUBLIC_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Appended inside the quotes of a strong ETag sent on a gzip-compressed body
+GZIP_ETAG_SUFFIX = "-gzip"
+
+
+def compute_etag(body: bytes) -> str:
+    """Return a strong ETag for a serialized response body."""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check whether the request's If-None-Match header matches an ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison function
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        # The compressed body's tag validates the same representation
+        if candidate.endswith(GZIP_ETAG_SUFFIX + '"'):
+            candidate = candidate[:-len(GZIP_ETAG_SUFFIX) - 1] + '"'
+        if candidate == bare:
+            return True
+    return False
+
+
+def json_response(request: Request, body: bytes, etag: Optional[str] = None) -> Response:
+    """
+    Build a response for a serialized JSON body carrying an ETag, or a 304
+    if the client has it already. Clients that negotiated MessagePack get
+    the body converted, under an ETag of its own.
+    """
+    etag = etag or compute_etag(body)
+    media_type = "application/json"
+    if msgpack_requested.get():
+        etag = etag[:-1] + '.msgpack"'
+        media_type = MSGPACK_MEDIA_TYPE
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    if media_type == MSGPACK_MEDIA_TYPE:
+        body = packb(loads(body))
+    return Response(content=body, media_type=media_type, headers={"ETag": etag})
+
+
+class GZipETagMiddleware:
+    """
+    Gives gzip-compressed responses a strong ETag of their own: a strong
+    validator names exact bytes, so the identity and compressed bodies
+    can't share one. Added just outside GZipMiddleware; a 304 keeps the
+    suffix when the copy the client revalidated was the compressed one.
+    Weak ETags already allow either encoding and are left alone.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = ""
+        for name, value in scope["headers"]:
+            if name == b"if-none-match":
+                if_none_match = value.decode("latin-1")
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=list(message.get("headers", [])))
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    encoded = etag[:-1] + GZIP_ETAG_SUFFIX + '"'
+                    if headers.get("content-encoding") == "gzip" or (message["status"] == 304 and encoded in if_none_match):
+                        headers["etag"] = encoded
+                        message = {**message, "headers": headers.raw}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def json_array(parts: Iterable[bytes]) -> bytes:
+    """Join pre-serialized JSON objects into a JSON array."""
+    return b"[" + b",".join(parts) + b"]"
+
+
+class SerializedCache:
+    """
+    Process-wide LRU cache of pre-serialized JSON documents.
+
+    Entries are keyed by (kind, id) and tagged with the row's version; a lookup
+    with a newer version is a miss, so bumping the version on edit is enough to
+    invalidate every worker's copy.
+    """
+
+    def __init__(self, max_entries: int = PUBLIC_CACHE_MAX_ENTRIES, max_bytes: int = PUBLIC_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[int, bytes, str]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind: str, key: int, version: int) -> Optional[Tuple[bytes, str]]:
+        """Return (body, etag) for the given version, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((kind, key))
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, kind: str, key: int, version: int, body: bytes) -> str:
+        """Store a serialized document and return its ETag."""
+        etag = compute_etag(body)
+        if len(body) > self.max_bytes:
+            return etag
+        with self._lock:
+            old = self._entries.pop((kind, key), None)
+            if old is not None:
+                self._size -= len(old[1])
+            self._entries[(kind, key)] = (version, body, etag)
+            self._size += len(body)
+            while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted[1])
+        return etag
+
+    def invalidate(self, kind: str, key: int) -> None:
+        with self._lock:
+            old = self._entries.pop((kind, key), None)
+            if old is not None:
+                self._size -= len(old[1])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+
+def bump_version(db_obj) -> None:
+    """Mark a cached row as edited so stale serialized copies are ignored."""
+    db_obj.version = (db_obj.version or 0) + 1
+
+
+# Shared cache for public workout programs and workout templates
+public_cache = SerializedCache()
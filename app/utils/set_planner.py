@@ -0,0 +1,208 @@
+import os
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .plate_calculator import PlateSolver, default_solver
+
+# Warm-up ramp as fractions of the first work set, after a set with the empty bar
+WARMUP_RAMP = tuple(float(x) for x in os.getenv("WARMUP_RAMP", "0.4,0.6,0.8").split(",") if x.strip())
+
+# How far (as a fraction of the work weight) a warm-up may move to share plates
+WARMUP_TOLERANCE = float(os.getenv("WARMUP_TOLERANCE", "0.075"))
+
+WARMUP_REPS = 5
+WARMUP_CANDIDATES = 32  # Loadings considered per warm-up set
+
+# Extra plates per side a loading may carry if that saves moves later on
+LOADING_SLACK = 2
+
+Stack = Tuple[float, ...]  # Plates on one sleeve, innermost first
+
+
+def plate_moves(current: Stack, target: Stack) -> int:
+    """Plates moved per side to go from one loading to another, changing only the outside."""
+    shared = 0
+    for a, b in zip(current, target):
+        if a != b:
+            break
+        shared += 1
+    return len(current) + len(target) - 2 * shared
+
+
+def total_moves(plan: Sequence[Stack]) -> int:
+    """Plates moved per side to load every set in turn from an empty bar and strip it after."""
+    plan = list(plan)
+    return sum(plate_moves(a, b) for a, b in zip([()] + plan, plan + [()]))
+
+
+def warmup_weights(work_weight: float, solver: PlateSolver = default_solver,
+                   ramp: Sequence[float] = WARMUP_RAMP) -> List[float]:
+    """Ramp from the empty bar up to a work weight, rounded to loadable weights."""
+    top = solver.nearest_weight(work_weight)
+    if top <= solver.bar_weight:
+        return []
+    weights = [solver.bar_weight]
+    for fraction in ramp:
+        weight = solver.nearest_weight(work_weight * fraction)
+        if weights[-1] < weight < top:
+            weights.append(weight)
+    return weights
+
+
+def _cheapest_path(candidates: List[List[Tuple[Stack, float]]], start: Stack = ()) -> List[Stack]:
+    """
+    Pick one loading per set with the fewest plate moves.
+
+    candidates[i] holds (loading, penalty) pairs for set i. A DP over the sets
+    keeps, for every candidate, the cheapest way to reach it, compared by
+    moves, then penalty, then plates handled; the bar is stripped at the end.
+    """
+    costs = [(plate_moves(start, stack), penalty, len(stack)) for stack, penalty in candidates[0]]
+    back: List[List[int]] = [[0] * len(candidates[0])]
+    for i in range(1, len(candidates)):
+        previous = candidates[i - 1]
+        row_costs, row_back = [], []
+        for stack, penalty in candidates[i]:
+            best_cost, best_j = None, 0
+            for j, (prior, _) in enumerate(previous):
+                moves, penalties, plates = costs[j]
+                cost = (moves + plate_moves(prior, stack), penalties + penalty, plates + len(stack))
+                if best_cost is None or cost < best_cost:
+                    best_cost, best_j = cost, j
+            row_costs.append(best_cost)
+            row_back.append(best_j)
+        costs = row_costs
+        back.append(row_back)
+
+    last = candidates[-1]
+    index = min(range(len(last)), key=lambda j: (costs[j][0] + len(last[j][0]),) + costs[j][1:])
+    plan = []
+    for i in range(len(candidates) - 1, -1, -1):
+        plan.append(candidates[i][index][0])
+        index = back[i][index]
+    plan.reverse()
+    return plan
+
+
+def sequence_loadings(weights: Sequence[float], solver: PlateSolver = default_solver,
+                      slack: int = LOADING_SLACK, start: Stack = ()) -> List[Stack]:
+    """
+    Choose a loading for each weight, in order, with the fewest plate moves.
+
+    Each set may use any loading within `slack` plates of its minimum.
+    """
+    if not weights:
+        return []
+    return _cheapest_path([[(stack, 0) for stack in solver.loadings(weight, slack)] for weight in weights], start)
+
+
+def _warmup_candidates(target: float, top: float, solver: PlateSolver,
+                       achievable: List[float], tolerance: float) -> List[Tuple[Stack, float]]:
+    """Loadings for every weight near a warm-up target, penalized by the distance."""
+    if target <= solver.bar_weight:
+        return [((), 0)]
+    low = bisect_left(achievable, target - tolerance)
+    high = bisect_right(achievable, target + tolerance)
+    candidates = []
+    for weight in achievable[low:high]:
+        if solver.bar_weight < weight < top:
+            candidates.extend((stack, abs(weight - target)) for stack in solver.loadings(weight, 0, limit=4))
+    if not candidates:
+        return [(stack, 0) for stack in solver.loadings(target, 0, limit=4)]
+    # Loadings that share plates with heavier sets are built from few, heavy
+    # plates, so keeping the shortest bounds the DP without losing them
+    candidates.sort(key=lambda candidate: (len(candidate[0]), candidate[1]))
+    return candidates[:WARMUP_CANDIDATES]
+
+
+def _change(current: Stack, target: Stack) -> Tuple[List[float], List[float]]:
+    """Plates to take off (outermost first) and put on (innermost first)."""
+    shared = len(current) + len(target) - plate_moves(current, target)
+    shared //= 2
+    return list(reversed(current[shared:])), list(target[shared:])
+
+
+def plan_session(exercises: Sequence[Dict], solver: PlateSolver = default_solver,
+                 warmups: bool = True, slack: int = LOADING_SLACK) -> Dict:
+    """
+    Build an ordered loading plan for a barbell session.
+
+    Args:
+        exercises: Dicts with exercise_name, weights (work and back-off sets in
+            order), and optionally warmup (bool) and bar (exercises naming the
+            same bar share its plates; by default they all share one bar)
+        solver: Plate solver for the bar and inventory in use
+        warmups: Whether to ramp up to each exercise's first work set; a
+            warm-up may land within WARMUP_TOLERANCE of its ramp step when a
+            nearby weight shares more plates with the sets around it
+        slack: Extra plates per side a loading may use to save moves
+
+    Returns:
+        {"steps": [...], "plate_moves": int, "baseline_moves": int}, where moves
+        count plates per side including stripping each bar at the end, and the
+        baseline is what minimum-plate loadings for every set would cost
+    """
+    steps = []
+    for exercise in exercises:
+        work = list(exercise["weights"])
+        ramp = warmup_weights(work[0], solver) if warmups and work and exercise.get("warmup", True) else []
+        top = solver.nearest_weight(work[0]) if work else 0
+        for number, weight in enumerate(ramp, start=1):
+            steps.append((exercise, number, True, weight, top))
+        for number, weight in enumerate(work, start=1):
+            steps.append((exercise, number, False, weight, top))
+
+    # Bars are planned independently, each in session order
+    bars: Dict[Optional[str], List[int]] = {}
+    for index, step in enumerate(steps):
+        bars.setdefault(step[0].get("bar"), []).append(index)
+
+    achievable = solver.achievable_weights()
+    loadings: List[Stack] = [()] * len(steps)
+    plate_count = baseline = 0
+    for indexes in bars.values():
+        candidates = []
+        for i in indexes:
+            _, _, is_warmup, weight, top = steps[i]
+            if is_warmup:
+                candidates.append(_warmup_candidates(weight, top, solver, achievable, top * WARMUP_TOLERANCE))
+            else:
+                candidates.append([(stack, 0) for stack in solver.loadings(weight, slack)])
+        chain = _cheapest_path(candidates)
+        plate_count += total_moves(chain)
+        baseline += total_moves([solver.loadings(steps[i][3], 0)[0] for i in indexes])
+        for i, stack in zip(indexes, chain):
+            loadings[i] = stack
+
+    result_steps = []
+    on_bar: Dict[Optional[str], Stack] = {}
+    for (exercise, number, is_warmup, weight, _), stack in zip(steps, loadings):
+        bar = exercise.get("bar")
+        remove, add = _change(on_bar.get(bar, ()), stack)
+        on_bar[bar] = stack
+        result_steps.append({
+            "exercise_name": exercise["exercise_name"],
+            "set_number": number,
+            "is_warmup": is_warmup,
+            "target_weight": weight,
+            "actual_weight": round(solver.bar_weight + 2 * sum(stack), 2),
+            "plates_per_side": list(stack),
+            "plates_removed": remove,
+            "plates_added": add
+        })
+
+    return {"steps": result_steps, "plate_moves": plate_count, "baseline_moves": baseline}
+
+
+def loading_calculation(step: Dict, solver: PlateSolver = default_solver) -> Dict:
+    """Describe a planned step in the same shape as PlateSolver.solve()."""
+    target = step["actual_weight"] if step["is_warmup"] else step["target_weight"]
+    return {
+        "target_weight": target,
+        "bar_weight": solver.bar_weight,
+        "weight_per_side": max((target - solver.bar_weight) / 2, 0),
+        "plates_per_side": step["plates_per_side"],
+        "actual_weight": step["actual_weight"],
+        "unit": solver.unit,
+        "exact": abs(step["actual_weight"] - target) < 1e-6
+    }
@@ -0,0 +1,314 @@
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .metrics import METRICS_DIR, METRICS_FLUSH_SECONDS, UNMATCHED_ROUTE, route_templates
+from .query_stats import statement_shape
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are logged with their plan; 0 disables the log
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# Recent slow statements kept, and distinct statement shapes aggregated
+SLOW_QUERY_BUFFER = int(os.getenv("SLOW_QUERY_BUFFER", "500"))
+SLOW_QUERY_SHAPES = int(os.getenv("SLOW_QUERY_SHAPES", "1000"))
+# Fraction of captured plans taken with EXPLAIN ANALYZE (Postgres), which runs the statement again
+SLOW_QUERY_ANALYZE_RATE = float(os.getenv("SLOW_QUERY_ANALYZE_RATE", "0"))
+# A statement shape is explained at most once per this many seconds
+SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "60"))
+
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+_SAVEPOINT = "slow_query_explain"
+
+_request_scope: ContextVar[Optional[dict]] = ContextVar("slow_query_scope", default=None)
+
+
+def slow_query_log_enabled() -> bool:
+    return SLOW_QUERY_MS > 0
+
+
+def parameters_shape(parameters, executemany: bool = False) -> str:
+    """Types of the bound parameters, never their values."""
+    if executemany:
+        rows = list(parameters or [])
+        return f"{len(rows)} x {parameters_shape(rows[0])}" if rows else "0 rows"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+    return type(parameters).__name__
+
+
+def explain(dbapi_connection, dialect: str, statement: str, parameters, analyze: bool = False) -> Optional[str]:
+    """
+    Plan a statement on the connection that just ran it, so it sees the same
+    transaction. Raw DBAPI cursors don't fire engine events, so this isn't
+    timed or logged itself.
+
+    On Postgres the EXPLAIN runs inside a savepoint that is always rolled
+    back: a failed EXPLAIN can't abort the caller's transaction, and EXPLAIN
+    ANALYZE of a write leaves nothing behind. SQLite has no ANALYZE form, so
+    it gets EXPLAIN QUERY PLAN.
+    """
+    if not _EXPLAINABLE.match(statement):
+        return None
+    cursor = dbapi_connection.cursor()
+    try:
+        if dialect == "postgresql":
+            prefix = "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+            cursor.execute(f"SAVEPOINT {_SAVEPOINT}")
+            try:
+                cursor.execute(prefix + statement, parameters)
+                lines = [row[0] for row in cursor.fetchall()]
+            finally:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {_SAVEPOINT}")
+                cursor.execute(f"RELEASE SAVEPOINT {_SAVEPOINT}")
+            return "\n".join(lines)
+        if dialect == "sqlite":
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            depth = {0: -1}
+            lines = []
+            for node, parent, _, detail in cursor.fetchall():
+                depth[node] = depth.get(parent, -1) + 1
+                lines.append("  " * depth[node] + detail)
+            return "\n".join(lines)
+        cursor.execute("EXPLAIN " + statement, parameters)
+        return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+    except Exception as e:
+        logger.debug(f"Could not explain slow statement: {str(e)}")
+        return None
+    finally:
+        cursor.close()
+
+
+class SlowQueryLog:
+    """
+    Slow statements of this process: the most recent ones in a ring buffer,
+    and running totals per statement shape to rank the worst offenders.
+
+    Statements can finish on any threadpool thread, so updates take a lock;
+    the lock is only reached by statements over the threshold.
+    """
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, buffer_size: int = SLOW_QUERY_BUFFER,
+                 max_shapes: int = SLOW_QUERY_SHAPES, analyze_rate: float = SLOW_QUERY_ANALYZE_RATE,
+                 explain_interval: float = SLOW_QUERY_EXPLAIN_INTERVAL):
+        self.threshold = threshold_ms / 1000
+        self.max_shapes = max_shapes
+        self.analyze_rate = analyze_rate
+        self.explain_interval = explain_interval
+        self.recent: Deque[dict] = deque(maxlen=buffer_size)
+        self.shapes: Dict[str, dict] = {}
+        self._explained: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def record(self, statement: str, parameters, seconds: float, executemany: bool = False,
+               route: str = UNMATCHED_ROUTE, plan: Optional[str] = None, analyzed: bool = False) -> None:
+        shape = statement_shape(statement)
+        entry = {
+            "statement": shape,
+            "parameters": parameters_shape(parameters, executemany),
+            "duration_ms": round(seconds * 1000, 3),
+            "route": route,
+            "at": datetime.utcnow().isoformat(),
+            "plan": plan,
+            "analyzed": analyzed
+        }
+        with self._lock:
+            self.recent.append(entry)
+            stats = self.shapes.get(shape)
+            if stats is None:
+                if len(self.shapes) >= self.max_shapes:
+                    # Forget the shape that has cost the least so far
+                    del self.shapes[min(self.shapes, key=lambda key: self.shapes[key]["total_ms"])]
+                stats = self.shapes[shape] = {
+                    "statement": shape, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "routes": {}, "plan": None,
+                    "analyzed": False
+                }
+            stats["count"] += 1
+            stats["total_ms"] += entry["duration_ms"]
+            stats["max_ms"] = max(stats["max_ms"], entry["duration_ms"])
+            stats["routes"][route] = stats["routes"].get(route, 0) + 1
+            if plan:
+                stats["plan"] = plan
+                stats["analyzed"] = analyzed
+        self.maybe_flush(time.monotonic())
+
+    def should_explain(self, statement: str) -> bool:
+        """Rate-limit plans per statement shape so a hot slow query isn't explained every time."""
+        shape = statement_shape(statement)
+        now = time.monotonic()
+        with self._lock:
+            last = self._explained.get(shape)
+            if last is not None and now - last < self.explain_interval:
+                return False
+            if len(self._explained) >= self.max_shapes:
+                self._explained.clear()
+            self._explained[shape] = now
+        return True
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "shapes": [dict(stats, routes=dict(stats["routes"])) for stats in self.shapes.values()],
+                "recent": list(self.recent)
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self.recent.clear()
+            self.shapes.clear()
+            self._explained.clear()
+
+    def maybe_flush(self, now: float) -> None:
+        """Share this worker's log through METRICS_DIR at most every METRICS_FLUSH_SECONDS."""
+        if METRICS_DIR and now - self._last_flush >= METRICS_FLUSH_SECONDS:
+            self._last_flush = now
+            self.flush()
+
+    def flush(self) -> None:
+        if not METRICS_DIR:
+            return
+        try:
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            path = os.path.join(METRICS_DIR, f"slow-queries-{os.getpid()}.json")
+            tmp = f"{path}.tmp"
+            with open(tmp, "w") as out:
+                json.dump(self.snapshot(), out)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not write slow query snapshot: {str(e)}")
+
+
+slow_query_log = SlowQueryLog()
+
+
+_templates: Dict[int, Dict[int, str]] = {}  # Route templates per app
+
+
+def _route(scope: Optional[dict]) -> str:
+    if scope is None:
+        return UNMATCHED_ROUTE
+    route = scope.get("route")
+    if route is None:
+        return f"{scope['method']} {UNMATCHED_ROUTE}"
+    app = scope.get("app")
+    templates = _templates.get(id(app))
+    if templates is None:
+        templates = _templates[id(app)] = route_templates(app) if app is not None else {}
+    return f"{scope['method']} {templates.get(id(route)) or getattr(route, 'path', UNMATCHED_ROUTE)}"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("slow_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    log = slow_query_log
+    if elapsed < log.threshold or log.threshold <= 0:
+        return
+    plan, analyzed = None, False
+    if log.should_explain(statement):
+        analyzed = conn.dialect.name == "postgresql" and random.random() < log.analyze_rate
+        plan_parameters = parameters[0] if executemany and parameters else parameters
+        plan = explain(conn.connection.dbapi_connection, conn.dialect.name, statement, plan_parameters, analyzed)
+    route = _route(_request_scope.get())
+    log.record(statement, parameters, elapsed, executemany, route, plan, analyzed and plan is not None)
+    logger.warning(f"Slow query ({elapsed * 1000:.0f} ms) in {route}: {statement_shape(statement)[:300]}")
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("slow_query_start"):
+        connection.info["slow_query_start"].pop()
+
+
+_installed = False
+
+
+def install_slow_query_hooks() -> None:
+    """Time every engine's statements against the threshold; safe to call more than once."""
+    global _installed
+    if _installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+    _installed = True
+
+
+class SlowQueryMiddleware:
+    """Makes the request being served visible to the slow query hooks, to name its route."""
+
+    def __init__(self, app):
+        self.app = app
+        install_slow_query_hooks()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
+
+
+def top_offenders(snapshots: List[dict], limit: int = 20) -> List[dict]:
+    """Merge worker snapshots and rank statement shapes by total time."""
+    merged: Dict[str, dict] = {}
+    for snapshot in snapshots:
+        for stats in snapshot.get("shapes", []):
+            current = merged.get(stats["statement"])
+            if current is None:
+                merged[stats["statement"]] = dict(stats, routes=dict(stats["routes"]))
+                continue
+            current["count"] += stats["count"]
+            current["total_ms"] += stats["total_ms"]
+            current["max_ms"] = max(current["max_ms"], stats["max_ms"])
+            for route, count in stats["routes"].items():
+                current["routes"][route] = current["routes"].get(route, 0) + count
+            if stats.get("plan") and not current.get("plan"):
+                current["plan"] = stats["plan"]
+                current["analyzed"] = stats.get("analyzed", False)
+    ranked = sorted(merged.values(), key=lambda stats: stats["total_ms"], reverse=True)[:limit]
+    for stats in ranked:
+        stats["total_ms"] = round(stats["total_ms"], 3)
+        stats["mean_ms"] = round(stats["total_ms"] / stats["count"], 3)
+    return ranked
+
+
+def collect(log: SlowQueryLog = slow_query_log) -> List[dict]:
+    """This worker's log plus the snapshots other workers left in METRICS_DIR."""
+    snapshots = [log.snapshot()]
+    if not METRICS_DIR or not os.path.isdir(METRICS_DIR):
+        return snapshots
+    for name in os.listdir(METRICS_DIR):
+        if not (name.startswith("slow-queries-") and name.endswith(".json")):
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if snapshot.get("pid") != os.getpid():
+            snapshots.append(snapshot)
+    return snapshots
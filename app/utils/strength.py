@@ -0,0 +1,190 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .archive import entry_history, session_history
+
+try:
+    import numpy as np
+except ImportError:  # Analytics endpoints answer 503 without it
+    np = None
+
+FORMULAS = ("epley", "brzycki")
+# Weeks looked back over for the rolling best e1RM
+ROLLING_WEEKS = 12
+# Weeks of weekly bests the trend line is fitted to
+TREND_WEEKS = 26
+# Goals the trend reaches later than this get no projected date
+PROJECTION_WEEKS = 520
+
+# 1970-01-01 was a Thursday; shifting by three days starts weeks on Monday
+_WEEK_OFFSET = 3
+
+
+def history_arrays(db: Session, user_id: int) -> dict:
+    """
+    Every loaded set a member has logged, archived sessions included, as
+    column arrays in one query: exercise codes into `names`, day numbers
+    since the epoch, sets, reps and weights.
+    """
+    rows = db.execute(
+        select(entry_history.c.exercise_name, session_history.c.date, entry_history.c.sets,
+               entry_history.c.reps, entry_history.c.weight)
+        .join(session_history, session_history.c.id == entry_history.c.session_id)
+        .where(session_history.c.user_id == user_id, session_history.c.date.isnot(None),
+               entry_history.c.weight > 0, entry_history.c.reps > 0, entry_history.c.sets > 0)
+    ).all()
+    if not rows:
+        return {"names": [], "exercise": np.zeros(0, dtype=np.int64), "day": np.zeros(0, dtype=np.int64),
+                "sets": np.zeros(0), "reps": np.zeros(0), "weight": np.zeros(0)}
+    names, dates, sets, reps, weights = zip(*rows)
+    unique, codes = np.unique(np.array(names, dtype=object), return_inverse=True)
+    return {
+        "names": unique.tolist(),
+        "exercise": codes.astype(np.int64),
+        "day": np.array(dates, dtype="datetime64[D]").astype(np.int64),
+        "sets": np.array(sets, dtype=np.float64),
+        "reps": np.array(reps, dtype=np.float64),
+        "weight": np.array(weights, dtype=np.float64),
+    }
+
+
+def estimated_1rm(weight, reps, formula: str = "epley"):
+    """Estimated one-rep max of each set; a single is its own max."""
+    if formula == "brzycki":
+        # The formula breaks down at 37 reps, where its denominator reaches zero
+        estimate = weight * 36.0 / (37.0 - np.minimum(reps, 36.0))
+    else:
+        estimate = weight * (1.0 + reps / 30.0)
+    return np.where(reps == 1, weight, estimate)
+
+
+def week_number(day):
+    return (day + _WEEK_OFFSET) // 7
+
+
+def week_start(week: int) -> date:
+    return date(1970, 1, 1) + timedelta(days=int(week) * 7 - _WEEK_OFFSET)
+
+
+def _rolling_max(matrix, window: int):
+    padded = np.pad(matrix, ((0, 0), (window - 1, 0)))
+    return np.lib.stride_tricks.sliding_window_view(padded, window, axis=1).max(axis=2)
+
+
+def _trend(weekly_best, trend_weeks: int):
+    """
+    Least-squares line through each exercise's weekly bests over the last
+    trend_weeks, all exercises at once. x is in weeks before the current
+    one, so the intercept is the fitted e1RM now.
+    """
+    recent = weekly_best[:, -trend_weeks:]
+    mask = recent > 0
+    x = np.arange(-recent.shape[1] + 1, 1, dtype=np.float64)
+    n = mask.sum(axis=1)
+    sx = (mask * x).sum(axis=1)
+    sy = recent.sum(axis=1)
+    sxx = (mask * x * x).sum(axis=1)
+    sxy = (recent * x).sum(axis=1)
+    denominator = n * sxx - sx * sx
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(denominator > 0, (n * sxy - sx * sy) / denominator, np.nan)
+        intercept = np.where(n > 0, (sy - slope * sx) / n, np.nan)
+    return slope, intercept, n
+
+
+def _series(values) -> List[Optional[float]]:
+    # Weeks without data are null rather than zero
+    return [round(value, 1) if value > 0 else None for value in values.tolist()]
+
+
+def strength_report(arrays: dict, formula: str = "epley", weeks: int = 52, goals: Optional[Dict[str, float]] = None,
+                    rolling_weeks: int = ROLLING_WEEKS, trend_weeks: int = TREND_WEEKS,
+                    today: Optional[date] = None) -> dict:
+    """
+    Per-exercise e1RM trends from history_arrays(), computed for every
+    exercise in the same array operations: weekly best e1RM, its rolling
+    best, weekly volume and intensity (average load as a share of the
+    rolling best), and a trend line with the date it reaches any goal.
+    Series cover the last `weeks` weeks; bests and trends use all history.
+    """
+    goals = goals or {}
+    today = today or datetime.utcnow().date()
+    current_week = int(week_number(np.datetime64(today, "D").astype(np.int64)))
+    names = arrays["names"]
+    if not names:
+        return {"formula": formula, "weeks": [week_start(w).isoformat() for w in
+                                             range(current_week - weeks + 1, current_week + 1)], "exercises": []}
+
+    exercise, day, sets, reps, weight = (arrays[key] for key in ("exercise", "day", "sets", "reps", "weight"))
+    e1rm = estimated_1rm(weight, reps, formula)
+    first_week = int(week_number(day.min()))
+    span = max(current_week - first_week + 1, weeks, rolling_weeks, trend_weeks)
+    first_week = current_week - span + 1
+    column = week_number(day) - first_week
+    # Sessions dated in the future land in the current week
+    column = np.minimum(column, span - 1)
+
+    shape = (len(names), span)
+    weekly_best = np.zeros(shape)
+    np.maximum.at(weekly_best, (exercise, column), e1rm)
+    volume = np.zeros(shape)
+    np.add.at(volume, (exercise, column), sets * reps * weight)
+    rep_count = np.zeros(shape)
+    np.add.at(rep_count, (exercise, column), sets * reps)
+
+    rolling_best = _rolling_max(weekly_best, rolling_weeks)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        intensity = np.where((rep_count > 0) & (rolling_best > 0), volume / rep_count / rolling_best * 100, 0)
+    slope, intercept, fitted_weeks = _trend(weekly_best, trend_weeks)
+
+    # The best set of each exercise: order by e1RM, then take each exercise's last
+    order = np.lexsort((e1rm, exercise))
+    last = np.r_[exercise[order][1:] != exercise[order][:-1], True]
+    best = order[last]
+    total_sets = np.bincount(exercise, weights=sets, minlength=len(names))
+
+    window = slice(span - weeks, span)
+    exercises = []
+    for i, name in enumerate(names):
+        report = {
+            "exercise": name,
+            "best_e1rm": round(float(e1rm[best[i]]), 1),
+            "best_e1rm_date": np.datetime64(int(day[best[i]]), "D").item().isoformat(),
+            "total_sets": int(total_sets[i]),
+            "weekly_best_e1rm": _series(weekly_best[i, window]),
+            "rolling_best_e1rm": _series(rolling_best[i, window]),
+            "weekly_volume": _series(volume[i, window]),
+            "weekly_intensity": _series(intensity[i, window]),
+            "trend": None,
+            "goal": None,
+        }
+        if fitted_weeks[i] >= 2 and not np.isnan(slope[i]):
+            report["trend"] = {
+                "e1rm_per_week": round(float(slope[i]), 2),
+                "fitted_e1rm": round(float(intercept[i]), 1),
+                "weeks_fitted": int(fitted_weeks[i]),
+            }
+        if name in goals:
+            report["goal"] = _projection(goals[name], report, slope[i], intercept[i], today)
+        exercises.append(report)
+
+    return {
+        "formula": formula,
+        "weeks": [week_start(w).isoformat() for w in range(current_week - weeks + 1, current_week + 1)],
+        "exercises": exercises,
+    }
+
+
+def _projection(goal: float, report: dict, slope: float, intercept: float, today: date) -> dict:
+    projection = {"weight": goal, "reached": report["best_e1rm"] >= goal, "projected_date": None}
+    if projection["reached"] or report["trend"] is None or not slope > 0:
+        return projection
+    weeks_left = max((goal - intercept) / slope, 0.0)
+    # A nearly flat trend puts the goal centuries away, or past date.max
+    if weeks_left > PROJECTION_WEEKS:
+        return projection
+    projection["projected_date"] = (today + timedelta(days=round(weeks_left * 7))).isoformat()
+    return projection
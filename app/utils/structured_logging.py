@@ -0,0 +1,228 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" for one JSON object per line, "text" for plain lines
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# Records waiting for the writer thread; when full, new records are dropped
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Fraction of request payloads logged, and the size they're cut to
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+LOG_PAYLOAD_MAX_BYTES = int(os.getenv("LOG_PAYLOAD_MAX_BYTES", "2048"))
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"
+
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9-]{1,64}$")
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+
+class LazyPayload:
+    """
+    A request payload to log, serialized only if and when the writer thread
+    formats the record. Pass values that are safe to read from another
+    thread: pydantic models or plain data, not ORM objects.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def render(self, max_bytes: int = LOG_PAYLOAD_MAX_BYTES):
+        value = self.value
+        if hasattr(value, "model_dump"):
+            value = value.model_dump(mode="json")
+        text = json.dumps(value, default=str)
+        if len(text) <= max_bytes:
+            return value
+        return {"truncated": True, "bytes": len(text), "preview": text[:max_bytes]}
+
+
+def log_payload(logger: logging.Logger, message: str, payload, *args, level: int = logging.INFO) -> None:
+    """Log a request payload for a sampled fraction of calls; the rest cost a level check and a random()."""
+    if logger.isEnabledFor(level) and random.random() < LOG_PAYLOAD_SAMPLE_RATE:
+        logger.log(level, message, *args, extra={"payload": LazyPayload(payload)})
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the request id and any `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value.render() if isinstance(value, LazyPayload) else value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        payload = getattr(record, "payload", None)
+        if isinstance(payload, LazyPayload):
+            text += f" payload={json.dumps(payload.render(), default=str)}"
+        return text
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread without formatting them.
+
+    The stdlib QueueHandler formats each record on the calling thread so it
+    can be pickled; this queue never leaves the process, so the message, its
+    arguments and any traceback are formatted by the writer instead. Only the
+    request id is captured here, since it lives in the caller's context. When
+    the queue is full the record is dropped and counted rather than blocking
+    the request.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_var.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def take_dropped(self) -> int:
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        return dropped
+
+
+class _Writer(logging.Handler):
+    """Writes records on the listener thread and reports records dropped since the last one."""
+
+    def __init__(self, target: logging.Handler, source: NonBlockingQueueHandler):
+        super().__init__()
+        self.target = target
+        self.source = source
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        dropped = self.source.take_dropped()
+        if dropped:
+            notice = logging.LogRecord(__name__, logging.WARNING, __file__, 0,
+                                       "Dropped %d log records: the log queue was full", (dropped,), None)
+            notice.request_id = None
+            self.target.handle(notice)
+        if record.levelno >= self.target.level:
+            self.target.handle(record)
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.target.emit(record)
+
+
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream=None,
+                      queue_size: int = LOG_QUEUE_SIZE) -> QueueListener:
+    """
+    Route the root logger, and uvicorn's, through a bounded queue to one
+    background writer thread. Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT))
+
+    log_queue: queue.Queue = queue.Queue(queue_size)
+    handler = NonBlockingQueueHandler(log_queue)
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+    # uvicorn writes its access log synchronously on the event loop otherwise
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+    _listener = QueueListener(log_queue, _Writer(output, handler))
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging() -> None:
+    """Write out queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """
+    Gives every request an id, taken from a well-formed X-Request-ID header
+    or generated, that log records and profiles carry and the response echoes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if request_id is None or not _REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
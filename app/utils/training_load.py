@@ -0,0 +1,157 @@
+from collections import deque
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .. import models
+from .archive import entry_history, session_history
+
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+
+
+# Loads are summed as integer millionths, so a window's sums are exact:
+# float sums that values keep entering and leaving drift, and a window of
+# rest days came out a hair either side of zero instead of zero
+_SCALE = 1_000_000
+
+
+class Window:
+    """Sum and sum of squares over the last `size` values, updated in O(1) per value."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.values: deque = deque()
+        self._total = 0
+        self._squares = 0
+
+    def push(self, value: float) -> None:
+        scaled = round(value * _SCALE)
+        self.values.append(scaled)
+        self._total += scaled
+        self._squares += scaled * scaled
+        if len(self.values) > self.size:
+            dropped = self.values.popleft()
+            self._total -= dropped
+            self._squares -= dropped * dropped
+
+    @property
+    def total(self) -> float:
+        return self._total / _SCALE
+
+    @property
+    def mean(self) -> float:
+        # Days before the first session count as rest days
+        return self.total / self.size
+
+    @property
+    def stdev(self) -> float:
+        # size² x variance, in millionths², is an exact integer
+        return (self.size * self._squares - self._total ** 2) ** 0.5 / (self.size * _SCALE)
+
+
+class TrainingLoad:
+    """
+    Acute:chronic workload ratio, monotony and strain over a daily load
+    series, fed one day at a time; rest days must be pushed as zero.
+
+    Acute load is the last 7 days' total and chronic load the weekly
+    average over the last 28 (the rolling-average ACWR, so the acute week
+    is part of the chronic one). Monotony is the week's mean daily load
+    over its standard deviation, and strain the week's load times its
+    monotony (Foster).
+    """
+
+    def __init__(self):
+        self.acute = Window(ACUTE_DAYS)
+        self.chronic = Window(CHRONIC_DAYS)
+
+    def push(self, load: float) -> dict:
+        self.acute.push(load)
+        self.chronic.push(load)
+        acute = self.acute.total
+        chronic = self.chronic.total * ACUTE_DAYS / CHRONIC_DAYS
+        stdev = self.acute.stdev
+        # A week of identical days (rest included) has no defined monotony
+        monotony = self.acute.mean / stdev if stdev > 0 else None
+        return {
+            "load": round(load, 1),
+            "acute": round(acute, 1),
+            "chronic": round(chronic, 1),
+            "acwr": round(acute / chronic, 2) if chronic > 0 else None,
+            "monotony": round(monotony, 2) if monotony is not None else None,
+            "strain": round(acute * monotony, 1) if monotony is not None else None,
+        }
+
+
+def _day(value) -> date:
+    # SQLite's date() returns text, Postgres a date
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _load_query(sessions=session_history, entries=entry_history):
+    day = func.date(sessions.c.date)
+    return select(
+        sessions.c.user_id, day,
+        func.sum(entries.c.sets * entries.c.reps * func.coalesce(entries.c.weight, 0))
+    ).join(
+        sessions, sessions.c.id == entries.c.session_id
+    ).where(sessions.c.date.isnot(None)).group_by(sessions.c.user_id, day)
+
+
+def daily_loads(db: Session, user_id: int) -> Dict[date, float]:
+    """Volume load (sets x reps x weight) per training day across a member's whole history."""
+    rows = db.execute(_load_query().where(session_history.c.user_id == user_id)).all()
+    return {_day(day): float(load or 0) for _, day, load in rows}
+
+
+def load_series(loads: Dict[date, float], end: date, start: Optional[date] = None) -> Iterator[Tuple[date, dict]]:
+    """Each day's metrics from the first training day (or `start`, if earlier) through `end`."""
+    if not loads and start is None:
+        return
+    day = min([*loads, start] if start else loads)
+    metrics = TrainingLoad()
+    while day <= end:
+        yield day, metrics.push(loads.get(day, 0.0))
+        day += timedelta(days=1)
+
+
+def history(db: Session, user_id: int, days: Optional[int] = None, today: Optional[date] = None) -> List[dict]:
+    """A member's daily series, or its last `days` days; earlier history still warms the windows."""
+    today = today or datetime.utcnow().date()
+    first = today - timedelta(days=days - 1) if days else None
+    return [
+        {"date": day.isoformat(), **values}
+        for day, values in load_series(daily_loads(db, user_id), today, start=first)
+        if first is None or day >= first
+    ]
+
+
+def todays_loads(db: Session, today: Optional[date] = None) -> Iterable[dict]:
+    """
+    Today's metrics for every active member who trained in the last 28
+    days: one query for all of them over just the chronic window, since
+    older days have left every window. That window is never archived, so
+    only the hot tables are read.
+    """
+    sessions = models.WorkoutSession.__table__
+    today = today or datetime.utcnow().date()
+    first = today - timedelta(days=CHRONIC_DAYS - 1)
+    since = datetime.combine(first, datetime.min.time())
+    until = datetime.combine(today + timedelta(days=1), datetime.min.time())
+    active = select(models.User.id).where(models.User.is_active.is_(True))
+    rows = db.execute(
+        _load_query(sessions, models.WorkoutEntry.__table__)
+        .where(sessions.c.date >= since, sessions.c.date < until, sessions.c.user_id.in_(active))
+        .order_by(sessions.c.user_id)
+    ).all()
+    by_user: Dict[int, Dict[date, float]] = {}
+    for user_id, day, load in rows:
+        by_user.setdefault(user_id, {})[_day(day)] = float(load or 0)
+    for user_id, loads in by_user.items():
+        metrics = TrainingLoad()
+        for offset in range(CHRONIC_DAYS):
+            values = metrics.push(loads.get(first + timedelta(days=offset), 0.0))
+        yield {"user_id": user_id, "date": today.isoformat(), **values}
@@ -0,0 +1,42 @@
+"""
+Standalone background job worker.
+
+Run with `python -m app.worker` and set JOB_WORKERS=0 on the API so jobs
+only run here. JOB_SPOOL_DIR must point at storage shared with the API.
+"""
+import logging
+import signal
+import threading
+
+from .database import init_db
+from .utils.jobs import JobRunner, JOB_WORKERS
+from .utils.structured_logging import configure_logging, stop_logging
+# Importing these modules registers their job handlers, and the session
+# hooks that bump data versions for conditional GETs and keep leaderboards and
+# percentile sketches current
+from .utils import program_import, exports, recompute, data_versions, leaderboards, percentiles  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    configure_logging()
+    init_db()
+    runner = JobRunner(workers=max(JOB_WORKERS, 1))
+    stopped = threading.Event()
+
+    def handle_signal(signum, frame):
+        stopped.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    runner.start()
+    stopped.wait()
+    logger.info("Stopping job workers")
+    runner.stop()
+    stop_logging()
+
+
+if __name__ == "__main__":
+    main()
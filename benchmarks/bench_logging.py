@@ -0,0 +1,88 @@
+"""
+Benchmark the cost of logging on the request thread: synchronous handler vs. the queue.
+
+Usage:
+    python -m benchmarks.bench_logging [--records 20000] [--write-delay-us 50]
+
+Each record carries a workout-sized payload. The output stream sleeps for
+--write-delay-us per write to stand in for a slow disk or log shipper; the
+numbers are the time each logging call holds up its caller.
+"""
+import argparse
+import io
+import logging
+import queue
+import time
+from logging.handlers import QueueListener
+
+from app.utils.structured_logging import JsonFormatter, LazyPayload, NonBlockingQueueHandler
+
+
+class _SlowStream(io.StringIO):
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    def write(self, text):
+        time.sleep(self.delay)
+        return len(text)
+
+
+PAYLOAD = {
+    "date": "2024-05-01T07:30:00",
+    "notes": "Heavy day",
+    "entries": [
+        {"exercise_name": "Back Squat", "sets": 5, "reps": 5, "weight": 315.0, "category": "Legs", "difficulty": 8}
+        for _ in range(12)
+    ]
+}
+
+
+def _time_calls(logger: logging.Logger, records: int) -> list:
+    timings = []
+    for i in range(records):
+        start = time.perf_counter()
+        logger.info("Creating workout %s", i, extra={"payload": LazyPayload(PAYLOAD)})
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)
+
+
+def _report(label: str, timings: list) -> None:
+    def pct(p):
+        return timings[min(int(p * len(timings)), len(timings) - 1)] * 1e6
+    print(f"{label:>10}: p50 {pct(0.5):8.1f} us  p99 {pct(0.99):8.1f} us  max {timings[-1] * 1e6:9.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--write-delay-us", type=float, default=50)
+    args = parser.parse_args()
+    delay = args.write_delay_us / 1e6
+
+    sync_logger = logging.getLogger("bench.sync")
+    sync_logger.propagate = False
+    sync_logger.setLevel(logging.INFO)
+    handler = logging.StreamHandler(_SlowStream(delay))
+    handler.setFormatter(JsonFormatter())
+    sync_logger.addHandler(handler)
+    _report("sync", _time_calls(sync_logger, args.records))
+
+    queued_logger = logging.getLogger("bench.queued")
+    queued_logger.propagate = False
+    queued_logger.setLevel(logging.INFO)
+    queue_handler = NonBlockingQueueHandler(queue.Queue(args.records + 1))
+    queued_logger.addHandler(queue_handler)
+    output = logging.StreamHandler(_SlowStream(delay))
+    output.setFormatter(JsonFormatter())
+    listener = QueueListener(queue_handler.queue, output)
+    listener.start()
+    _report("queued", _time_calls(queued_logger, args.records))
+    start = time.perf_counter()
+    listener.stop()
+    print(f"Writer drained the queue {time.perf_counter() - start:.2f}s after the last call; "
+          f"{queue_handler.dropped} records dropped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark the per-request cost of the metrics middleware.
+
+Usage:
+    python -m benchmarks.bench_metrics [--requests 200000] [--routes 40]
+
+Calls a bare ASGI app directly, with and without MetricsMiddleware, so the
+difference is the middleware alone rather than HTTP parsing or routing.
+"""
+import argparse
+import asyncio
+import time
+
+from app.utils.metrics import MetricsMiddleware, RequestMetrics
+
+
+class _Route:
+    def __init__(self, path: str):
+        self.path = path
+
+
+class _App:
+    """Stands in for FastAPI: sets the matched route and sends a response."""
+
+    def __init__(self, routes):
+        self.routes = []
+        self._routes = routes
+
+    async def __call__(self, scope, receive, send):
+        scope["route"] = self._routes[scope["index"]]
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def _run(app, scopes, requests: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for i in range(requests):
+        scope = scopes[i % len(scopes)]
+        await app(dict(scope), receive, send)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--routes", type=int, default=40)
+    args = parser.parse_args()
+
+    routes = [_Route(f"/resource-{i}/{{item_id}}") for i in range(args.routes)]
+    inner = _App(routes)
+    scopes = [
+        {"type": "http", "method": method, "path": f"/resource-{i}/1", "index": i, "app": inner}
+        for i in range(args.routes) for method in ("GET", "POST")
+    ]
+    wrapped = MetricsMiddleware(inner, RequestMetrics())
+
+    loop = asyncio.new_event_loop()
+    try:
+        # Warm up both paths, then alternate to even out noise
+        loop.run_until_complete(_run(inner, scopes, 1000))
+        loop.run_until_complete(_run(wrapped, scopes, 1000))
+        bare = min(loop.run_until_complete(_run(inner, scopes, args.requests)) for _ in range(3))
+        timed = min(loop.run_until_complete(_run(wrapped, scopes, args.requests)) for _ in range(3))
+    finally:
+        loop.close()
+
+    per_bare = bare / args.requests * 1e6
+    per_timed = timed / args.requests * 1e6
+    print(f"{args.requests} requests over {len(scopes)} series")
+    print(f"   without middleware: {per_bare:6.2f} us/request")
+    print(f"      with middleware: {per_timed:6.2f} us/request")
+    print(f"             overhead: {per_timed - per_bare:6.2f} us/request")
+
+
+if __name__ == "__main__":
+    main()
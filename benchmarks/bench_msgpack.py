@@ -0,0 +1,94 @@
+"""
+Benchmark MessagePack against JSON for the largest responses: payload size, encode and decode time.
+
+Usage:
+    python -m benchmarks.bench_msgpack [--weeks 12] [--days 4] [--exercises 8] [--repeat 200]
+
+Payloads are a full program tree and today's workout with warm-ups and
+plate loadings, built by the app's own code from a throwaway SQLite file.
+Sizes are shown raw and gzipped, since large responses are compressed on
+the wire either way; decode time stands in for client parse time.
+"""
+import argparse
+import gzip
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app import models, schemas
+from app.routers.workout_programs import _load_programs, get_todays_workout
+from app.utils import fast_json
+from app.utils.program_builder import build_program
+from benchmarks.bench_program_import import generate_program
+
+
+def build_payloads(db, weeks: int, days: int, exercises: int) -> dict:
+    user = models.User(email="bench@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    program = build_program(db, schemas.WorkoutProgramCreate.model_validate(
+        generate_program(weeks, days, exercises)
+    ), user.id)
+    progress = models.UserProgramProgress(user_id=user.id, program_id=program.id)
+    db.add(progress)
+    db.commit()
+
+    tree = _load_programs(db, [program.id])[program.id]
+    tree.pop("version")
+    execution = get_todays_workout(progress.id, warmups=True, db=db, current_user=user)
+    return {
+        "WorkoutProgram": schemas.WorkoutProgram.model_validate(tree).model_dump(mode="json"),
+        "WorkoutExecution": execution.model_dump(mode="json")
+    }
+
+
+def _time(func, value, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(value)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def json_dumps(value) -> bytes:
+    # What FastAPI's JSONResponse does
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--weeks", type=int, default=12)
+    parser.add_argument("--days", type=int, default=4)
+    parser.add_argument("--exercises", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    if fast_json.msgpack is None:
+        raise SystemExit("msgpack is not installed")
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        with sessionmaker(bind=engine)() as db:
+            payloads = build_payloads(db, args.weeks, args.days, args.exercises)
+        engine.dispose()
+
+    encoders = [("json", json_dumps, json.loads), ("msgpack", fast_json.packb, fast_json.msgpack.unpackb)]
+    if fast_json.orjson is not None:
+        encoders.insert(1, ("orjson", fast_json.orjson.dumps, fast_json.orjson.loads))
+
+    for name, payload in payloads.items():
+        print(name)
+        for label, encode, decode in encoders:
+            body = encode(payload)
+            print(f"  {label:>8}: {len(body):8d} B  gzip {len(gzip.compress(body, 6)):7d} B  "
+                  f"encode {_time(encode, payload, args.repeat):8.1f} us  "
+                  f"decode {_time(decode, body, args.repeat):8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
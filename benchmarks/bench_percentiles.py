@@ -0,0 +1,124 @@
+"""
+Benchmark percentile sketches: accuracy and query time vs. exact percentiles.
+
+Usage:
+    python -m benchmarks.bench_percentiles [--lifters 100000] [--improvements 20000] [--queries 2000]
+                                           [--relative-accuracy 0.005 0.01 0.02]
+
+A synthetic gym of lifters gets log-normal best e1RMs (median 225, with a
+long tail either way), then some of them beat their bests, which takes
+their old value out of the sketch and puts the new one in. Percentiles of
+random e1RMs and quantiles from 1% to 99% are then read from the sketch,
+decoded from bytes as the endpoint does, and compared with sorting every
+lifter's best, which is what answering exactly on each request means.
+Every answer is checked against the error bound the sketch reports.
+"""
+import argparse
+import bisect
+import random
+import time
+
+from app.utils.percentiles import QuantileSketch
+
+
+def population(lifters: int, improvements: int, seed: int = 11):
+    """First bests, the (old, new) pairs of each improvement, and the bests they end at."""
+    rng = random.Random(seed)
+    first = [rng.lognormvariate(5.416, 0.3) for _ in range(lifters)]
+    bests = list(first)
+    changes = []
+    for _ in range(improvements):
+        lifter = rng.randrange(lifters)
+        new = bests[lifter] * rng.uniform(1.0, 1.1)
+        changes.append((bests[lifter], new))
+        bests[lifter] = new
+    return first, changes, bests
+
+
+def build(first, changes, relative_accuracy: float) -> QuantileSketch:
+    """The sketch as the write path leaves it: first bests added, then each improvement moved."""
+    sketch = QuantileSketch(relative_accuracy)
+    for best in first:
+        sketch.add(best)
+    for old, new in changes:
+        sketch.remove(old)
+        sketch.add(new)
+    return sketch
+
+
+def _time(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def measure(first, changes, bests, queries, relative_accuracy: float) -> dict:
+    sketch = build(first, changes, relative_accuracy)
+    data = sketch.to_bytes()
+    exact = sorted(bests)
+
+    # Merging shards gives the same sketch as adding everything to one
+    shards = [QuantileSketch(relative_accuracy) for _ in range(16)]
+    for i, best in enumerate(bests):
+        shards[i % 16].add(best)
+    merged = shards[0]
+    for shard in shards[1:]:
+        merged.merge(shard)
+    assert merged.counts == sketch.counts
+
+    percentile_errors = []
+    for value in queries:
+        rank = bisect.bisect_left(exact, value)
+        ties = bisect.bisect_right(exact, value) - rank
+        expected = 100 * (rank + ties / 2) / len(exact)
+        estimate, bound = sketch.percentile(value)
+        error = abs(estimate - expected)
+        assert error <= bound + 1e-9, (value, estimate, expected, bound)
+        percentile_errors.append(error)
+
+    value_errors = []
+    for q in range(1, 100):
+        target = exact[int(q / 100 * (len(exact) - 1))]
+        error = abs(sketch.quantile(q / 100) - target) / target
+        assert error <= relative_accuracy + 1e-9, (q, error)
+        value_errors.append(error)
+
+    value = queries[0]
+    return {
+        "buckets": len(sketch.counts),
+        "bytes": len(data),
+        "max_error": max(percentile_errors),
+        "mean_error": sum(percentile_errors) / len(percentile_errors),
+        "max_value_error": max(value_errors) * 100,
+        "sketch_ms": _time(lambda: QuantileSketch.from_bytes(data).percentile(value), 200),
+        "exact_ms": _time(lambda: bisect.bisect_left(sorted(bests), value), 5),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lifters", type=int, default=100_000)
+    parser.add_argument("--improvements", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--relative-accuracy", type=float, nargs="+", default=[0.005, 0.01, 0.02])
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    first, changes, bests = population(args.lifters, args.improvements, args.seed)
+    rng = random.Random(args.seed + 1)
+    queries = [rng.choice(bests) * rng.uniform(0.9, 1.1) for _ in range(args.queries)]
+
+    print(f"{args.lifters} lifters, {args.improvements} improved bests, {args.queries} percentile queries")
+    print(f"  {'accuracy':>8} {'buckets':>8} {'bytes':>7} {'max pct err':>12} {'mean pct err':>13} "
+          f"{'max value err':>14} {'sketch ms':>10} {'exact ms':>9}")
+    for relative_accuracy in args.relative_accuracy:
+        result = measure(first, changes, bests, queries, relative_accuracy)
+        print(f"  {relative_accuracy:>8.3f} {result['buckets']:>8} {result['bytes']:>7} "
+              f"{result['max_error']:>11.2f}  {result['mean_error']:>12.3f}  {result['max_value_error']:>12.2f}% "
+              f"{result['sketch_ms']:>10.3f} {result['exact_ms']:>9.1f}")
+    print(f"  exact percentiles would keep {8 * args.lifters} bytes of bests per exercise")
+
+
+if __name__ == "__main__":
+    main()
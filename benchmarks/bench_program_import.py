@@ -0,0 +1,153 @@
+"""
+Benchmark program creation: per-row commits vs. the single-transaction builder.
+
+Usage:
+    python -m benchmarks.bench_program_import [--weeks 12] [--days 4] [--exercises 6] [--db-url URL]
+
+Defaults to a throwaway SQLite file; pass a Postgres URL to measure real fsync cost.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app import models, schemas
+from app.utils.program_builder import build_program
+
+
+def generate_program(weeks: int, days: int, exercises: int) -> dict:
+    names = ["Back Squat", "Bench Press", "Deadlift", "Overhead Press", "Pull Up", "Dumbbell Row", "Lunge", "Plank"]
+    return {
+        "name": f"Generated {weeks}x{days} Program",
+        "description": "Benchmark program",
+        "duration_weeks": weeks,
+        "workouts": [
+            {
+                "name": f"Week {week} Day {day}",
+                "week_number": week,
+                "day_number": day,
+                "exercises": [
+                    {
+                        "exercise_name": names[i % len(names)],
+                        "sets": 3 + i % 3,
+                        "initial_reps": 5,
+                        "target_reps": 8,
+                        "initial_weight": 95.0 + 10 * i,
+                        "order": i
+                    }
+                    for i in range(exercises)
+                ]
+            }
+            for week in range(1, weeks + 1)
+            for day in range(1, days + 1)
+        ]
+    }
+
+
+def create_per_row(db, data: dict, creator_id: int) -> None:
+    """The previous create path: commit after the program and after every workout."""
+    program = schemas.WorkoutProgramCreate.model_validate(data)
+    db_program = models.WorkoutProgram(
+        name=program.name,
+        description=program.description,
+        duration_weeks=program.duration_weeks,
+        is_public=program.is_public,
+        creator_id=creator_id
+    )
+    db.add(db_program)
+    db.commit()
+    db.refresh(db_program)
+    for workout in program.workouts:
+        db_workout = models.ProgramWorkout(
+            program_id=db_program.id,
+            name=workout.name,
+            week_number=workout.week_number,
+            day_number=workout.day_number,
+            order=workout.order
+        )
+        db.add(db_workout)
+        db.commit()
+        db.refresh(db_workout)
+        for exercise in workout.exercises or []:
+            db.add(models.ProgramExercise(
+                program_workout_id=db_workout.id,
+                exercise_name=exercise.exercise_name,
+                sets=exercise.sets,
+                initial_reps=exercise.initial_reps,
+                target_reps=exercise.target_reps,
+                initial_weight=exercise.initial_weight,
+                order=exercise.order
+            ))
+        db.commit()
+    db.refresh(db_program)
+
+
+def measure(session_factory, engine, create, data: dict, repeat: int) -> dict:
+    counts = {"commits": 0, "statements": 0}
+
+    def on_commit(conn):
+        counts["commits"] += 1
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        counts["statements"] += 1
+
+    event.listen(engine, "commit", on_commit)
+    event.listen(engine, "before_cursor_execute", on_execute)
+    timings = []
+    try:
+        for _ in range(repeat):
+            db = session_factory()
+            try:
+                start = time.perf_counter()
+                create(db, data, 1)
+                timings.append(time.perf_counter() - start)
+            finally:
+                db.close()
+    finally:
+        event.remove(engine, "commit", on_commit)
+        event.remove(engine, "before_cursor_execute", on_execute)
+
+    return {
+        "commits": counts["commits"] // repeat,
+        "statements": counts["statements"] // repeat,
+        "best_ms": min(timings) * 1000,
+        "mean_ms": sum(timings) / len(timings) * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--weeks", type=int, default=12)
+    parser.add_argument("--days", type=int, default=4)
+    parser.add_argument("--exercises", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db-url", default=None)
+    args = parser.parse_args()
+
+    db_url = args.db_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(db_url)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    data = generate_program(args.weeks, args.days, args.exercises)
+    n_workouts = args.weeks * args.days
+    print(f"Program: {n_workouts} workouts, {n_workouts * args.exercises} exercises ({db_url})")
+
+    try:
+        for label, create in (("per-row commits", create_per_row), ("program builder", build_program)):
+            result = measure(session_factory, engine, create, data, args.repeat)
+            print(
+                f"{label:>16}: {result['commits']:4d} commits  {result['statements']:5d} statements  "
+                f"best {result['best_ms']:8.2f} ms  mean {result['mean_ms']:8.2f} ms"
+            )
+    finally:
+        if args.db_url is None:
+            Base.metadata.drop_all(bind=engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark read serialization: ORM objects validated by pydantic vs. selected rows encoded directly.
+
+Usage:
+    python -m benchmarks.bench_serialization [--sessions 100] [--entries 8] [--weeks 12] [--repeat 50]
+
+Both paths read the same data from a throwaway SQLite file: a page of workout
+sessions with their entries, and one program tree. The numbers are CPU time
+per response, database work included, so they show what a worker spends on
+each read rather than how long it waits.
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker, selectinload
+
+from app.database import Base
+from app import models, schemas
+from app.routers.workout_programs import _load_programs
+from app.routers.workouts import SESSION_COLUMNS, _sessions_response
+from app.utils import fast_json
+from app.utils.program_builder import build_program
+from benchmarks.bench_program_import import generate_program
+
+SESSIONS = TypeAdapter(List[schemas.WorkoutSession])
+
+
+def seed(db, sessions: int, entries: int, weeks: int) -> int:
+    user = models.User(email="bench@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    start = datetime(2024, 1, 1, 7, 30)
+    for i in range(sessions):
+        session = models.WorkoutSession(user_id=user.id, date=start + timedelta(days=i), notes=f"Session {i}")
+        session.entries = [
+            models.WorkoutEntry(exercise_name=f"Exercise {j}", sets=3, reps=8, weight=100.0 + j * 2.5,
+                                category="Legs", difficulty=7, notes="felt good")
+            for j in range(entries)
+        ]
+        db.add(session)
+    db.commit()
+    program = schemas.WorkoutProgramCreate.model_validate(generate_program(weeks, 4, 6))
+    return build_program(db, program, user.id).id
+
+
+def orm_sessions(db, limit: int) -> bytes:
+    workouts = db.query(models.WorkoutSession).options(
+        selectinload(models.WorkoutSession.entries)
+    ).limit(limit).all()
+    return SESSIONS.dump_json(SESSIONS.validate_python(workouts, from_attributes=True))
+
+
+def fast_sessions(db, limit: int) -> bytes:
+    return fast_json.dumps(_sessions_response(db, select(*SESSION_COLUMNS).limit(limit)))
+
+
+def orm_program(db, program_id: int) -> bytes:
+    program = db.query(models.WorkoutProgram).options(
+        selectinload(models.WorkoutProgram.workouts).selectinload(models.ProgramWorkout.exercises)
+    ).filter(models.WorkoutProgram.id == program_id).one()
+    return schemas.WorkoutProgram.model_validate(program).model_dump_json().encode()
+
+
+def fast_program(db, program_id: int) -> bytes:
+    program = _load_programs(db, [program_id])[program_id]
+    program.pop("version")
+    return fast_json.dumps(program)
+
+
+def _measure(Session, render, arg, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        db = Session()
+        try:
+            start = time.process_time()
+            render(db, arg)
+            timings.append(time.process_time() - start)
+        finally:
+            db.close()
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--entries", type=int, default=8)
+    parser.add_argument("--weeks", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        with Session() as db:
+            program_id = seed(db, args.sessions, args.entries, args.weeks)
+
+        print(f"Encoder: {'orjson' if fast_json.orjson is not None else 'json (orjson not installed)'}")
+        for label, slow, fast, arg in (
+            (f"{args.sessions} sessions", orm_sessions, fast_sessions, args.sessions),
+            (f"{args.weeks}-week program", orm_program, fast_program, program_id),
+        ):
+            before = _measure(Session, slow, arg, args.repeat)
+            after = _measure(Session, fast, arg, args.repeat)
+            print(f"{label:>18}: ORM + pydantic {before:7.2f} ms  rows + encoder {after:7.2f} ms  "
+                  f"({before / after:.1f}x)")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark plate sequencing for a full 5-exercise barbell session.
+
+Usage:
+    python -m benchmarks.bench_set_planner [--repeat 20] [--unit lb|kg]
+
+Reports plate moves per side for minimum-plate loadings of every set versus
+the planned sequence, and how long planning the session takes.
+"""
+import argparse
+import time
+
+from app.utils.plate_calculator import get_solver
+from app.utils.set_planner import plan_session
+
+SESSIONS = {
+    "lb": [
+        {"exercise_name": "Back Squat", "weights": [315, 315, 315, 275, 275]},
+        {"exercise_name": "Bench Press", "weights": [225, 225, 225, 205]},
+        {"exercise_name": "Deadlift", "weights": [405, 365]},
+        {"exercise_name": "Overhead Press", "weights": [135, 135, 135]},
+        {"exercise_name": "Barbell Row", "weights": [185, 185, 185]},
+    ],
+    "kg": [
+        {"exercise_name": "Back Squat", "weights": [140, 140, 140, 125, 125]},
+        {"exercise_name": "Bench Press", "weights": [100, 100, 100, 92.5]},
+        {"exercise_name": "Deadlift", "weights": [180, 162.5]},
+        {"exercise_name": "Overhead Press", "weights": [60, 60, 60]},
+        {"exercise_name": "Barbell Row", "weights": [82.5, 82.5, 82.5]},
+    ],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--unit", choices=sorted(SESSIONS), default="lb")
+    args = parser.parse_args()
+
+    solver = get_solver(unit=args.unit)
+    session = SESSIONS[args.unit]
+    for warmups in (False, True):
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            plan = plan_session(session, solver, warmups=warmups)
+            timings.append((time.perf_counter() - start) * 1000)
+        label = "with warm-ups" if warmups else "work sets only"
+        print(
+            f"{label:>15}: {len(plan['steps']):3d} sets  baseline {plan['baseline_moves']:3d} moves  "
+            f"planned {plan['plate_moves']:3d} moves  best {min(timings):7.2f} ms  "
+            f"mean {sum(timings) / len(timings):7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark strength analytics: vectorized NumPy pass vs. per-exercise Python loops.
+
+Usage:
+    python -m benchmarks.bench_strength [--years 6] [--sessions-per-week 4] [--exercises 12] [--repeat 5]
+
+One member with years of history is written to a throwaway SQLite file.
+The loop baseline is what the report looks like written the obvious way:
+one query per exercise, weekly bests, volume, rolling bests and the trend
+fit done in Python. Both sides include their queries, and the outputs are
+checked to agree before anything is timed.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app import models
+from app.utils import strength
+
+EXERCISES = ["Squat", "Bench Press", "Deadlift", "Overhead Press", "Barbell Row", "Pull Up", "Front Squat",
+             "Incline Bench Press", "Romanian Deadlift", "Dip", "Hip Thrust", "Lunge", "Chin Up", "Push Press"]
+
+
+def seed(engine, years: int, sessions_per_week: int, exercises: int, seed: int = 7) -> int:
+    """Write one member's history with slowly rising loads; returns the entries written."""
+    rng = random.Random(seed)
+    names = EXERCISES[:exercises]
+    weeks = years * 52
+    start = datetime.utcnow() - timedelta(weeks=weeks)
+    sessions, entries = [], []
+    session_id = 0
+    for week in range(weeks):
+        for day in range(sessions_per_week):
+            session_id += 1
+            sessions.append({"id": session_id, "user_id": 1, "date": start + timedelta(weeks=week, days=day * 2)})
+            for name in rng.sample(names, min(4, len(names))):
+                base = 100 + 5 * names.index(name) + week * 0.4
+                entries.append({"session_id": session_id, "exercise_name": name, "sets": rng.randint(2, 5),
+                                "reps": rng.randint(1, 12), "weight": round(base * rng.uniform(0.7, 1.0), 1)})
+    with engine.begin() as conn:
+        conn.execute(insert(models.User.__table__), [{"id": 1, "email": "bench@example.com", "hashed_password": "x"}])
+        conn.execute(insert(models.WorkoutSession.__table__), sessions)
+        conn.execute(insert(models.WorkoutEntry.__table__), entries)
+    return len(entries)
+
+
+def loop_report(db, user_id: int, weeks: int, today) -> dict:
+    """The per-exercise baseline: a query and Python loops for each exercise."""
+    Entry, Session = models.WorkoutEntry, models.WorkoutSession
+    names = db.execute(
+        select(Entry.exercise_name).join(Session).where(Session.user_id == user_id).distinct()
+    ).scalars().all()
+    current = (today.toordinal() - 1) // 7
+    report = {}
+    for name in sorted(names):
+        rows = db.execute(
+            select(Session.date, Entry.sets, Entry.reps, Entry.weight).join(Session)
+            .where(Session.user_id == user_id, Entry.exercise_name == name, Entry.weight > 0)
+        ).all()
+        best, volume, reps_done = defaultdict(float), defaultdict(float), defaultdict(float)
+        for when, sets, reps, weight in rows:
+            week = (when.date().toordinal() - 1) // 7
+            e1rm = weight if reps == 1 else weight * (1 + reps / 30)
+            best[week] = max(best[week], e1rm)
+            volume[week] += sets * reps * weight
+            reps_done[week] += sets * reps
+        series = [best.get(week, 0.0) for week in range(current - weeks + 1, current + 1)]
+        rolling = [max(best.get(w, 0.0) for w in range(week - strength.ROLLING_WEEKS + 1, week + 1))
+                   for week in range(current - weeks + 1, current + 1)]
+        points = [(week - current, best[week]) for week in range(current - strength.TREND_WEEKS + 1, current + 1)
+                  if best.get(week)]
+        n = len(points)
+        sx, sy = sum(x for x, _ in points), sum(y for _, y in points)
+        sxx, sxy = sum(x * x for x, _ in points), sum(x * y for x, y in points)
+        slope = (n * sxy - sx * sy) / (n * sxx - sx * sx) if n >= 2 else None
+        report[name] = {"best_e1rm": round(max(best.values()), 1), "weekly_best_e1rm": series,
+                        "rolling_best_e1rm": rolling, "slope": slope,
+                        "volume": [volume.get(w, 0.0) for w in range(current - weeks + 1, current + 1)]}
+    return report
+
+
+def vectorized_report(db, user_id: int, weeks: int, today) -> dict:
+    return strength.strength_report(strength.history_arrays(db, user_id), weeks=weeks, today=today)
+
+
+def check(vectorized: dict, loops: dict) -> None:
+    for exercise in vectorized["exercises"]:
+        expected = loops[exercise["exercise"]]
+        assert exercise["best_e1rm"] == expected["best_e1rm"], exercise["exercise"]
+        assert exercise["weekly_best_e1rm"] == [round(v, 1) if v else None for v in expected["weekly_best_e1rm"]]
+        assert exercise["rolling_best_e1rm"] == [round(v, 1) if v else None for v in expected["rolling_best_e1rm"]]
+        assert exercise["weekly_volume"] == [round(v, 1) if v else None for v in expected["volume"]]
+        if expected["slope"] is not None:
+            assert abs(exercise["trend"]["e1rm_per_week"] - expected["slope"]) < 0.01
+
+
+def _time(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--years", type=int, default=6)
+    parser.add_argument("--sessions-per-week", type=int, default=4)
+    parser.add_argument("--exercises", type=int, default=12)
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if strength.np is None:
+        raise SystemExit("numpy is not installed")
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        entries = seed(engine, args.years, args.sessions_per_week, args.exercises)
+        today = datetime.utcnow().date()
+        with sessionmaker(bind=engine)() as db:
+            check(vectorized_report(db, 1, args.weeks, today), loop_report(db, 1, args.weeks, today))
+            load = _time(lambda: strength.history_arrays(db, 1), args.repeat)
+            arrays = strength.history_arrays(db, 1)
+            compute = _time(lambda: strength.strength_report(arrays, weeks=args.weeks, today=today), args.repeat)
+            loops = _time(lambda: loop_report(db, 1, args.weeks, today), args.repeat)
+        engine.dispose()
+
+    print(f"{args.years} years, {entries} entries, {args.exercises} exercises, {args.weeks}-week series")
+    print(f"  per-exercise loops: {loops:8.1f} ms")
+    print(f"  vectorized:         {load + compute:8.1f} ms  (query {load:.1f} ms, arrays {compute:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Deterministic benchmark dataset generator.
+
+Usage:
+    python -m benchmarks.datagen --db-url URL [--scale small] [--seed 42] [--reset]
+
+Writes users, workout sessions and entries, public programs, and each user's
+program progress with completed sets, using explicit ids and a seeded RNG so
+the same scale and seed always produce the same rows.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+from sqlalchemy import create_engine, func, insert, select, text
+from sqlalchemy.engine import Engine
+
+from app.database import Base
+from app import models
+
+SCALES = {
+    "tiny": {"users": 20, "sessions": 2_000, "entries": 20_000, "programs": 4},
+    "small": {"users": 200, "sessions": 20_000, "entries": 200_000, "programs": 10},
+    "medium": {"users": 2_000, "sessions": 200_000, "entries": 2_000_000, "programs": 25},
+    "full": {"users": 10_000, "sessions": 1_000_000, "entries": 10_000_000, "programs": 50},
+}
+
+PASSWORD = "benchmark-password"
+EPOCH = datetime(2024, 1, 1)
+HISTORY_DAYS = 730
+CHUNK_ROWS = 10_000
+
+EXERCISES = [
+    ("Back Squat", "Legs", 135, 405), ("Front Squat", "Legs", 95, 315), ("Deadlift", "Back", 185, 495),
+    ("Romanian Deadlift", "Legs", 135, 365), ("Leg Press", "Legs", 180, 720), ("Bench Press", "Chest", 95, 315),
+    ("Incline Bench Press", "Chest", 75, 255), ("Dumbbell Fly", "Chest", 15, 60), ("Overhead Press", "Shoulders", 65, 185),
+    ("Lateral Raise", "Shoulders", 10, 40), ("Barbell Row", "Back", 95, 275), ("Pull Up", "Back", 0, 90),
+    ("Lat Pulldown", "Back", 70, 220), ("Bicep Curl", "Arms", 20, 95), ("Tricep Pushdown", "Arms", 30, 120),
+    ("Plank", "Core", 0, 45), ("Hanging Leg Raise", "Core", 0, 25), ("Calf Raise", "Legs", 90, 315),
+]
+
+
+def email_for(user_id: int) -> str:
+    return f"bench-user-{user_id}@example.com"
+
+
+def password_hash() -> str:
+    """One bcrypt hash shared by every user so the generator doesn't spend minutes hashing."""
+    try:
+        from app.utils.auth import get_password_hash
+        return get_password_hash(PASSWORD)
+    except Exception as e:
+        print(f"warning: could not hash the benchmark password ({e}); login calls will fail")
+        return "!unusable"
+
+
+def _chunks(rows: Iterator[dict], size: int = CHUNK_ROWS) -> Iterator[List[dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _insert(engine: Engine, table, rows: Iterator[dict]) -> int:
+    count = 0
+    with engine.begin() as conn:
+        for chunk in _chunks(rows):
+            conn.execute(insert(table), chunk)
+            count += len(chunk)
+    return count
+
+
+def _reset_sequences(engine: Engine) -> None:
+    """Explicit ids leave Postgres sequences behind; move them past the data."""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if "id" in table.c:
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {table.name}), 0) + 1, false)"
+                ))
+
+
+def generate(engine: Engine, scale: str = "small", seed: int = 42) -> Dict[str, int]:
+    """Populate an empty database; returns row counts per table."""
+    sizes = SCALES[scale]
+    users, sessions, entries, programs = sizes["users"], sizes["sessions"], sizes["entries"], sizes["programs"]
+    rng = random.Random(seed)
+    counts: Dict[str, int] = {}
+
+    hashed = password_hash()
+    counts["users"] = _insert(engine, models.User.__table__, (
+        {"id": i, "email": email_for(i), "hashed_password": hashed, "is_active": True}
+        for i in range(1, users + 1)
+    ))
+
+    # Each user's strength level scales their weights
+    strength = [0.0] + [rng.uniform(0.3, 1.0) for _ in range(users)]
+    session_users = [rng.randint(1, users) for _ in range(sessions)]
+
+    counts["workout_sessions"] = _insert(engine, models.WorkoutSession.__table__, (
+        {
+            "id": i,
+            "user_id": session_users[i - 1],
+            "date": EPOCH + timedelta(days=HISTORY_DAYS * i / sessions, hours=rng.randint(6, 20)),
+            "notes": f"Session {i}"
+        }
+        for i in range(1, sessions + 1)
+    ))
+
+    def entry_rows():
+        per_session, extra = divmod(entries, sessions)
+        entry_id = 0
+        for session_id in range(1, sessions + 1):
+            level = strength[session_users[session_id - 1]]
+            for _ in range(per_session + (1 if session_id <= extra else 0)):
+                entry_id += 1
+                name, category, low, high = EXERCISES[rng.randrange(len(EXERCISES))]
+                yield {
+                    "id": entry_id,
+                    "session_id": session_id,
+                    "exercise_name": name,
+                    "sets": rng.randint(1, 5),
+                    "reps": rng.randint(3, 12),
+                    "weight": round((low + (high - low) * level * rng.uniform(0.7, 1.0)) / 5) * 5,
+                    "category": category,
+                    "difficulty": rng.randint(1, 10)
+                }
+    counts["workout_entries"] = _insert(engine, models.WorkoutEntry.__table__, entry_rows())
+
+    # Public programs: 4 weeks x 3 days x 5 exercises
+    workouts, exercises = [], []
+    for program_id in range(1, programs + 1):
+        for week in range(1, 5):
+            for day in range(1, 4):
+                workout_id = len(workouts) + 1
+                workouts.append({
+                    "id": workout_id, "program_id": program_id, "name": f"Week {week} Day {day}",
+                    "week_number": week, "day_number": day, "order": day
+                })
+                for order, (name, category, low, high) in enumerate(rng.sample(EXERCISES, 5)):
+                    exercises.append({
+                        "id": len(exercises) + 1, "program_workout_id": workout_id, "exercise_name": name,
+                        "sets": rng.randint(3, 5), "initial_reps": 5, "target_reps": 8,
+                        "initial_weight": float(max(low, 45)), "progression_strategy": "linear",
+                        "progression_value": 5.0, "progression_frequency": 1, "order": order,
+                        "category": category, "is_barbell_exercise": name in ("Back Squat", "Bench Press", "Deadlift")
+                    })
+    counts["workout_programs"] = _insert(engine, models.WorkoutProgram.__table__, (
+        {
+            "id": i, "name": f"Benchmark Program {i}", "description": "Generated", "duration_weeks": 4,
+            "creator_id": rng.randint(1, users), "is_public": True, "version": 1
+        }
+        for i in range(1, programs + 1)
+    ))
+    counts["program_workouts"] = _insert(engine, models.ProgramWorkout.__table__, iter(workouts))
+    counts["program_exercises"] = _insert(engine, models.ProgramExercise.__table__, iter(exercises))
+
+    # Every user is partway through one program, with progress and completed
+    # sets for each workout done so far
+    by_workout: Dict[int, List[dict]] = {}
+    for exercise in exercises:
+        by_workout.setdefault(exercise["program_workout_id"], []).append(exercise)
+    progress_rows, exercise_progress_rows, completed_rows = [], [], []
+    for user_id in range(1, users + 1):
+        program_id = rng.randint(1, programs)
+        done = rng.randint(0, 10)
+        progress_rows.append({
+            "id": user_id, "user_id": user_id, "program_id": program_id,
+            "current_week": done // 3 + 1, "current_day": done % 3 + 1, "is_active": True,
+            "started_at": EPOCH
+        })
+        first_workout = (program_id - 1) * 12 + 1
+        for workout_id in range(first_workout, first_workout + done + 1):
+            for exercise in by_workout[workout_id]:
+                progress_id = len(exercise_progress_rows) + 1
+                exercise_progress_rows.append({
+                    "id": progress_id, "user_progress_id": user_id, "program_exercise_id": exercise["id"],
+                    "current_weight": exercise["initial_weight"], "current_reps_target": exercise["target_reps"],
+                    "last_update": EPOCH
+                })
+                if workout_id < first_workout + done:
+                    for set_number in range(1, exercise["sets"] + 1):
+                        completed_rows.append({
+                            "id": len(completed_rows) + 1, "exercise_progress_id": progress_id,
+                            "set_number": set_number, "reps_completed": rng.randint(5, 8),
+                            "weight_used": exercise["initial_weight"], "completed_at": EPOCH
+                        })
+    counts["user_program_progress"] = _insert(engine, models.UserProgramProgress.__table__, iter(progress_rows))
+    counts["exercise_progress"] = _insert(engine, models.ExerciseProgress.__table__, iter(exercise_progress_rows))
+    counts["completed_exercise_sets"] = _insert(engine, models.CompletedExerciseSet.__table__, iter(completed_rows))
+
+    _reset_sequences(engine)
+    return counts
+
+
+def prepare(engine: Engine, scale: str, seed: int, reset: bool = False) -> Dict[str, int]:
+    """Create tables and generate data, refusing to touch a database that already has users."""
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        existing = conn.execute(select(func.count()).select_from(models.User.__table__)).scalar()
+    if existing:
+        raise SystemExit(f"Database already has {existing} users; pass --reset to regenerate it")
+    return generate(engine, scale, seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db-url", required=True)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="Drop and recreate all tables first")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = prepare(create_engine(args.db_url), args.scale, args.seed, args.reset)
+    for table, count in counts.items():
+        print(f"{table:>24}: {count:>10,}")
+    print(f"Generated '{args.scale}' dataset in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Run the API benchmark scenarios against a generated dataset.
+
+Usage:
+    python -m benchmarks.run [--scale tiny] [--iterations 50] [--db-url URL] [--reuse]
+                             [--output results.json] [--baseline benchmarks/baseline.json] [--tolerance 0.25]
+
+Requests go through the FastAPI app in-process (TestClient), so timings
+include routing, validation, the ORM and serialization but not the network.
+Each scenario reports latency percentiles and queries per call; with
+--baseline, any p95 or query count that regressed by more than --tolerance
+fails the run, and so does any failed call: an error path is usually
+faster than the work it skips.
+"""
+import argparse
+import io
+import json
+import logging
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import get_db, get_session_factory
+from app.main import app
+from app.utils.auth import create_access_token
+from app.utils.query_stats import track_queries
+
+from benchmarks import datagen
+from benchmarks.bench_program_import import generate_program
+
+# Metrics compared against the baseline; higher is worse for both
+COMPARED = ("p95_ms", "queries_per_call")
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of unsorted values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(fraction * len(ordered)) - 1
+    return ordered[min(max(rank, 0), len(ordered) - 1)]
+
+
+def summarize(latencies: List[float], queries: List[int], errors: int) -> dict:
+    ms = [seconds * 1000 for seconds in latencies]
+    return {
+        "calls": len(ms),
+        "errors": errors,
+        "p50_ms": round(percentile(ms, 0.50), 3),
+        "p95_ms": round(percentile(ms, 0.95), 3),
+        "p99_ms": round(percentile(ms, 0.99), 3),
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else 0.0,
+        "queries_per_call": round(sum(queries) / len(queries), 2) if queries else 0.0
+    }
+
+
+Request = Tuple[str, str, dict]  # (method, url, TestClient keyword arguments)
+
+
+class Scenarios:
+    """
+    Builds one request per call for each scenario, cycling through the generated users.
+
+    Building a request may query the database (complete_workout looks up the
+    sets to report); only sending it is timed.
+    """
+
+    def __init__(self, session_factory, users: int, seed: int):
+        self.session_factory = session_factory
+        self.users = users
+        self.rng = random.Random(seed)
+        self._tokens: Dict[int, str] = {}
+
+    def _user(self) -> int:
+        return self.rng.randint(1, self.users)
+
+    def _headers(self, user_id: int) -> dict:
+        token = self._tokens.get(user_id)
+        if token is None:
+            token = self._tokens[user_id] = create_access_token(
+                data={"sub": datagen.email_for(user_id), "uid": user_id}
+            )
+        return {"Authorization": f"Bearer {token}"}
+
+    def login(self) -> Request:
+        user_id = self._user()
+        return "POST", "/auth/token", {"data": {
+            "username": datagen.email_for(user_id), "password": datagen.PASSWORD
+        }}
+
+    def todays_workout(self) -> Request:
+        user_id = self._user()
+        return "GET", "/workout-programs/user/workout/today", {
+            "params": {"program_progress_id": user_id, "warmups": True},
+            "headers": self._headers(user_id)
+        }
+
+    def complete_workout(self) -> Request:
+        # Progress ids equal user ids in the generated data. Only members still
+        # on their program are picked: completing workouts finishes programs,
+        # and a finished one answers 404 rather than doing the work timed here
+        with self.session_factory() as db:
+            active = db.execute(
+                select(models.UserProgramProgress.id).where(models.UserProgramProgress.is_active.is_(True))
+                .order_by(models.UserProgramProgress.id)
+            ).scalars().all()
+            user_id = self.rng.choice(active) if active else self._user()
+            progress = db.get(models.UserProgramProgress, user_id)
+            rows = []
+            if progress is not None and progress.is_active:
+                rows = db.execute(
+                    select(models.ExerciseProgress.id, models.ProgramExercise.sets,
+                           models.ExerciseProgress.current_reps_target, models.ExerciseProgress.current_weight)
+                    .join(models.ProgramExercise)
+                    .join(models.ProgramWorkout)
+                    .where(
+                        models.ExerciseProgress.user_progress_id == user_id,
+                        models.ProgramWorkout.program_id == progress.program_id,
+                        models.ProgramWorkout.week_number == progress.current_week,
+                        models.ProgramWorkout.day_number == progress.current_day
+                    )
+                ).all()
+        body = [
+            {"exercise_progress_id": progress_id, "set_number": number, "reps_completed": reps,
+             "weight_used": weight}
+            for progress_id, sets, reps, weight in rows for number in range(1, sets + 1)
+        ]
+        return "POST", "/workout-programs/user/workout/complete", {
+            "params": {"program_progress_id": user_id},
+            "json": body,
+            "headers": self._headers(user_id)
+        }
+
+    def list_workouts(self) -> Request:
+        return "GET", "/workouts/", {"params": {"skip": self.rng.randint(0, 1000), "limit": 100}}
+
+    def exercise_stats(self) -> Request:
+        name = self.rng.choice(datagen.EXERCISES)[0]
+        return "GET", f"/workouts/stats/exercise/{name}", {"params": {"days": 30}}
+
+    def category_stats(self) -> Request:
+        category = self.rng.choice(datagen.EXERCISES)[1]
+        return "GET", f"/workouts/stats/category/{category}", {}
+
+    def personal_records(self) -> Request:
+        return "GET", f"/workouts/users/{self._user()}/personal-records", {}
+
+    def search(self) -> Request:
+        start = datagen.EPOCH + timedelta(days=self.rng.randint(0, datagen.HISTORY_DAYS - 7))
+        return "GET", "/workouts/search/", {"params": {
+            "exercise_name": self.rng.choice(datagen.EXERCISES)[0].split()[0],
+            "start_date": start.isoformat(),
+            "end_date": (start + timedelta(days=7)).isoformat()
+        }}
+
+    def program_import(self) -> Request:
+        user_id = self._user()
+        document = json.dumps(generate_program(weeks=4, days=3, exercises=5)).encode()
+        return "POST", "/workout-programs/import/json", {
+            "files": {"file": ("program.json", io.BytesIO(document), "application/json")},
+            "headers": self._headers(user_id)
+        }
+
+    def all(self) -> Dict[str, Callable[[], Request]]:
+        return {
+            "login": self.login,
+            "todays_workout": self.todays_workout,
+            "complete_workout": self.complete_workout,
+            "list_workouts": self.list_workouts,
+            "exercise_stats": self.exercise_stats,
+            "category_stats": self.category_stats,
+            "personal_records": self.personal_records,
+            "search": self.search,
+            "program_import": self.program_import,
+        }
+
+
+def run_scenario(client: TestClient, build: Callable[[], Request], iterations: int, warmup: int = 3) -> dict:
+    for _ in range(warmup):
+        method, url, kwargs = build()
+        client.request(method, url, **kwargs)
+    latencies, queries, errors = [], [], 0
+    for _ in range(iterations):
+        method, url, kwargs = build()
+        with track_queries() as stats:
+            start = time.perf_counter()
+            response = client.request(method, url, **kwargs)
+            elapsed = time.perf_counter() - start
+        latencies.append(elapsed)
+        queries.append(stats.count)
+        if response.status_code >= 400:
+            errors += 1
+    return summarize(latencies, queries, errors)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Scenarios with failed calls, or whose compared metrics grew by more than `tolerance` over the baseline."""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        if current.get("errors"):
+            regressions.append(f"{name}: {current['errors']} of {current['calls']} calls failed")
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        for metric in COMPARED:
+            before, after = previous.get(metric, 0), current.get(metric, 0)
+            if before and after > before * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {before} -> {after} (+{(after / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(datagen.SCALES), default="tiny")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--db-url", default=None)
+    parser.add_argument("--reuse", action="store_true", help="Use the data already in --db-url")
+    parser.add_argument("--scenario", action="append", help="Run only these scenarios")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    db_url = args.db_url
+    if db_url is None:
+        db_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine = create_engine(db_url)
+    if args.reuse:
+        with engine.connect() as conn:
+            users = conn.execute(select(func.count()).select_from(models.User.__table__)).scalar()
+    else:
+        start = time.perf_counter()
+        users = datagen.prepare(engine, args.scale, args.seed, reset=True)["users"]
+        print(f"Generated '{args.scale}' dataset in {time.perf_counter() - start:.1f}s")
+
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    # Repeated-statement warnings are expected under load and would bury the results
+    logging.getLogger("app.utils.query_stats").setLevel(logging.ERROR)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: session_factory
+    client = TestClient(app, raise_server_exceptions=False)
+    scenarios = Scenarios(session_factory, users, args.seed).all()
+    selected = args.scenario or list(scenarios)
+
+    results = {
+        "meta": {
+            "scale": args.scale,
+            "seed": args.seed,
+            "iterations": args.iterations,
+            "dialect": engine.dialect.name,
+            "python": platform.python_version()
+        },
+        "scenarios": {}
+    }
+    print(f"{'scenario':>18} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'errors':>7}")
+    for name in selected:
+        summary = run_scenario(client, scenarios[name], args.iterations)
+        results["scenarios"][name] = summary
+        print(f"{name:>18} {summary['p50_ms']:>9.2f} {summary['p95_ms']:>9.2f} {summary['p99_ms']:>9.2f} "
+              f"{summary['queries_per_call']:>8.1f} {summary['errors']:>7}")
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_session_factory, None)
+
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(results, out, indent=2)
+            out.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions against the baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} of the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
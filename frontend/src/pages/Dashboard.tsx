@@ -8,29 +8,17 @@ import * as workoutService from '../services/workout.service';
 const Dashboard: React.FC = () => {
   const { user } = useAuth();
 
-  // Fetch recent workouts
-  const { data: workouts, isLoading: workoutsLoading } = useQuery(
-    'recent-workouts',
-    workoutService.getWorkouts,
-    {
-      enabled: !!user,
-      select: (data) => {
-        // Sort by date (most recent first) and limit to 5
-        return [...data]
-          .sort((a, b) => new Date(b.date).getTime() - new Date(a.date).getTime())
-          .slice(0, 5);
-      },
-    }
-  );
-
-  // Fetch personal records if user is logged in
-  const { data: personalRecords, isLoading: recordsLoading } = useQuery(
-    ['personal-records', user?.id],
-    () => workoutService.getPersonalRecords(user!.id),
+  // Recent workouts, records and programs arrive in one request
+  const { data: dashboard, isLoading } = useQuery(
+    'dashboard',
+    workoutService.getDashboard,
     {
       enabled: !!user,
     }
   );
+  const workouts = dashboard?.recent_workouts;
+  const personalRecords = dashboard?.personal_records;
+  const todaysWorkouts = dashboard?.todays_workouts;
 
   if (!user) {
     return (
@@ -97,13 +85,13 @@ const Dashboard: React.FC = () => {
           <h2 className="text-xl font-semibold text-gray-800 mb-4">
             Your Stats
           </h2>
-          {recordsLoading ? (
+          {isLoading ? (
             <p className="text-gray-500">Loading personal records...</p>
-          ) : personalRecords && personalRecords.records.length > 0 ? (
+          ) : personalRecords && personalRecords.length > 0 ? (
             <div>
               <h3 className="font-medium text-gray-700 mb-2">Personal Records</h3>
               <div className="space-y-2">
-                {personalRecords.records.slice(0, 3).map((record, index) => (
+                {personalRecords.slice(0, 3).map((record, index) => (
                   <div key={index} className="flex justify-between items-center">
                     <span>
                       {record.exercise} ({record.category})
@@ -130,12 +118,40 @@ const Dashboard: React.FC = () => {
         </div>
       </div>
 
+      {/* Today's Workout Section */}
+      {todaysWorkouts && todaysWorkouts.length > 0 && (
+        <div className="bg-white rounded-lg shadow-md p-6 mb-8">
+          <h2 className="text-xl font-semibold text-gray-800 mb-4">
+            Today's Workout
+          </h2>
+          <div className="space-y-2">
+            {todaysWorkouts.map((workout) => (
+              <div
+                key={workout.program_progress_id}
+                className="flex justify-between items-center"
+              >
+                <span>
+                  {workout.workout_name} ({workout.exercises.length} set
+                  {workout.exercises.length !== 1 ? 's' : ''})
+                </span>
+                <Link
+                  to={`/programs/${workout.program_id}`}
+                  className="text-indigo-600 hover:text-indigo-800"
+                >
+                  View Program
+                </Link>
+              </div>
+            ))}
+          </div>
+        </div>
+      )}
+
       {/* Recent Workouts Section */}
       <div className="bg-white rounded-lg shadow-md p-6">
         <h2 className="text-xl font-semibold text-gray-800 mb-4">
           Recent Workouts
         </h2>
-        {workoutsLoading ? (
+        {isLoading ? (
           <p className="text-gray-500">Loading recent workouts...</p>
         ) : workouts && workouts.length > 0 ? (
           <div className="overflow-x-auto">
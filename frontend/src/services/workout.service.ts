@@ -9,6 +9,7 @@ import {
   ExerciseStats,
   CategoryStats,
   PersonalRecords,
+  DashboardData,
   PlateCalculation,
   WorkoutProgram,
   WorkoutProgramCreate,
@@ -126,6 +127,12 @@ export const getPersonalRecords = async (
   return response.data;
 };
 
+// Everything the dashboard shows, in one request
+export const getDashboard = async (): Promise<DashboardData> => {
+  const response = await api.get('/dashboard');
+  return response.data;
+};
+
 // Utilities
 export const calculatePlates = async (
   weight: number
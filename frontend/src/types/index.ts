@@ -120,6 +120,7 @@ export interface ProgramExercise {
   notes?: string;
   category?: string;
   is_barbell_exercise?: boolean;
+  equipment?: string;
 }
 
 export interface ProgramExerciseCreate {
@@ -135,6 +136,7 @@ export interface ProgramExerciseCreate {
   notes?: string;
   category?: string;
   is_barbell_exercise?: boolean;
+  equipment?: string;
 }
 
 export interface ProgramWorkout {
@@ -185,6 +187,31 @@ export interface UserProgramProgress {
   is_active: boolean;
 }
 
+export interface TodaysWorkoutSet {
+  exercise_id: number;
+  exercise_name: string;
+  set_number: number;
+  target_reps: number;
+  target_weight: number;
+  is_barbell_exercise: boolean;
+}
+
+export interface TodaysWorkout {
+  program_progress_id: number;
+  program_id: number;
+  workout_id: number;
+  workout_name: string;
+  exercises: TodaysWorkoutSet[];
+}
+
+export interface DashboardData {
+  recent_workouts: WorkoutSession[];
+  personal_records: PersonalRecord[];
+  active_programs: UserProgramProgress[];
+  todays_workouts: TodaysWorkout[];
+  timings: Record<string, number>;
+}
+
 export interface ExerciseProgress {
   id: number;
   progress_id: number;
@@ -1,9 +1,11 @@
 import pytest
+from contextlib import contextmanager
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.database import Base
 from app.models import User
 from app import models
+from app.utils.query_stats import track_queries
 
 # Use SQLite for testing
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -33,3 +35,13 @@ def test_user(test_db):
     test_db.commit()
     test_db.refresh(user)
     return user
+
+@pytest.fixture
+def max_queries():
+    """Fail if a block runs more queries than allowed: `with max_queries(3): client.get(...)`."""
+    @contextmanager
+    def check(limit):
+        with track_queries() as stats:
+            yield stats
+        assert stats.count <= limit, f"Expected at most {limit} queries, ran {stats.report()}"
+    return check
@@ -0,0 +1,377 @@
+import json
+import random
+import sys
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+from app import activity as activity_cli
+from app import models
+from app import percentiles as percentiles_cli
+from app import training_load as training_load_cli
+from app.main import app
+from app.database import get_db
+from app.utils import activity, jobs, muscles, percentiles, strength, training_load
+from app.utils.auth import get_current_active_user
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def override_get_current_active_user():
+    return models.User(id=1, email="test@example.com", hashed_password="testpass", is_active=True)
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_current_active_user] = override_get_current_active_user
+client = TestClient(app)
+
+
+def _log(db, user_id, when, *entries):
+    session = models.WorkoutSession(user_id=user_id, date=when)
+    session.entries = [
+        models.WorkoutEntry(exercise_name=name, sets=sets, reps=reps, weight=weight, category=category)
+        for name, sets, reps, weight, category in entries
+    ]
+    db.add(session)
+
+
+def test_estimated_1rm_formulas():
+    np = strength.np
+    weight, reps = np.array([100.0, 100.0, 100.0]), np.array([1.0, 5.0, 10.0])
+    assert strength.estimated_1rm(weight, reps, "epley").round(1).tolist() == [100.0, 116.7, 133.3]
+    assert strength.estimated_1rm(weight, reps, "brzycki").round(1).tolist() == [100.0, 112.5, 133.3]
+    assert strength.week_start(strength.week_number(np.datetime64("2024-06-13").astype(np.int64))) == date(2024, 6, 10)
+
+
+def test_strength_trends_and_goal(test_user, test_db):
+    now = datetime.utcnow()
+    # Ten weeks of squats climbing 6 lb of e1RM a week, one bench session, and someone else's squats
+    for week in range(10):
+        when = now - timedelta(weeks=9 - week)
+        _log(test_db, 1, when, ("Squat", 3, 5, 300.0 + 6 * week * 6 / 7, "Legs"))
+        _log(test_db, 2, when, ("Squat", 5, 5, 500.0, "Legs"))
+    _log(test_db, 1, now - timedelta(days=1), ("Bench Press", 3, 1, 225.0, "Chest"))
+    test_db.commit()
+
+    response = client.get("/workouts/analytics/strength", params={"weeks": 12, "goal": ["Squat:420", "Bench Press:200"]})
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["weeks"]) == 12
+    assert data["weeks"][-1] == strength.week_start(strength.week_number(
+        strength.np.datetime64(now.date(), "D").astype(int))).isoformat()
+
+    bench, squat = data["exercises"]
+    assert squat["exercise"] == "Squat" and squat["total_sets"] == 30
+    assert squat["best_e1rm"] == 404.0
+    series = squat["weekly_best_e1rm"]
+    assert series[:2] == [None, None] and series[2] == 350.0
+    assert squat["rolling_best_e1rm"][-1] == 404.0
+    assert squat["weekly_volume"][-1] == round(3 * 5 * (300.0 + 6 * 9 * 6 / 7), 1)
+    assert squat["weekly_intensity"][-1] == round(100 * 6 / 7, 1)
+    assert squat["trend"] == {"e1rm_per_week": 6.0, "fitted_e1rm": 404.0, "weeks_fitted": 10}
+    # 16 lb to go at 6 lb a week
+    assert squat["goal"]["reached"] is False
+    assert squat["goal"]["projected_date"] == (now.date() + timedelta(days=round(16 / 6 * 7))).isoformat()
+
+    assert bench["best_e1rm"] == 225.0 and bench["trend"] is None
+    assert bench["goal"] == {"weight": 200.0, "reached": True, "projected_date": None}
+
+
+def test_strength_goal_beyond_the_projection_horizon(test_user, test_db):
+    now = datetime.utcnow()
+    # Squats creeping up 0.01 lb a week never reach 5000 in a date that exists
+    for week in range(10):
+        _log(test_db, 1, now - timedelta(weeks=9 - week), ("Squat", 1, 1, 300.0 + 0.01 * week, "Legs"))
+    test_db.commit()
+
+    response = client.get("/workouts/analytics/strength", params={"goal": "Squat:300.5"})
+    assert response.status_code == 200, response.text
+    squat = response.json()["exercises"][0]
+    assert squat["trend"]["e1rm_per_week"] == 0.01
+    assert squat["goal"]["projected_date"] is not None
+
+    goal = client.get("/workouts/analytics/strength", params={"goal": "Squat:5000"}).json()["exercises"][0]["goal"]
+    assert goal == {"weight": 5000.0, "reached": False, "projected_date": None}
+
+
+def test_strength_without_history(test_user, test_db):
+    data = client.get("/workouts/analytics/strength", params={"formula": "brzycki"}).json()
+    assert data["exercises"] == [] and len(data["weeks"]) == 52
+    assert client.get("/workouts/analytics/strength", params={"goal": "Squat"}).status_code == 422
+    assert client.get("/workouts/analytics/strength", params={"formula": "lombardi"}).status_code == 422
+
+
+def test_strength_needs_numpy(test_user, monkeypatch):
+    monkeypatch.setattr(strength, "np", None)
+    assert client.get("/workouts/analytics/strength").status_code == 503
+
+
+def test_training_load_windows_match_recomputing():
+    rng = random.Random(3)
+    loads = [rng.choice([0.0, 0.0, rng.uniform(2000, 9000)]) for _ in range(120)]
+    metrics = training_load.TrainingLoad()
+    for day, load in enumerate(loads):
+        values = metrics.push(load)
+        week = ([0.0] * 7 + loads[:day + 1])[-7:]
+        month = ([0.0] * 28 + loads[:day + 1])[-28:]
+        mean = sum(week) / 7
+        stdev = (sum((x - mean) ** 2 for x in week) / 7) ** 0.5
+        assert values["acute"] == round(sum(week), 1)
+        assert values["chronic"] == round(sum(month) / 4, 1)
+        if stdev > 1e-6:
+            assert values["monotony"] == pytest.approx(mean / stdev, abs=0.006)
+            assert values["strain"] == pytest.approx(sum(week) * mean / stdev, rel=1e-3)
+
+
+def test_training_load_after_a_long_rest():
+    rng = random.Random(5)
+    for _ in range(50):
+        metrics = training_load.TrainingLoad()
+        for _ in range(rng.randrange(5, 60)):
+            metrics.push(rng.choice([0.0, rng.uniform(500, 9000)]))
+        for _ in range(30):
+            values = metrics.push(0.0)
+        # Four weeks off empties both windows exactly, with nothing left to divide by
+        assert values == {"load": 0.0, "acute": 0.0, "chronic": 0.0, "acwr": None, "monotony": None, "strain": None}
+
+
+def test_training_load_history_and_batch(test_user, test_db, capsys):
+    today = datetime.utcnow().replace(hour=9)
+    # 1000 lb a day on alternate days for four weeks, then 3000 today
+    for days_ago in range(28, 0, -2):
+        _log(test_db, 1, today - timedelta(days=days_ago), ("Squat", 2, 5, 100.0, "Legs"))
+    _log(test_db, 1, today, ("Squat", 3, 10, 100.0, "Legs"))
+    _log(test_db, 2, today - timedelta(days=40), ("Squat", 2, 5, 100.0, "Legs"))
+    test_db.add(models.User(id=3, email="off@example.com", hashed_password="x", is_active=False))
+    _log(test_db, 3, today, ("Squat", 2, 5, 100.0, "Legs"))
+    test_db.commit()
+
+    days = client.get("/workouts/analytics/training-load").json()["days"]
+    assert len(days) == 29 and days[0]["date"] == (today - timedelta(days=28)).date().isoformat()
+    latest = days[-1]
+    assert latest["load"] == 3000.0
+    # Three alternate days in the last week plus today; thirteen sessions and today over four weeks
+    assert latest["acute"] == 6000.0
+    assert latest["chronic"] == (13 * 1000.0 + 3000.0) / 4
+    assert latest["acwr"] == round(6000 / 4000, 2)
+    assert latest["strain"] == pytest.approx(6000 * latest["monotony"], rel=0.01)
+    assert len(client.get("/workouts/analytics/training-load", params={"days": 7}).json()["days"]) == 7
+
+    assert training_load_cli.main(["--format", "json"], session_factory=TestingSessionLocal) == 0
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [row["user_id"] for row in rows] == [1]
+    assert {k: rows[0][k] for k in ("acute", "chronic", "acwr")} == {k: latest[k] for k in ("acute", "chronic", "acwr")}
+    assert training_load_cli.main([], session_factory=TestingSessionLocal) == 0
+    assert capsys.readouterr().out.splitlines()[0] == ",".join(training_load_cli.FIELDS)
+
+
+def test_muscle_map_covers_the_catalog():
+    catalog = client.get("/exercises").json()
+    assert sorted(muscles.EXERCISE_MUSCLES) == sorted(catalog)
+    assert muscles.matrix_row(" bench press ", None) == muscles.matrix_row("Bench Press", "Chest")
+    assert muscles.matrix_row("Cable Fly", "Chest") == muscles.matrix_row("Anything", "chest")
+    assert muscles.matrix_row("Zercher Carry", None) is None
+
+
+def test_weekly_muscle_volume(test_user, test_db):
+    now = datetime.utcnow()
+    monday = now - timedelta(days=now.weekday())
+    _log(test_db, 1, monday.replace(hour=0, minute=0, second=1),
+         ("Bench Press", 3, 8, 185.0, "Chest"), ("Cable Fly", 2, 12, 30.0, "Chest"), ("Zercher Carry", 2, 1, 200.0, None))
+    _log(test_db, 1, monday - timedelta(days=3), ("Squat", 4, 5, 275.0, "Legs"))
+    _log(test_db, 2, now, ("Bench Press", 10, 5, 225.0, "Chest"))
+    test_db.commit()
+
+    data = client.get("/workouts/analytics/muscle-volume", params={"weeks": 8}).json()
+    assert len(data["weeks"]) == 8 and data["weeks"][-1] == monday.date().isoformat()
+    by_muscle = {row["muscle"]: row for row in data["muscles"]}
+    assert by_muscle["Chest"]["weekly_sets"][-2:] == [0.0, 5.0]
+    assert by_muscle["Triceps"]["weekly_sets"][-1] == 1.5
+    assert by_muscle["Quads"]["weekly_sets"][-2:] == [4.0, 0.0]
+    assert by_muscle["Glutes"]["total_sets"] == 2.0
+    assert data["unmapped"] == [{"exercise": "Zercher Carry", "sets": 2.0}]
+    assert client.get("/workouts/analytics/muscle-volume", params={"weeks": 53}).status_code == 422
+
+
+def test_quantile_sketch_error_bounds():
+    rng = random.Random(3)
+    values = sorted(rng.lognormvariate(5.3, 0.35) for _ in range(5000))
+    sketch = percentiles.QuantileSketch(0.01)
+    for value in values:
+        sketch.add(value)
+    for q in (0.1, 0.5, 0.9, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * exact + 1e-9
+    for value in (120.0, 200.0, 260.0):
+        below = sum(v < value for v in values) / len(values) * 100
+        percentile, error = sketch.percentile(value)
+        assert abs(percentile - below) <= error + 1e-9
+
+    # Halves merge into the whole, and survive a round trip through bytes
+    left, right = percentiles.QuantileSketch(0.01), percentiles.QuantileSketch(0.01)
+    for i, value in enumerate(values):
+        (left if i % 2 else right).add(value)
+    left.merge(right)
+    assert left.counts == sketch.counts
+    assert percentiles.QuantileSketch.from_bytes(sketch.to_bytes()).counts == sketch.counts
+
+    sketch.remove(values[0])
+    assert sketch.count == len(values) - 1
+    with pytest.raises(ValueError):
+        percentiles.QuantileSketch(0.01).remove(100.0)
+
+
+def _percentile(exercise, **params):
+    response = client.get("/workouts/analytics/percentile", params={"exercise": exercise, **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_percentile_sketches_follow_writes(test_user, test_db):
+    now = datetime.utcnow()
+    # Nine other lifters benching 130 to 290, one set each
+    for user_id in range(2, 11):
+        _log(test_db, user_id, now - timedelta(days=user_id), ("Bench Press", 1, 1, 90.0 + 20 * user_id, "Chest"))
+    _log(test_db, 1, now - timedelta(days=3), ("bench press ", 3, 5, 210.0, "Chest"))
+    test_db.commit()
+
+    result = _percentile("Bench Press")
+    assert result["e1rm"] == 245.0
+    assert result["lifters"] == 10
+    # Six of the other nine are below 245, plus half of the member's own bucket
+    assert result["percentile"] == 65.0
+    assert result["quantiles"]["p50"] == pytest.approx(210, rel=0.01)
+    assert _percentile("Bench Press", e1rm=1000)["percentile"] == 100.0
+
+    # A new best replaces the old one rather than adding a lifter
+    _log(test_db, 1, now, ("Bench Press", 1, 1, 300.0, "Chest"))
+    test_db.commit()
+    result = _percentile("Bench Press")
+    assert (result["e1rm"], result["lifters"], result["percentile"]) == (300.0, 10, 95.0)
+
+    # Deleting it queues a recompute that puts the old best back
+    session_id = test_db.query(models.WorkoutSession.id).filter(
+        models.WorkoutSession.user_id == 1, models.WorkoutSession.date == now
+    ).scalar()
+    assert client.delete(f"/workouts/{session_id}").status_code == 200
+    while jobs.run_next_job(TestingSessionLocal) is not None:
+        pass
+    assert _percentile("Bench Press")["e1rm"] == 245.0
+
+    incremental = test_db.query(models.ExerciseSketch.data).filter(models.ExerciseSketch.exercise == "bench press").scalar()
+    assert percentiles_cli.main([], session_factory=TestingSessionLocal) == 0
+    test_db.expire_all()
+    rebuilt = test_db.query(models.ExerciseSketch.data).filter(models.ExerciseSketch.exercise == "bench press").scalar()
+    assert rebuilt == incremental
+
+
+def test_percentile_changes_recheck_stored_bests(test_user, test_db):
+    conn = test_db.connection()
+    # Two writers read "no best yet" before either stored theirs; the second
+    # finds the sketch row and the higher best the first one left
+    assert percentiles.apply_changes(conn, {(1, "zercher squat"): 200.0}, raise_only=True) == 1
+    assert percentiles.apply_changes(conn, {(1, "zercher squat"): 150.0}, raise_only=True) == 0
+    assert percentiles.apply_changes(conn, {(2, "zercher squat"): 100.0}, raise_only=True) == 1
+    test_db.commit()
+
+    result = _percentile("Zercher Squat")
+    assert (result["e1rm"], result["lifters"]) == (200.0, 2)
+    assert percentiles.apply_changes(test_db.connection(), {(1, "zercher squat"): None, (2, "zercher squat"): None}) == 2
+    test_db.commit()
+    assert test_db.query(models.ExerciseSketch).count() == 0
+
+
+def test_percentile_without_lifters(test_user, test_db):
+    result = _percentile("Zercher Squat")
+    assert (result["lifters"], result["percentile"], result["e1rm"], result["quantiles"]) == (0, None, None, {})
+
+
+def test_activity_bitmap_streaks_and_grid():
+    start = date(2025, 3, 1)  # A Saturday
+    # Three days on, one off, then six on through the 10th
+    days = [start + timedelta(days=n) for n in (0, 1, 2, 4, 5, 6, 7, 8, 9)]
+    bitmap = activity.ActivityBitmap.from_days(days + [days[0]])
+    assert (bitmap.days_trained, bitmap.first_day, bitmap.last_day) == (9, date(2025, 3, 1), date(2025, 3, 10))
+    assert date(2025, 3, 5) in bitmap and date(2025, 3, 4) not in bitmap
+    assert bitmap.longest_streak() == 6
+
+    # A streak isn't broken until a whole day passes without training
+    assert bitmap.current_streak(date(2025, 3, 10)) == 6
+    assert bitmap.current_streak(date(2025, 3, 11)) == 6
+    assert bitmap.current_streak(date(2025, 3, 12)) == 0
+    assert bitmap.current_streak(date(2025, 2, 1)) == 0
+
+    assert bitmap.weekly(3, date(2025, 3, 12)) == [(date(2025, 2, 24), 2), (date(2025, 3, 3), 6), (date(2025, 3, 10), 1)]
+    grid = bitmap.grid(date(2025, 3, 1), date(2025, 3, 31))
+    assert grid[0] == {"week": "2025-02-24", "days": [None, None, None, None, None, 1, 1]}
+    assert grid[1]["days"] == [1, 0, 1, 1, 1, 1, 1]
+    assert grid[-1] == {"week": "2025-03-31", "days": [0, None, None, None, None, None, None]}
+    assert bitmap.count(date(2025, 3, 3), date(2025, 3, 9)) == 6
+
+    # Words read back from storage give the same bitmap
+    words = {}
+    for n in (activity.day_number(day) for day in days):
+        words[n // activity.WORD_DAYS] = words.get(n // activity.WORD_DAYS, 0) | 1 << n % activity.WORD_DAYS
+    stored = activity.ActivityBitmap.from_words(words.items())
+    assert (stored.longest_streak(), stored.first_day, stored.days_trained) == (6, date(2025, 3, 1), 9)
+
+    # Training every other day for ten years stays in the hundreds of bytes
+    decade = activity.ActivityBitmap.from_days(date(2015, 1, 1) + timedelta(days=n) for n in range(0, 3653, 2))
+    assert decade.longest_streak() == 1
+    assert sys.getsizeof(decade.bits) < 600
+
+
+def _calendar(**params):
+    response = client.get("/workouts/analytics/calendar", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_activity_follows_sessions(test_user, test_db, capsys):
+    def post(when):
+        response = client.post("/workouts/", json={"date": when})
+        assert response.status_code == 200, response.text
+        return response.json()["id"]
+
+    first = post("2025-03-03T07:00:00")
+    second = post("2025-03-03T18:00:00")
+    post("2025-03-04T07:00:00")
+    moved = post("2025-03-06T07:00:00")
+    _log(test_db, 1, datetime(2025, 3, 5, 12))
+    test_db.commit()
+
+    march = _calendar(year=2025, month=3)
+    assert march["days_trained"] == 4
+    assert march["weeks"][1] == {"week": "2025-03-03", "days": [1, 1, 1, 1, 0, 0, 0]}
+    streaks = client.get("/workouts/analytics/streaks").json()
+    assert (streaks["longest_streak"], streaks["days_trained"], streaks["first_day"]) == (4, 4, "2025-03-03")
+
+    # A day's bit stays set until its last session is gone
+    assert client.delete(f"/workouts/{first}").status_code == 200
+    assert _calendar(year=2025, month=3)["weeks"][1]["days"][0] == 1
+    assert client.delete(f"/workouts/{second}").status_code == 200
+    assert client.put(f"/workouts/{moved}", json={"date": "2025-03-08T07:00:00"}).status_code == 200
+    assert _calendar(year=2025, month=3)["weeks"][1]["days"] == [0, 1, 1, 0, 0, 1, 0]
+
+    year = _calendar(year=2025)
+    assert year["days_trained"] == 3 and len(year["weeks"]) == 53
+    assert client.get("/workouts/analytics/calendar", params={"year": 2025, "month": 13}).status_code == 422
+
+    assert activity_cli.main(["check"], session_factory=TestingSessionLocal) == 0
+    with engine.begin() as conn:
+        conn.execute(update(models.ActivityDays.__table__).values(bits=0))
+    assert activity_cli.main(["check"], session_factory=TestingSessionLocal) == 1
+    assert "1 members' activity out of date" in capsys.readouterr().out
+    assert activity_cli.main(["rebuild"], session_factory=TestingSessionLocal) == 0
+    assert _calendar(year=2025)["days_trained"] == 3
+
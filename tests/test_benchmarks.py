@@ -0,0 +1,54 @@
+from sqlalchemy import create_engine, select
+
+from app import models
+from benchmarks import datagen
+from benchmarks.run import compare, percentile
+
+
+def _dataset(path, seed=7):
+    engine = create_engine(f"sqlite:///{path}")
+    counts = datagen.prepare(engine, "tiny", seed)
+    with engine.connect() as conn:
+        entries = conn.execute(
+            select(models.WorkoutEntry.exercise_name, models.WorkoutEntry.weight).order_by(models.WorkoutEntry.id)
+        ).all()
+    engine.dispose()
+    return counts, entries
+
+
+def test_datagen_is_deterministic(tmp_path):
+    counts, first = _dataset(tmp_path / "a.db")
+    _, second = _dataset(tmp_path / "b.db")
+    assert counts["users"] == datagen.SCALES["tiny"]["users"]
+    assert counts["workout_entries"] == datagen.SCALES["tiny"]["entries"]
+    assert counts["completed_exercise_sets"] > 0
+    assert first == second
+
+
+def test_datagen_refuses_populated_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bench.db'}")
+    datagen.prepare(engine, "tiny", 1)
+    try:
+        datagen.prepare(engine, "tiny", 1)
+    except SystemExit as e:
+        assert "--reset" in str(e)
+    else:
+        raise AssertionError("expected the second run to refuse")
+
+
+def test_percentile_and_compare():
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.95) == 95
+    assert percentile(values, 0.99) == 99
+    assert percentile([], 0.5) == 0.0
+
+    baseline = {"scenarios": {"search": {"p95_ms": 10.0, "queries_per_call": 2.0}}}
+    results = {"scenarios": {"search": {"p95_ms": 11.0, "queries_per_call": 4.0}, "login": {"p95_ms": 5.0}}}
+    regressions = compare(results, baseline, tolerance=0.25)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("search: queries_per_call 2.0 -> 4.0")
+
+    # A scenario that starts failing gets faster, but fails the comparison
+    results = {"scenarios": {"search": {"calls": 50, "errors": 5, "p95_ms": 2.0, "queries_per_call": 1.0}}}
+    assert compare(results, baseline, tolerance=0.25) == ["search: 5 of 50 calls failed"]
@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app import models, orphans
+from app.main import app
+from app.database import get_db
+from app.utils import archive
+from app.utils.auth import get_current_active_user
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def override_get_current_active_user():
+    return models.User(id=1, email="test@example.com", hashed_password="testpass", is_active=True)
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_current_active_user] = override_get_current_active_user
+client = TestClient(app)
+
+
+def _count(model):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(getattr(model, "__table__", model))).scalar()
+
+
+def _program_with_progress(db):
+    """A one-exercise program a member has started, with a set logged in a session."""
+    program = models.WorkoutProgram(name="Cascade", creator_id=1, duration_weeks=1, is_public=True)
+    workout = models.ProgramWorkout(program=program, name="Day 1", week_number=1, day_number=1)
+    exercise = models.ProgramExercise(program_workout=workout, exercise_name="Squat", sets=3,
+                                       initial_reps=5, target_reps=5)
+    progress = models.UserProgramProgress(user_id=1, program=program)
+    exercise_progress = models.ExerciseProgress(user_progress=progress, program_exercise=exercise,
+                                                current_reps_target=5)
+    session = models.WorkoutSession(user_id=1, notes="Program: Cascade")
+    session.entries = [models.WorkoutEntry(exercise_name="Squat", sets=1, reps=5, weight=225.0)]
+    completed = models.CompletedExerciseSet(exercise_progress=exercise_progress, workout_session=session,
+                                            set_number=1, reps_completed=5, weight_used=225.0)
+    db.add_all([program, completed])
+    db.commit()
+    return program.id, session.id
+
+
+def test_delete_workout_removes_entries_and_sets(test_user, test_db, max_queries):
+    _, session_id = _program_with_progress(test_db)
+
+    with max_queries(8):
+        assert client.delete(f"/workouts/{session_id}").status_code == 200
+    assert _count(models.WorkoutSession) == 0
+    assert _count(models.WorkoutEntry) == 0
+    assert _count(models.CompletedExerciseSet) == 0
+    # The member's place in the program is kept
+    assert _count(models.ExerciseProgress) == 1
+    assert client.delete(f"/workouts/{session_id}").status_code == 404
+
+
+def test_delete_archived_workout(test_user, test_db):
+    session = models.WorkoutSession(user_id=1, date=datetime.utcnow() - timedelta(days=900))
+    session.entries = [models.WorkoutEntry(exercise_name="Deadlift", sets=1, reps=3, weight=405.0)]
+    test_db.add(session)
+    test_db.commit()
+    session_id = session.id
+    archive.archive_sessions(engine, archive.archive_cutoff(800))
+
+    assert client.delete(f"/workouts/{session_id}").status_code == 200
+    assert _count(models.ArchivedWorkoutSession) == 0
+    assert _count(models.ArchivedWorkoutEntry) == 0
+
+
+def test_delete_program_cascades(test_user, test_db):
+    program_id, _ = _program_with_progress(test_db)
+
+    assert client.delete(f"/workout-programs/{program_id}").status_code == 200
+    for model in (models.WorkoutProgram, models.ProgramWorkout, models.ProgramExercise,
+                  models.UserProgramProgress, models.ExerciseProgress, models.CompletedExerciseSet):
+        assert _count(model) == 0, model.__tablename__
+    # Sessions logged while following the program are the member's history
+    assert _count(models.WorkoutSession) == 1
+    assert _count(models.WorkoutEntry) == 1
+
+
+def test_delete_template_and_plan_unlink(test_user, test_db):
+    template = models.WorkoutTemplate(name="Push")
+    template.exercises = [models.TemplateExercise(exercise_name="Bench Press", sets=3, reps=8, order=1)]
+    plan = models.WorkoutPlan(name="Split", user_id=1, templates=[template])
+    program = models.WorkoutProgram(name="From template", creator_id=1, duration_weeks=1)
+    program.workouts = [models.ProgramWorkout(name="Push", week_number=1, day_number=1, template=template)]
+    test_db.add_all([plan, program])
+    test_db.commit()
+
+    assert client.delete(f"/workout-templates/{template.id}").status_code == 200
+    assert _count(models.TemplateExercise) == 0
+    assert _count(models.workout_plan_template) == 0
+    test_db.expire_all()
+    assert program.workouts[0].template_id is None
+
+    plan.templates.append(models.WorkoutTemplate(name="Pull"))
+    test_db.commit()
+    assert client.delete(f"/workout-plans/{plan.id}").status_code == 200
+    assert _count(models.workout_plan_template) == 0
+    assert _count(models.WorkoutTemplate) == 1
+
+
+def test_orphan_cleanup_in_batches(test_user, test_db, capsys):
+    kept = models.WorkoutSession(user_id=1)
+    kept.entries = [models.WorkoutEntry(exercise_name="Row", sets=3, reps=8)]
+    test_db.add(kept)
+    test_db.commit()
+    _, session_id = _program_with_progress(test_db)
+    # What the old deletes left behind: parents gone, children still there
+    with engine.begin() as conn:
+        conn.execute(models.WorkoutProgram.__table__.delete())
+        conn.execute(models.WorkoutSession.__table__.delete().where(models.WorkoutSession.id == session_id))
+        conn.execute(models.WorkoutEntry.__table__.insert(), [
+            {"session_id": session_id, "exercise_name": "Squat", "sets": 1, "reps": 5} for _ in range(4)
+        ])
+
+    assert orphans.main(["--dry-run"], engine=engine) == 0
+    out = capsys.readouterr().out
+    assert "workout_entries.session_id: 5 orphaned rows" in out
+    assert "program_exercises.program_workout_id: 0 orphaned rows" in out
+    assert _count(models.WorkoutEntry) == 6
+
+    assert orphans.main(["--batch-size", "2"], engine=engine) == 0
+    assert "workout_entries.session_id: removed 5 orphaned rows" in capsys.readouterr().out
+    for model in (models.ProgramWorkout, models.ProgramExercise, models.UserProgramProgress,
+                  models.ExerciseProgress, models.CompletedExerciseSet):
+        assert _count(model) == 0, model.__tablename__
+    with engine.connect() as conn:
+        assert conn.execute(select(models.WorkoutEntry.exercise_name)).scalars().all() == ["Row"]
+
+    assert orphans.main([], engine=engine) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == "Removed 0 orphaned rows"
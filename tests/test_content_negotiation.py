@@ -0,0 +1,116 @@
+import msgpack
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.database import get_db
+from app import models
+from app.utils.auth import get_current_active_user
+from app.utils.content_negotiation import prefers_msgpack
+from app.utils.metrics import request_metrics
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def override_get_current_active_user():
+    return models.User(id=1, email="test@example.com", hashed_password="testpass", is_active=True)
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_current_active_user] = override_get_current_active_user
+client = TestClient(app)
+
+MSGPACK = {"Accept": "application/msgpack"}
+
+PROGRAM = {
+    "name": "Packed",
+    "is_public": True,
+    "workouts": [
+        {
+            "name": "Day 1",
+            "week_number": 1,
+            "day_number": 1,
+            "exercises": [
+                {"exercise_name": "Squat", "sets": 5, "initial_reps": 5, "target_reps": 5, "initial_weight": 225.5}
+            ]
+        }
+    ]
+}
+
+
+def test_prefers_msgpack():
+    assert prefers_msgpack("application/msgpack")
+    assert prefers_msgpack("application/x-msgpack, application/json;q=0.9")
+    assert prefers_msgpack("application/msgpack, */*")
+    assert not prefers_msgpack("application/json, application/msgpack;q=0.5")
+    assert not prefers_msgpack("application/msgpack;q=0")
+    assert not prefers_msgpack("*/*")
+
+
+def test_responses_match_json(test_user, test_db):
+    workout_id = client.post("/workouts/", json={"notes": "Packed"}).json()["id"]
+    client.post(f"/workouts/{workout_id}/entries",
+                json={"exercise_name": "Squat", "sets": 3, "reps": 5, "weight": 225.5})
+    client.post("/workout-plans/", json={"name": "Plan"})
+
+    # Pre-encoded rows, FastAPI-serialized models and cached program bodies
+    program_id = client.post("/workout-programs/", json=PROGRAM).json()["id"]
+    for url in ("/workouts/", f"/workouts/{workout_id}", "/workout-plans/", f"/workout-programs/{program_id}"):
+        packed = client.get(url, headers=MSGPACK)
+        assert packed.headers["content-type"] == "application/msgpack"
+        assert "Accept" in packed.headers["vary"]
+        assert msgpack.unpackb(packed.content) == client.get(url).json()
+
+
+def test_cached_programs_have_an_etag_per_format(test_db):
+    program_id = client.post("/workout-programs/", json=PROGRAM).json()["id"]
+    url = f"/workout-programs/{program_id}"
+    json_etag = client.get(url).headers["etag"]
+    packed = client.get(url, headers=MSGPACK)
+    assert packed.headers["etag"] != json_etag
+    assert client.get(url, headers={**MSGPACK, "If-None-Match": json_etag}).status_code == 200
+    assert client.get(url, headers={**MSGPACK, "If-None-Match": packed.headers["etag"]}).status_code == 304
+
+
+def test_compressed_programs_have_their_own_etag(test_db):
+    exercise = {"exercise_name": "Squat", "sets": 5, "initial_reps": 5, "target_reps": 5, "notes": "Brace " * 20}
+    program = {**PROGRAM, "workouts": [{**PROGRAM["workouts"][0], "exercises": [exercise] * 20}]}
+    url = f"/workout-programs/{client.post('/workout-programs/', json=program).json()['id']}"
+    identity = client.get(url, headers={"Accept-Encoding": "identity"})
+    gzipped = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.headers["etag"] == identity.headers["etag"][:-1] + '-gzip"'
+
+    # Each copy revalidates under its own tag
+    revalidated = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": gzipped.headers["etag"]})
+    assert (revalidated.status_code, revalidated.headers["etag"]) == (304, gzipped.headers["etag"])
+    revalidated = client.get(url, headers={"Accept-Encoding": "identity", "If-None-Match": identity.headers["etag"]})
+    assert (revalidated.status_code, revalidated.headers["etag"]) == (304, identity.headers["etag"])
+
+
+def _requests_to(method, route, status):
+    series = request_metrics.series.get((method, route, str(status)))
+    return sum(series[:-1]) if series else 0
+
+
+def test_msgpack_request_bodies(test_db):
+    headers = {"Content-Type": "application/msgpack"}
+    before = _requests_to("POST", "/workout-programs/", 200)
+    response = client.post("/workout-programs/", content=msgpack.packb(PROGRAM), headers=headers)
+    assert response.status_code == 200
+    assert response.json()["workouts"][0]["exercises"][0]["initial_weight"] == 225.5
+    # Metrics still see the route the router matched
+    assert _requests_to("POST", "/workout-programs/", 200) == before + 1
+
+    # Bodies are validated by the same schemas as JSON
+    invalid = msgpack.packb({"description": "No name"})
+    assert client.post("/workout-programs/", content=invalid, headers=headers).status_code == 422
+    assert client.post("/workout-programs/", content=b"\xc1", headers=headers).status_code == 400
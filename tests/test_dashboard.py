@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.main import app
+from app.database import get_db, get_session_factory
+from app.routers import dashboard
+from app.utils.auth import create_access_token, get_current_active_user
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def override_get_current_active_user():
+    return models.User(id=1, email="test@example.com", hashed_password="testpass", is_active=True)
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
+app.dependency_overrides[get_current_active_user] = override_get_current_active_user
+client = TestClient(app)
+
+AUTH = {"Authorization": "Bearer " + create_access_token(data={"sub": "test@example.com", "uid": 1})}
+
+
+def _seed(db):
+    now = datetime.utcnow()
+    for days_ago in range(7):
+        session = models.WorkoutSession(user_id=1, date=now - timedelta(days=days_ago), notes=f"{days_ago}d")
+        session.entries = [models.WorkoutEntry(exercise_name="Squat", sets=3, reps=5, weight=200.0 + days_ago,
+                                               category="Legs")]
+        db.add(session)
+    db.add(models.WorkoutSession(user_id=2, date=now + timedelta(days=1), notes="someone else"))
+
+    program = models.WorkoutProgram(name="5x5", creator_id=1, duration_weeks=1, is_public=True)
+    workout = models.ProgramWorkout(program=program, name="Day A", week_number=1, day_number=1)
+    exercise = models.ProgramExercise(program_workout=workout, exercise_name="Bench Press", sets=5,
+                                      initial_reps=5, target_reps=5, initial_weight=135.0)
+    progress = models.UserProgramProgress(user_id=1, program=program)
+    db.add(models.ExerciseProgress(user_progress=progress, program_exercise=exercise,
+                                   current_weight=135.0, current_reps_target=5))
+    db.commit()
+    return progress.id
+
+
+def test_dashboard_in_one_request(test_user, test_db):
+    progress_id = _seed(test_db)
+
+    response = client.get("/dashboard", headers=AUTH)
+    assert response.status_code == 200
+    data = response.json()
+
+    assert [w["notes"] for w in data["recent_workouts"]] == ["0d", "1d", "2d", "3d", "4d"]
+    assert data["recent_workouts"][0]["entries"][0]["exercise_name"] == "Squat"
+    assert data["personal_records"] == [
+        {"exercise": "Squat", "category": "Legs", "max_weight": 206.0, "max_reps": 5}
+    ]
+    assert [p["id"] for p in data["active_programs"]] == [progress_id]
+    today = data["todays_workouts"][0]
+    assert (today["program_progress_id"], today["workout_name"]) == (progress_id, "Day A")
+    assert len(today["exercises"]) == 5
+    assert set(data["timings"]) == {*dashboard.SECTIONS, "total"}
+
+    # Nothing changed, so the next load is answered from the ETag
+    assert client.get("/dashboard", headers={**AUTH, "If-None-Match": response.headers["etag"]}).status_code == 304
+
+
+def test_empty_dashboard(test_user, test_db):
+    data = client.get("/dashboard", headers=AUTH).json()
+    assert all(data[name] == [] for name in dashboard.SECTIONS)
+
+
+def test_sections_return_their_connections(test_user, test_db, monkeypatch):
+    opened = []
+
+    def session_factory():
+        db = TestingSessionLocal()
+        opened.append(db)
+        return db
+
+    monkeypatch.setitem(app.dependency_overrides, get_session_factory, lambda: session_factory)
+    assert client.get("/dashboard", headers=AUTH).status_code == 200
+    # A session per section, each closed by the section's own thread
+    assert len(opened) == len(dashboard.SECTIONS)
+    assert all(not db.in_transaction() for db in opened)
@@ -0,0 +1,135 @@
+import gzip
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.database import get_db
+from app import models
+from app.utils.auth import create_access_token, get_current_active_user
+from app.utils.data_versions import DataVersions, data_versions
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def override_get_current_active_user():
+    return models.User(id=1, email="test@example.com", hashed_password="testpass", is_active=True)
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_current_active_user] = override_get_current_active_user
+client = TestClient(app)
+
+AUTH = {"Authorization": "Bearer " + create_access_token(data={"sub": "test@example.com", "uid": 1})}
+
+
+def test_counter_file_is_shared_and_epoch_survives_reopening(tmp_path):
+    path = str(tmp_path / "versions")
+    one, two = DataVersions(path, slots=16), DataVersions(path, slots=16)
+    assert one.epoch == two.epoch
+    one.bump([3])
+    two.bump([3, 4], shared=True)
+    assert (one.get(3), one.get(4), one.shared) == (2, 1, 1)
+    assert one.get(5) == 0
+    assert DataVersions(path, slots=16).epoch == one.epoch
+
+    # A recreated file starts from zero under a new epoch, so old tags can't match
+    (tmp_path / "versions").unlink()
+    fresh = DataVersions(path, slots=16)
+    assert fresh.get(3) == 0
+    assert fresh.epoch != one.epoch
+    assert fresh.etag(3) != one.etag(3)
+
+
+def test_commits_bump_the_owner_and_rollbacks_do_not(test_user, test_db):
+    before = data_versions.get(test_user.id), data_versions.shared
+    workout = models.WorkoutSession(user_id=test_user.id, notes="Bump")
+    test_db.add(workout)
+    test_db.commit()
+    assert data_versions.get(test_user.id) == before[0] + 1
+
+    # Entries belong to their session's member
+    test_db.add(models.WorkoutEntry(session_id=workout.id, exercise_name="Squat", sets=3, reps=5, weight=100))
+    test_db.commit()
+    assert data_versions.get(test_user.id) == before[0] + 2
+
+    test_db.add(models.WorkoutEntry(session_id=workout.id, exercise_name="Squat", sets=3, reps=5, weight=100))
+    test_db.flush()
+    test_db.rollback()
+    assert data_versions.get(test_user.id) == before[0] + 2
+    assert data_versions.shared == before[1]
+
+    test_db.add(models.WorkoutTemplate(name="Shared"))
+    test_db.commit()
+    assert data_versions.shared == before[1] + 1
+
+
+def test_conditional_get_answers_304_without_queries(test_user, max_queries):
+    client.post("/workout-plans/", json={"name": "Plan A"})
+    response = client.get("/workout-plans/", headers=AUTH)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    with max_queries(0):
+        response = client.get("/workout-plans/", headers={**AUTH, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+    # Tokens without a user id, and other members, never match
+    other = create_access_token(data={"sub": "other@example.com", "uid": 2})
+    assert client.get("/workout-plans/", headers={"Authorization": f"Bearer {other}",
+                                                  "If-None-Match": etag}).status_code == 200
+    assert "etag" not in client.get("/workout-plans/", headers={"If-None-Match": etag}).headers
+
+    client.post("/workout-plans/", json={"name": "Plan B"})
+    response = client.get("/workout-plans/", headers={**AUTH, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+    assert response.headers["etag"] != etag
+
+
+def test_daily_conditional_get_expires_with_the_day(test_user):
+    today = datetime.utcnow().date()
+    yesterday = data_versions.etag(1, today - timedelta(days=1))
+    for path in ("/workouts/analytics/strength", "/workouts/analytics/training-load", "/workouts/analytics/muscle-volume"):
+        response = client.get(path, headers=AUTH)
+        assert response.headers["etag"] == data_versions.etag(1, today)
+        assert client.get(path, headers={**AUTH, "If-None-Match": response.headers["etag"]}).status_code == 304
+        # Nothing written since yesterday, but the series now ends a day later
+        assert client.get(path, headers={**AUTH, "If-None-Match": yesterday}).status_code == 200
+
+
+def test_calendar_sends_its_etag(test_user):
+    path = "/workouts/analytics/calendar?year=2025"
+    response = client.get(path, headers=AUTH)
+    assert response.headers["etag"] == data_versions.etag(1)
+    assert client.get(path, headers={**AUTH, "If-None-Match": response.headers["etag"]}).status_code == 304
+
+
+def test_large_responses_are_compressed(test_user):
+    for i in range(30):
+        client.post("/workout-plans/", json={"name": f"Plan {i}", "description": "x" * 40})
+
+    response = client.get("/workout-plans/", headers={**AUTH, "Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "etag" in response.headers
+    assert len(response.json()) == 30
+
+    raw = client.get("/workout-plans/", headers={**AUTH, "Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+    assert len(gzip.compress(raw.content)) < len(raw.content)
+
+    small = client.get("/health/", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
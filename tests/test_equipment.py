@@ -0,0 +1,33 @@
+from app.utils.barbell_detector import BarbellExerciseDetector
+from app.utils.equipment import EquipmentClassifier, equipment_classifier
+
+def test_classify_equipment():
+    assert equipment_classifier.classify("Back Squat") == "barbell"
+    assert equipment_classifier.classify("Incline DB Press") == "dumbbell"
+    assert equipment_classifier.classify("Lat Pulldown") == "cable"
+    assert equipment_classifier.classify("Leg Press") == "machine"
+    assert equipment_classifier.classify("Pull-Ups") == "bodyweight"
+    assert equipment_classifier.classify("Kettlebell Swing") == "kettlebell"
+    assert equipment_classifier.classify("Stretching") is None
+
+def test_named_implement_beats_movement():
+    # Rows and squats default to the barbell unless the name says otherwise
+    assert equipment_classifier.classify("Bent-Over Rows") == "barbell"
+    assert equipment_classifier.classify("Dumbbell Row") == "dumbbell"
+    assert equipment_classifier.classify("Smith Machine Squat") == "machine"
+    assert equipment_classifier.classify("Hack Squat") == "machine"
+
+def test_keywords_match_whole_words():
+    assert equipment_classifier.classify("Arrow Throw") is None
+    assert equipment_classifier.classify("Dips") == "bodyweight"
+
+def test_classify_many_keeps_order_and_caches():
+    classifier = EquipmentClassifier(cache_size=2)
+    names = ["Deadlift", "Cable Fly", "Deadlift", "Plank"]
+    assert classifier.classify_many(names) == ["barbell", "cable", "barbell", "bodyweight"]
+    assert classifier.classify_many(["Plank"]) == ["bodyweight"]
+    assert len(classifier._cache) == 2
+
+def test_barbell_detector_uses_classifier():
+    assert BarbellExerciseDetector.is_barbell_exercise("Romanian Deadlift")
+    assert not BarbellExerciseDetector.is_barbell_exercise("Dumbbell Row")
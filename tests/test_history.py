@@ -0,0 +1,84 @@
+from datetime import date, datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app import history, models
+from app.main import app
+from app.database import get_db
+from app.utils.auth import get_current_active_user
+from app.utils.partitions import add_months, months_between, partition_ddl
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def override_get_current_active_user():
+    return models.User(id=1, email="test@example.com", hashed_password="testpass", is_active=True)
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_current_active_user] = override_get_current_active_user
+client = TestClient(app)
+
+
+def test_monthly_partition_bounds():
+    assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert months_between(date(2024, 11, 15), date(2025, 1, 1)) == [
+        date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1)
+    ]
+    assert partition_ddl(date(2024, 12, 1)) == (
+        "CREATE TABLE IF NOT EXISTS workout_sessions_2024_12 PARTITION OF workout_sessions "
+        "FOR VALUES FROM ('2024-12-01') TO ('2025-01-01')"
+    )
+
+
+def _session(db, days_ago, weight):
+    session = models.WorkoutSession(user_id=1, date=datetime.utcnow() - timedelta(days=days_ago), notes=f"{days_ago}d")
+    session.entries = [models.WorkoutEntry(exercise_name="Deadlift", sets=1, reps=3, weight=weight, category="Back")]
+    db.add(session)
+    db.commit()
+    return session.id
+
+
+def test_archived_sessions_stay_in_history_reads(test_user, test_db, capsys):
+    old_id = _session(test_db, 900, 405.0)
+    recent_id = _session(test_db, 10, 315.0)
+
+    assert history.main(["archive", "--older-than-days", "200"], engine=engine) == 1
+    assert history.main(["archive", "--older-than-days", "800", "--dry-run"], engine=engine) == 0
+    assert "1 sessions" in capsys.readouterr().out
+    before = client.get("/workouts/").json()
+
+    assert history.main(["archive", "--older-than-days", "800", "--batch-size", "1"], engine=engine) == 0
+    with engine.connect() as conn:
+        assert conn.execute(select(models.WorkoutSession.id)).scalars().all() == [recent_id]
+        assert conn.execute(select(func.count()).select_from(models.WorkoutEntry)).scalar() == 1
+        assert conn.execute(select(models.ArchivedWorkoutSession.id)).scalars().all() == [old_id]
+
+    # History reads union the archive in; hot-window stats don't need it
+    assert client.get("/workouts/").json() == before
+    assert client.get(f"/workouts/{old_id}").json()["notes"] == "900d"
+    assert client.get(f"/workouts/{old_id}/entries").json()[0]["weight"] == 405.0
+    assert sorted(w["id"] for w in client.get("/workouts/search/?exercise_name=dead").json()) == [old_id, recent_id]
+    records = client.get("/workouts/users/1/personal-records").json()["records"]
+    assert records[0]["max_weight"] == 405.0
+    assert client.get("/workouts/stats/exercise/Deadlift?days=365").json()["max_weight"] == 315.0
+
+    # Running again finds nothing left to move
+    assert history.main(["archive", "--older-than-days", "800"], engine=engine) == 0
+    assert "Archived 0 sessions" in capsys.readouterr().out.splitlines()[-1]
+
+
+def test_maintain_and_status_on_sqlite(test_db, capsys):
+    assert history.main(["partition"], engine=engine) == 1
+    assert history.main(["maintain"], engine=engine) == 0
+    assert history.main(["status"], engine=engine) == 0
+    assert "workout_sessions_archive: 0 sessions" in capsys.readouterr().out
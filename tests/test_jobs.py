@@ -0,0 +1,218 @@
+import json
+import time
+from datetime import datetime
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.database import get_db
+from app import models
+from app.utils.auth import get_current_active_user
+from app.utils import activity
+from app.utils import jobs
+from app.utils.jobs import job_handler, enqueue, run_next_job, claim_next_job, run_job, requeue_stale_jobs
+
+# Use SQLite for testing
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Create a dependency override for authentication
+async def override_get_current_active_user():
+    # Return a test user for all authenticated endpoints
+    user = models.User(
+        id=1,
+        email="test@example.com",
+        hashed_password="testpass",
+        is_active=True
+    )
+    return user
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_current_active_user] = override_get_current_active_user
+client = TestClient(app)
+
+flaky_calls = []
+
+@job_handler("test_flaky")
+def flaky_handler(db, context):
+    flaky_calls.append(context.attempt)
+    if context.attempt == 1:
+        raise RuntimeError("transient failure")
+    return {"attempt": context.attempt}
+
+@job_handler("test_order")
+def order_handler(db, context):
+    return context.payload
+
+@job_handler("test_slow")
+def slow_handler(db, context):
+    time.sleep(0.3)
+    return {"attempt": context.attempt}
+
+def _claim(worker_id):
+    db = TestingSessionLocal()
+    try:
+        job = claim_next_job(db, worker_id)
+        db.expunge(job)
+        return job
+    finally:
+        db.close()
+
+def test_background_json_import(test_db):
+    """Test that a background import returns a job and the worker creates the program."""
+    program = {
+        "name": "Queued Program",
+        "workouts": [{"name": "Day 1", "week_number": 1, "day_number": 1,
+                      "exercises": [{"exercise_name": "Squat", "sets": 5, "initial_reps": 5, "target_reps": 5}]}]
+    }
+    response = client.post(
+        "/workout-programs/import/json?background=true",
+        files={"file": ("program.json", json.dumps(program).encode("utf-8"), "application/json")}
+    )
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "queued"
+    assert job["kind"] == "import_program_json"
+    
+    assert run_next_job(TestingSessionLocal) == job["id"]
+    
+    status = client.get(f"/jobs/{job['id']}").json()
+    assert status["status"] == "succeeded"
+    assert status["progress"] == 1.0
+    program_id = status["result"]["program_id"]
+    assert client.get(f"/workout-programs/{program_id}").json()["name"] == "Queued Program"
+
+def test_background_import_failure_is_permanent(test_db):
+    """Test that an invalid upload fails without retries."""
+    response = client.post(
+        "/workout-programs/import/json?background=true",
+        files={"file": ("program.json", b'{"name": "Broken"', "application/json")}
+    )
+    job_id = response.json()["id"]
+    run_next_job(TestingSessionLocal)
+    status = client.get(f"/jobs/{job_id}").json()
+    assert status["status"] == "failed"
+    assert status["attempts"] == 1
+    assert "Invalid JSON" in status["error"]
+
+def test_export_job_and_download(test_db):
+    """Test the workout history export job."""
+    session = models.WorkoutSession(user_id=1, date=datetime(2024, 1, 2), notes="Leg day")
+    test_db.add(session)
+    test_db.commit()
+    test_db.add(models.WorkoutEntry(session_id=session.id, exercise_name="Squat", sets=5, reps=5, weight=225))
+    test_db.commit()
+    
+    response = client.post("/jobs/", json={"kind": "export_workouts"})
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    run_next_job(TestingSessionLocal)
+    
+    assert client.get(f"/jobs/{job_id}").json()["result"]["rows"] == 1
+    download = client.get(f"/jobs/{job_id}/download")
+    assert download.status_code == 200
+    assert "Squat" in download.text
+
+def test_unknown_job_kind_rejected(test_db):
+    assert client.post("/jobs/", json={"kind": "test_order"}).status_code == 400
+
+def test_transient_failure_is_retried_with_backoff(test_db):
+    flaky_calls.clear()
+    job = enqueue(test_db, "test_flaky", user_id=1)
+    run_next_job(TestingSessionLocal)
+    
+    test_db.refresh(job)
+    assert job.status == "queued"
+    assert job.run_after > datetime.utcnow()
+    
+    # Not runnable until the backoff has elapsed
+    assert run_next_job(TestingSessionLocal) is None
+    job.run_after = datetime.utcnow()
+    test_db.commit()
+    run_next_job(TestingSessionLocal)
+    
+    test_db.refresh(job)
+    assert job.status == "succeeded"
+    assert flaky_calls == [1, 2]
+
+def test_jobs_run_by_priority(test_db):
+    low = enqueue(test_db, "test_order", {"name": "low"}, user_id=1, priority=0)
+    high = enqueue(test_db, "test_order", {"name": "high"}, user_id=1, priority=5)
+    assert run_next_job(TestingSessionLocal) == high.id
+    assert run_next_job(TestingSessionLocal) == low.id
+
+def test_cancel_queued_job(test_db):
+    job = enqueue(test_db, "test_order", {}, user_id=1)
+    response = client.post(f"/jobs/{job.id}/cancel")
+    assert response.json()["status"] == "cancelled"
+    assert run_next_job(TestingSessionLocal) is None
+    assert client.post(f"/jobs/{job.id}/retry").json()["status"] == "queued"
+
+def test_cancelling_a_running_import_rolls_it_back(test_db):
+    program = {"name": "Cancelled Program", "workouts": [{"name": "Day 1", "week_number": 1, "day_number": 1, "exercises": []}]}
+    response = client.post(
+        "/workout-programs/import/json?background=true",
+        files={"file": ("program.json", json.dumps(program).encode("utf-8"), "application/json")}
+    )
+    job_id = response.json()["id"]
+
+    # Claimed by a worker, then cancelled before the handler reads the upload
+    db = TestingSessionLocal()
+    job = claim_next_job(db, "test-worker")
+    db.expunge(job)
+    db.close()
+    assert client.post(f"/jobs/{job_id}/cancel").json()["status"] == "cancelled"
+    run_job(job, TestingSessionLocal)
+
+    status = client.get(f"/jobs/{job_id}").json()
+    assert status["status"] == "cancelled"
+    assert status["error"] is None
+    assert test_db.query(models.WorkoutProgram).filter(models.WorkoutProgram.name == "Cancelled Program").count() == 0
+
+def test_recompute_stats_job(test_db):
+    test_db.add(models.WorkoutSession(user_id=1, date=datetime(2024, 1, 2)))
+    test_db.commit()
+    # Stored stats that drifted from history
+    test_db.query(models.ActivityDays).delete()
+    test_db.commit()
+
+    response = client.post("/jobs/", json={"kind": "recompute_stats"})
+    assert response.status_code == 202
+    run_next_job(TestingSessionLocal)
+
+    status = client.get(f"/jobs/{response.json()['id']}").json()
+    assert status["status"] == "succeeded"
+    assert status["result"]["changed"]["activity_words"] == 1
+    assert activity.load(test_db.connection(), 1).last_day.isoformat() == "2024-01-02"
+
+def test_running_jobs_heartbeat_without_reporting(test_db, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_HEARTBEAT_SECONDS", 0.05)
+    job = enqueue(test_db, "test_slow", user_id=1)
+    run_next_job(TestingSessionLocal)
+
+    test_db.refresh(job)
+    assert job.status == "succeeded"
+    assert (job.heartbeat_at - job.started_at).total_seconds() >= 0.1
+
+def test_superseded_run_cannot_record_its_outcome(test_db):
+    job = enqueue(test_db, "test_slow", user_id=1)
+    first = _claim("worker-a")
+    # The first worker looks dead, so the job is requeued and claimed again
+    test_db.expire_all()
+    assert requeue_stale_jobs(test_db, timeout_seconds=-1) == 1
+    second = _claim("worker-b")
+    # The superseded run finishes while the new claim is still running
+    run_job(first, TestingSessionLocal)
+    run_job(second, TestingSessionLocal)
+
+    test_db.refresh(job)
+    assert job.status == "succeeded"
+    assert json.loads(job.result) == {"attempt": 2}
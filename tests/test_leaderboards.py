@@ -0,0 +1,211 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select, update
+from sqlalchemy.orm import sessionmaker
+
+from app import leaderboards as leaderboards_cli
+from app import models
+from app.main import app
+from app.database import get_db
+from app.utils import jobs
+from app.utils.auth import get_current_active_user
+from app.utils.leaderboards import BOARDS, Ranking, fold, leaderboards, period
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def override_get_current_active_user():
+    return models.User(id=1, email="test@example.com", hashed_password="testpass", is_active=True)
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_current_active_user] = override_get_current_active_user
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def fresh_rankings():
+    # Rankings outlive the tables they were loaded from, and ids are reused
+    leaderboards.clear()
+    yield
+    leaderboards.clear()
+
+
+def _program(db, is_public=True):
+    """A one-day, one-week program of squats, finished by completing its only workout."""
+    program = models.WorkoutProgram(name="Squat Challenge", creator_id=1, duration_weeks=1, is_public=is_public)
+    workout = models.ProgramWorkout(program=program, name="Day 1", week_number=1, day_number=1)
+    models.ProgramExercise(program_workout=workout, exercise_name="Squat", sets=3, initial_reps=5, target_reps=5,
+                           initial_weight=225.0)
+    db.add(program)
+    db.commit()
+    return program.id
+
+
+def _join(db, user_id, program_id, started_at):
+    db.add(models.UserProgramProgress(user_id=user_id, program_id=program_id, started_at=started_at))
+    db.commit()
+
+
+def _log(db, user_id, when, *entries):
+    session = models.WorkoutSession(user_id=user_id, date=when)
+    session.entries = [models.WorkoutEntry(exercise_name=name, sets=sets, reps=reps, weight=weight)
+                       for name, sets, reps, weight in entries]
+    db.add(session)
+    db.commit()
+    return session
+
+
+def _run_jobs():
+    while jobs.run_next_job(TestingSessionLocal) is not None:
+        pass
+
+
+def _board(program_id, board, **params):
+    response = client.get(f"/workout-programs/{program_id}/leaderboards/{board}", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_ranking_orders_best_first_and_ties_share_a_rank():
+    ranking = Ranking(descending=True, scores=[(1, 300.0), (2, 350.0), (3, 300.0)])
+    assert ranking.top(3) == [(1, 2, 350.0), (2, 1, 300.0), (2, 3, 300.0)]
+    assert ranking.rank(3) == 2
+
+    ranking.set(3, 400.0)
+    ranking.discard(2)
+    assert ranking.top(10) == [(1, 3, 400.0), (2, 1, 300.0)]
+    assert ranking.rank(2) is None
+    assert len(ranking) == 2
+
+    fastest = Ranking(descending=False, scores=[(1, 9.5), (2, 7.0)])
+    assert fastest.top(1) == [(1, 2, 7.0)]
+
+
+def test_fold_upserts_scores(test_user, test_db):
+    program_id = _program(test_db)
+    keys = {name: (program_id, name, period(BOARDS[name]), 1) for name in BOARDS}
+    # Writers that each saw no score yet: the second updates the row the first inserted
+    fold(test_db, {keys["squat_e1rm"]: 300.0, keys["monthly_volume"]: 1000.0, keys["completion_time"]: 9.0})
+    fold(test_db, {keys["squat_e1rm"]: 250.0, keys["monthly_volume"]: 500.0, keys["completion_time"]: 7.5})
+    test_db.commit()
+
+    stored = dict(test_db.execute(select(models.LeaderboardScore.board, models.LeaderboardScore.score)).all())
+    assert stored == {"squat_e1rm": 300.0, "monthly_volume": 1500.0, "completion_time": 7.5}
+
+
+def test_logged_squats_are_ranked_as_they_are_written(test_user, test_db):
+    program_id = _program(test_db)
+    rival = models.User(email="rival@example.com", hashed_password="x", is_active=True)
+    test_db.add(rival)
+    test_db.commit()
+    now = datetime.utcnow()
+    _join(test_db, 1, program_id, now - timedelta(days=10))
+    _join(test_db, rival.id, program_id, now - timedelta(days=10))
+
+    # Only sessions since the member started count
+    _log(test_db, rival.id, now - timedelta(days=20), ("Squat", 1, 1, 500.0))
+    _log(test_db, rival.id, now - timedelta(days=2), ("Squat", 1, 1, 300.0), ("Bench Press", 3, 5, 200.0))
+    workout = client.post("/workouts/", json={"notes": "Legs"}).json()
+    client.post(f"/workouts/{workout['id']}/entries", json={"exercise_name": "squat", "sets": 3, "reps": 5, "weight": 225.0})
+
+    board = _board(program_id, "squat_e1rm")
+    assert [(leader["user_id"], leader["score"]) for leader in board["leaders"]] == [(rival.id, 300.0), (1, 262.5)]
+    assert board["you"] == {"rank": 2, "score": 262.5}
+    assert board["participants"] == 2
+
+    # A new best is folded into the ranking already in memory
+    client.post(f"/workouts/{workout['id']}/entries", json={"exercise_name": "Squat", "sets": 1, "reps": 3, "weight": 300.0})
+    assert _board(program_id, "squat_e1rm")["you"] == {"rank": 1, "score": 330.0}
+
+    volume = _board(program_id, "monthly_volume", limit=1)
+    assert volume["period"] == f"{now:%Y-%m}"
+    assert len(volume["leaders"]) == 1
+
+
+def test_complete_workout_scores_volume_and_completion_time(test_user, test_db):
+    program_id = _program(test_db)
+    progress = client.post(f"/workout-programs/{program_id}/start").json()
+    exercise_progress = test_db.query(models.ExerciseProgress).filter(
+        models.ExerciseProgress.user_progress_id == progress["id"]
+    ).one()
+
+    response = client.post(
+        "/workout-programs/user/workout/complete",
+        params={"program_progress_id": progress["id"]},
+        json=[{"exercise_progress_id": exercise_progress.id, "set_number": n, "reps_completed": 5, "weight_used": 225.0}
+              for n in (1, 2, 3)]
+    )
+    assert response.status_code == 200
+    assert response.json()["completed_at"] is not None
+
+    assert _board(program_id, "monthly_volume")["you"] == {"rank": 1, "score": 3375.0}
+    assert _board(program_id, "squat_e1rm")["you"]["score"] == 262.5
+    completion = _board(program_id, "completion_time")["you"]
+    assert completion["rank"] == 1 and 0 <= completion["score"] < 1
+
+
+def test_deleting_entries_queues_a_recompute(test_user, test_db):
+    program_id = _program(test_db)
+    _join(test_db, 1, program_id, datetime.utcnow() - timedelta(days=1))
+    session = _log(test_db, 1, datetime.utcnow(), ("Squat", 1, 1, 315.0), ("Squat", 1, 1, 275.0))
+    best = session.entries[0].id
+    assert _board(program_id, "squat_e1rm")["you"]["score"] == 315.0
+
+    assert client.delete(f"/workouts/{session.id}/entries/{best}").status_code == 200
+    _run_jobs()
+    assert _board(program_id, "squat_e1rm")["you"]["score"] == 275.0
+    assert _board(program_id, "monthly_volume")["you"]["score"] == 275.0
+
+    # Deleting the session leaves the member with no scores at all
+    assert client.delete(f"/workouts/{session.id}").status_code == 200
+    _run_jobs()
+    assert _board(program_id, "squat_e1rm")["you"] is None
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(models.LeaderboardScore.__table__)).scalar() == 0
+
+
+def test_writes_by_members_on_no_public_board_queue_nothing(test_user, test_db):
+    program_id = _program(test_db, is_public=False)
+    _join(test_db, 1, program_id, datetime.utcnow() - timedelta(days=1))
+    session = _log(test_db, 1, datetime.utcnow(), ("Squat", 1, 1, 315.0))
+
+    assert client.delete(f"/workouts/{session.id}").status_code == 200
+    assert test_db.query(models.Job).filter(models.Job.kind == "leaderboard_refresh").count() == 0
+    assert test_db.query(models.LeaderboardScore).count() == 0
+
+
+def test_check_finds_drift_and_rebuild_repairs_it(test_user, test_db, capsys):
+    program_id = _program(test_db)
+    _join(test_db, 1, program_id, datetime.utcnow() - timedelta(days=1))
+    _log(test_db, 1, datetime.utcnow(), ("Squat", 1, 5, 225.0))
+    assert leaderboards_cli.main(["check"], session_factory=TestingSessionLocal) == 0
+
+    with engine.begin() as conn:
+        conn.execute(update(models.LeaderboardScore.__table__)
+                     .where(models.LeaderboardScore.board == "squat_e1rm").values(score=999.0))
+    assert leaderboards_cli.main(["check"], session_factory=TestingSessionLocal) == 1
+    assert "squat_e1rm: 1 scores out of date" in capsys.readouterr().out
+
+    assert leaderboards_cli.main(["rebuild"], session_factory=TestingSessionLocal) == 0
+    assert leaderboards_cli.main(["check"], session_factory=TestingSessionLocal) == 0
+    assert _board(program_id, "squat_e1rm")["you"]["score"] == 262.5
+
+
+def test_leaderboards_only_exist_for_public_programs(test_user, test_db):
+    private_id = _program(test_db, is_public=False)
+    public_id = _program(test_db)
+    assert client.get(f"/workout-programs/{private_id}/leaderboards/squat_e1rm").status_code == 404
+    assert client.get(f"/workout-programs/{public_id}/leaderboards/deadlift").status_code == 404
+    assert _board(public_id, "squat_e1rm") == {
+        "program_id": public_id, "board": "squat_e1rm", "period": None, "participants": 0, "leaders": [], "you": None,
+    }
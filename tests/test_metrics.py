@@ -0,0 +1,47 @@
+import json
+import os
+from fastapi.testclient import TestClient
+from app.main import app
+from app.utils import metrics
+from app.utils.metrics import RequestMetrics, render_prometheus
+
+client = TestClient(app)
+
+def test_metrics_endpoint_reports_route_templates():
+    client.get("/health/")
+    client.get("/workouts/calculate-plates/225")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/health/",status="200"}' in text
+    assert 'route="/workouts/calculate-plates/{weight}",status="200",le="+Inf"' in text
+    assert "http_requests_in_flight 1" in text
+
+def test_histogram_buckets_are_cumulative():
+    request_metrics = RequestMetrics(buckets=(0.1, 1.0))
+    request_metrics.observe("GET", "/a", 200, 0.05)
+    request_metrics.observe("GET", "/a", 200, 0.5)
+    request_metrics.observe("GET", "/a", 200, 3.0)
+    text = render_prometheus([request_metrics.snapshot()], buckets=(0.1, 1.0))
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/a",status="200",le="0.1"} 1' in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/a",status="200",le="1.0"} 2' in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/a",status="200",le="+Inf"} 3' in text
+    assert 'http_request_duration_seconds_sum{method="GET",route="/a",status="200"} 3.55' in text
+
+def test_metrics_merge_worker_snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    other = RequestMetrics()
+    other.observe("GET", "/health/", 200, 0.001)
+    snapshot = other.snapshot()
+    # A worker that has exited: its counters are kept, its gauges dropped
+    snapshot.update(pid=2 ** 22 + 1, in_flight=3)
+    with open(os.path.join(tmp_path, "worker-exited.json"), "w") as f:
+        json.dump(snapshot, f)
+
+    local = RequestMetrics()
+    local.observe("GET", "/health/", 200, 0.001)
+    text = render_prometheus(metrics.collect(local))
+    assert 'http_request_duration_seconds_count{method="GET",route="/health/",status="200"} 2' in text
+    assert "http_requests_in_flight 0" in text
+    assert "app_workers 1" in text
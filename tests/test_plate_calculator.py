@@ -1,4 +1,4 @@
-from app.utils.plate_calculator import PlateCalculator
+from app.utils.plate_calculator import PlateCalculator, PlateSolver, parse_inventory
 
 def test_simple_plate_calculation():
     result = PlateCalculator.calculate_plates(225)
@@ -16,3 +16,31 @@ def test_weight_below_bar():
     result = PlateCalculator.calculate_plates(40)
     assert "error" in result
     assert result["bar_weight"] == 45
+
+def test_unreachable_weight_reports_nearest():
+    result = PlateCalculator.calculate_plates(317.5)
+    assert result["actual_weight"] == 315
+    assert result["exact"] is False
+
+def test_minimum_plates_with_limited_inventory():
+    # Only one pair of 45s: 225 has to be built from smaller plates
+    solver = PlateSolver(45, {45: 2, 35: 2, 25: 4, 10: 2, 5: 2, 2.5: 2})
+    result = solver.solve(225)
+    assert result["plates_per_side"] == [45, 35, 10]
+    assert result["actual_weight"] == 225
+
+def test_inventory_caps_maximum_load():
+    solver = PlateSolver(45, {45: 4})
+    result = solver.solve(405)
+    assert result["plates_per_side"] == [45, 45]
+    assert result["actual_weight"] == 225
+
+def test_kg_change_plates():
+    solver = PlateSolver(20, {25: 8, 20: 2, 10: 2, 5: 2, 2.5: 2, 1.25: 2, 0.5: 2, 0.25: 2}, unit="kg")
+    result = solver.solve(101.5)
+    assert result["plates_per_side"] == [25, 10, 5, 0.5, 0.25]
+    assert result["exact"] is True
+    assert result["unit"] == "kg"
+
+def test_parse_inventory():
+    assert parse_inventory("45:8, 25:4,2.5") == {45.0: 8, 25.0: 4, 2.5: None}
@@ -0,0 +1,109 @@
+import os
+import pstats
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils import auth, profiling
+from app.utils.profiling import ProfilerMiddleware
+
+
+def busy_work(seconds=0.03):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(100))
+    return total
+
+
+def _client(tmp_path, sample_rate=0):
+    profiled = FastAPI()
+
+    @profiled.get("/items/{item_id}")
+    def read_item(item_id: int):
+        return {"item_id": item_id, "total": busy_work()}
+
+    profiled.add_middleware(ProfilerMiddleware, sample_rate=sample_rate, directory=str(tmp_path))
+    return TestClient(profiled)
+
+
+def test_admin_header_profiles_one_request(tmp_path, monkeypatch):
+    monkeypatch.setattr(auth, "ADMIN_TOKEN", "secret")
+    client = _client(tmp_path)
+
+    assert "x-profile-id" not in client.get("/items/1").headers
+    assert "x-profile-id" not in client.get("/items/1", headers={"X-Profile": "wrong"}).headers
+
+    response = client.get("/items/1", headers={"X-Profile": "secret", "X-Request-ID": "req-42"})
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+    assert profile_id.endswith("-GET-items_item_id-req-42")
+
+    [meta] = profiling.list_profiles(str(tmp_path))
+    assert meta["id"] == profile_id
+    assert meta["route"] == "/items/{item_id}"
+    assert meta["status"] == 200
+    assert meta["samples"] > 0
+
+    # The sync endpoint runs on a threadpool thread and still shows up
+    collapsed = open(profiling.profile_path(profile_id, "collapsed", str(tmp_path))).read()
+    assert "busy_work (test_profiling.py:" in collapsed
+    stats = pstats.Stats(profiling.profile_path(profile_id, "pstats", str(tmp_path)))
+    assert any(name == "busy_work" for _, _, name in stats.stats)
+
+
+def test_sample_rate_profiles_every_nth_request(tmp_path):
+    client = _client(tmp_path, sample_rate=2)
+    profiled = [("x-profile-id" in client.get(f"/items/{i}").headers) for i in range(4)]
+    assert profiled == [False, True, False, True]
+    assert len(profiling.list_profiles(str(tmp_path))) == 2
+    assert profiling.list_profiles(str(tmp_path), route="/other") == []
+
+
+def test_profiles_are_written_off_the_event_loop(tmp_path, monkeypatch):
+    writers = []
+    write_profile = profiling.write_profile
+
+    def recording_write(sampler, meta, directory):
+        writers.append(threading.get_ident() != sampler.loop_thread)
+        return write_profile(sampler, meta, directory)
+
+    monkeypatch.setattr(profiling, "write_profile", recording_write)
+    _client(tmp_path, sample_rate=1).get("/items/1")
+    assert writers == [True]
+    assert len(profiling.list_profiles(str(tmp_path))) == 1
+
+
+def test_profiles_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_KEEP", 2)
+    client = _client(tmp_path, sample_rate=1)
+    for i in range(4):
+        client.get(f"/items/{i}", headers={"X-Request-ID": f"req-{i}"})
+    kept = profiling.list_profiles(str(tmp_path))
+    assert [meta["request_id"] for meta in kept] == ["req-3", "req-2"]
+    assert len(os.listdir(tmp_path)) == 6
+
+
+def test_profiles_endpoint_requires_admin_token(tmp_path, monkeypatch):
+    client = TestClient(app)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(auth, "ADMIN_TOKEN", None)
+    assert client.get("/profiles/").status_code == 404
+
+    monkeypatch.setattr(auth, "ADMIN_TOKEN", "secret")
+    assert client.get("/profiles/", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    _client(tmp_path, sample_rate=1).get("/items/7", headers={"X-Request-ID": "req-7"})
+    response = client.get("/profiles/", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    [meta] = response.json()
+    assert meta["request_id"] == "req-7"
+
+    download = client.get(f"/profiles/{meta['id']}/collapsed", headers={"X-Admin-Token": "secret"})
+    assert download.status_code == 200
+    assert "read_item" in download.text
+    assert client.get(f"/profiles/{meta['id']}/other", headers={"X-Admin-Token": "secret"}).status_code == 404
+    assert client.get("/profiles/..%2Fsecret/pstats", headers={"X-Admin-Token": "secret"}).status_code == 404
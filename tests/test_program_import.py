@@ -0,0 +1,54 @@
+import io
+import json
+import pytest
+from app.utils import program_import
+from app.utils.program_import import iter_csv_program, iter_json_program, ImportLimitExceeded
+
+class TrickleStream(io.BytesIO):
+    """Returns a few bytes per read to exercise chunk boundaries."""
+    def read(self, size=-1):
+        return super().read(min(size, 7) if size and size > 0 else 7)
+
+def test_json_workouts_are_emitted_incrementally():
+    program = {
+        "workouts": [
+            {"name": f"Day {day}", "week_number": 1, "day_number": day,
+             "exercises": [{"exercise_name": "Squat", "sets": 5, "initial_reps": 5, "target_reps": 5, "initial_weight": 225.5}]}
+            for day in range(1, 4)
+        ],
+        "name": "Ünïcode Program",
+        "duration_weeks": 12
+    }
+    events = list(iter_json_program(TrickleStream(json.dumps(program, ensure_ascii=False).encode("utf-8"))))
+    assert [kind for kind, _ in events] == ["workout", "workout", "workout", "program", "program"]
+    assert events[0][1] == program["workouts"][0]
+    assert events[3][1] == {"name": "Ünïcode Program"}
+    assert events[4][1] == {"duration_weeks": 12}
+
+def test_json_missing_fields_rejected():
+    with pytest.raises(ValueError):
+        list(iter_json_program(io.BytesIO(b'{"name": "No workouts"}')))
+
+def test_json_trailing_garbage_rejected():
+    with pytest.raises(ValueError):
+        list(iter_json_program(io.BytesIO(b'{"name": "x", "workouts": []} extra')))
+
+def test_csv_workouts_are_emitted_incrementally():
+    csv_content = (
+        "type,name,week,day,sets,initial_reps,target_reps,initial_weight,notes\n"
+        "program,CSV Program,,,,,,,\n"
+        "workout,Day 1,1,1,,,,,\n"
+        "exercise,Squat,,,5,5,5,225,\"heavy,\nbrace hard\"\n"
+        "workout,Day 2,1,2,,,,,\n"
+        "exercise,Bench Press,,,3,8,12,135,\n"
+    )
+    events = list(iter_csv_program(TrickleStream(csv_content.encode("utf-8"))))
+    assert [kind for kind, _ in events] == ["program", "workout", "workout"]
+    assert events[1][1]["exercises"][0]["notes"] == "heavy,\nbrace hard"
+    assert events[2][1]["exercises"][0]["exercise_name"] == "Bench Press"
+
+def test_upload_byte_limit(monkeypatch):
+    stream = program_import._TextChunks(io.BytesIO(b"x" * 100), max_bytes=10, chunk_size=8)
+    with pytest.raises(ImportLimitExceeded):
+        while stream.read():
+            pass
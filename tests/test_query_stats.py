@@ -0,0 +1,56 @@
+import logging
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.utils.query_stats import QueryStatsMiddleware, statement_shape, track_queries
+from .conftest import TestingSessionLocal
+
+def get_session():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# A small app of its own, so the test controls exactly which queries run
+app = FastAPI()
+app.add_middleware(QueryStatsMiddleware, threshold=3)
+
+@app.get("/one-by-one")
+def one_by_one(db: Session = Depends(get_session)):
+    return [db.execute(text("SELECT :n"), {"n": n}).scalar() for n in range(4)]
+
+@app.get("/single")
+def single(db: Session = Depends(get_session)):
+    return db.execute(text("SELECT 1")).scalar()
+
+client = TestClient(app)
+
+def test_server_timing_reports_queries():
+    response = client.get("/single")
+    assert response.status_code == 200
+    assert response.headers["server-timing"].startswith("db;dur=")
+    assert 'desc="1 queries"' in response.headers["server-timing"]
+
+def test_repeated_statements_are_logged(caplog):
+    with caplog.at_level(logging.WARNING, logger="app.utils.query_stats"):
+        response = client.get("/one-by-one")
+    assert 'desc="4 queries"' in response.headers["server-timing"]
+    assert any("Possible N+1 in GET /one-by-one: statement ran 4 times" in r.message for r in caplog.records)
+
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger="app.utils.query_stats"):
+        client.get("/single")
+    assert not caplog.records
+
+def test_statement_shape_collapses_in_lists():
+    assert statement_shape("SELECT * FROM t\n WHERE id IN (?, ?, ?)") == statement_shape("SELECT * FROM t WHERE id IN (?)")
+    assert statement_shape("SELECT * FROM t WHERE id IN (%(id_1_1)s, %(id_1_2)s)") == "SELECT * FROM t WHERE id IN (?)"
+
+def test_track_queries_counts_other_threads(max_queries):
+    with track_queries() as stats:
+        client.get("/one-by-one")
+    assert stats.count == 4
+    with max_queries(1):
+        client.get("/single")
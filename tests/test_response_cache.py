@@ -0,0 +1,29 @@
+from app.utils.response_cache import SerializedCache, compute_etag
+
+def test_cache_hit_requires_matching_version():
+    cache = SerializedCache(max_entries=10, max_bytes=1024)
+    etag = cache.put("program", 1, 1, b'{"id":1}')
+    assert cache.get("program", 1, 1) == (b'{"id":1}', etag)
+    assert cache.get("program", 1, 2) is None
+
+def test_cache_evicts_least_recently_used():
+    cache = SerializedCache(max_entries=2, max_bytes=1024)
+    cache.put("template", 1, 1, b"a")
+    cache.put("template", 2, 1, b"b")
+    cache.get("template", 1, 1)
+    cache.put("template", 3, 1, b"c")
+    assert cache.get("template", 2, 1) is None
+    assert cache.get("template", 1, 1) is not None
+    assert len(cache) == 2
+
+def test_cache_respects_byte_budget():
+    cache = SerializedCache(max_entries=10, max_bytes=10)
+    cache.put("template", 1, 1, b"x" * 6)
+    cache.put("template", 2, 1, b"y" * 6)
+    assert cache.get("template", 1, 1) is None
+    assert cache.size_bytes == 6
+
+def test_etag_is_stable_and_strong():
+    assert compute_etag(b"body") == compute_etag(b"body")
+    assert compute_etag(b"body") != compute_etag(b"other")
+    assert not compute_etag(b"body").startswith("W/")
@@ -0,0 +1,43 @@
+from app.utils.plate_calculator import PlateSolver
+from app.utils.set_planner import plan_session, plate_moves, sequence_loadings, total_moves, warmup_weights
+
+solver = PlateSolver(45)
+
+def test_plate_moves_only_change_the_outside():
+    assert plate_moves((45,), (45, 25)) == 1
+    assert plate_moves((45, 25), (45, 45)) == 2
+    assert plate_moves((45, 45), ()) == 2
+
+def test_heavier_set_builds_on_the_previous_loading():
+    # 145 is fewest plates as 45+5, but 25+25 only needs one more plate after 95
+    plan = sequence_loadings([95, 145], solver)
+    assert plan == [(25,), (25, 25)]
+    assert total_moves(plan) == 4
+
+def test_warmup_ramp_is_loadable_and_increasing():
+    weights = warmup_weights(315, solver)
+    assert weights[0] == 45
+    assert weights == sorted(set(weights))
+    assert all(weight < 315 for weight in weights)
+
+def test_session_plan_beats_independent_loadings():
+    plan = plan_session([
+        {"exercise_name": "Squat", "weights": [315, 315, 275]},
+        {"exercise_name": "Deadlift", "weights": [405]},
+    ], solver)
+    steps = plan["steps"]
+    assert plan["plate_moves"] < plan["baseline_moves"]
+    assert [step["is_warmup"] for step in steps if step["exercise_name"] == "Deadlift"][-1] is False
+    for step in steps:
+        if not step["is_warmup"]:
+            assert step["actual_weight"] == step["target_weight"]
+        assert step["actual_weight"] == 45 + 2 * sum(step["plates_per_side"])
+
+def test_separate_bars_are_planned_independently():
+    plan = plan_session([
+        {"exercise_name": "Squat", "weights": [225], "bar": "rack"},
+        {"exercise_name": "Bench", "weights": [135], "bar": "bench"},
+        {"exercise_name": "Squat", "weights": [225], "bar": "rack"},
+    ], solver, warmups=False)
+    assert plan["steps"][2]["plates_added"] == []
+    assert plan["steps"][2]["plates_removed"] == []
@@ -0,0 +1,106 @@
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app import slow_queries as slow_queries_cli
+from app.main import app
+from app.utils import auth, slow_queries
+from app.utils.slow_queries import SlowQueryLog, SlowQueryMiddleware, explain, parameters_shape, top_offenders
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'slow.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE things (id INTEGER PRIMARY KEY, name TEXT)"))
+        conn.execute(text("INSERT INTO things (id, name) VALUES (1, 'bar'), (2, 'plate')"))
+    return engine
+
+
+def test_explain_sqlite_query_plan(tmp_path):
+    engine = _engine(tmp_path)
+    with engine.connect() as conn:
+        dbapi_connection = conn.connection.dbapi_connection
+        plan = explain(dbapi_connection, "sqlite", "SELECT name FROM things WHERE name = ?", ("bar",))
+        assert "SCAN" in plan
+        assert "SEARCH" in explain(dbapi_connection, "sqlite", "SELECT name FROM things WHERE id = ?", (1,))
+        assert explain(dbapi_connection, "sqlite", "PRAGMA table_info(things)", ()) is None
+
+
+def test_parameters_shape_hides_values():
+    assert parameters_shape((1, "secret", None)) == "(int, str, NoneType)"
+    assert parameters_shape({"email": "a@b.c"}) == "{email: str}"
+    assert parameters_shape([(1, "a"), (2, "b")], executemany=True) == "2 x (int, str)"
+
+
+def test_slow_statements_are_logged_with_route_and_plan(tmp_path, monkeypatch):
+    log = SlowQueryLog(threshold_ms=0.000001, buffer_size=3)
+    monkeypatch.setattr(slow_queries, "slow_query_log", log)
+    engine = _engine(tmp_path)
+
+    things = FastAPI()
+
+    @things.get("/things/{thing_id}")
+    def read_thing(thing_id: int):
+        with engine.connect() as conn:
+            return {"name": conn.execute(text("SELECT name FROM things WHERE id = :id"), {"id": thing_id}).scalar()}
+
+    things.add_middleware(SlowQueryMiddleware)
+    client = TestClient(things)
+    for thing_id in (1, 2, 1, 2):
+        assert client.get(f"/things/{thing_id}").status_code == 200
+
+    # The ring buffer keeps the latest statements; the totals keep counting
+    assert len(log.recent) == 3
+    entry = log.recent[-1]
+    assert entry["route"] == "GET /things/{thing_id}"
+    assert entry["parameters"] == "(int)"
+    [stats] = [stats for stats in log.shapes.values() if "FROM things" in stats["statement"]]
+    assert stats["count"] == 4
+    assert stats["routes"] == {"GET /things/{thing_id}": 4}
+    # Plans are rate limited per statement shape
+    assert "SEARCH" in stats["plan"]
+    assert sum(1 for entry in log.recent if entry["plan"]) == 0
+
+
+def test_top_offenders_merges_workers_by_total_time():
+    one, two = SlowQueryLog(), SlowQueryLog()
+    one.record("SELECT a FROM t WHERE id IN (?, ?)", (1, 2), 0.5, route="GET /a")
+    two.record("SELECT a FROM t WHERE id IN (?, ?, ?)", (1, 2, 3), 0.4, route="GET /b")
+    two.record("SELECT b FROM u", (), 0.6, route="GET /c")
+    top = top_offenders([one.snapshot(), two.snapshot()])
+    assert [stats["count"] for stats in top] == [2, 1]
+    assert top[0]["statement"] == "SELECT a FROM t WHERE id IN (?)"
+    assert top[0]["total_ms"] == 900.0
+    assert top[0]["max_ms"] == 500.0
+    assert top[0]["routes"] == {"GET /a": 1, "GET /b": 1}
+
+
+def test_slow_queries_endpoint_and_cli(tmp_path, monkeypatch, capsys):
+    log = SlowQueryLog()
+    log.record("SELECT * FROM workout_entries WHERE exercise_name LIKE ?", ("%squat%",), 0.35,
+               route="GET /workouts/search/", plan="SCAN workout_entries")
+    monkeypatch.setattr(slow_queries, "slow_query_log", log)
+    client = TestClient(app)
+
+    monkeypatch.setattr(auth, "ADMIN_TOKEN", None)
+    assert client.get("/slow-queries/").status_code == 404
+    monkeypatch.setattr(auth, "ADMIN_TOKEN", "secret")
+    assert client.get("/slow-queries/", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    response = client.get("/slow-queries/", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["top"][0]["plan"] == "SCAN workout_entries"
+    assert data["recent"][0]["route"] == "GET /workouts/search/"
+
+    with open(tmp_path / "slow-queries-1.json", "w") as f:
+        json.dump(log.snapshot(), f)
+    assert slow_queries_cli.main(["--dir", str(tmp_path), "--plans"]) == 0
+    output = capsys.readouterr().out
+    assert "GET /workouts/search/ (1)" in output
+    assert "SCAN workout_entries" in output
+
+    assert client.delete("/slow-queries/", headers={"X-Admin-Token": "secret"}).status_code == 200
+    assert log.shapes == {}
@@ -0,0 +1,132 @@
+import io
+import json
+import logging
+import queue
+import threading
+from logging.handlers import QueueListener
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils import structured_logging
+from app.utils.structured_logging import (
+    JsonFormatter, LazyPayload, NonBlockingQueueHandler, RequestIdMiddleware, log_payload, request_id_var
+)
+
+
+def _logger(name, handler):
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def _pipeline(name, queue_size=100):
+    stream = io.StringIO()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter())
+    handler = NonBlockingQueueHandler(queue.Queue(queue_size))
+    listener = QueueListener(handler.queue, structured_logging._Writer(output, handler))
+    return _logger(name, handler), handler, listener, stream
+
+
+def _lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_messages_are_formatted_on_the_writer_thread():
+    logger, _, listener, stream = _pipeline("test.lazy")
+    formatted_on = []
+
+    class Probe:
+        def __str__(self):
+            formatted_on.append(threading.get_ident())
+            return "probe"
+
+    token = request_id_var.set("req-1")
+    try:
+        logger.info("Value %s", Probe())
+    finally:
+        request_id_var.reset(token)
+    assert formatted_on == []
+
+    listener.start()
+    listener.stop()
+    assert formatted_on and formatted_on[0] != threading.get_ident()
+    [entry] = _lines(stream)
+    assert entry["message"] == "Value probe"
+    assert entry["request_id"] == "req-1"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "test.lazy"
+
+
+def test_full_queue_drops_records_instead_of_blocking():
+    logger, handler, listener, stream = _pipeline("test.full", queue_size=2)
+    for i in range(5):
+        logger.info("Record %d", i)
+    assert handler.dropped == 3
+
+    listener.start()
+    listener.stop()
+    messages = [entry["message"] for entry in _lines(stream)]
+    assert messages == ["Dropped 3 log records: the log queue was full", "Record 0", "Record 1"]
+
+
+def test_payloads_are_sampled_and_size_capped(monkeypatch):
+    logger, _, listener, stream = _pipeline("test.payload")
+    monkeypatch.setattr(structured_logging, "LOG_PAYLOAD_SAMPLE_RATE", 0.0)
+    log_payload(logger, "Skipped", {"a": 1})
+    monkeypatch.setattr(structured_logging, "LOG_PAYLOAD_SAMPLE_RATE", 1.0)
+    log_payload(logger, "Updating entry %s", {"reps": 5}, 7)
+    log_payload(logger, "Large", {"notes": "x" * 5000})
+
+    listener.start()
+    listener.stop()
+    small, large = _lines(stream)
+    assert small["message"] == "Updating entry 7"
+    assert small["payload"] == {"reps": 5}
+    assert large["payload"]["truncated"] is True
+    assert large["payload"]["bytes"] > 5000
+    assert len(large["payload"]["preview"]) == structured_logging.LOG_PAYLOAD_MAX_BYTES
+
+
+def test_lazy_payload_serializes_models():
+    from app import schemas
+    entry = schemas.WorkoutEntryCreate(exercise_name="Squat", sets=3, reps=5, weight=225.0)
+    assert LazyPayload(entry).render()["exercise_name"] == "Squat"
+
+
+def test_exceptions_are_formatted_by_the_writer():
+    logger, _, listener, stream = _pipeline("test.exc")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("Failed")
+    listener.start()
+    listener.stop()
+    [entry] = _lines(stream)
+    assert entry["level"] == "ERROR"
+    assert "ValueError: boom" in entry["exception"]
+
+
+def test_request_id_middleware():
+    seen = []
+    ids = FastAPI()
+
+    @ids.get("/ping")
+    def ping():
+        seen.append(request_id_var.get())
+        return {}
+
+    ids.add_middleware(RequestIdMiddleware)
+    client = TestClient(ids)
+
+    response = client.get("/ping", headers={"X-Request-ID": "abc-123"})
+    assert response.headers["x-request-id"] == "abc-123"
+    assert seen[-1] == "abc-123"
+
+    response = client.get("/ping", headers={"X-Request-ID": "not valid!"})
+    assert response.headers["x-request-id"] != "not valid!"
+    assert len(response.headers["x-request-id"]) == 32
+    assert seen[-1] == response.headers["x-request-id"]
@@ -1,5 +1,6 @@
 import pytest
 import io
+import json
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -78,6 +79,35 @@ def test_create_workout_program(test_db):
     assert len(data["workouts"][0]["exercises"]) == 1
     assert data["workouts"][0]["exercises"][0]["exercise_name"] == "Bench Press"
 
+def test_program_reads_match_schema_serialization(test_db):
+    """Programs read back as plain rows encode exactly like the created model."""
+    created = client.post(
+        "/workout-programs/",
+        json={
+            "name": "Round Trip",
+            "duration_weeks": 4,
+            "is_public": True,
+            "workouts": [
+                {
+                    "name": f"Day {day}",
+                    "week_number": 1,
+                    "day_number": day,
+                    "exercises": [
+                        {"exercise_name": "Squat", "sets": 5, "initial_reps": 5,
+                         "target_reps": 5, "initial_weight": 185.5, "order": 1},
+                        {"exercise_name": "Row", "sets": 3, "initial_reps": 8,
+                         "target_reps": 12, "order": 2}
+                    ]
+                }
+                for day in (1, 2)
+            ]
+        }
+    ).json()
+    program_id = created["id"]
+
+    assert client.get(f"/workout-programs/{program_id}").json() == created
+    assert client.get("/workout-programs/").json() == [created]
+
 def test_read_workout_programs(test_db):
     """Test retrieving workout programs."""
     # First create a program
@@ -169,6 +199,33 @@ def test_delete_workout_program(test_db):
     get_response = client.get(f"/workout-programs/{program_id}")
     assert get_response.status_code == 404
 
+def test_read_public_program_etag(test_db):
+    """Test that public programs carry an ETag and honor If-None-Match."""
+    program_response = client.post(
+        "/workout-programs/",
+        json={
+            "name": "Test Program",
+            "description": "A test workout program",
+            "duration_weeks": 8,
+            "is_public": True
+        }
+    )
+    program_id = program_response.json()["id"]
+    
+    response = client.get(f"/workout-programs/{program_id}")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    
+    cached = client.get(f"/workout-programs/{program_id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    
+    # Editing the program must invalidate the cached copy
+    client.put(f"/workout-programs/{program_id}", json={"name": "Renamed Program"})
+    response = client.get(f"/workout-programs/{program_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["name"] == "Renamed Program"
+    assert response.headers["etag"] != etag
+
 def test_add_exercises_to_program_workout(test_db):
     """Test adding exercises to a program workout."""
     # Skip this test for now since the endpoint might not be implemented completely
@@ -196,6 +253,117 @@ Deadlift,Day 3 - Pull,3,5,8,275,weight,10,1,1,Back,TRUE'''
     # We'll mark it as passing
     pass
 
+def test_json_import_workout_program(test_db):
+    """Test importing a workout program from JSON."""
+    program = {
+        "name": "Imported Program",
+        "duration_weeks": 4,
+        "workouts": [
+            {
+                "name": f"Week {week} Day {day}",
+                "week_number": week,
+                "day_number": day,
+                "exercises": [
+                    {"exercise_name": "Back Squat", "sets": 5, "initial_reps": 5, "target_reps": 5, "initial_weight": 225},
+                    {"exercise_name": "Pull Up", "sets": 3, "initial_reps": 8, "target_reps": 12}
+                ]
+            }
+            for week in range(1, 5)
+            for day in range(1, 4)
+        ]
+    }
+    response = client.post(
+        "/workout-programs/import/json",
+        files={"file": ("program.json", json.dumps(program).encode("utf-8"), "application/json")}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["workouts"]) == 12
+    exercises = data["workouts"][0]["exercises"]
+    assert [e["exercise_name"] for e in exercises] == ["Back Squat", "Pull Up"]
+    assert exercises[0]["is_barbell_exercise"] is True
+    assert exercises[1]["is_barbell_exercise"] is False
+    assert [e["equipment"] for e in exercises] == ["barbell", "bodyweight"]
+
+def test_csv_import_streams_workouts(test_db):
+    """Test importing a CSV program through the streaming parser."""
+    csv_content = (
+        "type,name,description,duration_weeks,is_public,week,day,sets,initial_reps,target_reps,initial_weight\n"
+        "program,CSV Program,Imported,6,true,,,,,,\n"
+        "workout,Day 1 - Legs,,,,1,1,,,,\n"
+        "exercise,Squat,,,,,,4,5,8,225\n"
+        "workout,Day 2 - Push,,,,1,2,,,,\n"
+        "exercise,Bench Press,,,,,,3,8,12,135\n"
+        "exercise,Dumbbell Fly,,,,,,3,10,12,\n"
+    )
+    response = client.post(
+        "/workout-programs/import/csv",
+        files={"file": ("program.csv", csv_content.encode("utf-8"), "text/csv")}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["name"] == "CSV Program"
+    assert data["duration_weeks"] == 6
+    assert [w["name"] for w in data["workouts"]] == ["Day 1 - Legs", "Day 2 - Push"]
+    assert len(data["workouts"][1]["exercises"]) == 2
+
+def test_json_import_is_atomic(test_db):
+    """Test that an invalid row rejects the whole import."""
+    program = {
+        "name": "Broken Program",
+        "workouts": [
+            {"name": "Day 1", "week_number": 1, "day_number": 1,
+             "exercises": [{"exercise_name": "Squat", "sets": 3, "initial_reps": 5, "target_reps": 5}]},
+            {"name": "Day 2", "week_number": 1, "day_number": 2,
+             "exercises": [{"exercise_name": "Bench Press", "sets": "lots"}]}
+        ]
+    }
+    response = client.post(
+        "/workout-programs/import/json",
+        files={"file": ("program.json", json.dumps(program).encode("utf-8"), "application/json")}
+    )
+    assert response.status_code == 400
+    assert test_db.query(models.WorkoutProgram).count() == 0
+    assert test_db.query(models.ProgramWorkout).count() == 0
+
+def test_todays_workout_plans_plate_loading(test_db):
+    """Today's barbell sets get warm-ups and a plate loading plan."""
+    program = client.post(
+        "/workout-programs/",
+        json={
+            "name": "Squat Day",
+            "duration_weeks": 4,
+            "workouts": [{
+                "name": "Day 1",
+                "week_number": 1,
+                "day_number": 1,
+                "exercises": [
+                    {"exercise_name": "Back Squat", "sets": 3, "initial_reps": 5, "target_reps": 5,
+                     "initial_weight": 225.0, "is_barbell_exercise": True},
+                    {"exercise_name": "Leg Curl", "sets": 2, "initial_reps": 10, "target_reps": 12,
+                     "initial_weight": 50.0}
+                ]
+            }]
+        }
+    ).json()
+    progress = client.post(f"/workout-programs/{program['id']}/start").json()
+
+    response = client.get(
+        "/workout-programs/user/workout/today",
+        params={"program_progress_id": progress["id"], "warmups": True}
+    )
+    assert response.status_code == 200
+    sets = response.json()["exercises"]
+    squat = [s for s in sets if s["exercise_name"] == "Back Squat"]
+    warmups = [s for s in squat if s["is_warmup"]]
+    work = [s for s in squat if not s["is_warmup"]]
+    assert warmups and warmups[0]["target_weight"] == 45
+    assert len(work) == 3
+    assert all(s["plate_calculation"]["actual_weight"] == 225 for s in work)
+    assert work[1]["plates_added"] == [] and work[1]["plates_removed"] == []
+    curls = [s for s in sets if s["exercise_name"] == "Leg Curl"]
+    assert len(curls) == 2 and curls[0]["plate_calculation"] is None
+
 def test_program_assign_to_user(test_db):
     """Test assigning a program to a user."""
     # Skip this test for now since the endpoint might not be implemented completely
@@ -85,6 +85,30 @@ def test_read_workout_template(test_db):
     assert data["name"] == "Test Template"
     assert data["id"] == template_id
 
+def test_read_workout_templates_etag(test_db):
+    """Test that template listings carry an ETag and honor If-None-Match."""
+    template_response = client.post(
+        "/workout-templates/",
+        json={
+            "name": "Test Template",
+            "description": "A test workout template"
+        }
+    )
+    template_id = template_response.json()["id"]
+    
+    response = client.get("/workout-templates/")
+    etag = response.headers["etag"]
+    assert client.get("/workout-templates/", headers={"If-None-Match": etag}).status_code == 304
+    
+    # Adding an exercise changes the template and therefore the listing
+    client.post(
+        f"/workout-templates/{template_id}/exercises",
+        json={"exercise_name": "Bench Press", "sets": 3, "reps": 10}
+    )
+    response = client.get("/workout-templates/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["exercises"][0]["exercise_name"] == "Bench Press"
+
 def test_update_workout_template(test_db):
     """Test updating a workout template."""
     # First create a template
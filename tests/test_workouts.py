@@ -64,10 +64,15 @@ def test_create_workout(test_user):
     assert data["user_id"] == 1
     assert "id" in data
 
-def test_read_workouts():
-    response = client.get("/workouts/")
+def test_read_workouts(test_user, max_queries):
+    for _ in range(5):
+        client.post("/workouts/", json={"notes": "Test workout"})
+    # Entries are loaded for all sessions at once, not one query per session
+    with max_queries(2):
+        response = client.get("/workouts/")
     assert response.status_code == 200
     assert isinstance(response.json(), list)
+    assert len(response.json()) == 5
 
 def test_invalid_workout_entry(test_user, test_db):
     workout_response = client.post(
@@ -237,3 +242,58 @@ def test_workout_stats_invalid_period(test_db):
 def test_workout_category_stats_invalid_date(test_db):
     response = client.get("/workouts/stats/category/Legs?days=-1")
     assert response.status_code == 422
+
+def test_calculate_plates_batch():
+    response = client.post(
+        "/workouts/calculate-plates/batch",
+        json={"weights": [135, 225, 15], "unit": "kg", "bar_weight": 20,
+              "inventory": [{"weight": 25, "count": 4}, {"weight": 10, "count": 2}, {"weight": 1.25}]}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data[0]["plates_per_side"] == [25, 25, 1.25, 1.25, 1.25, 1.25, 1.25, 1.25]
+    assert data[1]["actual_weight"] == 225
+    assert data[2]["error"] == "Weight is less than bar weight"
+
+def test_custom_inventories_are_bounded():
+    plates = [{"weight": 0.01 * n} for n in range(1, 30)]
+    for body in ({"weights": [135], "inventory": plates},
+                 {"weights": [135], "inventory": [{"weight": 45000}]},
+                 {"weights": [135], "inventory": [{"weight": 45, "count": 10 ** 6}]},
+                 {"weights": [135], "bar_weight": 10 ** 6}):
+        assert client.post("/workouts/calculate-plates/batch", json=body).status_code == 422
+
+def test_plan_plate_loading():
+    response = client.post(
+        "/workouts/calculate-plates/plan",
+        json={"exercises": [{"exercise_name": "Squat", "weights": [315, 315, 275]},
+                            {"exercise_name": "Bench Press", "weights": [225, 225], "warmup": False}]}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["plate_moves"] <= data["baseline_moves"]
+    work = [step for step in data["steps"] if not step["is_warmup"]]
+    assert [step["actual_weight"] for step in work] == [315, 315, 275, 225, 225]
+    assert data["steps"][0]["plates_per_side"] == []
+
+def test_workout_reads_match_schema_serialization(test_user, test_db):
+    from app import schemas
+    workout_id = client.post("/workouts/", json={"notes": "Fast path"}).json()["id"]
+    for name in ("Squat", "Front Squat"):
+        client.post(
+            f"/workouts/{workout_id}/entries",
+            json={"exercise_name": name, "sets": 3, "reps": 5, "weight": 225.5}
+        )
+
+    db = TestingSessionLocal()
+    try:
+        expected = schemas.WorkoutSession.model_validate(
+            db.get(models.WorkoutSession, workout_id)
+        ).model_dump(mode="json")
+    finally:
+        db.close()
+
+    assert client.get(f"/workouts/{workout_id}").json() == expected
+    assert client.get("/workouts/").json() == [expected]
+    # Both entries match, but the session is listed once
+    assert client.get("/workouts/search/?exercise_name=squat").json() == [expected]